@@ -3,6 +3,7 @@ from .sub_agents.guide.agent import guide_agent
 from .sub_agents.search.tools.search_tool import SearchEnhancementTool
 from .sub_agents.prompt_writer.agent import prompt_writer_agent
 from .prompts import ROOT_PROMPT
+from .models import build_model
 from .callbacks import (
     before_agent_callback,
     after_agent_callback,
@@ -10,12 +11,13 @@ from .callbacks import (
     after_model_callback,
     before_tool_callback,
     after_tool_callback,
+    on_tool_error_callback,
 )
 
 # Create the root agent focused on prompt generation
 root_agent = Agent(
     name="drop_agent",
-    model="gemini-2.0-flash",
+    model=build_model("drop_agent"),
     instruction=ROOT_PROMPT,
     sub_agents=[guide_agent, prompt_writer_agent],  # Add prompt_writer_agent
     tools=[SearchEnhancementTool()],  # Use search enhancement tool
@@ -25,5 +27,6 @@ root_agent = Agent(
     before_model_callback=before_model_callback,
     after_model_callback=after_model_callback,
     before_tool_callback=before_tool_callback,
-    after_tool_callback=after_tool_callback
+    after_tool_callback=after_tool_callback,
+    on_tool_error_callback=on_tool_error_callback,
 ) 
\ No newline at end of file
@@ -0,0 +1,217 @@
+"""
+Bulk idea-to-prompt runs for the 82ndrop Agent System.
+
+The content team submits many ideas at once. Instead of one ``/run_sse``
+session per idea from the browser, ``/run_batch`` accepts the whole list and
+runs the prompt pipeline for each idea in-process:
+- each idea gets its own session, so its history shows up like any other
+- at most ``concurrency`` ideas run at a time per batch
+- all items share the process-wide caches (model response, semantic and
+  context caches), so repeated or similar ideas are served cheaply
+- results are yielded as each item completes, not in submission order, with
+  per-item errors instead of failing the whole batch
+
+Items go through the app's own session and ``/run`` routes in-process. Each
+batch registers its caller's verified claims under a random token
+(``InternalCalls``). Its item requests carry that token in
+``INTERNAL_CALL_HEADER``, so they are not authenticated again (a long
+batch outlives the caller's ID token). They are also left out of the
+request analytics and HTTP metrics, which count the batch request itself.
+Other background work that runs the served agent (semantic cache refreshes,
+the startup warm-up) goes through the same client, ``get_internal_client``.
+
+Configuration (environment variables):
+- BATCH_CONCURRENCY: ideas run at once when the request doesn't say (default 4)
+- BATCH_MAX_CONCURRENCY: upper bound on a request's concurrency (default 10)
+- BATCH_MAX_IDEAS: max ideas per batch (default 100)
+"""
+
+import time
+import asyncio
+import logging
+import secrets
+from contextlib import contextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+
+import httpx
+
+from .config import env_int
+
+logger = logging.getLogger(__name__)
+
+FINAL_OUTPUT_KEY = "video_prompts_response"
+FINAL_AGENT = "prompt_writer_agent"
+
+# Header of a batch's requests to the app's own routes
+INTERNAL_CALL_HEADER = "x-drop-internal-call"
+
+# The served agent app (its directory under the agents dir)
+AGENT_APP_NAME = "drop_agent"
+
+
+class InternalCalls:
+    """Claims of the running batches, keyed by the token their requests carry."""
+
+    def __init__(self):
+        self._claims: Dict[str, Dict[str, Any]] = {}
+
+    @contextmanager
+    def register(self, claims: Dict[str, Any]) -> Iterator[str]:
+        """Issue a token for the caller's claims, valid until the block exits."""
+        token = secrets.token_urlsafe(32)
+        self._claims[token] = claims
+        try:
+            yield token
+        finally:
+            self._claims.pop(token, None)
+
+    def claims(self, scope) -> Optional[Dict[str, Any]]:
+        """The claims of an internal request (None for every other request)."""
+        if not self._claims:
+            return None
+        header = INTERNAL_CALL_HEADER.encode("latin-1")
+        for key, value in scope.get("headers", ()):
+            if key == header:
+                return self._claims.get(value.decode("latin-1"))
+        return None
+
+
+_internal_calls = None
+
+
+def get_internal_calls() -> InternalCalls:
+    """Get or initialize the internal call registry."""
+    global _internal_calls
+    if _internal_calls is None:
+        _internal_calls = InternalCalls()
+    return _internal_calls
+
+
+_internal_app = None
+_internal_client: Optional[httpx.AsyncClient] = None
+
+
+def set_internal_app(app) -> None:
+    """Route internal calls to the served app; called once it is built."""
+    global _internal_app, _internal_client
+    _internal_app = app
+    _internal_client = None
+
+
+def get_internal_client() -> Optional[httpx.AsyncClient]:
+    """
+    In-process client of the served app's routes.
+
+    None until ``set_internal_app`` is called, e.g. when the agents run
+    outside the server.
+    """
+    global _internal_client
+    if _internal_client is None and _internal_app is not None:
+        _internal_client = httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=_internal_app), base_url="http://internal", timeout=None
+        )
+    return _internal_client
+
+
+def parse_batch_request(body: Any) -> Tuple[List[str], int]:
+    """
+    Validate a batch request body.
+
+    Args:
+        body: Decoded JSON body, e.g. {"ideas": ["...", "..."], "concurrency": 5}
+
+    Returns:
+        The ideas (result indexes refer to this order) and the concurrency
+
+    Raises:
+        ValueError: When the body is malformed or exceeds the limits
+    """
+    if not isinstance(body, dict) or not isinstance(body.get("ideas"), list):
+        raise ValueError("Body must be a JSON object with an 'ideas' list")
+
+    ideas = body["ideas"]
+    if not ideas:
+        raise ValueError("'ideas' must not be empty")
+    for index, idea in enumerate(ideas):
+        if not isinstance(idea, str) or not idea.strip():
+            raise ValueError(f"Idea {index} must be a non-empty string")
+    ideas = [idea.strip() for idea in ideas]
+
+    max_ideas = env_int("BATCH_MAX_IDEAS", 100)
+    if len(ideas) > max_ideas:
+        raise ValueError(f"At most {max_ideas} ideas per batch (got {len(ideas)})")
+
+    max_concurrency = env_int("BATCH_MAX_CONCURRENCY", 10)
+    concurrency = body.get("concurrency") or env_int("BATCH_CONCURRENCY", 4)
+    try:
+        concurrency = int(concurrency)
+    except (TypeError, ValueError):
+        raise ValueError("'concurrency' must be an integer")
+    return ideas, max(1, min(concurrency, max_concurrency))
+
+
+def extract_final_prompt(events: List[Dict[str, Any]]) -> Optional[str]:
+    """
+    Find the pipeline's final prompt in a run's events.
+
+    Args:
+        events: Events as returned by ``/run`` (camelCase keys)
+
+    Returns:
+        The final output (prompt writer text or semantic cache hit), or None
+    """
+    final = None
+    for event in events:
+        state_delta = (event.get("actions") or {}).get("stateDelta") or {}
+        if state_delta.get(FINAL_OUTPUT_KEY):
+            final = state_delta[FINAL_OUTPUT_KEY]
+        elif event.get("author") == FINAL_AGENT and not event.get("partial"):
+            parts = (event.get("content") or {}).get("parts") or []
+            text = "".join(part.get("text", "") for part in parts if not part.get("thought"))
+            final = text or final
+    return final
+
+
+async def run_batch(
+    ideas: List[str],
+    run_item: Callable[[str], Awaitable[Dict[str, Any]]],
+    concurrency: int,
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Run every idea through ``run_item`` and yield results as they complete.
+
+    Args:
+        ideas: Ideas to run
+        run_item: Runs one idea; returns a dict (with "error" set on failure)
+        concurrency: Max items running at once
+
+    Yields:
+        One result per idea: index, idea, status ("ok"/"error"), duration_ms
+        and whatever ``run_item`` returned
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(index: int, idea: str) -> Dict[str, Any]:
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                result = await run_item(idea)
+            except Exception as e:
+                logger.warning(f"Batch item {index} failed: {e}")
+                result = {"error": f"{type(e).__name__}: {e}"}
+            return {
+                "index": index,
+                "idea": idea,
+                "status": "error" if result.get("error") else "ok",
+                "duration_ms": (time.perf_counter() - started) * 1000,
+                **result,
+            }
+
+    tasks = [asyncio.create_task(run(index, idea)) for index, idea in enumerate(ideas)]
+    try:
+        for completed in asyncio.as_completed(tasks):
+            yield await completed
+    finally:
+        # Client went away or the consumer stopped early: don't leave work running
+        for task in tasks:
+            task.cancel()
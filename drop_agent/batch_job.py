@@ -0,0 +1,307 @@
+"""
+Offline batch job runner for large master prompt backfills.
+
+Reads ideas from a JSONL file and runs each through the drop_agent pipeline
+in-process with a pool of async workers:
+- input lines are {"id": "...", "idea": "..."} objects or bare JSON strings
+  (the id defaults to the line number)
+- results are appended to a JSONL checkpoint as each item finishes, so a
+  crashed or interrupted job resumes where it stopped: items already
+  completed are skipped, failed ones are tried again
+- failed items (exceptions, error events, no prompt) are retried with
+  exponential backoff and jitter
+- the output is the JSONL checkpoint itself (in completion order), or a
+  Parquet file written from it at the end in input order (requires pyarrow)
+- throughput, token usage and an estimated cost are printed at the end
+
+Use --fake (or FAKE_LLM=true) to run against the offline fake model. Run it
+as a script: the agents build their models on import, so the settings must
+be in place before ``drop_agent`` is imported.
+
+Usage:
+    python drop_agent/batch_job.py ideas.jsonl --output prompts.jsonl [--workers 8] [--fake]
+    python drop_agent/batch_job.py ideas.jsonl --output prompts.parquet
+
+Configuration (environment variables):
+- BATCH_JOB_INPUT_PRICE_PER_M: USD per million prompt tokens (default 0.10)
+- BATCH_JOB_OUTPUT_PRICE_PER_M: USD per million output tokens (default 0.40)
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import logging
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+APP_NAME = "batch_job"
+BATCH_USER_ID = "batch_job"
+
+
+def read_ideas(path: str) -> Iterator[Tuple[str, str]]:
+    """Yield (id, idea) pairs from a JSONL file."""
+    with open(path) as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if isinstance(record, str):
+                yield str(line_number), record
+            else:
+                yield str(record.get("id", line_number)), record["idea"]
+
+
+def load_checkpoint(path: Path) -> Dict[str, Dict[str, Any]]:
+    """Latest result per item id from an existing checkpoint."""
+    results = {}
+    if not path.exists():
+        return results
+    with open(path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A crash can leave a partial last line
+                continue
+            results[record["id"]] = record
+    return results
+
+
+class CheckpointWriter:
+    """Append-only JSONL of item results, synced after every line."""
+
+    def __init__(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(path, "a")
+
+    def write(self, record: Dict[str, Any]) -> None:
+        self._file.write(json.dumps(record, default=str) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def write_parquet(records: List[Dict[str, Any]], path: Path) -> None:
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet output requires pyarrow (pip install pyarrow)")
+    columns = ["id", "idea", "status", "prompt", "error", "attempts", "duration_ms", "prompt_tokens", "output_tokens"]
+    table = pa.table({column: [record.get(column) for record in records] for column in columns})
+    pq.write_table(table, path)
+
+
+async def run_idea(runner, idea: str) -> Dict[str, Any]:
+    """Run one idea in a throwaway session and collect its prompt and usage."""
+    from google.genai import types
+    from drop_agent.batch import extract_final_prompt
+
+    session = await runner.session_service.create_session(app_name=APP_NAME, user_id=BATCH_USER_ID)
+    events = []
+    prompt_tokens = output_tokens = 0
+    try:
+        async for event in runner.run_async(
+            user_id=BATCH_USER_ID,
+            session_id=session.id,
+            new_message=types.Content(role="user", parts=[types.Part(text=idea)]),
+        ):
+            if event.usage_metadata and not event.partial:
+                prompt_tokens += event.usage_metadata.prompt_token_count or 0
+                output_tokens += event.usage_metadata.candidates_token_count or 0
+            events.append(event.model_dump(mode="json", by_alias=True, exclude_none=True))
+    finally:
+        await runner.session_service.delete_session(
+            app_name=APP_NAME, user_id=BATCH_USER_ID, session_id=session.id
+        )
+
+    errors = [event for event in events if event.get("errorCode")]
+    if errors:
+        raise RuntimeError(f"{errors[-1]['errorCode']}: {errors[-1].get('errorMessage')}")
+    prompt = extract_final_prompt(events)
+    if not prompt:
+        raise RuntimeError("Pipeline finished without a prompt")
+    return {"prompt": prompt, "prompt_tokens": prompt_tokens, "output_tokens": output_tokens}
+
+
+async def run_with_retries(
+    runner, item_id: str, idea: str, max_attempts: int, backoff: float, max_backoff: float
+) -> Dict[str, Any]:
+    started = time.perf_counter()
+    error = None
+    for attempt in range(1, max_attempts + 1):
+        try:
+            result = await run_idea(runner, idea)
+            return {
+                "id": item_id,
+                "idea": idea,
+                "status": "ok",
+                "attempts": attempt,
+                "duration_ms": (time.perf_counter() - started) * 1000,
+                **result,
+            }
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            if attempt < max_attempts:
+                delay = min(max_backoff, backoff * 2 ** (attempt - 1)) * random.uniform(0.5, 1.0)
+                logger.warning(f"Item {item_id} attempt {attempt} failed ({error}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+    return {
+        "id": item_id,
+        "idea": idea,
+        "status": "error",
+        "attempts": max_attempts,
+        "duration_ms": (time.perf_counter() - started) * 1000,
+        "error": error,
+    }
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else 0.0
+
+
+def summarize(results: List[Dict[str, Any]], skipped: int, elapsed: float) -> Dict[str, Any]:
+    from drop_agent.config import env_float
+
+    succeeded = [r for r in results if r["status"] == "ok"]
+    prompt_tokens = sum(r.get("prompt_tokens", 0) for r in succeeded)
+    output_tokens = sum(r.get("output_tokens", 0) for r in succeeded)
+    cost = (
+        prompt_tokens * env_float("BATCH_JOB_INPUT_PRICE_PER_M", 0.10)
+        + output_tokens * env_float("BATCH_JOB_OUTPUT_PRICE_PER_M", 0.40)
+    ) / 1_000_000
+    latencies = [r["duration_ms"] for r in succeeded]
+    return {
+        "processed": len(results),
+        "succeeded": len(succeeded),
+        "failed": len(results) - len(succeeded),
+        "skipped": skipped,
+        "retries": sum(r["attempts"] - 1 for r in results),
+        "elapsed_s": elapsed,
+        "throughput_per_min": len(results) / elapsed * 60 if elapsed else 0.0,
+        "latency_ms": {"p50": _percentile(latencies, 0.5), "p95": _percentile(latencies, 0.95)},
+        "prompt_tokens": prompt_tokens,
+        "output_tokens": output_tokens,
+        "estimated_cost_usd": cost,
+        "cost_per_prompt_usd": cost / len(succeeded) if succeeded else 0.0,
+    }
+
+
+async def run_job(
+    input_path: str,
+    output_path: str,
+    workers: int = 8,
+    max_attempts: int = 3,
+    backoff: float = 1.0,
+    max_backoff: float = 30.0,
+    limit: Optional[int] = None,
+) -> Dict[str, Any]:
+    """Run every idea not yet completed in the checkpoint and write the output."""
+    from google.adk.runners import InMemoryRunner
+    from drop_agent.agent import root_agent
+
+    output = Path(output_path)
+    parquet = output.suffix == ".parquet"
+    checkpoint_path = output.with_suffix(".checkpoint.jsonl") if parquet else output
+
+    completed = {
+        item_id for item_id, record in load_checkpoint(checkpoint_path).items() if record["status"] == "ok"
+    }
+    queue: asyncio.Queue = asyncio.Queue()
+    skipped = 0
+    # Input position of each id: the Parquet output keeps the input order
+    positions: Dict[str, int] = {}
+    for item_id, idea in read_ideas(input_path):
+        positions.setdefault(item_id, len(positions))
+        if item_id in completed:
+            skipped += 1
+        elif limit is None or queue.qsize() < limit:
+            queue.put_nowait((item_id, idea))
+    total = queue.qsize()
+    print(f"🔬 Batch job: {total} ideas to run, {skipped} already done, {workers} workers")
+
+    runner = InMemoryRunner(agent=root_agent, app_name=APP_NAME)
+    writer = CheckpointWriter(checkpoint_path)
+    results: List[Dict[str, Any]] = []
+
+    async def worker():
+        while True:
+            try:
+                item_id, idea = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            result = await run_with_retries(runner, item_id, idea, max_attempts, backoff, max_backoff)
+            writer.write(result)
+            results.append(result)
+            status = "✅" if result["status"] == "ok" else f"❌ {result['error']}"
+            print(f"[{len(results)}/{total}] {status} {item_id} ({result['duration_ms']:.0f}ms)")
+
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(worker() for _ in range(max(1, workers))))
+    finally:
+        writer.close()
+    summary = summarize(results, skipped, time.perf_counter() - started)
+
+    if parquet:
+        records = sorted(
+            load_checkpoint(checkpoint_path).values(),
+            key=lambda record: positions.get(record["id"], len(positions)),
+        )
+        write_parquet(records, output)
+
+    print("=" * 60)
+    print(
+        f"Processed {summary['processed']} ({summary['succeeded']} ok, {summary['failed']} failed, "
+        f"{summary['retries']} retries), skipped {skipped}"
+    )
+    print(
+        f"Throughput: {summary['throughput_per_min']:.1f} prompts/min over {summary['elapsed_s']:.1f}s, "
+        f"p50 {summary['latency_ms']['p50']:.0f}ms, p95 {summary['latency_ms']['p95']:.0f}ms"
+    )
+    print(
+        f"Tokens: {summary['prompt_tokens']} prompt, {summary['output_tokens']} output; "
+        f"estimated cost ${summary['estimated_cost_usd']:.4f} (${summary['cost_per_prompt_usd']:.5f}/prompt)"
+    )
+    print(f"📊 Results written to: {output}")
+    return summary
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run a JSONL file of ideas through the drop_agent pipeline")
+    parser.add_argument("input", help="JSONL file of ideas")
+    parser.add_argument("--output", required=True, help="Results file (.jsonl, or .parquet)")
+    parser.add_argument("--workers", type=int, default=8, help="Ideas run at once")
+    parser.add_argument("--max-attempts", type=int, default=3, help="Attempts per idea")
+    parser.add_argument("--backoff", type=float, default=1.0, help="First retry delay in seconds")
+    parser.add_argument("--max-backoff", type=float, default=30.0, help="Longest retry delay in seconds")
+    parser.add_argument("--limit", type=int, help="Run at most this many ideas")
+    parser.add_argument("--fake", action="store_true", help="Use the offline fake model")
+    args = parser.parse_args(argv)
+
+    if args.fake:
+        os.environ["FAKE_LLM"] = "true"
+    logging.basicConfig(level=logging.WARNING, format="%(name)s - %(levelname)s - %(message)s")
+
+    summary = asyncio.run(
+        run_job(args.input, args.output, args.workers, args.max_attempts, args.backoff, args.max_backoff, args.limit)
+    )
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    # Add project root to path for imports
+    sys.path.insert(0, str(Path(__file__).parent.parent))
+    load_dotenv()
+    sys.exit(main())
@@ -0,0 +1,244 @@
+"""
+Per-invocation model budget for the 82ndrop Agent System.
+
+A single ``/run`` invocation can loop between agents and burn many model
+calls. The budget caps model calls, prompt tokens and output tokens per
+invocation, and is enforced from the model callbacks:
+- before each call, the prompt is pre-counted with a local estimate and the
+  call is refused when it (or the invocation) would exceed a limit
+- after each call, the real token usage is added to the invocation totals
+
+A refused call is answered locally with an explanatory ``BUDGET_EXCEEDED``
+response, which ends the agent's turn instead of failing the request.
+Usage is also accumulated per agent and per user, and reported by ``/usage``.
+
+Tools that run an agent in a runner of their own (SearchEnhancementTool)
+store the parent invocation id in the nested session's state under
+``PARENT_INVOCATION_STATE_KEY``; calls made there are charged to the parent.
+
+Configuration (environment variables):
+- INVOCATION_BUDGET: "false" to disable enforcement (default enabled)
+- INVOCATION_MAX_MODEL_CALLS: model calls per invocation (default 12)
+- INVOCATION_MAX_PROMPT_TOKENS: prompt tokens per invocation (default 200000)
+- INVOCATION_MAX_OUTPUT_TOKENS: output tokens per invocation (default 20000)
+- MAX_REQUEST_PROMPT_TOKENS: estimated prompt tokens for one call (default 60000)
+"""
+
+import json
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, Optional
+
+from .config import env_flag, env_int
+
+try:
+    from google.adk.models.llm_request import LlmRequest
+    from google.adk.models.llm_response import LlmResponse
+    from google.genai import types
+except ImportError:
+    # Fallback for development/testing
+    LlmRequest = Any
+    LlmResponse = Any
+    types = Any
+
+logger = logging.getLogger(__name__)
+
+BUDGET_EXCEEDED_ERROR = "BUDGET_EXCEEDED"
+
+# Rough characters-per-token ratio of Gemini tokenizers for English text
+CHARS_PER_TOKEN = 4
+
+# Invocations tracked at once; older ones are dropped first
+MAX_TRACKED_INVOCATIONS = 1000
+
+# Session state key of nested runs naming the invocation they are charged to
+PARENT_INVOCATION_STATE_KEY = "budget_parent_invocation_id"
+
+
+@dataclass
+class BudgetLimits:
+    """Limits applied to every invocation."""
+
+    max_model_calls: int = 12
+    max_prompt_tokens: int = 200_000
+    max_output_tokens: int = 20_000
+    max_request_prompt_tokens: int = 60_000
+
+    @classmethod
+    def from_env(cls) -> "BudgetLimits":
+        return cls(
+            max_model_calls=env_int("INVOCATION_MAX_MODEL_CALLS", 12),
+            max_prompt_tokens=env_int("INVOCATION_MAX_PROMPT_TOKENS", 200000),
+            max_output_tokens=env_int("INVOCATION_MAX_OUTPUT_TOKENS", 20000),
+            max_request_prompt_tokens=env_int("MAX_REQUEST_PROMPT_TOKENS", 60000),
+        )
+
+
+@dataclass
+class Usage:
+    """Model usage counters."""
+
+    model_calls: int = 0
+    prompt_tokens: int = 0
+    output_tokens: int = 0
+    refused_calls: int = 0
+
+
+def estimate_prompt_tokens(llm_request: LlmRequest) -> int:
+    """
+    Estimate the prompt size of a request without calling the provider.
+
+    Counts the system instruction, every text part and function call or
+    response payload, using a characters-per-token ratio.
+    """
+    characters = 0
+    config = getattr(llm_request, "config", None)
+    instruction = getattr(config, "system_instruction", None) if config else None
+    if isinstance(instruction, str):
+        characters += len(instruction)
+    elif instruction is not None:
+        characters += sum(len(part.text or "") for part in (instruction.parts or []))
+
+    for content in llm_request.contents or []:
+        for part in content.parts or []:
+            if part.text:
+                characters += len(part.text)
+            if part.function_call:
+                characters += len(json.dumps(part.function_call.args or {}, default=str))
+            if part.function_response:
+                characters += len(json.dumps(part.function_response.response or {}, default=str))
+
+    return characters // CHARS_PER_TOKEN + 1
+
+
+def budget_invocation_id(callback_context: Any) -> str:
+    """The invocation a model call is charged to (the parent's for nested runs)."""
+    state = getattr(callback_context, "state", None)
+    parent = state.get(PARENT_INVOCATION_STATE_KEY) if state is not None else None
+    return parent or getattr(callback_context, "invocation_id", "unknown")
+
+
+class BudgetTracker:
+    """Tracks usage per invocation, agent and user, and enforces limits."""
+
+    def __init__(self, limits: BudgetLimits):
+        self.limits = limits
+        self._invocations: "OrderedDict[str, Usage]" = OrderedDict()
+        self._by_agent: Dict[str, Usage] = {}
+        self._by_user: Dict[str, Usage] = {}
+        self._lock = threading.Lock()
+
+    def _invocation(self, invocation_id: str) -> Usage:
+        usage = self._invocations.get(invocation_id)
+        if usage is None:
+            usage = self._invocations[invocation_id] = Usage()
+            while len(self._invocations) > MAX_TRACKED_INVOCATIONS:
+                self._invocations.popitem(last=False)
+        return usage
+
+    def _accumulate(self, agent_name: str, user_id: str, **counts: int) -> None:
+        for totals in (
+            self._by_agent.setdefault(agent_name, Usage()),
+            self._by_user.setdefault(user_id, Usage()),
+        ):
+            for field, value in counts.items():
+                setattr(totals, field, getattr(totals, field) + value)
+
+    def admit(
+        self, invocation_id: str, agent_name: str, user_id: str, estimated_prompt_tokens: int
+    ) -> Optional[str]:
+        """
+        Admit a model call, counting it against the invocation.
+
+        Returns:
+            None when the call may proceed, otherwise the reason it was refused
+        """
+        limits = self.limits
+        with self._lock:
+            usage = self._invocation(invocation_id)
+            if estimated_prompt_tokens > limits.max_request_prompt_tokens:
+                reason = (
+                    f"request of ~{estimated_prompt_tokens} prompt tokens exceeds the "
+                    f"{limits.max_request_prompt_tokens} token limit"
+                )
+            elif usage.model_calls >= limits.max_model_calls:
+                reason = f"invocation reached the {limits.max_model_calls} model call limit"
+            elif usage.prompt_tokens + estimated_prompt_tokens > limits.max_prompt_tokens:
+                reason = f"invocation would exceed the {limits.max_prompt_tokens} prompt token limit"
+            elif usage.output_tokens >= limits.max_output_tokens:
+                reason = f"invocation reached the {limits.max_output_tokens} output token limit"
+            else:
+                reason = None
+
+            if reason:
+                usage.refused_calls += 1
+                self._accumulate(agent_name, user_id, refused_calls=1)
+            else:
+                usage.model_calls += 1
+                self._accumulate(agent_name, user_id, model_calls=1)
+        return reason
+
+    def record_usage(
+        self, invocation_id: str, agent_name: str, user_id: str, usage_metadata: Any
+    ) -> None:
+        """Add the provider-reported token usage of a completed call."""
+        prompt_tokens = getattr(usage_metadata, "prompt_token_count", 0) or 0
+        output_tokens = getattr(usage_metadata, "candidates_token_count", 0) or 0
+        with self._lock:
+            usage = self._invocation(invocation_id)
+            usage.prompt_tokens += prompt_tokens
+            usage.output_tokens += output_tokens
+            self._accumulate(
+                agent_name, user_id, prompt_tokens=prompt_tokens, output_tokens=output_tokens
+            )
+
+    def get_invocation_usage(self, invocation_id: str) -> Dict[str, int]:
+        with self._lock:
+            return asdict(self._invocations.get(invocation_id, Usage()))
+
+    def get_user_usage(self, user_id: str) -> Dict[str, int]:
+        with self._lock:
+            return asdict(self._by_user.get(user_id, Usage()))
+
+    def usage_summary(self) -> Dict[str, Any]:
+        """Usage totals per agent and per user."""
+        with self._lock:
+            return {
+                "limits": asdict(self.limits),
+                "by_agent": {name: asdict(usage) for name, usage in self._by_agent.items()},
+                "by_user": {user: asdict(usage) for user, usage in self._by_user.items()},
+            }
+
+
+def budget_exceeded_response(reason: str) -> LlmResponse:
+    """Local response that ends the agent's turn when the budget is exhausted."""
+    return LlmResponse(
+        content=types.Content(
+            role="model",
+            parts=[
+                types.Part(
+                    text=(
+                        "⚠️ This request used up its processing budget "
+                        f"({reason}). Please try again with a shorter or simpler idea."
+                    )
+                )
+            ],
+        ),
+        error_code=BUDGET_EXCEEDED_ERROR,
+        error_message=reason,
+        custom_metadata={"budget_exceeded": reason},
+        turn_complete=True,
+    )
+
+
+_budget_tracker = None
+
+
+def get_budget_tracker() -> Optional[BudgetTracker]:
+    """Get or initialize the budget tracker (None when disabled)."""
+    global _budget_tracker
+    if _budget_tracker is None and env_flag("INVOCATION_BUDGET", default=True):
+        _budget_tracker = BudgetTracker(BudgetLimits.from_env())
+    return _budget_tracker
@@ -1,12 +1,14 @@
 """
 Agent callbacks for the 82ndrop Agent System.
 
-These callbacks handle agent lifecycle events for monitoring and logging.
+These callbacks handle agent lifecycle events for monitoring (one sampled
+hop event per agent step, see instrumentation.py) and serve the root agent
+from the semantic prompt cache when enabled. The agent callbacks are async
+so the cache's embedding calls don't block the event loop.
 """
 
 import logging
 from typing import Optional, Any
-from datetime import datetime
 
 try:
     from google.adk.agents.callback_context import CallbackContext
@@ -16,17 +18,32 @@ except ImportError:
     CallbackContext = Any
     types = Any
 
+from ..semantic_cache import (
+    FINAL_AGENT_NAME,
+    FINAL_OUTPUT_KEY,
+    ROOT_AGENT_NAME,
+    SEMANTIC_CACHE_BYPASS_KEY,
+    SEMANTIC_CACHE_STATE_KEY,
+    get_semantic_cache,
+    schedule_refresh,
+)
+from ..instrumentation import emit_hop
+from ..session_telemetry import get_session_telemetry
+from ..tracing import end_agent_span, start_agent_span
+from ..variants import detect_variant_count
+
 # Configure logging for callbacks
 logger = logging.getLogger(__name__)
 
 
-def before_agent_callback(callback_context: CallbackContext) -> None:
+async def before_agent_callback(callback_context: CallbackContext) -> Optional[types.Content]:
     """
-    Before agent callback - logs the start of agent processing
+    Before agent callback - records the start of agent processing
+
+    Returns the cached Master Prompt for the root agent when the user's idea
+    is a near-duplicate of a previous one, which skips the whole pipeline.
     """
     try:
-        logger.info("🚀 Agent processing started")
-        
         # Add CORS headers to the response if available
         if hasattr(callback_context, 'response_headers'):
             callback_context.response_headers.update({
@@ -36,29 +53,122 @@ def before_agent_callback(callback_context: CallbackContext) -> None:
                 'Access-Control-Max-Age': '86400'
             })
         
-        # Store start time for performance monitoring (as timestamp for JSON serialization)
-        callback_context.state["start_time"] = datetime.now().timestamp()
-        
+        # Store start time for performance monitoring (outside session state)
+        invocation_id = getattr(callback_context, "invocation_id", "unknown")
+        get_session_telemetry().start_timer(("agent", invocation_id, callback_context.agent_name))
+
+        start_agent_span(invocation_id, callback_context.agent_name, getattr(callback_context, "user_id", None))
+
+        cached = semantic_cache = None
+        if callback_context.agent_name == ROOT_AGENT_NAME:
+            cached = await _lookup_semantic_cache(callback_context)
+            semantic_cache = (callback_context.state.get(SEMANTIC_CACHE_STATE_KEY) or {}).get("decision")
+
+        emit_hop(
+            "agent.start",
+            callback_context.agent_name,
+            invocation_id=invocation_id,
+            semantic_cache=semantic_cache,
+        )
+        if cached is not None:
+            # The pipeline is skipped, so after_agent_callback won't run
+            end_agent_span(invocation_id, callback_context.agent_name, **{"drop_agent.semantic_cache": "hit"})
+        return cached
+
     except Exception as e:
         logger.error(f"Error in before_agent_callback: {e}")
 
+    return None
 
-def after_agent_callback(callback_context: CallbackContext) -> None:
+
+async def after_agent_callback(callback_context: CallbackContext) -> None:
     """
-    After agent callback - logs completion and performance metrics
+    After agent callback - records completion and performance metrics
     """
     try:
-        start_time_timestamp = callback_context.state.get("start_time")
-        if start_time_timestamp:
-            duration = datetime.now().timestamp() - start_time_timestamp
-            logger.info(f"✅ Agent processing completed in {duration:.2f}s")
-        else:
-            logger.info("✅ Agent processing completed")
+        invocation_id = getattr(callback_context, "invocation_id", "unknown")
+        duration = get_session_telemetry().stop_timer(("agent", invocation_id, callback_context.agent_name))
+        duration_ms = duration * 1000 if duration is not None else None
+
+        if callback_context.agent_name in (ROOT_AGENT_NAME, FINAL_AGENT_NAME):
+            await _store_semantic_cache(callback_context)
+
+        emit_hop("agent.end", callback_context.agent_name, invocation_id=invocation_id, duration_ms=duration_ms)
+        end_agent_span(invocation_id, callback_context.agent_name)
             
     except Exception as e:
         logger.error(f"Error in after_agent_callback: {e}")
 
 
+def _user_idea(callback_context: CallbackContext) -> str:
+    """Extract the text of the message that started this invocation."""
+    content = getattr(callback_context, "user_content", None)
+    if not content or not content.parts:
+        return ""
+    return " ".join(part.text for part in content.parts if getattr(part, "text", None)).strip()
+
+
+async def _lookup_semantic_cache(callback_context: CallbackContext) -> Optional[types.Content]:
+    """
+    Serve a fresh idea from the semantic prompt cache.
+
+    Only the first idea of a session is looked up: follow-up messages refine
+    an existing prompt and depend on the conversation history.
+    """
+    cache = get_semantic_cache()
+    idea = _user_idea(callback_context)
+    if cache is None or not idea:
+        return None
+
+    state = callback_context.state
+    if state.get(SEMANTIC_CACHE_STATE_KEY):
+        # The root agent runs again when a sub-agent transfers back; the
+        # idea was already looked up in this invocation
+        return None
+    if state.get(SEMANTIC_CACHE_BYPASS_KEY):
+        state[SEMANTIC_CACHE_STATE_KEY] = {"decision": "refresh", "idea": idea}
+        return None
+    if state.get(FINAL_OUTPUT_KEY):
+        state[SEMANTIC_CACHE_STATE_KEY] = {"decision": "bypass", "reason": "follow_up"}
+        return None
+    if detect_variant_count(idea) > 1:
+        state[SEMANTIC_CACHE_STATE_KEY] = {"decision": "bypass", "reason": "variants"}
+        return None
+
+    user_id = getattr(callback_context, "user_id", None)
+    match = await cache.alookup(idea, user_id)
+    if match is None:
+        state[SEMANTIC_CACHE_STATE_KEY] = {"decision": "miss", "idea": idea}
+        return None
+
+    entry, similarity = match
+    state[SEMANTIC_CACHE_STATE_KEY] = {
+        "decision": "hit",
+        "similarity": round(similarity, 4),
+        "cached_idea": entry.idea,
+    }
+    state[FINAL_OUTPUT_KEY] = entry.prompt
+    logger.debug(f"Semantic cache hit (similarity {similarity:.3f})")
+
+    schedule_refresh(idea, user_id)
+    return types.Content(role="model", parts=[types.Part(text=entry.prompt)])
+
+
+async def _store_semantic_cache(callback_context: CallbackContext) -> None:
+    """Cache the final prompt produced by a full pipeline run."""
+    cache = get_semantic_cache()
+    if cache is None:
+        return
+
+    decision = callback_context.state.get(SEMANTIC_CACHE_STATE_KEY) or {}
+    prompt = callback_context.state.get(FINAL_OUTPUT_KEY)
+    if decision.get("decision") not in ("miss", "refresh") or not prompt:
+        return
+
+    await cache.astore(decision["idea"], prompt, getattr(callback_context, "user_id", None))
+    callback_context.state[SEMANTIC_CACHE_STATE_KEY] = {**decision, "decision": "stored"}
+
+
 def before_model_callback(callback_context: CallbackContext) -> Optional[types.Content]:
     """
     Called before the model is invoked.
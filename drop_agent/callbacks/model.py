@@ -2,30 +2,64 @@
 Model callbacks for the 82ndrop Agent System.
 
 These callbacks handle model interaction events for monitoring
-LLM performance, token usage, and response quality.
+LLM performance and token usage (one sampled hop event per model call,
+see instrumentation.py). They also serve
+and populate the opt-in model response cache (see response_cache.py) and
+point requests at provider-side cached instructions (see context_cache.py).
+Every real model call is admitted against the invocation budget (see
+budget.py) first, timed for the model latency metrics (see metrics.py),
+and added to the token and latency ledger (see usage_ledger.py) when it
+is enabled. A hedged duplicate of the call (see hedging.py) is admitted
+and recorded the same way.
 """
 
 import logging
 from typing import Optional, Any, Dict
-from datetime import datetime
 
 try:
     from google.adk.agents.callback_context import CallbackContext
     from google.adk.models.llm_request import LlmRequest
     from google.adk.models.llm_response import LlmResponse
+    from google.genai import types
 except ImportError:
     # Fallback for development/testing
     CallbackContext = Any
     LlmRequest = Any
     LlmResponse = Any
+    types = Any
+
+from ..budget import (
+    budget_exceeded_response,
+    budget_invocation_id,
+    estimate_prompt_tokens,
+    get_budget_tracker,
+)
+from ..context_cache import CONTEXT_CACHE_STATE_KEY, get_context_cache
+from ..hedging import HedgeAccounting, is_hedging_enabled, set_hedge_accounting
+from ..instrumentation import emit_hop
+from ..metrics import get_metrics
+from ..tracing import end_model_span, start_model_span
+from ..usage_ledger import get_usage_ledger
+from ..session_telemetry import get_session_telemetry
+from ..routing import ROUTING_STATE_KEY, classify_request, is_routing_enabled, select_model
+from ..response_cache import (
+    CACHE_STATE_KEY,
+    build_cache_key,
+    get_bypass_reason,
+    get_response_cache,
+    is_cacheable_response,
+)
 
 # Configure logging for callbacks
 logger = logging.getLogger(__name__)
 
+# Invocation-scoped state key of the model the agent's current call went to
+MODEL_CALL_STATE_KEY = "temp:model_call"
+
 
 def before_model_callback(
     callback_context: CallbackContext, llm_request: LlmRequest = None
-) -> None:
+) -> Optional[LlmResponse]:
     """
     Callback executed before each model invocation.
 
@@ -37,38 +71,34 @@ def before_model_callback(
         llm_request: The request being sent to the LLM (if available)
 
     Returns:
-        None
+        A cached (or budget-exceeded) LlmResponse to skip the model call,
+        otherwise None
     """
+    response = None
     try:
-        # Log model interaction start
-        logger.info("Model request initiated")
-
-        # Extract session info for context
-        session_id = getattr(callback_context, "session_id", "unknown")
-        user_id = getattr(callback_context, "user_id", "unknown")
-
-        logger.info(f"Model request for user: {user_id}, session: {session_id}")
-
-        # Track timing for performance metrics
-        if hasattr(callback_context, "state"):
-            callback_context.state["model_request_start_time"] = (
-                datetime.now().isoformat()
-            )
-
-        # Log request details if available
         if llm_request:
-            # Log message count or other request metrics
-            if hasattr(llm_request, "messages"):
-                message_count = len(llm_request.messages) if llm_request.messages else 0
-                logger.info(f"Sending {message_count} messages to model")
+            # Route before the cache lookup: the model is part of the cache key
+            _route_model(callback_context, llm_request)
+
+            response = _lookup_cached_response(callback_context, llm_request)
+            if response is None:
+                response = _admit_model_call(callback_context, llm_request)
+            if response is None:
+                _apply_context_cache(callback_context, llm_request)
+                _start_model_call(callback_context, llm_request)
+                start_model_span(
+                    getattr(callback_context, "invocation_id", "unknown"),
+                    getattr(callback_context, "agent_name", "unknown"),
+                    llm_request.model,
+                )
 
-            # Log model settings if available
-            if hasattr(llm_request, "model"):
-                logger.info(f"Using model: {llm_request.model}")
+            _emit_model_request(callback_context, llm_request, response)
 
     except Exception as e:
         logger.error(f"Error in before_model_callback: {e}")
 
+    return response
+
 
 def after_model_callback(
     callback_context: CallbackContext, llm_response: LlmResponse = None
@@ -87,55 +117,305 @@ def after_model_callback(
         None
     """
     try:
-        # Log model interaction completion
-        logger.info("Model response received")
-
-        # Calculate model response time
-        if (
-            hasattr(callback_context, "state")
-            and "model_request_start_time" in callback_context.state
-        ):
-            start_time = datetime.fromisoformat(
-                callback_context.state["model_request_start_time"]
-            )
-            duration = (datetime.now() - start_time).total_seconds()
-            logger.info(f"Model response time: {duration:.2f} seconds")
-
-            # Store performance metrics
-            callback_context.state["last_model_duration"] = duration
-
-        # Extract session info for logging
-        session_id = getattr(callback_context, "session_id", "unknown")
-        user_id = getattr(callback_context, "user_id", "unknown")
-
-        logger.info(
-            f"Model response completed for user: {user_id}, session: {session_id}"
-        )
-
-        # Analyze response if available
         if llm_response:
-            # Log response metrics
-            if hasattr(llm_response, "content"):
-                content_length = (
-                    len(str(llm_response.content)) if llm_response.content else 0
+            duration = _finish_model_call(callback_context, llm_response)
+            _store_cached_response(callback_context, llm_response)
+            _record_context_cache_usage(callback_context, llm_response, duration)
+            _record_budget_usage(callback_context, llm_response)
+
+            # Streaming calls report every chunk; one event per call
+            if not llm_response.partial:
+                _emit_model_response(callback_context, llm_response, duration)
+                end_model_span(
+                    getattr(callback_context, "invocation_id", "unknown"),
+                    getattr(callback_context, "agent_name", "unknown"),
+                    llm_response.usage_metadata,
+                    llm_response.error_code,
                 )
-                logger.info(f"Model response length: {content_length} characters")
-
-            # Log token usage if available
-            if hasattr(llm_response, "usage"):
-                usage = llm_response.usage
-                if hasattr(usage, "total_tokens"):
-                    logger.info(f"Total tokens used: {usage.total_tokens}")
-                if hasattr(usage, "prompt_tokens"):
-                    logger.info(f"Prompt tokens: {usage.prompt_tokens}")
-                if hasattr(usage, "completion_tokens"):
-                    logger.info(f"Completion tokens: {usage.completion_tokens}")
-
-            # Here you could add additional functionality like:
-            # - Response quality analysis
-            # - Content filtering or validation
-            # - Custom metrics collection
-            # - Response caching logic
 
     except Exception as e:
         logger.error(f"Error in after_model_callback: {e}")
+
+
+def _start_model_call(callback_context: CallbackContext, llm_request: LlmRequest) -> None:
+    """Start the monotonic clock of a call that goes to the model."""
+    invocation_id = getattr(callback_context, "invocation_id", "unknown")
+    agent_name = getattr(callback_context, "agent_name", "unknown")
+    get_session_telemetry().start_timer(("model", invocation_id, agent_name))
+    callback_context.state[MODEL_CALL_STATE_KEY] = llm_request.model
+
+    ledger = get_usage_ledger()
+    if ledger is not None:
+        ledger.start_call(invocation_id, agent_name, llm_request.model)
+    if is_hedging_enabled():
+        set_hedge_accounting(_hedge_accounting(callback_context, llm_request))
+
+
+def _finish_model_call(
+    callback_context: CallbackContext, llm_response: LlmResponse
+) -> Optional[float]:
+    """
+    Stop the clock of a call at its final response and record it in the
+    model latency metrics and the usage ledger.
+
+    Returns:
+        Seconds since the call started, or None for partial responses and
+        calls that didn't go to the model
+    """
+    invocation_id = getattr(callback_context, "invocation_id", "unknown")
+    agent_name = getattr(callback_context, "agent_name", "unknown")
+    ledger = get_usage_ledger()
+    if llm_response.partial:
+        if ledger is not None:
+            ledger.record_chunk(invocation_id, agent_name)
+        return None
+
+    duration = get_session_telemetry().stop_timer(("model", invocation_id, agent_name))
+    if duration is None:
+        return None
+
+    if ledger is not None:
+        ledger.finish_call(
+            invocation_id,
+            agent_name,
+            getattr(callback_context, "user_id", "unknown"),
+            llm_response.usage_metadata,
+            llm_response.error_code,
+        )
+    metrics = get_metrics()
+    if metrics is not None:
+        metrics.observe_model(
+            agent_name,
+            callback_context.state.get(MODEL_CALL_STATE_KEY),
+            duration,
+            llm_response.error_code,
+        )
+    return duration
+
+
+def _emit_model_request(
+    callback_context: CallbackContext,
+    llm_request: LlmRequest,
+    response: Optional[LlmResponse],
+) -> None:
+    """Emit the model.request hop event."""
+    state = callback_context.state
+    emit_hop(
+        "model.request",
+        getattr(callback_context, "agent_name", "unknown"),
+        invocation_id=getattr(callback_context, "invocation_id", None),
+        user_id=getattr(callback_context, "user_id", None),
+        model=llm_request.model,
+        contents=len(llm_request.contents or []),
+        complexity=(state.get(ROUTING_STATE_KEY) or {}).get("complexity"),
+        response_cache=(state.get(CACHE_STATE_KEY) or {}).get("decision"),
+        context_cache=state.get(CONTEXT_CACHE_STATE_KEY),
+        refused=response.error_message if response is not None and response.error_code else None,
+    )
+
+
+def _emit_model_response(
+    callback_context: CallbackContext,
+    llm_response: LlmResponse,
+    duration: Optional[float],
+) -> None:
+    """Emit the model.response hop event."""
+    usage = llm_response.usage_metadata
+    emit_hop(
+        "model.response",
+        getattr(callback_context, "agent_name", "unknown"),
+        invocation_id=getattr(callback_context, "invocation_id", None),
+        error=bool(llm_response.error_code),
+        duration_ms=duration * 1000 if duration is not None else None,
+        error_code=llm_response.error_code,
+        error_message=llm_response.error_message,
+        prompt_tokens=usage.prompt_token_count if usage else None,
+        output_tokens=usage.candidates_token_count if usage else None,
+        cached_tokens=usage.cached_content_token_count if usage else None,
+    )
+
+
+def _lookup_cached_response(
+    callback_context: CallbackContext, llm_request: LlmRequest
+) -> Optional[LlmResponse]:
+    """
+    Serve a request from the response cache when possible.
+
+    The cache decision (hit, miss or bypass reason) is recorded in
+    invocation-scoped state so after_model_callback knows whether to store.
+    """
+    cache = get_response_cache()
+    if cache is None:
+        return None
+
+    bypass_reason = get_bypass_reason(llm_request)
+    if bypass_reason:
+        callback_context.state[CACHE_STATE_KEY] = {"decision": "bypass", "reason": bypass_reason}
+        logger.debug(f"Model response cache bypassed: {bypass_reason}")
+        return None
+
+    key = build_cache_key(llm_request)
+    cached_response = cache.get(key)
+    callback_context.state[CACHE_STATE_KEY] = {
+        "decision": "hit" if cached_response else "miss",
+        "key": key,
+    }
+    if cached_response:
+        logger.debug(f"Model response cache hit: {key[:12]}")
+    return cached_response
+
+
+def _store_cached_response(
+    callback_context: CallbackContext, llm_response: LlmResponse
+) -> None:
+    """Store the response of a cache miss once it is complete."""
+    cache = get_response_cache()
+    if cache is None or not hasattr(callback_context, "state"):
+        return
+
+    decision = callback_context.state.get(CACHE_STATE_KEY) or {}
+    if decision.get("decision") != "miss" or llm_response.partial:
+        return
+
+    if is_cacheable_response(llm_response):
+        cache.put(decision["key"], llm_response)
+        callback_context.state[CACHE_STATE_KEY] = {**decision, "decision": "stored"}
+    else:
+        callback_context.state[CACHE_STATE_KEY] = {**decision, "decision": "not_cacheable"}
+
+
+def _route_model(callback_context: CallbackContext, llm_request: LlmRequest) -> None:
+    """Pick the model for this agent step from the request's complexity."""
+    if not is_routing_enabled():
+        return
+
+    decision = callback_context.state.get(ROUTING_STATE_KEY)
+    if decision is None:
+        content = getattr(callback_context, "user_content", None)
+        text = " ".join(
+            part.text for part in (content.parts if content else None) or [] if part.text
+        )
+        route = classify_request(text)
+        decision = {"complexity": route.complexity, "features": route.features}
+        callback_context.state[ROUTING_STATE_KEY] = decision
+
+    agent_name = getattr(callback_context, "agent_name", "unknown")
+    model = select_model(agent_name, decision["complexity"])
+    if model and model != llm_request.model:
+        logger.debug(
+            f"Routing {agent_name} from {llm_request.model} to {model} "
+            f"({decision['complexity']}: {decision['features']})"
+        )
+        llm_request.model = model
+
+
+def _admit_model_call(
+    callback_context: CallbackContext, llm_request: LlmRequest
+) -> Optional[LlmResponse]:
+    """Count a model call against the invocation budget, refusing overruns."""
+    tracker = get_budget_tracker()
+    if tracker is None:
+        return None
+
+    agent_name = getattr(callback_context, "agent_name", "unknown")
+    reason = tracker.admit(
+        budget_invocation_id(callback_context),
+        agent_name,
+        getattr(callback_context, "user_id", "unknown"),
+        estimate_prompt_tokens(llm_request),
+    )
+    if reason is None:
+        return None
+
+    logger.warning(f"Model call refused for {agent_name}: {reason}")
+    metrics = get_metrics()
+    if metrics is not None:
+        metrics.count_quota_error("budget")
+    return budget_exceeded_response(reason)
+
+
+def _hedge_accounting(
+    callback_context: CallbackContext, llm_request: LlmRequest
+) -> HedgeAccounting:
+    """Admit and record a hedged duplicate of this call like the call itself."""
+    invocation_id = getattr(callback_context, "invocation_id", "unknown")
+    agent_name = getattr(callback_context, "agent_name", "unknown")
+    user_id = getattr(callback_context, "user_id", "unknown")
+    budget_id = budget_invocation_id(callback_context)
+    model = llm_request.model
+
+    def admit() -> bool:
+        tracker = get_budget_tracker()
+        if tracker is None:
+            return True
+        reason = tracker.admit(budget_id, agent_name, user_id, estimate_prompt_tokens(llm_request))
+        if reason:
+            logger.info(f"Hedge refused for {agent_name}: {reason}")
+        return reason is None
+
+    def record(usage_metadata: Any) -> None:
+        # The duplicate sent the same prompt; its output was cancelled unreported
+        usage = types.GenerateContentResponseUsageMetadata(
+            prompt_token_count=getattr(usage_metadata, "prompt_token_count", None)
+            or estimate_prompt_tokens(llm_request),
+            cached_content_token_count=getattr(usage_metadata, "cached_content_token_count", None),
+        )
+        tracker = get_budget_tracker()
+        if tracker is not None:
+            tracker.record_usage(budget_id, agent_name, user_id, usage)
+        ledger = get_usage_ledger()
+        if ledger is not None:
+            ledger.record_call(invocation_id, agent_name, user_id, model, usage, hedge=True)
+
+    return HedgeAccounting(admit=admit, record=record)
+
+
+def _record_budget_usage(
+    callback_context: CallbackContext, llm_response: LlmResponse
+) -> None:
+    """Add the provider-reported token usage to the invocation budget."""
+    tracker = get_budget_tracker()
+    if tracker is None or llm_response.partial or not llm_response.usage_metadata:
+        return
+
+    tracker.record_usage(
+        budget_invocation_id(callback_context),
+        getattr(callback_context, "agent_name", "unknown"),
+        getattr(callback_context, "user_id", "unknown"),
+        llm_response.usage_metadata,
+    )
+
+
+def _apply_context_cache(
+    callback_context: CallbackContext, llm_request: LlmRequest
+) -> None:
+    """Reference cached static instructions instead of re-sending them."""
+    context_cache = get_context_cache()
+    if context_cache is None:
+        return
+
+    cache_name = context_cache.apply(llm_request)
+    callback_context.state[CONTEXT_CACHE_STATE_KEY] = cache_name
+    if cache_name:
+        logger.debug(f"Using cached instructions: {cache_name}")
+
+
+def _record_context_cache_usage(
+    callback_context: CallbackContext,
+    llm_response: LlmResponse,
+    duration: Optional[float],
+) -> None:
+    """Report prompt-token and latency savings from context caching."""
+    context_cache = get_context_cache()
+    if context_cache is None or llm_response.partial or not llm_response.usage_metadata:
+        return
+
+    cached = bool(callback_context.state.get(CONTEXT_CACHE_STATE_KEY))
+    cached_tokens = context_cache.record_usage(cached, llm_response.usage_metadata, duration)
+    metrics = get_metrics()
+    if metrics is not None:
+        metrics.observe_context_cache(
+            getattr(callback_context, "agent_name", "unknown"), cached, cached_tokens
+        )
+    if cached_tokens:
+        logger.debug(f"Context cache saved {cached_tokens} prompt tokens")
@@ -1,8 +1,18 @@
 """
 Tool execution callbacks for the 82ndrop Agent System
 
-Monitors tool executions and integrates with RAG Memory Service 
-for enhanced user experience.
+Monitors tool executions (one sampled hop event per tool call, see
+instrumentation.py), serves cacheable tools from the result cache (see
+tool_cache.py) and integrates with RAG Memory Service for enhanced user
+experience.
+
+A tool that raises is answered with an error response (see
+on_tool_error_callback), so after_tool_callback still runs for it: the
+failure reaches the search breaker and the tool's span and timer are closed.
+
+Per-call telemetry (usage history, tool metrics, start times) is kept in the
+session telemetry side channel (see session_telemetry.py), not in session
+state, so it isn't persisted with the session.
 """
 
 import time
@@ -11,8 +21,37 @@ from typing import Dict, Any, Optional, Union
 from google.adk.tools.tool_context import ToolContext
 from google.adk.tools import BaseTool
 
+from drop_agent.cassettes import CassetteMiss, record_tool_call, replay_tool_call
+from drop_agent.instrumentation import emit_hop
+from drop_agent.metrics import get_metrics
+from drop_agent.session_telemetry import (
+    TOOL_METRICS,
+    TOOL_USAGE,
+    get_session_telemetry,
+    session_id_of,
+)
+from drop_agent.tool_cache import COALESCED, HIT, get_tool_cache
+from drop_agent.tracing import end_agent_span, end_tool_span, start_tool_span
+from drop_agent.circuit_breaker import (
+    SEARCH_BREAKER,
+    InjectedFailure,
+    get_breaker,
+    maybe_inject_failure,
+)
+
 logger = logging.getLogger(__name__)
 
+# Tools that depend on search; they are skipped while the search breaker is open
+SEARCH_TOOL_NAMES = ("search_enhancement", "search_agent", "google_search")
+
+SEARCH_SKIPPED_RESPONSE = {
+    "status": "skipped",
+    "result": (
+        "Search enhancement is temporarily unavailable. Do not retry it: "
+        "transfer to prompt_writer_agent now with the guide analysis."
+    ),
+}
+
 
 def before_tool_callback(
     tool: BaseTool, args: Dict[str, Any], tool_context: ToolContext, **kwargs
@@ -27,7 +66,8 @@ def before_tool_callback(
         **kwargs: Additional arguments from the framework
 
     Returns:
-        Optional[Dict]: Return None to proceed, or dict to override tool execution
+        Optional[Dict]: Return None to proceed, or dict (or an awaitable
+        resolving to one, when replaying a cassette) to override tool execution
     """
     try:
         # Get tool information
@@ -35,25 +75,54 @@ def before_tool_callback(
         function_call_id = getattr(tool_context, "function_call_id", "unknown_call")
 
         # Store start time for performance tracking
-        if not hasattr(tool_context, "state"):
-            tool_context.state = {}
-
-        tool_context.state[f"{tool_name}_start_time"] = time.time()
-        tool_context.state["current_tool_name"] = tool_name
-        tool_context.state["current_function_call_id"] = function_call_id
+        get_session_telemetry().start_timer(("tool", tool_name, function_call_id))
 
-        # Log tool execution start
-        logger.info(
-            f"🔧 Starting tool execution: {tool_name} (call_id: {function_call_id})"
+        start_tool_span(
+            getattr(tool_context, "invocation_id", "unknown"),
+            getattr(tool_context, "agent_name", "unknown"),
+            tool_name,
+            function_call_id,
+        )
+        emit_hop(
+            "tool.start",
+            getattr(tool_context, "agent_name", "unknown"),
+            invocation_id=getattr(tool_context, "invocation_id", None),
+            tool=tool_name,
+            call_id=function_call_id,
+            args=args,
         )
-        logger.debug(f"Tool arguments: {args}")
 
         # Track tool usage patterns
         _track_tool_usage(tool_name, tool_context)
 
+        # Serve the recorded response when replaying a cassette
+        replayed = replay_tool_call(tool_name, args)
+        if replayed is not None:
+            logger.debug(f"🎞️ Replaying recorded {tool_name} response")
+            return replayed
+
+        # Skip search enhancement while search is failing
+        if tool_name in SEARCH_TOOL_NAMES and not _admit_search():
+            logger.warning(f"Search circuit open, skipping {tool_name}")
+            return SEARCH_SKIPPED_RESPONSE
+
+        # Serve cacheable tools from the result cache; identical concurrent
+        # calls share one execution
+        cache = get_tool_cache()
+        if cache is not None and cache.policy_for(tool_name):
+            return cache.serve(
+                tool_name,
+                args,
+                function_call_id,
+                lambda: _run_reporting_errors(tool, args, tool_context),
+                user_id=getattr(tool_context, "user_id", None),
+            )
+
         # Return None to proceed with normal tool execution
         return None
 
+    except CassetteMiss:
+        raise
     except Exception as e:
         logger.error(f"Error in before_tool_callback: {e}")
         # Don't raise - callbacks should be non-blocking
@@ -104,77 +173,83 @@ def after_tool_callback(
             else "unknown_call"
         )
 
-        # Ensure context has state (only if we have a valid tool_context)
-        if tool_context and not hasattr(tool_context, "state"):
-            try:
-                tool_context.state = {}
-            except (AttributeError, TypeError):
-                logger.debug(
-                    f"Cannot set state on tool_context of type {type(tool_context)}"
-                )
-                tool_context = None
-
         # Calculate execution time
-        start_time = None
-        execution_time = 0.0
-
-        if (
-            tool_context
-            and hasattr(tool_context, "state")
-            and isinstance(tool_context.state, dict)
-        ):
-            start_time = tool_context.state.get(f"{tool_name}_start_time", time.time())
-            execution_time = time.time() - start_time
-        elif (
-            tool_context
-            and hasattr(tool_context, "state")
-            and isinstance(tool_context.state, str)
-        ):
-            # If state is a string, we can't get the start time, so estimate a small execution time
-            execution_time = 0.01
-        else:
+        telemetry = get_session_telemetry()
+        execution_time = telemetry.stop_timer(("tool", tool_name, function_call_id))
+        if execution_time is None:
             # Fallback: estimate a small execution time
             execution_time = 0.01
 
         # Determine success based on response
         success = response is not None and not (
             isinstance(response, str) and response.startswith("Error:")
-        )
+        ) and not (isinstance(response, dict) and "error" in response)
 
-        # Log tool completion
-        logger.info(
-            f"🔧 Completed tool execution: {tool_name} ({'✅' if success else '❌'}) in {execution_time:.2f}s"
-        )
-        logger.info(f"Tool response: {response}")
+        cache_outcome, saved_seconds = _pop_cache_outcome(function_call_id)
 
-        # Store performance metrics (only if we have a valid tool_context with state)
+        # Cached and coalesced results say nothing about search health
         if (
-            tool_context
-            and hasattr(tool_context, "state")
-            and isinstance(tool_context.state, dict)
+            tool_name in SEARCH_TOOL_NAMES
+            and response != SEARCH_SKIPPED_RESPONSE
+            and cache_outcome not in (HIT, COALESCED)
         ):
-            try:
-                if "tool_metrics" not in tool_context.state:
-                    tool_context.state["tool_metrics"] = []
-
-                tool_context.state["tool_metrics"].append(
-                    {
-                        "tool_name": tool_name,
-                        "function_call_id": function_call_id,
-                        "execution_time": execution_time,
-                        "success": success,
-                        "timestamp": time.time(),
-                        "args_count": len(args) if args else 0,
-                        "response_type": type(response).__name__
-                        if response
-                        else "None",
-                    }
-                )
-
-                # Store the duration for this specific tool
-                tool_context.state[f"{tool_name}_last_duration"] = execution_time
-            except (AttributeError, TypeError) as e:
-                logger.debug(f"Could not store tool metrics: {e}")
+            _record_search_outcome(success)
+
+        record_tool_call(tool_name, args, response, execution_time)
+
+        metrics = get_metrics()
+        if metrics is not None:
+            metrics.observe_tool(tool_name, execution_time, success or response is None)
+            if cache_outcome:
+                metrics.observe_tool_cache(tool_name, cache_outcome, saved_seconds)
+
+        end_tool_span(function_call_id, error=None if success or response is None else "tool returned an error")
+        if tool_name == "transfer_to_agent" and tool_context:
+            # A transferring agent's after_agent_callback doesn't run; its turn ends here
+            telemetry.stop_timer(
+                ("agent", getattr(tool_context, "invocation_id", "unknown"), getattr(tool_context, "agent_name", "unknown"))
+            )
+            end_agent_span(
+                getattr(tool_context, "invocation_id", "unknown"),
+                getattr(tool_context, "agent_name", "unknown"),
+                **{"drop_agent.transferred_to": (args or {}).get("agent_name")},
+            )
+
+        # The response is truncated (and only serialized) when the event is emitted
+        emit_hop(
+            "tool.end",
+            getattr(tool_context, "agent_name", "unknown"),
+            invocation_id=getattr(tool_context, "invocation_id", None),
+            # Tools like transfer_to_agent return nothing; only error responses count
+            error=not success and response is not None,
+            duration_ms=execution_time * 1000,
+            tool=tool_name,
+            call_id=function_call_id,
+            cache=cache_outcome,
+            saved_ms=saved_seconds * 1000 if cache_outcome else None,
+            response=response,
+        )
+
+        # Store performance metrics in the session's ring buffer
+        if tool_context:
+            telemetry.record(
+                session_id_of(tool_context),
+                TOOL_METRICS,
+                {
+                    "tool_name": tool_name,
+                    "function_call_id": function_call_id,
+                    "execution_time": execution_time,
+                    "success": success,
+                    "timestamp": time.time(),
+                    "args_count": len(args) if args else 0,
+                    "response_type": type(response).__name__
+                    if response
+                    else "None",
+                    "cache": cache_outcome,
+                    "saved_seconds": saved_seconds,
+                },
+                user_id=getattr(tool_context, "user_id", None),
+            )
 
         # Memory handling is now done automatically by ADK
 
@@ -191,6 +266,85 @@ def after_tool_callback(
         return None
 
 
+def on_tool_error_callback(
+    tool: BaseTool,
+    args: Dict[str, Any],
+    tool_context: ToolContext,
+    error: Exception,
+    **kwargs,
+) -> Optional[Dict]:
+    """
+    Called when a tool raises.
+
+    Args:
+        tool: The tool that failed
+        args: Arguments that were passed to the tool
+        tool_context: The tool execution context from ADK
+        error: The exception the tool raised
+        **kwargs: Additional arguments from the framework
+
+    Returns:
+        Optional[Dict]: An error response for the model; ADK then runs
+        after_tool_callback with it. None (re-raise) for cassette misses.
+    """
+    if isinstance(error, CassetteMiss):
+        return None
+    tool_name = getattr(tool, "name", getattr(tool, "__name__", str(tool)))
+    logger.error(f"Tool {tool_name} failed: {error}")
+    return _error_response(tool_name, error)
+
+
+def _error_response(tool_name: str, error: Exception) -> Dict[str, Any]:
+    return {"error": f"{tool_name} failed: {type(error).__name__}: {error}"}
+
+
+async def _run_reporting_errors(tool: BaseTool, args: Dict[str, Any], tool_context: ToolContext) -> Any:
+    """Run a tool served through the result cache.
+
+    Its result comes from before_tool_callback, where ADK doesn't call the
+    error callbacks, so a raising tool is turned into an error response here.
+    """
+    try:
+        return await tool.run_async(args=args, tool_context=tool_context)
+    except CassetteMiss:
+        raise
+    except Exception as e:
+        return on_tool_error_callback(tool, args, tool_context, e)
+
+
+def _pop_cache_outcome(function_call_id: str):
+    """(outcome, saved seconds) of a call served through the tool cache."""
+    cache = get_tool_cache()
+    outcome = cache.pop_outcome(function_call_id) if cache is not None else None
+    return outcome or (None, 0.0)
+
+
+def _admit_search() -> bool:
+    """Ask the search breaker whether a search call may run now."""
+    breaker = get_breaker(SEARCH_BREAKER)
+    if breaker is None:
+        return True
+    if not breaker.allow():
+        return False
+    try:
+        maybe_inject_failure(SEARCH_BREAKER)
+    except InjectedFailure as e:
+        logger.warning(str(e))
+        breaker.record_failure()
+        return False
+    return True
+
+
+def _record_search_outcome(success: bool) -> None:
+    breaker = get_breaker(SEARCH_BREAKER)
+    if breaker is None:
+        return
+    if success:
+        breaker.record_success()
+    else:
+        breaker.record_failure()
+
+
 def _track_tool_usage(tool_name: str, context: ToolContext) -> None:
     """
     Track tool usage patterns for insights.
@@ -205,36 +359,19 @@ def _track_tool_usage(tool_name: str, context: ToolContext) -> None:
             logger.debug("Skipping tool usage tracking - invalid context")
             return
 
-        if not hasattr(context, "state"):
-            try:
-                context.state = {}
-            except (AttributeError, TypeError):
-                logger.debug(f"Cannot create state on context of type {type(context)}")
-                return
-
-        if not isinstance(context.state, dict):
-            logger.debug(f"Context state is not a dict: {type(context.state)}")
-            return
-
-        if "tool_usage_history" not in context.state:
-            context.state["tool_usage_history"] = []
-
-        context.state["tool_usage_history"].append(
+        # The ring buffer keeps only recent history (SESSION_TELEMETRY_EVENTS)
+        get_session_telemetry().record(
+            session_id_of(context),
+            TOOL_USAGE,
             {
                 "tool_name": tool_name,
                 "timestamp": time.time(),
-                "session_id": getattr(context, "session_id", "unknown"),
                 "agent_name": getattr(context, "agent_name", "unknown"),
                 "invocation_id": getattr(context, "invocation_id", "unknown"),
-            }
+            },
+            user_id=getattr(context, "user_id", None),
         )
 
-        # Keep only recent history (last 50 tool uses)
-        if len(context.state["tool_usage_history"]) > 50:
-            context.state["tool_usage_history"] = context.state["tool_usage_history"][
-                -50:
-            ]
-
     except Exception as e:
         logger.debug(f"Could not track tool usage: {e}")
 
@@ -0,0 +1,302 @@
+"""
+Record/replay cassettes for the 82ndrop agent pipeline.
+
+In record mode every model call and tool call made while running real ideas
+is appended to a JSONL cassette, keyed by a content hash of the request:
+- model calls: the response-cache key of the ``LlmRequest`` (model, system
+  instruction, normalized contents, generation config), with every streamed
+  chunk and its offset from the start of the call
+- tool calls: tool name and arguments, with the tool response and duration
+
+In replay mode the same requests are answered from the cassette with their
+original timings, so the pipeline can be benchmarked repeatably without
+Vertex AI, search or credentials. Repeated identical requests are served in
+recorded order (the last recording is reused once they run out).
+
+Models are wrapped by ``drop_agent.models.build_model``; tool calls are
+recorded and replayed from the tool callbacks.
+
+Configuration (environment variables):
+- CASSETTE_MODE: "record" or "replay" (default: off)
+- CASSETTE_PATH: cassette file (default cassettes/drop_agent.jsonl)
+- CASSETTE_REPLAY_SPEED: multiplier on recorded timings (default 1.0, 0 replays instantly)
+- CASSETTE_STRICT: "false" to fall through to the live model/tool on a replay miss
+"""
+
+import os
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from typing import Any, AsyncGenerator, Awaitable, Dict, List, Optional
+
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.adk.models.registry import LLMRegistry
+
+from drop_agent.config import env_flag, env_float
+from drop_agent.response_cache import build_cache_key
+
+logger = logging.getLogger(__name__)
+
+RECORD = "record"
+REPLAY = "replay"
+
+MODEL_ENTRY = "model"
+TOOL_ENTRY = "tool"
+
+# Tools that act on the invocation (agent transfer) rather than return data;
+# they always run for real
+UNRECORDED_TOOLS = ("transfer_to_agent",)
+
+
+def get_cassette_mode() -> Optional[str]:
+    mode = (os.getenv("CASSETTE_MODE") or "").strip().lower()
+    return mode if mode in (RECORD, REPLAY) else None
+
+
+class CassetteMiss(LookupError):
+    """A replayed request has no recording in the cassette."""
+
+
+def build_tool_key(tool_name: str, args: Optional[Dict[str, Any]]) -> str:
+    """Content hash of a tool call."""
+    payload = json.dumps({"tool": tool_name, "args": args or {}}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _usage_tokens(response: Dict[str, Any]) -> int:
+    usage = response.get("usage_metadata") or {}
+    return int(usage.get("total_token_count") or 0)
+
+
+class Cassette:
+    """JSONL store of recorded interactions, served back by content key."""
+
+    def __init__(self, path: str, mode: str, speed: float = 1.0, strict: bool = True):
+        self.path = Path(path)
+        self.mode = mode
+        self.speed = speed
+        self.strict = strict
+        self._lock = threading.Lock()
+        self._entries: Dict[str, List[Dict[str, Any]]] = {}
+        self._served: Dict[str, int] = {}
+        self.stats: Dict[str, Any] = {}
+        self.reset_stats()
+        if self.path.exists():
+            with open(self.path) as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._entries.setdefault(f"{entry['kind']}:{entry['key']}", []).append(entry)
+        elif mode == REPLAY:
+            logger.warning(f"Cassette {self.path} does not exist; every replay will miss")
+
+    @classmethod
+    def from_env(cls) -> Optional["Cassette"]:
+        mode = get_cassette_mode()
+        if mode is None:
+            return None
+        return cls(
+            os.getenv("CASSETTE_PATH") or "cassettes/drop_agent.jsonl",
+            mode,
+            speed=env_float("CASSETTE_REPLAY_SPEED", 1.0),
+            strict=env_flag("CASSETTE_STRICT", default=True),
+        )
+
+    def __len__(self) -> int:
+        return sum(len(entries) for entries in self._entries.values())
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self.stats = {
+                "recorded": 0,
+                "replayed": 0,
+                "misses": 0,
+                "replayed_seconds": 0.0,
+                "agents": {},
+                "tools": {},
+            }
+
+    def _count(self, source: str, entry: Dict[str, Any]) -> None:
+        """Account a served or recorded entry per agent/tool (lock held)."""
+        bucket = self.stats["agents" if entry["kind"] == MODEL_ENTRY else "tools"]
+        stats = bucket.setdefault(source, {"calls": 0, "tokens": 0, "recorded_seconds": 0.0})
+        stats["calls"] += 1
+        stats["recorded_seconds"] += entry.get("duration", 0.0)
+        if entry["kind"] == MODEL_ENTRY:
+            stats["tokens"] += sum(_usage_tokens(item["response"]) for item in entry["responses"])
+
+    def lookup(self, kind: str, key: str, source: str) -> Optional[Dict[str, Any]]:
+        """Next recording of a request, or None on a miss."""
+        with self._lock:
+            entries = self._entries.get(f"{kind}:{key}")
+            if not entries:
+                self.stats["misses"] += 1
+                return None
+            served = self._served.get(f"{kind}:{key}", 0)
+            self._served[f"{kind}:{key}"] = served + 1
+            entry = entries[min(served, len(entries) - 1)]
+            self.stats["replayed"] += 1
+            self.stats["replayed_seconds"] += entry.get("duration", 0.0) * self.speed
+            self._count(source, entry)
+            return entry
+
+    def record(self, entry: Dict[str, Any]) -> None:
+        """Append an interaction to the cassette file."""
+        line = json.dumps(entry, default=str)
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a") as f:
+                f.write(line + "\n")
+            self._entries.setdefault(f"{entry['kind']}:{entry['key']}", []).append(entry)
+            self.stats["recorded"] += 1
+            self._count(entry.get("agent") or entry.get("tool") or "unknown", entry)
+
+    def rewind(self) -> None:
+        """Serve repeated requests from their first recording again."""
+        with self._lock:
+            self._served.clear()
+
+
+_cassette: Optional[Cassette] = None
+_cassette_lock = threading.Lock()
+
+
+def get_cassette() -> Optional[Cassette]:
+    """Get the process-wide cassette (None when CASSETTE_MODE is unset)."""
+    global _cassette
+    mode = get_cassette_mode()
+    if mode is None:
+        return None
+    with _cassette_lock:
+        if _cassette is None or _cassette.mode != mode:
+            _cassette = Cassette.from_env()
+        return _cassette
+
+
+def reset_cassette() -> None:
+    """Drop the loaded cassette (it is reloaded from disk on next use)."""
+    global _cassette
+    with _cassette_lock:
+        _cassette = None
+
+
+class CassetteLlm(BaseLlm):
+    """Model wrapper that records calls to ``inner`` or replays them."""
+
+    agent_name: str = ""
+    inner: Optional[BaseLlm] = None
+
+    def _inner(self) -> BaseLlm:
+        if self.inner is None:
+            self.inner = LLMRegistry.new_llm(self.model)
+        return self.inner
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        cassette = get_cassette()
+        if cassette is None:
+            async for response in self._inner().generate_content_async(llm_request, stream):
+                yield response
+            return
+
+        # Key before the inner model gets a chance to touch the request
+        key = build_cache_key(llm_request)
+
+        if cassette.mode == REPLAY:
+            entry = cassette.lookup(MODEL_ENTRY, key, self.agent_name)
+            if entry is not None:
+                started = time.perf_counter()
+                for item in entry["responses"]:
+                    delay = item["offset"] * cassette.speed - (time.perf_counter() - started)
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                    yield LlmResponse.model_validate(item["response"])
+                return
+            if cassette.strict:
+                raise CassetteMiss(f"No recording for {self.agent_name} model call {key[:12]}")
+            logger.warning(f"🎞️ Cassette miss for {self.agent_name}, calling the live model")
+
+        started = time.perf_counter()
+        responses = []
+        failed = False
+        try:
+            async for response in self._inner().generate_content_async(llm_request, stream):
+                responses.append(
+                    {
+                        "offset": time.perf_counter() - started,
+                        "response": response.model_dump(mode="json", exclude_none=True),
+                    }
+                )
+                yield response
+        except Exception:
+            failed = True
+            raise
+        finally:
+            # ADK may stop iterating after a function call, so record on close;
+            # the duration ends at the last chunk, not when the caller let go
+            if cassette.mode == RECORD and responses and not failed:
+                cassette.record(
+                    {
+                        "kind": MODEL_ENTRY,
+                        "key": key,
+                        "agent": self.agent_name,
+                        "model": llm_request.model,
+                        "stream": stream,
+                        "duration": responses[-1]["offset"],
+                        "responses": responses,
+                    }
+                )
+
+
+async def _replay_tool_response(entry: Dict[str, Any], speed: float) -> Dict[str, Any]:
+    await asyncio.sleep(entry.get("duration", 0.0) * speed)
+    return entry["response"]
+
+
+def replay_tool_call(tool_name: str, args: Optional[Dict[str, Any]]) -> Optional[Awaitable[Dict]]:
+    """
+    Answer a tool call from the cassette in replay mode.
+
+    Returns:
+        An awaitable resolving to the recorded response after the recorded
+        duration (ADK awaits awaitable tool-callback results), or None to
+        run the tool
+    """
+    cassette = get_cassette()
+    if cassette is None or cassette.mode != REPLAY or tool_name in UNRECORDED_TOOLS:
+        return None
+    entry = cassette.lookup(TOOL_ENTRY, build_tool_key(tool_name, args), tool_name)
+    if entry is None:
+        if cassette.strict:
+            raise CassetteMiss(f"No recording for tool call {tool_name}")
+        logger.warning(f"🎞️ Cassette miss for tool {tool_name}, running the tool")
+        return None
+    return _replay_tool_response(entry, cassette.speed)
+
+
+def record_tool_call(
+    tool_name: str, args: Optional[Dict[str, Any]], response: Any, duration: float
+) -> None:
+    """Record a completed tool call in record mode."""
+    cassette = get_cassette()
+    if cassette is None or cassette.mode != RECORD or tool_name in UNRECORDED_TOOLS:
+        return
+    if not isinstance(response, dict):
+        response = {"result": response}
+    cassette.record(
+        {
+            "kind": TOOL_ENTRY,
+            "key": build_tool_key(tool_name, args),
+            "tool": tool_name,
+            "args": args or {},
+            "duration": duration,
+            "response": response,
+        }
+    )
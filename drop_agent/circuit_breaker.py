@@ -0,0 +1,193 @@
+"""
+Circuit breakers for the external dependencies of the 82ndrop Agent System.
+
+When Vertex AI models, search or Veo degrade, every request would otherwise
+wait out its timeouts before failing. Each dependency gets a breaker:
+- closed: calls go through; consecutive failures are counted
+- open: after ``failure_threshold`` consecutive failures calls are refused
+  immediately for ``recovery_timeout`` seconds
+- half-open: after the recovery timeout a limited number of probe calls are
+  let through; a successful probe closes the breaker, a failed one reopens it
+
+Callers degrade instead of failing when a breaker is open:
+- model calls (``model:<name>``) fall back to CIRCUIT_FALLBACK_MODEL, or
+  fail fast with an explanatory error response
+- search enhancement is skipped and the pipeline goes straight to the
+  prompt writer
+- Veo video generation is routed to the mock backend outside production
+
+Failures can be injected for testing with CIRCUIT_FAILURE_INJECTION.
+
+Configuration (environment variables):
+- CIRCUIT_BREAKERS: "false" to disable breakers (default enabled)
+- CIRCUIT_FAILURE_THRESHOLD: consecutive failures that open a breaker (default 5)
+- CIRCUIT_RECOVERY_TIMEOUT: seconds an open breaker waits before probing (default 30)
+- CIRCUIT_HALF_OPEN_PROBES: concurrent probe calls while half-open (default 1)
+- CIRCUIT_FALLBACK_MODEL: model used while a model's breaker is open (default: none)
+- CIRCUIT_FAILURE_INJECTION: failure rates per breaker, e.g. "search=1.0,veo=0.5"
+"""
+
+import os
+import time
+import random
+import logging
+import threading
+from typing import Any, Dict, Optional
+
+from .config import env_flag, env_float, env_int
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+CIRCUIT_OPEN_ERROR = "CIRCUIT_OPEN"
+
+MODEL_BREAKER_PREFIX = "model:"
+SEARCH_BREAKER = "search"
+VEO_BREAKER = "veo"
+
+
+class InjectedFailure(RuntimeError):
+    """Failure raised on purpose by CIRCUIT_FAILURE_INJECTION."""
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with half-open probing."""
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        recovery_timeout: float = 30.0,
+        half_open_probes: int = 1,
+        clock=time.monotonic,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_probes = half_open_probes
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self._probes: list = []
+        self.stats = {"successes": 0, "failures": 0, "rejected": 0, "opened": 0}
+
+    def _transition(self, state: str) -> None:
+        if state != self.state:
+            logger.warning(f"Circuit breaker '{self.name}': {self.state} -> {state}")
+            self.state = state
+        if state == OPEN:
+            self.opened_at = self._clock()
+            self.stats["opened"] += 1
+            self._probes = []
+
+    def allow(self) -> bool:
+        """
+        Ask whether a call may go through now.
+
+        Every allowed call must be followed by ``record_success`` or
+        ``record_failure``. A probe that never reports back expires after
+        the recovery timeout, so a lost probe cannot wedge the breaker.
+        """
+        with self._lock:
+            now = self._clock()
+            if self.state == OPEN and now - self.opened_at >= self.recovery_timeout:
+                self._transition(HALF_OPEN)
+            if self.state == HALF_OPEN:
+                self._probes = [t for t in self._probes if now - t < self.recovery_timeout]
+                if len(self._probes) < self.half_open_probes:
+                    self._probes.append(now)
+                    return True
+            elif self.state == CLOSED:
+                return True
+            self.stats["rejected"] += 1
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.stats["successes"] += 1
+            self.consecutive_failures = 0
+            if self.state != CLOSED:
+                self._transition(CLOSED)
+                self._probes = []
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.stats["failures"] += 1
+            self.consecutive_failures += 1
+            if self.state == HALF_OPEN or (
+                self.state == CLOSED and self.consecutive_failures >= self.failure_threshold
+            ):
+                self._transition(OPEN)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Current state for the status endpoint."""
+        with self._lock:
+            retry_in = None
+            if self.state == OPEN:
+                retry_in = max(0.0, self.recovery_timeout - (self._clock() - self.opened_at))
+            return {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "retry_in_seconds": retry_in,
+                **self.stats,
+            }
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def is_circuit_breaking_enabled() -> bool:
+    return env_flag("CIRCUIT_BREAKERS", default=True)
+
+
+def get_breaker(name: str) -> Optional[CircuitBreaker]:
+    """Get or create the breaker for a dependency (None when breakers are disabled)."""
+    if not is_circuit_breaking_enabled():
+        return None
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = _breakers[name] = CircuitBreaker(
+                name,
+                failure_threshold=env_int("CIRCUIT_FAILURE_THRESHOLD", 5),
+                recovery_timeout=env_float("CIRCUIT_RECOVERY_TIMEOUT", 30.0),
+                half_open_probes=env_int("CIRCUIT_HALF_OPEN_PROBES", 1),
+            )
+        return breaker
+
+
+def breaker_status() -> Dict[str, Dict[str, Any]]:
+    """Snapshot of every breaker created so far."""
+    with _breakers_lock:
+        breakers = dict(_breakers)
+    return {name: breaker.snapshot() for name, breaker in sorted(breakers.items())}
+
+
+def reset_breakers() -> None:
+    """Forget every breaker (they are recreated closed on next use)."""
+    with _breakers_lock:
+        _breakers.clear()
+
+
+def maybe_inject_failure(name: str) -> None:
+    """
+    Raise ``InjectedFailure`` at the configured rate for breaker ``name``.
+
+    Model breakers also match the bare "model" entry.
+    """
+    rates = {}
+    for item in (os.getenv("CIRCUIT_FAILURE_INJECTION") or "").split(","):
+        if "=" in item:
+            key, rate = item.split("=", 1)
+            rates[key.strip()] = float(rate)
+    rate = rates.get(name)
+    if rate is None and name.startswith(MODEL_BREAKER_PREFIX):
+        rate = rates.get("model")
+    if rate and random.random() < rate:
+        raise InjectedFailure(f"Injected failure for '{name}'")
@@ -0,0 +1,33 @@
+"""
+Environment configuration helpers for the 82ndrop Agent System.
+
+Every setting is read when its feature initializes. Unset and blank values
+(e.g. ``MODEL_RESPONSE_CACHE=`` copied from ``.env.example``) mean the
+default.
+"""
+
+import os
+
+
+def env_flag(name: str, default: bool = False) -> bool:
+    """A boolean setting: "1", "true", "yes" or "on" (any case) enable it."""
+    value = os.getenv(name)
+    if value is None or not value.strip():
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def env_int(name: str, default: int) -> int:
+    """An integer setting; raises ValueError when it is set to a non-integer."""
+    value = os.getenv(name)
+    if value is None or not value.strip():
+        return default
+    return int(value)
+
+
+def env_float(name: str, default: float) -> float:
+    """A float setting; raises ValueError when it is set to a non-number."""
+    value = os.getenv(name)
+    if value is None or not value.strip():
+        return default
+    return float(value)
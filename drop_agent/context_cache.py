@@ -0,0 +1,439 @@
+"""
+Provider-side context caching for the large static agent instructions.
+
+ROOT_PROMPT and prompt_writer's INSTRUCTION are several KB of static text
+that would otherwise be re-sent and re-tokenized on every model call. When
+enabled, the system instruction (and tool declarations, which the provider
+requires to live in the same cached content) of those agents is stored as
+Vertex AI cached content and each request references it by name.
+
+Handles are keyed on the exact request shape (model, system instruction,
+tools). ADK appends agent identity and transfer instructions to the static
+prompt, so ``start()`` builds each agent's request through the agent's own
+ADK flow and creates the handles for those shapes on a background thread,
+which then keeps them warm. Shapes first seen in traffic (e.g. a routed
+model) are queued for that thread. Requests fall back to sending the full
+instruction whenever no live handle exists or caching is unavailable.
+
+Savings (prompt tokens served from the cache, billable prompt tokens and
+latency with and without it) are reported by ``/usage`` and as metrics.
+
+Configuration (environment variables):
+- CONTEXT_CACHE: "true" to enable context caching
+- CONTEXT_CACHE_BACKEND: "genai" (default) or "fake" (offline, for tests)
+- CONTEXT_CACHE_TTL: handle lifetime in seconds (default 3600)
+- CONTEXT_CACHE_REFRESH_MARGIN: refresh handles this many seconds before expiry (default 300)
+- CONTEXT_CACHE_RETRY_AFTER: seconds to wait before retrying a failed creation (default 600)
+"""
+
+import os
+import json
+import asyncio
+import time
+import hashlib
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from .config import env_flag, env_int
+
+try:
+    from google.adk.models.llm_request import LlmRequest
+except ImportError:
+    # Fallback for development/testing
+    LlmRequest = Any
+
+logger = logging.getLogger(__name__)
+
+# Invocation-scoped state key ("temp:" keys are never persisted by ADK)
+CONTEXT_CACHE_STATE_KEY = "temp:context_cache"
+
+_static_instructions = None
+
+
+def get_static_instructions() -> Tuple[str, ...]:
+    """
+    Instructions worth caching; only requests embedding one of them are cached.
+
+    Imported lazily because the agent modules import the callbacks package.
+    """
+    global _static_instructions
+    if _static_instructions is None:
+        from .prompts import ROOT_PROMPT
+        from .sub_agents.prompt_writer.prompt import INSTRUCTION as PROMPT_WRITER_INSTRUCTION
+
+        _static_instructions = (ROOT_PROMPT, PROMPT_WRITER_INSTRUCTION)
+    return _static_instructions
+
+
+@dataclass
+class CacheHandle:
+    """A live provider-side cached content resource."""
+
+    name: str
+    model: str
+    expires_at: float
+    token_count: int = 0
+
+
+class GenAICacheBackend:
+    """Creates cached content through the google.genai client (Vertex AI)."""
+
+    def __init__(self):
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            from google import genai
+
+            self._client = genai.Client()
+        return self._client
+
+    def create(
+        self, model: str, system_instruction: str, tools: List[Any], ttl_seconds: int
+    ) -> CacheHandle:
+        from google.genai import types
+
+        cached = self.client.caches.create(
+            model=model,
+            config=types.CreateCachedContentConfig(
+                display_name="82ndrop-static-instruction",
+                system_instruction=system_instruction,
+                tools=tools or None,
+                ttl=f"{ttl_seconds}s",
+            ),
+        )
+        usage = getattr(cached, "usage_metadata", None)
+        return CacheHandle(
+            name=cached.name,
+            model=model,
+            expires_at=time.time() + ttl_seconds,
+            token_count=getattr(usage, "total_token_count", 0) or 0,
+        )
+
+    def refresh(self, handle: CacheHandle, ttl_seconds: int) -> CacheHandle:
+        from google.genai import types
+
+        self.client.caches.update(
+            name=handle.name,
+            config=types.UpdateCachedContentConfig(ttl=f"{ttl_seconds}s"),
+        )
+        handle.expires_at = time.time() + ttl_seconds
+        return handle
+
+    def delete(self, handle: CacheHandle) -> None:
+        self.client.caches.delete(name=handle.name)
+
+
+class FakeCacheBackend:
+    """
+    In-memory stand-in for the provider, used by tests and offline runs.
+
+    Set ``available = False`` to simulate caching being unavailable.
+    """
+
+    def __init__(self, available: bool = True):
+        self.available = available
+        self.handles: Dict[str, CacheHandle] = {}
+        self.created = 0
+        self.refreshed = 0
+
+    def create(
+        self, model: str, system_instruction: str, tools: List[Any], ttl_seconds: int
+    ) -> CacheHandle:
+        if not self.available:
+            raise RuntimeError("Context caching unavailable")
+        self.created += 1
+        handle = CacheHandle(
+            name=f"cachedContents/fake-{self.created}",
+            model=model,
+            expires_at=time.time() + ttl_seconds,
+            token_count=len(system_instruction) // 4,
+        )
+        self.handles[handle.name] = handle
+        return handle
+
+    def refresh(self, handle: CacheHandle, ttl_seconds: int) -> CacheHandle:
+        if not self.available or handle.name not in self.handles:
+            raise RuntimeError("Context caching unavailable")
+        self.refreshed += 1
+        handle.expires_at = time.time() + ttl_seconds
+        return handle
+
+    def delete(self, handle: CacheHandle) -> None:
+        self.handles.pop(handle.name, None)
+
+
+def _iter_agents(agent) -> List[Any]:
+    agents = [agent]
+    for sub_agent in getattr(agent, "sub_agents", None) or []:
+        agents.extend(_iter_agents(sub_agent))
+    return agents
+
+
+async def build_agent_requests(root_agent) -> List[LlmRequest]:
+    """
+    The request each LLM agent of the tree sends on its first model call.
+
+    Runs the request preprocessing of the agent's own ADK flow (instructions,
+    identity, transfer targets, tools) in an empty session, without calling
+    the model or any callback.
+    """
+    from google.adk.agents import LlmAgent
+    from google.adk.agents.invocation_context import InvocationContext
+    from google.adk.agents.run_config import RunConfig
+    from google.adk.sessions import InMemorySessionService
+
+    session_service = InMemorySessionService()
+    session = await session_service.create_session(app_name="context_cache", user_id="context_cache")
+    requests = []
+    for agent in _iter_agents(root_agent):
+        if not isinstance(agent, LlmAgent):
+            continue
+        context = InvocationContext(
+            session_service=session_service,
+            invocation_id="context-cache",
+            agent=agent,
+            session=session,
+            run_config=RunConfig(),
+        )
+        llm_request = LlmRequest()
+        async for _ in agent._llm_flow._preprocess_async(context, llm_request):
+            pass
+        requests.append(llm_request)
+    return requests
+
+
+def _system_instruction_text(llm_request: LlmRequest) -> str:
+    instruction = getattr(llm_request.config, "system_instruction", None)
+    if instruction is None:
+        return ""
+    if isinstance(instruction, str):
+        return instruction
+    parts = getattr(instruction, "parts", None) or []
+    return "\n".join(part.text for part in parts if getattr(part, "text", None))
+
+
+class StaticInstructionCache:
+    """Manages cached-content handles for the static agent instructions."""
+
+    def __init__(
+        self,
+        backend: Any,
+        ttl_seconds: int = 3600,
+        refresh_margin: int = 300,
+        retry_after: int = 600,
+    ):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self.refresh_margin = refresh_margin
+        self.retry_after = retry_after
+        self._handles: Dict[str, CacheHandle] = {}
+        self._pending: Dict[str, Tuple[str, str, List[Any]]] = {}
+        self._failed_until: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._refresher: Optional[threading.Thread] = None
+        self.stats = {
+            "cached_requests": 0,
+            "uncached_requests": 0,
+            "cached_prompt_tokens": 0,
+            "uncached_prompt_tokens": 0,
+            "cached_latency_total": 0.0,
+            "uncached_latency_total": 0.0,
+            "saved_prompt_tokens": 0,
+        }
+
+    @staticmethod
+    def shape_key(model: str, system_instruction: str, tools: List[Any]) -> str:
+        tools_json = json.dumps(
+            [tool.model_dump(mode="json", exclude_none=True) for tool in tools],
+            sort_keys=True,
+            default=str,
+        )
+        payload = f"{model}\n{system_instruction}\n{tools_json}"
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _shape(self, llm_request: LlmRequest) -> Optional[Tuple[str, str, List[Any]]]:
+        """The shape key, system instruction and tools of a cacheable request."""
+        system_instruction = _system_instruction_text(llm_request)
+        if not any(static in system_instruction for static in get_static_instructions()):
+            return None
+        tools = list(llm_request.config.tools or [])
+        return self.shape_key(llm_request.model, system_instruction, tools), system_instruction, tools
+
+    def _queue_create(self, key: str, model: str, system_instruction: str, tools: List[Any]) -> None:
+        """Queue a handle for the refresher thread; call with the lock held."""
+        if key not in self._pending and self._failed_until.get(key, 0) < time.time():
+            self._pending[key] = (model, system_instruction, tools)
+            self._wake.set()
+
+    def prepare(self, requests: List[LlmRequest]) -> None:
+        """Queue handles for the shapes of known requests, e.g. each agent's first."""
+        with self._lock:
+            for llm_request in requests:
+                shape = self._shape(llm_request)
+                if shape and shape[0] not in self._handles:
+                    self._queue_create(shape[0], llm_request.model, shape[1], shape[2])
+
+    def create_pending(self) -> None:
+        """Create the queued handles."""
+        with self._lock:
+            pending = list(self._pending.items())
+        for key, (model, system_instruction, tools) in pending:
+            try:
+                handle = self.backend.create(model, system_instruction, tools, self.ttl_seconds)
+                with self._lock:
+                    self._handles[key] = handle
+                logger.info(f"Context cache created: {handle.name} ({handle.token_count} tokens)")
+            except Exception as e:
+                with self._lock:
+                    self._failed_until[key] = time.time() + self.retry_after
+                logger.warning(f"Context cache unavailable, sending full instructions: {e}")
+            finally:
+                with self._lock:
+                    self._pending.pop(key, None)
+
+    def apply(self, llm_request: LlmRequest) -> Optional[str]:
+        """
+        Point a request at the cached content for its static instruction.
+
+        The request's system instruction, tools and tool config move into
+        the cached content, so they are removed from the request itself.
+
+        Returns:
+            The cached content name when applied, otherwise None
+        """
+        shape = self._shape(llm_request)
+        if shape is None:
+            return None
+
+        key, system_instruction, tools = shape
+        with self._lock:
+            handle = self._handles.get(key)
+            if handle is None or handle.expires_at - time.time() < 1:
+                self._handles.pop(key, None)
+                # Created by the refresher thread; this request goes uncached
+                self._queue_create(key, llm_request.model, system_instruction, tools)
+                return None
+
+        config = llm_request.config
+        config.cached_content = handle.name
+        config.system_instruction = None
+        config.tools = None
+        config.tool_config = None
+        return handle.name
+
+    def refresh_expiring(self) -> None:
+        """Extend (or recreate) handles that expire within the refresh margin."""
+        with self._lock:
+            expiring = [
+                (key, handle)
+                for key, handle in self._handles.items()
+                if handle.expires_at - time.time() < self.refresh_margin
+            ]
+        for key, handle in expiring:
+            try:
+                self.backend.refresh(handle, self.ttl_seconds)
+            except Exception as e:
+                logger.warning(f"Context cache refresh failed for {handle.name}: {e}")
+                with self._lock:
+                    self._handles.pop(key, None)
+
+    def start(self, root_agent: Any = None, interval: Optional[float] = None) -> None:
+        """
+        Start the background refresher thread (idempotent).
+
+        The thread first creates the handles of the agents in ``root_agent``'s
+        tree (the app's agents by default), then creates queued handles as
+        they come and refreshes expiring ones.
+        """
+        if self._refresher is not None:
+            return
+        interval = interval or max(1.0, self.refresh_margin / 2)
+
+        def _run():
+            try:
+                agent = root_agent
+                if agent is None:
+                    from .agent import root_agent as agent
+                self.prepare(asyncio.run(build_agent_requests(agent)))
+            except Exception as e:
+                logger.warning(f"Could not build the agents' requests, caching them on first use: {e}")
+            while not self._stop.is_set():
+                self._wake.clear()
+                self.create_pending()
+                self.refresh_expiring()
+                self._wake.wait(interval)
+
+        self._refresher = threading.Thread(target=_run, name="context-cache-refresher", daemon=True)
+        self._refresher.start()
+
+    def stop(self) -> None:
+        """Stop the refresher and release every handle."""
+        self._stop.set()
+        self._wake.set()
+        with self._lock:
+            handles = list(self._handles.values())
+            self._handles.clear()
+        for handle in handles:
+            try:
+                self.backend.delete(handle)
+            except Exception as e:
+                logger.debug(f"Could not delete context cache {handle.name}: {e}")
+
+    def record_usage(self, cached: bool, usage_metadata: Any, duration: Optional[float]) -> int:
+        """
+        Record prompt-token and latency figures for a model call.
+
+        Returns:
+            Number of prompt tokens served from the cache
+        """
+        prefix = "cached" if cached else "uncached"
+        prompt_tokens = getattr(usage_metadata, "prompt_token_count", 0) or 0
+        cached_tokens = getattr(usage_metadata, "cached_content_token_count", 0) or 0
+        with self._lock:
+            self.stats[f"{prefix}_requests"] += 1
+            self.stats[f"{prefix}_prompt_tokens"] += prompt_tokens - cached_tokens
+            self.stats[f"{prefix}_latency_total"] += duration or 0.0
+            self.stats["saved_prompt_tokens"] += cached_tokens
+        return cached_tokens
+
+    def savings_summary(self) -> Dict[str, Any]:
+        """
+        Average billable prompt tokens and latency with and without the cache,
+        and the prompt tokens served from it in total.
+        """
+        summary = {}
+        for prefix in ("cached", "uncached"):
+            count = self.stats[f"{prefix}_requests"]
+            summary[prefix] = {
+                "requests": count,
+                "avg_prompt_tokens": self.stats[f"{prefix}_prompt_tokens"] / count if count else None,
+                "avg_latency": self.stats[f"{prefix}_latency_total"] / count if count else None,
+            }
+        summary["saved_prompt_tokens"] = self.stats["saved_prompt_tokens"]
+        summary["live_handles"] = len(self._handles)
+        return summary
+
+
+_context_cache = None
+
+
+def get_context_cache() -> Optional[StaticInstructionCache]:
+    """Get or initialize the static instruction cache (None when disabled)."""
+    global _context_cache
+    if _context_cache is None and env_flag("CONTEXT_CACHE"):
+        backend_name = os.getenv("CONTEXT_CACHE_BACKEND") or "genai"
+        backend = FakeCacheBackend() if backend_name == "fake" else GenAICacheBackend()
+        _context_cache = StaticInstructionCache(
+            backend=backend,
+            ttl_seconds=env_int("CONTEXT_CACHE_TTL", 3600),
+            refresh_margin=env_int("CONTEXT_CACHE_REFRESH_MARGIN", 300),
+            retry_after=env_int("CONTEXT_CACHE_RETRY_AFTER", 600),
+        )
+        logger.info(f"Context caching enabled ({backend_name} backend)")
+    return _context_cache
@@ -0,0 +1,164 @@
+"""
+82ndrop Analytics Sketch Evaluation
+
+Checks the accuracy bounds of the sketches behind AnalyticsTracker and that
+its memory stays flat as traffic grows:
+- HyperLogLog unique users: root mean square relative error over several
+  user sets within 2 standard errors (2 * 1.04 / sqrt(4096), about 3.3%)
+  at several cardinalities
+- DDSketch response times: p50/p95/p99 within the 1% relative accuracy of
+  the exact quantiles, on log-normal latencies; merged sketches give the
+  same quantiles as one sketch over all values
+- memory of a day of traffic (tracemalloc) for growing user counts, with
+  per-user stats capped at --max-users
+
+Exits non-zero when a bound is violated.
+
+Usage:
+    python drop_agent/evals/analytics_sketch_eval.py [--requests 100000] [--max-users 1000]
+"""
+
+import os
+import sys
+import json
+import math
+import random
+import argparse
+import tracemalloc
+from pathlib import Path
+from datetime import datetime
+
+# Add project root to path for imports
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from dotenv import load_dotenv
+
+CARDINALITIES = (50, 1000, 20000, 100000)
+HLL_TRIALS = 5
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+def _exact_quantile(ordered, q: float) -> float:
+    return ordered[int(q * (len(ordered) - 1))]
+
+
+def _check_hyperloglog():
+    from drop_agent.logging_config import HyperLogLog
+
+    bound = 2 * 1.04 / math.sqrt(4096)
+    results = []
+    for cardinality in CARDINALITIES:
+        errors = []
+        for trial in range(HLL_TRIALS):
+            sketch = HyperLogLog()
+            for i in range(cardinality):
+                sketch.add(f"trial-{trial}-user-{i}")
+                sketch.add(f"trial-{trial}-user-{i}")  # duplicates must not count
+            errors.append((sketch.count() - cardinality) / cardinality)
+        rms = math.sqrt(sum(error * error for error in errors) / len(errors))
+        worst = max(errors, key=abs)
+        results.append({"cardinality": cardinality, "rms_error": rms, "worst_error": worst, "ok": rms <= bound})
+        print(f"   HLL {cardinality:>7} users: {rms:.2%} RMS error (worst {worst:+.2%}) {'✅' if rms <= bound else '❌'}")
+    return {"bound": bound, "trials": HLL_TRIALS, "results": results}
+
+
+def _check_ddsketch(samples: int):
+    from drop_agent.logging_config import DDSketch
+
+    rng = random.Random(82)
+    values = [rng.lognormvariate(math.log(800), 1.2) for _ in range(samples)]
+    ordered = sorted(values)
+
+    sketch, left, right = DDSketch(), DDSketch(), DDSketch()
+    for i, value in enumerate(values):
+        sketch.add(value)
+        (left if i % 2 else right).add(value)
+    left.merge(right)
+
+    results = []
+    for q in QUANTILES:
+        exact = _exact_quantile(ordered, q)
+        estimate = sketch.quantile(q)
+        error = abs(estimate - exact) / exact
+        merged_ok = math.isclose(left.quantile(q), estimate)
+        ok = error <= sketch.relative_accuracy and merged_ok
+        results.append({"quantile": q, "exact_ms": exact, "estimate_ms": estimate, "error": error, "merged_matches": merged_ok, "ok": ok})
+        print(f"   p{int(q * 100):<2} latency: exact {exact:9.1f}ms, sketch {estimate:9.1f}ms ({error:.2%} error) {'✅' if ok else '❌'}")
+    return {"bound": sketch.relative_accuracy, "bins": len(sketch.bins), "results": results}
+
+
+def _check_memory(requests: int, max_users: int):
+    from drop_agent.logging_config import AnalyticsTracker, UserAnalytics
+
+    rng = random.Random(82)
+    results = []
+    for users in (100, 10000, 100000):
+        tracemalloc.start()
+        tracker = AnalyticsTracker(retention_days=30, max_users=max_users)
+        for i in range(requests):
+            tracker.track_usage(
+                UserAnalytics(
+                    user_id=f"user-{rng.randrange(users)}",
+                    email=None,
+                    access_level="basic",
+                    endpoint="/run",
+                    method="POST",
+                    status_code=200,
+                    response_time_ms=rng.lognormvariate(math.log(800), 1.2),
+                )
+            )
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        summary = tracker.get_daily_summary()
+        results.append({"users": users, "memory_kb": current / 1024, "tracked_users": len(tracker.user_stats), "unique_users_estimate": summary["unique_users"]})
+        print(f"   {users:>6} users: {current / 1024:8.0f}KB, {len(tracker.user_stats)} users with stats, ~{summary['unique_users']} unique")
+    return results
+
+
+def run_analytics_sketch_eval(requests: int = 100000, max_users: int = 1000):
+    """Check sketch accuracy bounds and tracker memory"""
+
+    os.environ["ENV"] = "production"  # no console handler
+    print(f"📐 Analytics Sketch Evaluation ({requests} requests)")
+    print("=" * 60)
+
+    print("\n🔢 Unique users (HyperLogLog)")
+    hll = _check_hyperloglog()
+    print("\n⏱️ Response time quantiles (DDSketch)")
+    ddsketch = _check_ddsketch(requests)
+    print(f"\n💾 Tracker memory for {requests} requests in one day (max {max_users} users with stats)")
+    memory = _check_memory(requests, max_users)
+
+    passed = all(r["ok"] for r in hll["results"]) and all(r["ok"] for r in ddsketch["results"])
+    print()
+    print(f"{'✅ All accuracy bounds hold' if passed else '❌ Accuracy bound violated'}")
+
+    Path("evals").mkdir(exist_ok=True)
+    report_file = f"evals/analytics_sketch_eval_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(report_file, "w") as f:
+        json.dump(
+            {
+                "timestamp": datetime.now().isoformat(),
+                "requests": requests,
+                "max_users": max_users,
+                "hyperloglog": hll,
+                "ddsketch": ddsketch,
+                "memory": memory,
+                "passed": passed,
+            },
+            f,
+            indent=2,
+        )
+
+    print(f"📊 Detailed report saved to: {report_file}")
+    return passed
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Analytics sketch accuracy and memory evaluation")
+    parser.add_argument("--requests", type=int, default=100000)
+    parser.add_argument("--max-users", type=int, default=1000)
+    args = parser.parse_args()
+    sys.exit(0 if run_analytics_sketch_eval(args.requests, args.max_users) else 1)
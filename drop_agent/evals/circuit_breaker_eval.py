@@ -0,0 +1,398 @@
+"""
+82ndrop Circuit Breaker Evaluations
+
+Failure-injection checks of the circuit breakers and the degraded paths
+(no model, search or Veo calls are made):
+- breaker state machine: closed -> open -> half-open -> closed/open
+- model calls fail fast, or use the fallback model, while a circuit is open
+- search enhancement is skipped while search is failing and resumes after
+  a successful half-open probe
+- a search enhancement tool that raises, run through the agent graph on the
+  fake model backend, opens the search circuit and leaves no tool timers
+  running
+
+Usage:
+    python drop_agent/evals/circuit_breaker_eval.py
+"""
+
+import os
+import asyncio
+import logging
+import time
+import json
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+from datetime import datetime
+
+# Add project root to path for imports
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from dotenv import load_dotenv
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format="%(name)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+EVAL_ENV = {
+    "CIRCUIT_BREAKERS": "true",
+    "CIRCUIT_FAILURE_THRESHOLD": "3",
+    "CIRCUIT_RECOVERY_TIMEOUT": "0.2",
+    "CIRCUIT_HALF_OPEN_PROBES": "1",
+}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _set_env(**values):
+    """Set environment variables, returning the previous values."""
+    previous = {name: os.environ.get(name) for name in values}
+    for name, value in values.items():
+        if value is None:
+            os.environ.pop(name, None)
+        else:
+            os.environ[name] = value
+    return previous
+
+
+async def test_breaker_state_machine():
+    """Test breaker transitions with injected failures and a fake clock"""
+
+    print("🔄 Testing Breaker State Machine")
+
+    from drop_agent.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+    start_time = time.time()
+    clock = FakeClock()
+    breaker = CircuitBreaker("eval", failure_threshold=3, recovery_timeout=10, clock=clock)
+    states = []
+
+    for _ in range(3):
+        assert breaker.allow()
+        breaker.record_failure()
+    states.append(breaker.state)
+    if breaker.state != OPEN:
+        raise Exception(f"Breaker should open after 3 failures, is {breaker.state}")
+    if breaker.allow():
+        raise Exception("Open breaker let a call through")
+
+    clock.now = 10
+    if not breaker.allow() or breaker.state != HALF_OPEN:
+        raise Exception("Breaker should let one probe through after the recovery timeout")
+    if breaker.allow():
+        raise Exception("Half-open breaker let a second concurrent probe through")
+    states.append(breaker.state)
+
+    breaker.record_failure()
+    states.append(breaker.state)
+    if breaker.state != OPEN:
+        raise Exception("Failed probe should reopen the breaker")
+
+    clock.now = 20
+    breaker.allow()
+    breaker.record_success()
+    states.append(breaker.state)
+    if breaker.state != CLOSED:
+        raise Exception("Successful probe should close the breaker")
+
+    # A probe that never reports back expires after the recovery timeout
+    for _ in range(3):
+        breaker.allow()
+        breaker.record_failure()
+    clock.now = 30
+    breaker.allow()
+    clock.now = 40
+    if not breaker.allow():
+        raise Exception("Lost probe wedged the half-open breaker")
+
+    duration = time.time() - start_time
+    print(f"✅ PASS: Breaker transitions {' -> '.join(states)}")
+
+    return {
+        "test_name": "breaker_state_machine",
+        "passed": True,
+        "duration": duration,
+        "metrics": {"states": states, "stats": breaker.snapshot()},
+    }
+
+
+async def test_model_fail_fast_and_fallback():
+    """Test that model calls fail fast or fall back while the model circuit is open"""
+
+    print("🔄 Testing Model Circuit Fail-Fast and Fallback")
+
+    from google.adk.models.google_llm import Gemini
+    from google.adk.models.llm_request import LlmRequest
+    from google.adk.models.llm_response import LlmResponse
+    from google.genai import types
+    from drop_agent.circuit_breaker import CIRCUIT_OPEN_ERROR, breaker_status, reset_breakers
+    from drop_agent.hedging import HedgedGemini
+
+    start_time = time.time()
+    served_models = []
+
+    async def fake_backend(self, llm_request, stream=False):
+        await asyncio.sleep(0.01)
+        served_models.append(llm_request.model)
+        yield LlmResponse(content=types.Content(role="model", parts=[types.Part(text="ok")]))
+
+    def request():
+        return LlmRequest(
+            model="gemini-2.0-flash",
+            contents=[types.Content(role="user", parts=[types.Part(text="idea")])],
+            config=types.GenerateContentConfig(),
+        )
+
+    async def call(model):
+        responses, errors = [], []
+        try:
+            async for response in model.generate_content_async(request()):
+                responses.append(response)
+        except Exception as e:
+            errors.append(e)
+        return responses, errors
+
+    original_backend = Gemini.generate_content_async
+    previous_env = _set_env(
+        **EVAL_ENV,
+        CIRCUIT_FAILURE_INJECTION="model:gemini-2.0-flash=1.0",
+        CIRCUIT_FALLBACK_MODEL=None,
+        MODEL_HEDGING="false",
+    )
+    Gemini.generate_content_async = fake_backend
+    reset_breakers()
+    try:
+        model = HedgedGemini(model="gemini-2.0-flash", agent_name="eval_agent")
+
+        for _ in range(3):
+            _, errors = await call(model)
+            if not errors:
+                raise Exception("Injected failure did not surface")
+
+        fail_fast_start = time.perf_counter()
+        responses, errors = await call(model)
+        fail_fast_ms = (time.perf_counter() - fail_fast_start) * 1000
+        if errors or not responses or responses[0].error_code != CIRCUIT_OPEN_ERROR:
+            raise Exception("Open model circuit did not fail fast")
+
+        os.environ["CIRCUIT_FALLBACK_MODEL"] = "gemini-2.0-flash-lite"
+        responses, errors = await call(model)
+        if errors or served_models[-1:] != ["gemini-2.0-flash-lite"]:
+            raise Exception("Open model circuit did not fall back")
+
+        os.environ["CIRCUIT_FAILURE_INJECTION"] = ""
+        await asyncio.sleep(float(EVAL_ENV["CIRCUIT_RECOVERY_TIMEOUT"]))
+        responses, errors = await call(model)
+        status = breaker_status()
+        if errors or status["model:gemini-2.0-flash"]["state"] != "closed":
+            raise Exception("Model circuit did not close after a successful probe")
+    finally:
+        Gemini.generate_content_async = original_backend
+        _set_env(**previous_env)
+        reset_breakers()
+
+    duration = time.time() - start_time
+    print(f"✅ PASS: Open circuit answered in {fail_fast_ms:.2f}ms, fallback served, probe closed it")
+
+    return {
+        "test_name": "model_fail_fast_and_fallback",
+        "passed": True,
+        "duration": duration,
+        "metrics": {"fail_fast_ms": fail_fast_ms, "served_models": served_models, "breakers": status},
+    }
+
+
+async def test_search_degradation():
+    """Test that search enhancement is skipped while search is failing"""
+
+    print("🔄 Testing Search Degradation")
+
+    from drop_agent.callbacks.tool import (
+        SEARCH_SKIPPED_RESPONSE,
+        after_tool_callback,
+        before_tool_callback,
+    )
+    from drop_agent.circuit_breaker import SEARCH_BREAKER, breaker_status, reset_breakers
+
+    start_time = time.time()
+    tool = SimpleNamespace(name="search_enhancement")
+
+    def tool_context():
+        return SimpleNamespace(state={}, function_call_id="eval_call", agent_name="drop_agent")
+
+    previous_env = _set_env(**EVAL_ENV, CIRCUIT_FAILURE_INJECTION="search=1.0", TOOL_CACHE="false")
+    reset_breakers()
+    try:
+        skipped = sum(
+            before_tool_callback(tool, {}, tool_context()) == SEARCH_SKIPPED_RESPONSE
+            for _ in range(5)
+        )
+        if skipped != 5 or breaker_status()[SEARCH_BREAKER]["state"] != "open":
+            raise Exception(f"Failing search should be skipped and open the circuit ({skipped}/5)")
+
+        os.environ["CIRCUIT_FAILURE_INJECTION"] = ""
+        if before_tool_callback(tool, {}, tool_context()) != SEARCH_SKIPPED_RESPONSE:
+            raise Exception("Open search circuit let a call through")
+
+        await asyncio.sleep(float(EVAL_ENV["CIRCUIT_RECOVERY_TIMEOUT"]))
+        context = tool_context()
+        if before_tool_callback(tool, {}, context) is not None:
+            raise Exception("Half-open search circuit did not let the probe through")
+        after_tool_callback(tool, {}, context, {"result": "trends"})
+        status = breaker_status()
+        if status[SEARCH_BREAKER]["state"] != "closed":
+            raise Exception("Search circuit did not close after a successful probe")
+    finally:
+        _set_env(**previous_env)
+        reset_breakers()
+
+    duration = time.time() - start_time
+    print("✅ PASS: Search skipped while failing and resumed after a successful probe")
+
+    return {
+        "test_name": "search_degradation",
+        "passed": True,
+        "duration": duration,
+        "metrics": {"breakers": status},
+    }
+
+
+async def test_search_tool_errors():
+    """Test that exceptions raised by the search tool reach the search breaker"""
+
+    print("🔄 Testing Search Tool Errors")
+
+    from google.adk.runners import InMemoryRunner
+    from google.genai import types
+    from drop_agent import tool_cache
+    from drop_agent.agent import root_agent
+    from drop_agent.circuit_breaker import SEARCH_BREAKER, breaker_status, reset_breakers
+    from drop_agent.session_telemetry import get_session_telemetry
+    from drop_agent.sub_agents.search.tools.search_tool import SearchEnhancementTool
+
+    async def failing_search(self, input_text, **kwargs):
+        raise RuntimeError("search backend unavailable")
+
+    async def run_turns(runner, turns):
+        responses = []
+        for turn in range(turns):
+            session = await runner.session_service.create_session(app_name="drop_agent", user_id="eval_user")
+            async for event in runner.run_async(
+                user_id="eval_user",
+                session_id=session.id,
+                new_message=types.Content(role="user", parts=[types.Part(text=f"eval idea {turn}")]),
+            ):
+                responses.extend(
+                    response.response
+                    for response in event.get_function_responses()
+                    if response.name == "search_enhancement"
+                )
+        return responses
+
+    start_time = time.time()
+    threshold = int(EVAL_ENV["CIRCUIT_FAILURE_THRESHOLD"])
+    original_call = SearchEnhancementTool.__call__
+    SearchEnhancementTool.__call__ = failing_search
+    runner = InMemoryRunner(agent=root_agent, app_name="drop_agent")
+    metrics = {}
+    try:
+        # The tool runs from ADK directly, or from before_tool_callback when cached
+        for cache_enabled in ("false", "true"):
+            previous_env = _set_env(
+                **{**EVAL_ENV, "CIRCUIT_RECOVERY_TIMEOUT": "60"},
+                CIRCUIT_FAILURE_INJECTION="",
+                TOOL_CACHE=cache_enabled,
+                FAKE_LLM_LATENCY_MS="0",
+                FAKE_LLM_LATENCY_JITTER_MS="0",
+            )
+            tool_cache._tool_cache = None
+            reset_breakers()
+            try:
+                responses = await run_turns(runner, threshold + 1)
+                status = breaker_status()
+            finally:
+                _set_env(**previous_env)
+                tool_cache._tool_cache = None
+                reset_breakers()
+
+            errors = sum(1 for response in responses if "error" in response)
+            skipped = sum(1 for response in responses if response.get("status") == "skipped")
+            pending_timers = [key for key in get_session_telemetry()._timers if key[:2] == ("tool", "search_enhancement")]
+            if errors != threshold or skipped != 1:
+                raise Exception(f"Expected {threshold} error responses then a skipped call, got {responses}")
+            if status[SEARCH_BREAKER]["state"] != "open":
+                raise Exception(f"Raising search tool did not open the circuit ({status[SEARCH_BREAKER]['state']})")
+            if pending_timers:
+                raise Exception(f"Failed tool calls left timers running: {pending_timers}")
+            mode = "cached" if cache_enabled == "true" else "uncached"
+            metrics[mode] = {"error_responses": errors, "skipped_responses": skipped, "breakers": status}
+    finally:
+        SearchEnhancementTool.__call__ = original_call
+
+    duration = time.time() - start_time
+    print(f"✅ PASS: {threshold} raised search calls opened the circuit (with and without the tool cache)")
+
+    return {
+        "test_name": "search_tool_errors",
+        "passed": True,
+        "duration": duration,
+        "metrics": metrics,
+    }
+
+
+async def run_circuit_breaker_evaluations():
+    """Run all circuit breaker failure-injection tests"""
+
+    # Agents build their models at import; keep them offline
+    os.environ.setdefault("FAKE_LLM", "true")
+    os.environ.setdefault("GOOGLE_CLOUD_PROJECT", "circuit-breaker-eval")
+
+    print("🔬 Starting 82ndrop Circuit Breaker Evaluations")
+    print("=" * 60)
+
+    tests = [
+        test_breaker_state_machine,
+        test_model_fail_fast_and_fallback,
+        test_search_degradation,
+        test_search_tool_errors,
+    ]
+
+    results = []
+    for test_func in tests:
+        try:
+            results.append(await test_func())
+        except Exception as e:
+            logger.error(f"Test {test_func.__name__} failed with error: {e}")
+            results.append(
+                {
+                    "test_name": test_func.__name__,
+                    "passed": False,
+                    "error": str(e),
+                    "duration": 0,
+                }
+            )
+        print()
+
+    passed_tests = sum(1 for r in results if r["passed"])
+    print("=" * 60)
+    print(f"Circuit Breaker Evaluation Results: {passed_tests}/{len(results)} passed")
+
+    Path("evals").mkdir(exist_ok=True)
+    report_file = f"evals/circuit_breaker_eval_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(report_file, "w") as f:
+        json.dump({"timestamp": datetime.now().isoformat(), "results": results}, f, indent=2, default=str)
+
+    print(f"📊 Detailed report saved to: {report_file}")
+    return results
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    asyncio.run(run_circuit_breaker_evaluations())
@@ -0,0 +1,271 @@
+"""
+82ndrop Context Cache Evaluation
+
+Runs a set of ideas through the full agent graph on the fake model backend
+with context caching off, on (``FakeCacheBackend``) and on with the backend
+unavailable, and checks that the savings are measured and reported.
+
+The fake model doesn't count the system instruction, so the provider's
+accounting is emulated: a call's prompt tokens include its system
+instruction or, when it references cached content, the cached tokens, which
+are also reported as ``cached_content_token_count``. Each call waits a
+time to first token that grows with its billable prompt tokens.
+
+Reported per mode: billable prompt tokens and latency per idea, cached
+calls, and the savings from ``/usage`` (``savings_summary()``) and from the
+``drop_context_cache_*`` metrics.
+
+Checks:
+- every run produces a final prompt, also when caching is unavailable
+- with caching on, the handles are prepared before the first request (as
+  at app startup), every call of the cached agents references them and
+  fewer billable prompt tokens are sent than with caching off
+- the saved tokens in the savings summary and the metrics match the cached
+  tokens the provider reported
+
+Exits non-zero when a check fails.
+
+Usage:
+    python drop_agent/evals/context_cache_eval.py [--ideas 6]
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+import argparse
+from pathlib import Path
+from datetime import datetime
+
+# Add project root to path for imports
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from dotenv import load_dotenv
+
+MODES = ("off", "on", "unavailable")
+
+# Emulated time to first token: a fixed part plus prefill of the billable prompt
+BASE_LATENCY_MS = 200
+PREFILL_MS_PER_TOKEN = 0.2
+
+IDEAS = (
+    "cat reviews fancy restaurants",
+    "robot learns to dance",
+    "gorilla explains stocks",
+    "morning routine of a busy baker",
+    "dog explains taxes",
+    "grandma reacts to new slang",
+)
+
+
+def _install_provider_accounting(calls, backend):
+    """Make FakeLlm count instruction and cached tokens like the provider."""
+    from drop_agent.context_cache import _system_instruction_text, get_static_instructions
+    from drop_agent.fake_llm import FakeLlm, _texts
+
+    original = FakeLlm.generate_content_async
+
+    async def accounted(self, llm_request, stream=False):
+        config = llm_request.config
+        handle = backend.handles.get(config.cached_content) if backend and config and config.cached_content else None
+        cached_tokens = handle.token_count if handle else 0
+        instruction = _system_instruction_text(llm_request) if config else ""
+        instruction_tokens = len(instruction) // 4
+        # A cached request has no instruction left; its cached content is the static one
+        static = bool(handle) or any(text in instruction for text in get_static_instructions())
+        billable = sum(len(text) for text in _texts(llm_request)) // 4 + 1 + instruction_tokens
+        await asyncio.sleep((BASE_LATENCY_MS + billable * PREFILL_MS_PER_TOKEN) / 1000)
+
+        async for response in original(self, llm_request, stream):
+            if not response.partial and response.usage_metadata:
+                usage = response.usage_metadata
+                usage.prompt_token_count = billable + cached_tokens
+                usage.cached_content_token_count = cached_tokens or None
+                calls.append(
+                    {
+                        "agent": self.agent_name,
+                        "static": static,
+                        "billable_tokens": billable,
+                        "cached_tokens": cached_tokens,
+                    }
+                )
+            yield response
+
+    FakeLlm.generate_content_async = accounted
+    return original
+
+
+def _metric(metrics, name: str) -> float:
+    """Sum of a counter over all its label values."""
+    if metrics is None:
+        return 0.0
+    return sum(
+        sample.value
+        for family in metrics.registry.collect()
+        for sample in family.samples
+        if sample.name == name
+    )
+
+
+async def _run_ideas(runner, mode: str, ideas):
+    from google.genai import types
+
+    runs = []
+    for index, idea in enumerate(ideas):
+        user_id = f"context_cache_{mode}_{index}"
+        session = await runner.session_service.create_session(app_name=runner.app_name, user_id=user_id)
+        final_text, error = "", None
+        started = time.perf_counter()
+        async for event in runner.run_async(
+            user_id=user_id,
+            session_id=session.id,
+            new_message=types.Content(role="user", parts=[types.Part(text=idea)]),
+        ):
+            if event.error_code:
+                error = f"{event.error_code}: {event.error_message}"
+            if event.author == "prompt_writer_agent" and event.content and event.content.parts and not event.partial:
+                final_text = "".join(part.text for part in event.content.parts if part.text) or final_text
+        runs.append({"wall_ms": (time.perf_counter() - started) * 1000, "final_prompt": bool(final_text) and error is None})
+        # Handles are created in the background; give them a moment like real traffic would
+        await asyncio.sleep(0.05)
+    return runs
+
+
+async def _run_mode(mode: str, ideas):
+    from google.adk.runners import InMemoryRunner
+    from drop_agent import context_cache
+    from drop_agent.agent import root_agent
+    from drop_agent.context_cache import build_agent_requests
+    from drop_agent.metrics import get_metrics
+
+    os.environ["CONTEXT_CACHE"] = "false" if mode == "off" else "true"
+    os.environ["CONTEXT_CACHE_BACKEND"] = "fake"
+    context_cache._context_cache = None
+    cache = context_cache.get_context_cache()
+    if mode == "unavailable":
+        cache.backend.available = False
+    if cache:
+        # As at app startup: the agents' handles exist before the first request
+        cache.prepare(await build_agent_requests(root_agent))
+        cache.create_pending()
+        cache.start(root_agent)
+
+    metrics = get_metrics()
+    saved_before = _metric(metrics, "drop_context_cache_saved_tokens_total")
+    cached_before = _metric(metrics, "drop_context_cache_requests_total")
+
+    calls = []
+    original = _install_provider_accounting(calls, cache.backend if cache else None)
+    try:
+        runs = await _run_ideas(InMemoryRunner(agent=root_agent, app_name="drop_agent"), mode, ideas)
+    finally:
+        from drop_agent.fake_llm import FakeLlm
+
+        FakeLlm.generate_content_async = original
+
+    summary = cache.savings_summary() if cache else None
+    if cache:
+        cache.stop()
+    context_cache._context_cache = None
+    return {
+        "ideas": len(runs),
+        "final_prompts": sum(run["final_prompt"] for run in runs),
+        "mean_ms": sum(run["wall_ms"] for run in runs) / len(runs),
+        "calls": len(calls),
+        "cached_calls": sum(1 for call in calls if call["cached_tokens"]),
+        "static_instruction_calls": sum(1 for call in calls if call["static"]),
+        "billable_tokens_per_idea": sum(call["billable_tokens"] for call in calls) / len(runs),
+        "reported_cached_tokens": sum(call["cached_tokens"] for call in calls),
+        "savings_summary": summary,
+        "metrics": {
+            "requests": _metric(metrics, "drop_context_cache_requests_total") - cached_before,
+            "saved_tokens": _metric(metrics, "drop_context_cache_saved_tokens_total") - saved_before,
+        },
+    }
+
+
+def run_context_cache_eval(ideas: int = len(IDEAS)):
+    """Check that context cache savings are measured, reported and exported"""
+
+    ideas = [IDEAS[i % len(IDEAS)] for i in range(ideas)]
+
+    # Agents build their models at import; keep them offline
+    os.environ["FAKE_LLM"] = "true"
+    os.environ.setdefault("GOOGLE_CLOUD_PROJECT", "context-cache-eval")
+    os.environ["FAKE_LLM_LATENCY_MS"] = "0"
+    os.environ["FAKE_LLM_LATENCY_JITTER_MS"] = "0"
+    for name in ("MODEL_RESPONSE_CACHE", "SEMANTIC_CACHE", "TOOL_CACHE", "INSTRUMENTATION", "MODEL_ROUTING"):
+        os.environ[name] = "false"
+    logging.getLogger().setLevel(logging.WARNING)
+
+    print(f"🧊 Context Cache Evaluation ({len(ideas)} ideas)")
+    print("=" * 60)
+
+    results = {}
+    for mode in MODES:
+        results[mode] = asyncio.run(_run_mode(mode, ideas))
+        r = results[mode]
+        print(
+            f"{mode:>11}: {r['billable_tokens_per_idea']:.0f} billable prompt tokens per idea, "
+            f"mean {r['mean_ms']:.0f}ms, {r['cached_calls']}/{r['calls']} calls cached, "
+            f"final prompts {r['final_prompts']}/{r['ideas']}"
+        )
+
+    off, on = results["off"], results["on"]
+    summary = on["savings_summary"] or {}
+    checks = {
+        "final_prompts": all(r["final_prompts"] == r["ideas"] for r in results.values()),
+        "cache_used": 0 < on["cached_calls"] == on["static_instruction_calls"]
+        and results["unavailable"]["cached_calls"] == 0,
+        "fewer_billable_tokens": on["billable_tokens_per_idea"] < off["billable_tokens_per_idea"],
+        "summary_matches": summary.get("saved_prompt_tokens") == on["reported_cached_tokens"],
+        "metrics_match": on["metrics"]["saved_tokens"] == on["reported_cached_tokens"]
+        and on["metrics"]["requests"] == on["calls"],
+    }
+
+    print()
+    print(
+        f"Context caching: {off['billable_tokens_per_idea']:.0f} -> {on['billable_tokens_per_idea']:.0f} "
+        f"billable prompt tokens per idea, mean {off['mean_ms']:.0f}ms -> {on['mean_ms']:.0f}ms"
+    )
+    print(f"   final prompts in every mode {'✅' if checks['final_prompts'] else '❌'}")
+    print(
+        f"   every static-instruction call cached when available, none when not "
+        f"{'✅' if checks['cache_used'] else '❌'}"
+    )
+    print(f"   fewer billable prompt tokens {'✅' if checks['fewer_billable_tokens'] else '❌'}")
+    print(
+        f"   saved tokens: provider {on['reported_cached_tokens']}, /usage {summary.get('saved_prompt_tokens')}, "
+        f"metrics {on['metrics']['saved_tokens']:.0f} "
+        f"{'✅' if checks['summary_matches'] and checks['metrics_match'] else '❌'}"
+    )
+    passed = all(checks.values())
+
+    Path("evals").mkdir(exist_ok=True)
+    report_file = f"evals/context_cache_eval_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(report_file, "w") as f:
+        json.dump(
+            {
+                "timestamp": datetime.now().isoformat(),
+                "ideas": len(ideas),
+                "results": results,
+                "checks": checks,
+                "passed": passed,
+            },
+            f,
+            indent=2,
+        )
+
+    print(f"📊 Detailed report saved to: {report_file}")
+    return passed
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Context cache savings evaluation")
+    parser.add_argument("--ideas", type=int, default=len(IDEAS))
+    args = parser.parse_args()
+    sys.exit(0 if run_context_cache_eval(args.ideas) else 1)
@@ -48,8 +48,8 @@ async def test_agent_configuration():
         if root_agent.name != "task_master_agent":
             raise Exception(f"Root agent name incorrect: {root_agent.name}")
             
-        if root_agent.model != "gemini-2.0-flash":
-            raise Exception(f"Root agent model incorrect: {root_agent.model}")
+        if root_agent.canonical_model.model != "gemini-2.0-flash":
+            raise Exception(f"Root agent model incorrect: {root_agent.canonical_model.model}")
         
         # Verify sub-agents are configured
         if len(root_agent.sub_agents) != 3:
@@ -65,8 +65,8 @@ async def test_agent_configuration():
         
         # Verify each sub-agent has the correct model
         for agent in root_agent.sub_agents:
-            if agent.model != "gemini-2.0-flash":
-                raise Exception(f"Agent {agent.name} has wrong model: {agent.model}")
+            if agent.canonical_model.model != "gemini-2.0-flash":
+                raise Exception(f"Agent {agent.name} has wrong model: {agent.canonical_model.model}")
                 
         duration = time.time() - start_time
         print(f"✅ PASS: Agent configuration test completed in {duration:.2f}s")
@@ -77,7 +77,7 @@ async def test_agent_configuration():
             "duration": duration,
             "metrics": {
                 "root_agent_name": root_agent.name,
-                "root_agent_model": root_agent.model,
+                "root_agent_model": root_agent.canonical_model.model,
                 "sub_agents_count": len(root_agent.sub_agents),
                 "sub_agent_names": actual_agents,
             },
@@ -0,0 +1,146 @@
+"""
+82ndrop Hedging Benchmark
+
+Shows the tail latency of model calls before and after deadlines and
+hedged requests, using a fake model with a heavy-tailed latency
+distribution (no model or network calls): most calls take around the
+median, a few percent take ten times longer or more.
+
+Three configurations are compared:
+- baseline: plain calls
+- hedged: adaptive hedge after the observed p95 latency
+- hedged + deadline: hedging plus a per-call deadline
+
+Usage:
+    python drop_agent/evals/hedging_benchmark.py [calls] [median_ms]
+"""
+
+import sys
+import json
+import random
+import asyncio
+from pathlib import Path
+from datetime import datetime
+
+# Add project root to path for imports
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from dotenv import load_dotenv
+
+# Share of calls hitting the slow tail, and how much slower they are
+TAIL_PROBABILITY = 0.04
+TAIL_MULTIPLIER = (8.0, 15.0)
+CONCURRENCY = 25
+SEED = 82
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class HeavyTailedFakeModel:
+    """Fake streaming model: lognormal body latency plus a rare 8-15x tail."""
+
+    def __init__(self, median: float, seed: int = SEED):
+        self.median = median
+        self.random = random.Random(seed)
+
+    def latency(self) -> float:
+        latency = self.median * self.random.lognormvariate(0, 0.25)
+        if self.random.random() < TAIL_PROBABILITY:
+            latency *= self.random.uniform(*TAIL_MULTIPLIER)
+        return latency
+
+    async def generate(self):
+        await asyncio.sleep(self.latency())
+        yield {"text": "fake response"}
+
+
+async def _run_configuration(calls: int, median: float, hedging: bool, deadline):
+    from drop_agent.hedging import DEADLINE_EXCEEDED_ERROR, LatencyTracker, hedged_generate
+
+    model = HeavyTailedFakeModel(median)
+    tracker = LatencyTracker(percentile=0.95, min_samples=20, min_delay=0.0)
+    loop = asyncio.get_running_loop()
+    latencies, deadline_errors = [], 0
+
+    async def one_call():
+        nonlocal deadline_errors
+        started = loop.time()
+        async for response in hedged_generate(
+            model.generate, ("benchmark_agent", "fake-model"), deadline, hedging, tracker
+        ):
+            if getattr(response, "error_code", None) == DEADLINE_EXCEEDED_ERROR:
+                deadline_errors += 1
+        latencies.append(loop.time() - started)
+
+    for start in range(0, calls, CONCURRENCY):
+        await asyncio.gather(*(one_call() for _ in range(min(CONCURRENCY, calls - start))))
+
+    return {
+        "p50_ms": _percentile(latencies, 0.5) * 1000,
+        "p95_ms": _percentile(latencies, 0.95) * 1000,
+        "p99_ms": _percentile(latencies, 0.99) * 1000,
+        "max_ms": max(latencies) * 1000,
+        "hedges": tracker.stats["hedges"],
+        "hedge_wins": tracker.stats["hedge_wins"],
+        "extra_call_rate": tracker.stats["hedges"] / calls,
+        "deadline_errors": deadline_errors,
+    }
+
+
+def run_hedging_benchmark(calls: int = 500, median_ms: float = 20.0):
+    """Compare tail latency with and without hedging and deadlines"""
+
+    print(f"🔬 Hedging Benchmark ({calls} calls, fake model median {median_ms:.0f}ms)")
+    print("=" * 60)
+
+    median = median_ms / 1000
+    deadline = median * 6
+    configurations = [
+        ("baseline", False, None),
+        ("hedged", True, None),
+        ("hedged+deadline", True, deadline),
+    ]
+
+    results = []
+    for name, hedging, call_deadline in configurations:
+        row = asyncio.run(_run_configuration(calls, median, hedging, call_deadline))
+        results.append({"configuration": name, **row})
+
+    print(f"{'configuration':>16} {'p50':>7} {'p95':>7} {'p99':>7} {'max':>7} "
+          f"{'hedges':>7} {'wins':>5} {'deadlines':>10}")
+    for row in results:
+        print(
+            f"{row['configuration']:>16} {row['p50_ms']:>7.1f} {row['p95_ms']:>7.1f} "
+            f"{row['p99_ms']:>7.1f} {row['max_ms']:>7.1f} {row['hedges']:>7} "
+            f"{row['hedge_wins']:>5} {row['deadline_errors']:>10}"
+        )
+
+    report = {
+        "timestamp": datetime.now().isoformat(),
+        "calls": calls,
+        "median_ms": median_ms,
+        "tail_probability": TAIL_PROBABILITY,
+        "tail_multiplier": TAIL_MULTIPLIER,
+        "deadline_ms": deadline * 1000,
+        "results": results,
+    }
+
+    Path("evals").mkdir(exist_ok=True)
+    report_file = f"evals/hedging_benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(report_file, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"📊 Detailed report saved to: {report_file}")
+    return report
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    run_hedging_benchmark(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 500,
+        float(sys.argv[2]) if len(sys.argv) > 2 else 20.0,
+    )
@@ -0,0 +1,239 @@
+"""
+82ndrop Offline Load Test
+
+Pushes many concurrent sessions through ``main.py``'s app, running the full
+agent graph (root agent, sub-agents, SearchEnhancementTool) on the fake
+model backend (FAKE_LLM) - no Gemini calls and no network.
+
+Each virtual user creates a session and runs one idea through ``/run_sse``.
+Reported per run:
+- end-to-end latency percentiles and throughput
+- time to first streamed byte (only meaningful with --url: the in-process
+  ASGI transport delivers each response body in one piece)
+- error counts by status
+- event-loop lag (blocking work on the server's loop shows up here)
+- optionally, the hottest functions from cProfile (--profile)
+
+By default requests go through an in-process ASGI transport with Firebase
+token verification patched out. Pass --url to load a running server
+(started with FAKE_LLM=true); LOAD_TEST_TOKEN then supplies the bearer token.
+
+Usage:
+    python drop_agent/evals/load_test.py [--sessions 1000] [--concurrency 200] [--profile]
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import cProfile
+import pstats
+import io
+from pathlib import Path
+from datetime import datetime
+
+# Add project root to path for imports
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from dotenv import load_dotenv
+
+APP_NAME = "drop_agent"
+
+IDEAS = [
+    "gorilla explains stocks",
+    "morning routine of a CEO",
+    "cat reviews fancy restaurants",
+    "three gorillas host a podcast",
+    "budget travel tips for Paris",
+    "robot learns to dance",
+]
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else 0.0
+
+
+def _build_local_client(httpx):
+    """ASGI client for main.py's app running on the fake backend."""
+    os.environ["FAKE_LLM"] = "true"
+    os.environ.setdefault("GOOGLE_CLOUD_PROJECT", "load-test")
+
+    from firebase_admin import auth
+
+    # The load test exercises the agent stack, not Firebase
+    auth.verify_id_token = lambda token, *args, **kwargs: {
+        "uid": token,
+        "user_id": token,
+        "agent_access": True,
+    }
+
+    from main import app
+
+    return httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://load-test", timeout=None
+    )
+
+
+async def _monitor_loop_lag(samples, stop: asyncio.Event, interval: float = 0.05):
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        scheduled = loop.time()
+        await asyncio.sleep(interval)
+        samples.append(loop.time() - scheduled - interval)
+
+
+async def _virtual_user(client, index: int, token: str, results: list):
+    user_id = token or f"load_user_{index}"
+    headers = {"Authorization": f"Bearer {user_id}"}
+    started = time.perf_counter()
+    first_byte = None
+    status = None
+    streamed_bytes = 0
+    try:
+        response = await client.post(f"/apps/{APP_NAME}/users/{user_id}/sessions", headers=headers, json={})
+        if response.status_code != 200:
+            status = f"session_{response.status_code}"
+            return
+        session_id = response.json()["id"]
+
+        run_request = {
+            "appName": APP_NAME,
+            "userId": user_id,
+            "sessionId": session_id,
+            "newMessage": {"role": "user", "parts": [{"text": IDEAS[index % len(IDEAS)]}]},
+            "streaming": True,
+        }
+        async with client.stream("POST", "/run_sse", headers=headers, json=run_request) as stream:
+            async for chunk in stream.aiter_bytes():
+                if first_byte is None:
+                    first_byte = time.perf_counter() - started
+                streamed_bytes += len(chunk)
+            status = str(stream.status_code)
+    except Exception as e:
+        status = type(e).__name__
+    finally:
+        results.append(
+            {
+                "status": status,
+                "latency": time.perf_counter() - started,
+                "first_byte": first_byte,
+                "bytes": streamed_bytes,
+            }
+        )
+
+
+async def _run(client, sessions: int, concurrency: int, token: str):
+    results, lag_samples = [], []
+    stop = asyncio.Event()
+    monitor = asyncio.create_task(_monitor_loop_lag(lag_samples, stop))
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def limited(index):
+        async with semaphore:
+            await _virtual_user(client, index, token, results)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(limited(i) for i in range(sessions)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await monitor
+    return results, lag_samples, elapsed
+
+
+def run_load_test(sessions: int = 1000, concurrency: int = 200, url: str = None, profile: bool = False):
+    """Run concurrent sessions through the app and report server-side behaviour"""
+
+    import httpx
+
+    print(f"🔬 Offline Load Test ({sessions} sessions, concurrency {concurrency})")
+    print("=" * 60)
+
+    token = ""
+    if url:
+        token = os.getenv("LOAD_TEST_TOKEN", "")
+        client = httpx.AsyncClient(base_url=url, timeout=None)
+    else:
+        client = _build_local_client(httpx)
+
+    profiler = cProfile.Profile() if profile else None
+
+    async def main():
+        async with client:
+            if profiler:
+                profiler.enable()
+            try:
+                return await _run(client, sessions, concurrency, token)
+            finally:
+                if profiler:
+                    profiler.disable()
+
+    results, lag_samples, elapsed = asyncio.run(main())
+
+    latencies = [r["latency"] for r in results if r["status"] == "200"]
+    first_bytes = [r["first_byte"] for r in results if r["first_byte"] is not None]
+    errors = {}
+    for r in results:
+        if r["status"] != "200":
+            errors[r["status"]] = errors.get(r["status"], 0) + 1
+
+    summary = {
+        "sessions": sessions,
+        "concurrency": concurrency,
+        "target": url or "in-process ASGI (fake LLM)",
+        "elapsed_s": elapsed,
+        "throughput_rps": sessions / elapsed if elapsed else 0.0,
+        "succeeded": len(latencies),
+        "errors": errors,
+        "latency_ms": {
+            "p50": _percentile(latencies, 0.5) * 1000,
+            "p95": _percentile(latencies, 0.95) * 1000,
+            "p99": _percentile(latencies, 0.99) * 1000,
+            "max": max(latencies, default=0.0) * 1000,
+        },
+        "first_byte_ms": {
+            "p50": _percentile(first_bytes, 0.5) * 1000,
+            "p95": _percentile(first_bytes, 0.95) * 1000,
+        },
+        "loop_lag_ms": {
+            "p50": _percentile(lag_samples, 0.5) * 1000,
+            "p99": _percentile(lag_samples, 0.99) * 1000,
+            "max": max(lag_samples, default=0.0) * 1000,
+        },
+        "bytes_streamed": sum(r["bytes"] for r in results),
+    }
+
+    print(f"Succeeded: {summary['succeeded']}/{sessions}  errors: {errors or 'none'}")
+    print(f"Throughput: {summary['throughput_rps']:.1f} sessions/s over {elapsed:.1f}s")
+    print("Latency ms: " + ", ".join(f"{k} {v:.0f}" for k, v in summary["latency_ms"].items()))
+    print("First byte ms: " + ", ".join(f"{k} {v:.0f}" for k, v in summary["first_byte_ms"].items()))
+    print("Event loop lag ms: " + ", ".join(f"{k} {v:.1f}" for k, v in summary["loop_lag_ms"].items()))
+
+    if profiler:
+        stream = io.StringIO()
+        pstats.Stats(profiler, stream=stream).sort_stats("tottime").print_stats(25)
+        summary["profile_top"] = stream.getvalue()
+        print()
+        print(summary["profile_top"])
+
+    Path("evals").mkdir(exist_ok=True)
+    report_file = f"evals/load_test_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(report_file, "w") as f:
+        json.dump({"timestamp": datetime.now().isoformat(), **summary}, f, indent=2)
+
+    print(f"📊 Detailed report saved to: {report_file}")
+    return summary
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Offline load test of the 82ndrop app")
+    parser.add_argument("--sessions", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--url", help="Load a running server instead of the in-process app")
+    parser.add_argument("--profile", action="store_true", help="Profile the run with cProfile")
+    args = parser.parse_args()
+    run_load_test(args.sessions, args.concurrency, args.url, args.profile)
@@ -0,0 +1,187 @@
+"""
+82ndrop API Logging Benchmark
+
+Measures request latency of a small async endpoint that logs every request
+through APILogger (analytics JSON line plus the human-readable usage line),
+served in-process over ASGI with concurrent clients.
+
+Modes compared:
+- disabled: the endpoint doesn't log
+- sync: the file handlers write from the request path (LOG_QUEUE=false)
+- queued: records go on the bounded queue and the listener thread writes them
+
+Slow disks are emulated by delaying every write to the log files by
+--disk-latency-ms (0 for the real disk). Logs go to a temporary directory.
+
+Usage:
+    python drop_agent/evals/logging_benchmark.py [--requests 500] [--concurrency 20] [--disk-latency-ms 2]
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import statistics
+from pathlib import Path
+from datetime import datetime
+
+# Add project root to path for imports
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from dotenv import load_dotenv
+
+MODES = ("disabled", "sync", "queued")
+
+
+class _SlowStream:
+    """File stream whose writes take ``delay`` seconds, like a slow disk"""
+
+    def __init__(self, stream, delay: float):
+        self.stream = stream
+        self.delay = delay
+
+    def write(self, text):
+        time.sleep(self.delay)
+        return self.stream.write(text)
+
+    def tell(self):
+        return self.stream.tell()
+
+    def flush(self):
+        self.stream.flush()
+
+    def close(self):
+        self.stream.close()
+
+
+async def _run_mode(mode: str, requests: int, concurrency: int, disk_latency: float, log_dir: Path):
+    import httpx
+    from fastapi import FastAPI
+    from drop_agent.logging_config import APILogger, UserAnalytics
+
+    api_logger = None
+    if mode != "disabled":
+        api_logger = APILogger(log_dir=log_dir, use_queue=mode == "queued")
+        if disk_latency:
+            for handler in api_logger._handlers:
+                if hasattr(handler, "baseFilename"):
+                    handler.stream = _SlowStream(handler.stream, disk_latency)
+
+    app = FastAPI()
+
+    @app.post("/run")
+    async def run():
+        started = time.perf_counter()
+        await asyncio.sleep(0)
+        if api_logger is not None:
+            api_logger.log_api_request(
+                UserAnalytics(
+                    user_id="bench_user",
+                    email="bench@example.com",
+                    access_level="basic",
+                    endpoint="/run",
+                    method="POST",
+                    status_code=200,
+                    response_time_ms=(time.perf_counter() - started) * 1000,
+                    session_id="bench-session",
+                )
+            )
+        return {"ok": True}
+
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+
+        async def one():
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.post("/run")
+                response.raise_for_status()
+                latencies.append((time.perf_counter() - started) * 1000)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(requests)))
+        wall = time.perf_counter() - started
+
+    flush_started = time.perf_counter()
+    stats = api_logger.queue_stats() if api_logger else {"enabled": False}
+    if api_logger is not None:
+        api_logger.shutdown()
+    ordered = sorted(latencies)
+    return {
+        "mean_ms": statistics.mean(latencies),
+        "p50_ms": ordered[len(ordered) // 2],
+        "p95_ms": ordered[int(len(ordered) * 0.95) - 1],
+        "max_ms": ordered[-1],
+        "requests_per_second": requests / wall,
+        "shutdown_flush_ms": (time.perf_counter() - flush_started) * 1000,
+        "queue": stats,
+    }
+
+
+def run_logging_benchmark(requests: int = 500, concurrency: int = 20, disk_latency_ms: float = 2.0):
+    """Compare request latency with logging disabled, synchronous and queued"""
+
+    os.environ["ENV"] = "production"  # no console handler
+
+    print(f"📝 API Logging Benchmark ({requests} requests, {concurrency} concurrent, {disk_latency_ms}ms per disk write)")
+    print("=" * 60)
+
+    # The module-level logger writes to ./logs; it isn't measured
+    from drop_agent.logging_config import api_logger
+
+    api_logger.shutdown()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in MODES:
+            log_dir = Path(tmp) / mode
+            log_dir.mkdir()
+            results[mode] = asyncio.run(
+                _run_mode(mode, requests, concurrency, disk_latency_ms / 1000, log_dir)
+            )
+            r = results[mode]
+            print(
+                f"{mode:>8}: mean {r['mean_ms']:.2f}ms, p50 {r['p50_ms']:.2f}ms, p95 {r['p95_ms']:.2f}ms, "
+                f"{r['requests_per_second']:.0f} req/s, shutdown flush {r['shutdown_flush_ms']:.0f}ms"
+            )
+            if r["queue"].get("dropped"):
+                print(f"          dropped on overflow: {r['queue']['dropped']}")
+
+    print()
+    print(
+        f"p95 latency: sync {results['sync']['p95_ms']:.2f}ms -> queued {results['queued']['p95_ms']:.2f}ms "
+        f"(disabled {results['disabled']['p95_ms']:.2f}ms)"
+    )
+
+    Path("evals").mkdir(exist_ok=True)
+    report_file = f"evals/logging_benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(report_file, "w") as f:
+        json.dump(
+            {
+                "timestamp": datetime.now().isoformat(),
+                "requests": requests,
+                "concurrency": concurrency,
+                "disk_latency_ms": disk_latency_ms,
+                "results": results,
+            },
+            f,
+            indent=2,
+        )
+
+    print(f"📊 Detailed report saved to: {report_file}")
+    return results
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="API logging latency benchmark")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--disk-latency-ms", type=float, default=2.0, help="Emulated delay of each log file write")
+    args = parser.parse_args()
+    run_logging_benchmark(args.requests, args.concurrency, args.disk_latency_ms)
@@ -0,0 +1,288 @@
+"""
+82ndrop Replay Latency Regression Benchmark
+
+Replays a fixed corpus of ideas through drop_agent from a record/replay
+cassette (see ``drop_agent/cassettes.py``): every model and tool call is
+answered with its recorded response and original timing, so run-to-run
+differences come from our own code - callbacks, prompt rendering, session
+handling and ADK itself.
+
+Reported per idea and per agent:
+- wall-clock latency, and overhead (wall clock minus replayed model/tool time)
+- model calls, tool calls and tokens (from the recorded usage metadata)
+- server CPU time of the process
+
+With --baseline, the run is compared against a previous report and the
+script exits non-zero when overhead, CPU time, model calls or tokens regress
+beyond --threshold.
+
+Record the cassette once against the live models (or FAKE_LLM=true for an
+offline smoke test), then replay it:
+    python drop_agent/evals/replay_benchmark.py --record --cassette cassettes/corpus.jsonl
+    python drop_agent/evals/replay_benchmark.py --cassette cassettes/corpus.jsonl --save-baseline cassettes/baseline.json
+    python drop_agent/evals/replay_benchmark.py --cassette cassettes/corpus.jsonl --baseline cassettes/baseline.json
+
+Usage:
+    python drop_agent/evals/replay_benchmark.py [--record] [--cassette PATH] [--baseline PATH] [--threshold 0.2]
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import logging
+from pathlib import Path
+from datetime import datetime
+
+# Add project root to path for imports
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from dotenv import load_dotenv
+
+logging.basicConfig(level=logging.WARNING, format="%(name)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+CORPUS = [
+    "gorilla explains stocks",
+    "morning routine of a CEO",
+    "cat reviews fancy restaurants",
+    "three gorillas host a podcast",
+    "budget travel tips for Paris",
+    "robot learns to dance",
+]
+
+# Metrics compared against the baseline, with the smallest absolute change
+# that counts (keeps timer noise on tiny values from failing the run)
+REGRESSION_METRICS = {
+    "overhead_ms": 5.0,
+    "cpu_ms": 5.0,
+    "model_calls": 0.0,
+    "tokens": 0.0,
+}
+
+
+def _mean(values):
+    return sum(values) / len(values) if values else 0.0
+
+
+async def _run_idea(runner, cassette, idea: str, index: int):
+    """Run one idea and collect its latency, call and CPU metrics."""
+    from google.adk.agents.run_config import RunConfig, StreamingMode
+    from google.genai import types
+
+    user_id = f"replay_user_{index}"
+    session = await runner.session_service.create_session(app_name=runner.app_name, user_id=user_id)
+
+    cassette.reset_stats()
+    agent_latency = {}
+    error = None
+    started = time.perf_counter()
+    cpu_started = time.process_time()
+    last = started
+    try:
+        async for event in runner.run_async(
+            user_id=user_id,
+            session_id=session.id,
+            new_message=types.Content(role="user", parts=[types.Part(text=idea)]),
+            run_config=RunConfig(streaming_mode=StreamingMode.SSE),
+        ):
+            now = time.perf_counter()
+            # Time since the previous event is attributed to the agent that produced this one
+            agent_latency[event.author] = agent_latency.get(event.author, 0.0) + (now - last)
+            last = now
+            if event.error_code:
+                error = f"{event.error_code}: {event.error_message}"
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    wall = time.perf_counter() - started
+    cpu = time.process_time() - cpu_started
+    stats = json.loads(json.dumps(cassette.stats))
+
+    replayed = stats["replayed_seconds"]
+    return {
+        "idea": idea,
+        "error": error,
+        "wall_ms": wall * 1000,
+        "replayed_ms": replayed * 1000,
+        "overhead_ms": max(0.0, wall - replayed) * 1000,
+        "cpu_ms": cpu * 1000,
+        "model_calls": sum(agent["calls"] for agent in stats["agents"].values()),
+        "tool_calls": sum(tool["calls"] for tool in stats["tools"].values()),
+        "tokens": sum(agent["tokens"] for agent in stats["agents"].values()),
+        "misses": stats["misses"],
+        "agents": {
+            name: {
+                "latency_ms": agent_latency.get(name, 0.0) * 1000,
+                "model_calls": agent["calls"],
+                "tokens": agent["tokens"],
+            }
+            for name, agent in stats["agents"].items()
+        },
+    }
+
+
+def _summarize(ideas):
+    summary = {
+        metric: _mean([idea[metric] for idea in ideas])
+        for metric in ("wall_ms", "replayed_ms", "overhead_ms", "cpu_ms", "model_calls", "tool_calls", "tokens")
+    }
+    agents = {}
+    for idea in ideas:
+        for name, agent in idea["agents"].items():
+            totals = agents.setdefault(name, {"latency_ms": 0.0, "model_calls": 0, "tokens": 0})
+            for metric, value in agent.items():
+                totals[metric] += value
+    summary["agents"] = {
+        name: {metric: value / len(ideas) for metric, value in totals.items()}
+        for name, totals in sorted(agents.items())
+    }
+    return summary
+
+
+def _find_regressions(summary, baseline, threshold: float):
+    """Metrics (per-idea means) that grew beyond the threshold since the baseline."""
+    regressions = []
+    for metric, min_delta in REGRESSION_METRICS.items():
+        current, previous = summary.get(metric, 0.0), baseline.get(metric, 0.0)
+        if current > previous * (1 + threshold) and current - previous > min_delta:
+            regressions.append(
+                {
+                    "metric": metric,
+                    "baseline": previous,
+                    "current": current,
+                    "change": (current - previous) / previous if previous else None,
+                }
+            )
+    return regressions
+
+
+def run_replay_benchmark(
+    cassette_path: str,
+    record: bool = False,
+    baseline_path: str = None,
+    threshold: float = 0.2,
+    speed: float = 1.0,
+    repeat: int = 1,
+    save_baseline: str = None,
+):
+    """Replay (or record) the corpus and check overhead against a baseline"""
+
+    mode = "record" if record else "replay"
+    os.environ["CASSETTE_MODE"] = mode
+    os.environ["CASSETTE_PATH"] = cassette_path
+    os.environ["CASSETTE_REPLAY_SPEED"] = str(speed)
+    if record and Path(cassette_path).exists():
+        Path(cassette_path).unlink()
+
+    print(f"🔬 Replay Benchmark ({mode}, {len(CORPUS)} ideas x {repeat}, cassette {cassette_path})")
+    print("=" * 60)
+
+    # Agents build their models at import, so the cassette mode must be set first
+    from google.adk.runners import InMemoryRunner
+    from drop_agent.agent import root_agent
+    from drop_agent.cassettes import get_cassette, reset_cassette
+
+    reset_cassette()
+    cassette = get_cassette()
+    runner = InMemoryRunner(agent=root_agent, app_name="replay_benchmark")
+
+    async def main():
+        if not record:
+            # Untimed warm-up so imports and first-call setup don't skew the first idea
+            await _run_idea(runner, cassette, CORPUS[0], len(CORPUS))
+        results = []
+        for round_index in range(repeat):
+            cassette.rewind()
+            for index, idea in enumerate(CORPUS):
+                result = await _run_idea(runner, cassette, idea, index)
+                status = "✅" if not result["error"] else f"❌ {result['error']}"
+                print(
+                    f"{status} '{idea}': wall {result['wall_ms']:.0f}ms, overhead "
+                    f"{result['overhead_ms']:.1f}ms, cpu {result['cpu_ms']:.1f}ms, "
+                    f"{result['model_calls']} model calls, {result['tokens']} tokens"
+                )
+                results.append(result)
+        return results
+
+    ideas = asyncio.run(main())
+    failed = [idea for idea in ideas if idea["error"]]
+    summary = _summarize(ideas)
+
+    print()
+    print(
+        f"Per idea: wall {summary['wall_ms']:.0f}ms, replayed {summary['replayed_ms']:.0f}ms, "
+        f"overhead {summary['overhead_ms']:.1f}ms, cpu {summary['cpu_ms']:.1f}ms"
+    )
+    for name, agent in summary["agents"].items():
+        print(
+            f"  {name}: {agent['latency_ms']:.0f}ms, {agent['model_calls']:.1f} model calls, "
+            f"{agent['tokens']:.0f} tokens"
+        )
+
+    regressions = []
+    if baseline_path and not record:
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+        regressions = _find_regressions(summary, baseline.get("summary", baseline), threshold)
+        print()
+        if regressions:
+            for regression in regressions:
+                print(
+                    f"❌ REGRESSION: {regression['metric']} {regression['baseline']:.1f} -> "
+                    f"{regression['current']:.1f} (threshold {threshold:.0%})"
+                )
+        else:
+            print(f"✅ No regression beyond {threshold:.0%} against {baseline_path}")
+
+    report = {
+        "timestamp": datetime.now().isoformat(),
+        "mode": mode,
+        "cassette": cassette_path,
+        "speed": speed,
+        "threshold": threshold,
+        "summary": summary,
+        "regressions": regressions,
+        "failed": len(failed),
+        "ideas": ideas,
+    }
+
+    if save_baseline and not failed:
+        Path(save_baseline).parent.mkdir(parents=True, exist_ok=True)
+        with open(save_baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"📌 Baseline saved to: {save_baseline}")
+
+    Path("evals").mkdir(exist_ok=True)
+    report_file = f"evals/replay_benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(report_file, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"📊 Detailed report saved to: {report_file}")
+    return 1 if failed or regressions else 0
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Replay latency regression benchmark")
+    parser.add_argument("--cassette", default=os.getenv("CASSETTE_PATH", "cassettes/drop_agent.jsonl"))
+    parser.add_argument("--record", action="store_true", help="Record a new cassette from the live models")
+    parser.add_argument("--baseline", help="Previous report to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed relative regression")
+    parser.add_argument("--speed", type=float, default=1.0, help="Multiplier on recorded timings")
+    parser.add_argument("--repeat", type=int, default=1, help="Times to run the corpus")
+    parser.add_argument("--save-baseline", help="Write this run's report as the new baseline")
+    args = parser.parse_args()
+    sys.exit(
+        run_replay_benchmark(
+            args.cassette,
+            args.record,
+            args.baseline,
+            args.threshold,
+            args.speed,
+            args.repeat,
+            args.save_baseline,
+        )
+    )
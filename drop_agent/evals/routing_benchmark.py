@@ -0,0 +1,250 @@
+"""
+82ndrop Model Routing Benchmark
+
+Runs a labelled corpus of simple and complex ideas through the full agent
+graph on the fake model backend (see ``drop_agent/fake_llm.py``), with
+model routing off (every step on the strong model) and on. Each model
+answers with its own emulated latency, and calls are priced per model from
+the tokens in the fake usage metadata.
+
+Reported per configuration:
+- wall-clock latency per idea (mean, p95)
+- model calls and estimated cost per idea, split by model
+- quality checks: the prompt writer produced a final prompt, the local
+  classifier matched the corpus labels, and no agent was routed to a model
+  that lacks its tools (search_agent needs Google Search grounding)
+
+The fake backend answers every model the same way, so this measures the
+latency and cost side of routing and the routing decisions; output quality
+of the fast model needs live runs (golden_tests_eval.py with MODEL_ROUTING=true).
+
+Exits non-zero when a quality check fails.
+
+Usage:
+    python drop_agent/evals/routing_benchmark.py [--repeat 3]
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import logging
+import argparse
+from pathlib import Path
+from datetime import datetime
+
+# Add project root to path for imports
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from dotenv import load_dotenv
+
+STRONG_MODEL = "gemini-2.0-flash"
+FAST_MODEL = "gemini-2.0-flash-lite"
+
+# Emulated time to response (ms) and list prices (USD per 1M tokens)
+MODEL_PROFILES = {
+    STRONG_MODEL: {"latency_ms": 700, "input_per_m": 0.10, "output_per_m": 0.40},
+    FAST_MODEL: {"latency_ms": 400, "input_per_m": 0.075, "output_per_m": 0.30},
+}
+
+# Models without Google Search grounding, per agent that depends on it
+UNSUPPORTED_MODELS = {"search_agent": (FAST_MODEL,)}
+
+CORPUS = [
+    ("cat reviews fancy restaurants", "simple"),
+    ("robot learns to dance", "simple"),
+    ("gorilla explains stocks", "simple"),
+    ("morning routine of a busy baker", "simple"),
+    ('Two gorillas host a podcast. One says "buy the dip", the other panics about bananas', "complex"),
+    ("0-10s: a chef drops a cake, 10-20s: the kitchen freezes, 20-30s: the cake talks back", "complex"),
+    ("Interview with Elon Musk, Taylor Swift, MrBeast and Oprah about their morning routines in Paris", "complex"),
+]
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def _install_profiled_backend(calls, seed: int = 82):
+    """Make FakeLlm answer with per-model latency and record every call."""
+    from drop_agent.fake_llm import FakeLlm
+
+    original = FakeLlm.generate_content_async
+    rng = random.Random(seed)
+
+    async def profiled(self, llm_request, stream=False):
+        model = llm_request.model or self.model
+        profile = MODEL_PROFILES.get(model, MODEL_PROFILES[STRONG_MODEL])
+        await asyncio.sleep(profile["latency_ms"] * rng.uniform(0.8, 1.2) / 1000)
+        async for response in original(self, llm_request, stream):
+            if not response.partial and response.usage_metadata:
+                usage = response.usage_metadata
+                calls.append(
+                    {
+                        "agent": self.agent_name,
+                        "model": model,
+                        "prompt_tokens": usage.prompt_token_count or 0,
+                        "output_tokens": usage.candidates_token_count or 0,
+                    }
+                )
+            yield response
+
+    FakeLlm.generate_content_async = profiled
+    return original
+
+
+def _cost(call) -> float:
+    profile = MODEL_PROFILES.get(call["model"], MODEL_PROFILES[STRONG_MODEL])
+    return (
+        call["prompt_tokens"] * profile["input_per_m"] + call["output_tokens"] * profile["output_per_m"]
+    ) / 1_000_000
+
+
+async def _run_idea(runner, idea: str, index: int, calls):
+    from google.genai import types
+
+    user_id = f"routing_user_{index}"
+    session = await runner.session_service.create_session(app_name=runner.app_name, user_id=user_id)
+    first_call = len(calls)
+    final_text, error = "", None
+    started = time.perf_counter()
+    async for event in runner.run_async(
+        user_id=user_id,
+        session_id=session.id,
+        new_message=types.Content(role="user", parts=[types.Part(text=idea)]),
+    ):
+        if event.error_code:
+            error = f"{event.error_code}: {event.error_message}"
+        if event.author == "prompt_writer_agent" and event.content and event.content.parts:
+            final_text = "".join(part.text for part in event.content.parts if part.text) or final_text
+    wall = time.perf_counter() - started
+
+    idea_calls = calls[first_call:]
+    return {
+        "wall_ms": wall * 1000,
+        "calls": idea_calls,
+        "cost_usd": sum(_cost(call) for call in idea_calls),
+        "final_prompt": bool(final_text) and error is None,
+        "error": error,
+    }
+
+
+async def _run_mode(routing: bool, repeat: int):
+    from google.adk.runners import InMemoryRunner
+    from drop_agent.agent import root_agent
+    from drop_agent.routing import classify_request
+
+    os.environ["MODEL_ROUTING"] = "true" if routing else "false"
+    calls = []
+    original = _install_profiled_backend(calls)
+    runner = InMemoryRunner(agent=root_agent, app_name="drop_agent")
+    runs = []
+    try:
+        for round_ in range(repeat):
+            for index, (idea, label) in enumerate(CORPUS):
+                run = await _run_idea(runner, idea, round_ * len(CORPUS) + index, calls)
+                run["complexity"] = classify_request(idea).complexity
+                run["label"] = label
+                runs.append(run)
+    finally:
+        from drop_agent.fake_llm import FakeLlm
+
+        FakeLlm.generate_content_async = original
+
+    by_model = {}
+    for call in calls:
+        totals = by_model.setdefault(call["model"], {"calls": 0, "cost_usd": 0.0})
+        totals["calls"] += 1
+        totals["cost_usd"] += _cost(call)
+    violations = [
+        call for call in calls if call["model"] in UNSUPPORTED_MODELS.get(call["agent"], ())
+    ]
+    walls = [run["wall_ms"] for run in runs]
+    return {
+        "ideas": len(runs),
+        "mean_ms": sum(walls) / len(walls),
+        "p95_ms": _percentile(walls, 0.95),
+        "calls_per_idea": len(calls) / len(runs),
+        "cost_per_idea_usd": sum(run["cost_usd"] for run in runs) / len(runs),
+        "by_model": by_model,
+        "final_prompts": sum(run["final_prompt"] for run in runs),
+        "label_matches": sum(run["complexity"] == run["label"] for run in runs),
+        "tool_violations": violations,
+        "errors": [run["error"] for run in runs if run["error"]],
+    }
+
+
+def run_routing_benchmark(repeat: int = 3):
+    """Compare latency, cost and routing decisions with and without model routing"""
+
+    # Agents build their models at import; keep them offline
+    os.environ["FAKE_LLM"] = "true"
+    os.environ.setdefault("GOOGLE_CLOUD_PROJECT", "routing-benchmark")
+    os.environ["FAKE_LLM_LATENCY_MS"] = "0"
+    os.environ["FAKE_LLM_LATENCY_JITTER_MS"] = "0"
+    for name in ("MODEL_RESPONSE_CACHE", "SEMANTIC_CACHE", "TOOL_CACHE", "INSTRUMENTATION"):
+        os.environ[name] = "false"
+    logging.getLogger().setLevel(logging.WARNING)
+
+    print(f"🔀 Model Routing Benchmark ({len(CORPUS)} ideas x {repeat})")
+    print("=" * 60)
+
+    results = {}
+    for mode, routing in (("strong_only", False), ("routed", True)):
+        results[mode] = asyncio.run(_run_mode(routing, repeat))
+        r = results[mode]
+        models = ", ".join(f"{model} {totals['calls']}" for model, totals in sorted(r["by_model"].items()))
+        print(
+            f"{mode:>12}: mean {r['mean_ms']:.0f}ms, p95 {r['p95_ms']:.0f}ms, "
+            f"${r['cost_per_idea_usd'] * 1000:.3f} per 1k ideas, calls: {models}"
+        )
+
+    routed, strong = results["routed"], results["strong_only"]
+    checks = {
+        "final_prompts": routed["final_prompts"] == routed["ideas"] and strong["final_prompts"] == strong["ideas"],
+        "labels": routed["label_matches"] == routed["ideas"],
+        "tool_support": not routed["tool_violations"] and not strong["tool_violations"],
+    }
+    print()
+    print(
+        f"Routing: latency {strong['mean_ms']:.0f}ms -> {routed['mean_ms']:.0f}ms, "
+        f"cost per idea {(1 - routed['cost_per_idea_usd'] / strong['cost_per_idea_usd']):.0%} lower"
+    )
+    print(f"   final prompts: {routed['final_prompts']}/{routed['ideas']} {'✅' if checks['final_prompts'] else '❌'}")
+    print(f"   classifier matches labels: {routed['label_matches']}/{routed['ideas']} {'✅' if checks['labels'] else '❌'}")
+    print(
+        f"   calls on models lacking the agent's tools: {len(routed['tool_violations'])} "
+        f"{'✅' if checks['tool_support'] else '❌'}"
+    )
+    passed = all(checks.values())
+
+    Path("evals").mkdir(exist_ok=True)
+    report_file = f"evals/routing_benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(report_file, "w") as f:
+        json.dump(
+            {
+                "timestamp": datetime.now().isoformat(),
+                "repeat": repeat,
+                "model_profiles": MODEL_PROFILES,
+                "results": results,
+                "checks": checks,
+                "passed": passed,
+            },
+            f,
+            indent=2,
+        )
+
+    print(f"📊 Detailed report saved to: {report_file}")
+    return passed
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Model routing latency, cost and quality benchmark")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs of the corpus per configuration")
+    args = parser.parse_args()
+    sys.exit(0 if run_routing_benchmark(args.repeat) else 1)
@@ -0,0 +1,139 @@
+"""
+82ndrop Semantic Cache Evaluation
+
+Measures how well the semantic prompt cache separates paraphrased video
+ideas from genuinely different ones:
+- precision / recall / false-hit rate per similarity threshold
+- embedding and index lookup latency
+
+Usage:
+    python drop_agent/evals/semantic_cache_eval.py [local|vertex]
+"""
+
+import sys
+import json
+import time
+from pathlib import Path
+from datetime import datetime
+
+# Add project root to path for imports
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from dotenv import load_dotenv
+
+# (cached idea, incoming idea, is_paraphrase)
+LABELED_PAIRS = [
+    ("gorilla explains stocks", "ape in a suit on the stock market", True),
+    ("gorilla explains stocks", "a gorilla teaching how the stock market works", True),
+    ("morning routine of a CEO", "a day-start routine for a busy executive", True),
+    ("morning routine of a CEO", "what a chief executive does every morning", True),
+    ("cat reviews fancy restaurants", "a cat acting as a food critic at fine dining places", True),
+    ("three gorillas host a podcast", "gorilla podcast with three hosts", True),
+    ("budget travel tips for Paris", "how to visit Paris cheaply", True),
+    ("robot learns to dance", "a robot teaching itself to dance", True),
+    ("grandma reacts to modern slang", "old lady reacting to gen z slang", True),
+    ("5 minute pasta recipe", "quick pasta you can cook in five minutes", True),
+    ("gorilla explains stocks", "gorilla explains cooking pasta", False),
+    ("gorilla explains stocks", "stock footage of a rainforest", False),
+    ("morning routine of a CEO", "night routine of a student", False),
+    ("cat reviews fancy restaurants", "dog reviews dog parks", False),
+    ("three gorillas host a podcast", "three chefs host a cooking show", False),
+    ("budget travel tips for Paris", "luxury hotels in Tokyo", False),
+    ("robot learns to dance", "robot vacuum cleaning tips", False),
+    ("grandma reacts to modern slang", "grandma's secret cookie recipe", False),
+    ("5 minute pasta recipe", "5 minute ab workout", False),
+    ("5 minute pasta recipe", "history of Italian pasta", False),
+]
+
+THRESHOLDS = [0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.75, 0.8, 0.85, 0.88, 0.9, 0.95]
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def run_semantic_cache_evaluation(embedder_kind: str = "local"):
+    """Compute precision/recall and latency curves for the semantic cache"""
+
+    from drop_agent.semantic_cache import SemanticPromptCache, build_embedder
+
+    print(f"🔬 Semantic Cache Evaluation (embedder: {embedder_kind})")
+    print("=" * 60)
+
+    embedder = build_embedder(embedder_kind)
+
+    embed_latencies = []
+    scored_pairs = []
+    for cached_idea, incoming_idea, is_paraphrase in LABELED_PAIRS:
+        start = time.perf_counter()
+        cached_vector = embedder.embed(cached_idea)
+        incoming_vector = embedder.embed(incoming_idea)
+        embed_latencies.append((time.perf_counter() - start) * 500)  # ms per embedding
+        similarity = sum(a * b for a, b in zip(cached_vector, incoming_vector))
+        scored_pairs.append((similarity, is_paraphrase))
+
+    curve = []
+    print(f"{'threshold':>10} {'precision':>10} {'recall':>8} {'false_hit_rate':>15}")
+    for threshold in THRESHOLDS:
+        true_hits = sum(1 for s, label in scored_pairs if s >= threshold and label)
+        false_hits = sum(1 for s, label in scored_pairs if s >= threshold and not label)
+        positives = sum(1 for _, label in scored_pairs if label)
+        negatives = len(scored_pairs) - positives
+        precision = true_hits / (true_hits + false_hits) if true_hits + false_hits else 1.0
+        recall = true_hits / positives if positives else 0.0
+        false_hit_rate = false_hits / negatives if negatives else 0.0
+        curve.append(
+            {
+                "threshold": threshold,
+                "precision": precision,
+                "recall": recall,
+                "false_hit_rate": false_hit_rate,
+            }
+        )
+        print(f"{threshold:>10.2f} {precision:>10.2f} {recall:>8.2f} {false_hit_rate:>15.2f}")
+
+    # Lookup latency against an index populated with every cached idea
+    lookup_latencies = []
+    for index_size in (10, 100, 500):
+        cache = SemanticPromptCache(embedder, threshold=0.0, max_entries=index_size)
+        for i in range(index_size):
+            cached_idea = LABELED_PAIRS[i % len(LABELED_PAIRS)][0]
+            cache.store(f"{cached_idea} #{i}", "cached prompt", user_id="eval_user")
+        start = time.perf_counter()
+        for _, incoming_idea, _ in LABELED_PAIRS:
+            cache.lookup(incoming_idea, user_id="eval_user")
+        per_lookup_ms = (time.perf_counter() - start) * 1000 / len(LABELED_PAIRS)
+        lookup_latencies.append({"index_size": index_size, "lookup_ms": per_lookup_ms})
+
+    print()
+    print(f"Embedding latency: p50 {_percentile(embed_latencies, 0.5):.2f}ms, "
+          f"p95 {_percentile(embed_latencies, 0.95):.2f}ms")
+    for row in lookup_latencies:
+        print(f"Lookup latency @ {row['index_size']:>3} entries: {row['lookup_ms']:.2f}ms")
+
+    report = {
+        "embedder": embedder_kind,
+        "timestamp": datetime.now().isoformat(),
+        "pairs": len(LABELED_PAIRS),
+        "precision_recall_curve": curve,
+        "embedding_latency_ms": {
+            "p50": _percentile(embed_latencies, 0.5),
+            "p95": _percentile(embed_latencies, 0.95),
+        },
+        "lookup_latency": lookup_latencies,
+    }
+
+    Path("evals").mkdir(exist_ok=True)
+    report_file = f"evals/semantic_cache_eval_{embedder_kind}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(report_file, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"📊 Detailed report saved to: {report_file}")
+    return report
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    run_semantic_cache_evaluation(sys.argv[1] if len(sys.argv) > 1 else "local")
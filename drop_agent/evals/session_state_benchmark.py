@@ -0,0 +1,199 @@
+"""
+82ndrop Session State Benchmark
+
+Runs the agent and tool callbacks for many turns against an in-memory
+session and appends one event per hop carrying the state delta the
+callbacks produced, the way the runner persists it. After the last turn it
+reports the session payload size (state and full session JSON) and the
+append latency.
+
+Modes compared:
+- legacy: the telemetry the callbacks used to keep in session state (start
+  times, current tool, the tool usage history and the unbounded tool
+  metrics list), emulated as it would be persisted
+- side_channel: the current callbacks, which keep that telemetry in the
+  session telemetry ring buffers (see session_telemetry.py)
+
+A turn is one pipeline run: the root, search and prompt writer agents and
+three tool calls (two transfers and a search enhancement).
+
+Usage:
+    python drop_agent/evals/session_state_benchmark.py [--turns 100]
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+import argparse
+import statistics
+from pathlib import Path
+from datetime import datetime
+from types import SimpleNamespace
+
+# Add project root to path for imports
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from dotenv import load_dotenv
+
+TOOLS = (
+    ("root_agent", "transfer_to_agent", {"agent_name": "search_agent"}),
+    ("search_agent", "search_enhancement", {"query": "gorilla explains stocks"}),
+    ("search_agent", "transfer_to_agent", {"agent_name": "prompt_writer_agent"}),
+)
+TOOL_RESPONSE = {"status": "success", "result": "search result snippet " * 40}
+
+
+def _legacy_agent_start(state) -> None:
+    state["start_time"] = datetime.now().timestamp()
+
+
+def _legacy_tool_call(state, context, tool_name: str, args, response) -> None:
+    """The session state writes one tool call made before the side channel."""
+    started = time.time()
+    state[f"{tool_name}_start_time"] = started
+    state["current_tool_name"] = tool_name
+    state["current_function_call_id"] = context.function_call_id
+    history = state.get("tool_usage_history", []) + [
+        {
+            "tool_name": tool_name,
+            "timestamp": started,
+            "session_id": context.session.id,
+            "agent_name": context.agent_name,
+            "invocation_id": context.invocation_id,
+        }
+    ]
+    state["tool_usage_history"] = history[-50:]
+    state["tool_metrics"] = state.get("tool_metrics", []) + [
+        {
+            "tool_name": tool_name,
+            "function_call_id": context.function_call_id,
+            "execution_time": time.time() - started,
+            "success": True,
+            "timestamp": time.time(),
+            "args_count": len(args),
+            "response_type": type(response).__name__,
+        }
+    ]
+    state[f"{tool_name}_last_duration"] = time.time() - started
+
+
+def _state_delta(before: dict, state: dict) -> dict:
+    return {key: value for key, value in state.items() if before.get(key, object()) != value}
+
+
+async def _run_mode(mode: str, turns: int):
+    from google.adk.events import Event, EventActions
+    from google.adk.sessions import InMemorySessionService
+    from drop_agent.callbacks import (
+        after_agent_callback,
+        after_tool_callback,
+        before_agent_callback,
+        before_tool_callback,
+    )
+
+    service = InMemorySessionService()
+    session = await service.create_session(app_name="drop_agent", user_id="bench_user")
+    append_ms = []
+
+    async def append(author: str, invocation_id: str, delta: dict) -> None:
+        event = Event(author=author, invocation_id=invocation_id, actions=EventActions(state_delta=delta))
+        started = time.perf_counter()
+        await service.append_event(session, event)
+        append_ms.append((time.perf_counter() - started) * 1000)
+
+    for turn in range(turns):
+        invocation_id = f"bench-{mode}-{turn}"
+        for call, (agent, tool_name, args) in enumerate(TOOLS):
+            # A working copy of the state, like the callback context's
+            state = json.loads(json.dumps(session.state))
+            before = json.loads(json.dumps(state))
+            context = SimpleNamespace(
+                agent_name=agent,
+                invocation_id=invocation_id,
+                user_id="bench_user",
+                function_call_id=f"call-{turn}-{call}",
+                session=session,
+                user_content=None,
+                state=state,
+            )
+            tool = SimpleNamespace(name=tool_name)
+            if mode == "legacy":
+                _legacy_agent_start(state)
+                _legacy_tool_call(state, context, tool_name, args, TOOL_RESPONSE)
+            else:
+                await before_agent_callback(context)
+                before_tool_callback(tool, args, context)
+                after_tool_callback(tool, args, context, TOOL_RESPONSE)
+            await append(agent, invocation_id, _state_delta(before, state))
+
+        # The prompt writer's final answer ends the turn
+        state = json.loads(json.dumps(session.state))
+        before = json.loads(json.dumps(state))
+        context = SimpleNamespace(
+            agent_name="prompt_writer_agent", invocation_id=invocation_id, session=session, state=state
+        )
+        if mode == "legacy":
+            _legacy_agent_start(state)
+        else:
+            await before_agent_callback(context)
+            await after_agent_callback(context)
+        await append("prompt_writer_agent", invocation_id, _state_delta(before, state))
+
+    session = await service.get_session(app_name="drop_agent", user_id="bench_user", session_id=session.id)
+    ordered = sorted(append_ms)
+    return {
+        "events": len(session.events),
+        "state_bytes": len(json.dumps(session.state)),
+        "session_bytes": len(session.model_dump_json()),
+        "state_keys": len(session.state),
+        "append_mean_ms": statistics.mean(append_ms),
+        "append_p95_ms": ordered[int(len(ordered) * 0.95) - 1],
+        "last_turn_append_ms": statistics.mean(append_ms[-len(TOOLS) - 1 :]),
+    }
+
+
+def run_session_state_benchmark(turns: int = 100):
+    """Compare session payload size and append latency with and without state telemetry"""
+
+    # Agents build their models at import; keep them offline
+    os.environ.setdefault("FAKE_LLM", "true")
+    os.environ.setdefault("GOOGLE_CLOUD_PROJECT", "session-state-benchmark")
+    os.environ["INSTRUMENTATION"] = "false"
+    logging.getLogger().setLevel(logging.WARNING)
+
+    print(f"🗃️ Session State Benchmark ({turns} turns)")
+    print("=" * 60)
+
+    results = {}
+    for mode in ("legacy", "side_channel"):
+        results[mode] = asyncio.run(_run_mode(mode, turns))
+        r = results[mode]
+        print(
+            f"{mode:>12}: state {r['state_bytes'] / 1024:.1f}KB ({r['state_keys']} keys), session "
+            f"{r['session_bytes'] / 1024:.1f}KB, append mean {r['append_mean_ms']:.3f}ms "
+            f"(p95 {r['append_p95_ms']:.3f}ms, last turn {r['last_turn_append_ms']:.3f}ms)"
+        )
+
+    legacy, side = results["legacy"]["session_bytes"], results["side_channel"]["session_bytes"]
+    print()
+    print(f"Session payload after {turns} turns: {legacy / 1024:.1f}KB -> {side / 1024:.1f}KB ({(legacy - side) / legacy:.0%} smaller)")
+
+    Path("evals").mkdir(exist_ok=True)
+    report_file = f"evals/session_state_benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(report_file, "w") as f:
+        json.dump({"timestamp": datetime.now().isoformat(), "turns": turns, "results": results}, f, indent=2)
+
+    print(f"📊 Detailed report saved to: {report_file}")
+    return results
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Session state size and append latency benchmark")
+    parser.add_argument("--turns", type=int, default=100)
+    args = parser.parse_args()
+    run_session_state_benchmark(args.turns)
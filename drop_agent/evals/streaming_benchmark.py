@@ -0,0 +1,231 @@
+"""
+82ndrop Streaming Benchmark
+
+Measures what a ``/run_sse`` client sees for one pipeline run driven by a
+fake streaming model (no model or network calls):
+- time to first visible token of the final prompt (TTFT)
+- total time and total bytes streamed
+
+Two configurations are compared:
+- buffered: every event is streamed unchanged and the prompt only becomes
+  readable with the final event (slot JSON chunks are not displayable)
+- streaming: slot chunks are rendered incrementally and orchestration
+  chatter is filtered by ``SSEChatterFilterMiddleware``
+
+Usage:
+    python drop_agent/evals/streaming_benchmark.py [token_interval_ms]
+"""
+
+import sys
+import json
+import time
+import asyncio
+from pathlib import Path
+from datetime import datetime
+
+# Add project root to path for imports
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from dotenv import load_dotenv
+
+# Characters per streamed chunk, roughly a few tokens as Gemini streams them
+CHUNK_CHARS = 12
+
+ROOT_CHATTER = (
+    "Thanks for the idea! I'll first analyze it with the guide agent, then "
+    "write your Master Prompt."
+)
+GUIDE_ANALYSIS = (
+    "Content type: comedy explainer. Visual style: cinematic office parody. "
+    "Audience: young investors on TikTok. Hook: a gorilla in a suit explains "
+    "why stocks go up and down. Recommended length: 30 seconds with three "
+    "caption beats."
+)
+SLOTS = {
+    "duration": 30,
+    "top_line": "A Gorilla Explains The Stock Market",
+    "font_style": "bold, high-contrast sans-serif",
+    "main_scene_description": (
+        "a silverback gorilla in a tailored suit at a trading desk, pointing at "
+        "a wall of charts with exaggerated enthusiasm, handheld documentary "
+        "camera, warm office lighting, voice-over in a calm narrator tone"
+    ),
+    "background_description": "scrolling green and red stock tickers",
+    "captions": [
+        {"time": "0-10s", "caption": "Stocks go up when people want them"},
+        {"time": "10-20s", "caption": "Stocks go down when they panic"},
+        {"time": "20-30s", "caption": "Bananas are not a hedge"},
+    ],
+}
+
+
+def _chunks(text: str):
+    for start in range(0, len(text), CHUNK_CHARS):
+        yield text[start:start + CHUNK_CHARS]
+
+
+def _sse(event: dict) -> bytes:
+    return f"data: {json.dumps(event)}\n\n".encode("utf-8")
+
+
+def _text_event(author: str, text: str, partial: bool = False, state_delta: dict = None) -> dict:
+    event = {
+        "author": author,
+        "content": {"role": "model", "parts": [{"text": text}]},
+        "actions": {"stateDelta": state_delta or {}},
+    }
+    if partial:
+        event["partial"] = True
+    return event
+
+
+def _transfer_event(author: str, agent_name: str) -> dict:
+    return {
+        "author": author,
+        "content": {
+            "role": "model",
+            "parts": [{"functionCall": {"name": "transfer_to_agent", "args": {"agent_name": agent_name}}}],
+        },
+    }
+
+
+async def fake_pipeline_events(token_interval: float, renderer, final_prompt: str):
+    """
+    Events of one pipeline run, as produced by a fake streaming model.
+
+    Args:
+        token_interval: Seconds between streamed chunks
+        renderer: StreamingSlotRenderer applied to slot chunks like the prompt
+            writer callback does, or None to stream raw slot JSON
+        final_prompt: The rendered prompt carried by the final event
+    """
+    for chunk in _chunks(ROOT_CHATTER):
+        await asyncio.sleep(token_interval)
+        yield _text_event("drop_agent", chunk, partial=True)
+    yield _text_event("drop_agent", ROOT_CHATTER)
+    yield _transfer_event("drop_agent", "guide_agent")
+
+    for chunk in _chunks(GUIDE_ANALYSIS):
+        await asyncio.sleep(token_interval)
+        yield _text_event("guide_agent", chunk, partial=True)
+    yield _text_event(
+        "guide_agent", GUIDE_ANALYSIS, state_delta={"guide_analysis_response": GUIDE_ANALYSIS}
+    )
+    yield _transfer_event("guide_agent", "prompt_writer_agent")
+
+    for chunk in _chunks(json.dumps(SLOTS)):
+        await asyncio.sleep(token_interval)
+        if renderer is not None:
+            chunk = renderer.feed(chunk)
+            if not chunk:
+                continue
+        yield _text_event("prompt_writer_agent", chunk, partial=True)
+
+    yield _text_event(
+        "prompt_writer_agent", final_prompt, state_delta={"video_prompts_response": final_prompt}
+    )
+
+
+async def measure(token_interval: float, streaming: bool) -> dict:
+    """Stream one run through the SSE middleware and time what the client receives."""
+    from drop_agent.streaming import SSEChatterFilterMiddleware
+    from drop_agent.sub_agents.prompt_writer.template import (
+        MasterPromptSlots,
+        StreamingSlotRenderer,
+        render_master_prompt,
+    )
+
+    renderer = StreamingSlotRenderer() if streaming else None
+    final_prompt = render_master_prompt(MasterPromptSlots.model_validate(SLOTS))
+
+    async def sse_app(scope, receive, send):
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [(b"content-type", b"text/event-stream; charset=utf-8")],
+            }
+        )
+        async for event in fake_pipeline_events(token_interval, renderer, final_prompt):
+            await send({"type": "http.response.body", "body": _sse(event), "more_body": True})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    middleware = SSEChatterFilterMiddleware(sse_app)
+    middleware.enabled = streaming
+
+    received = {"bytes": 0, "events": 0, "ttft": None}
+    start = time.perf_counter()
+
+    async def client_send(message):
+        if message["type"] != "http.response.body":
+            return
+        body = message.get("body", b"")
+        received["bytes"] += len(body)
+        for raw in body.split(b"\n\n"):
+            if not raw.startswith(b"data: "):
+                continue
+            received["events"] += 1
+            event = json.loads(raw[len(b"data: "):])
+            parts = (event.get("content") or {}).get("parts") or []
+            visible = event.get("author") == "prompt_writer_agent" and any(
+                part.get("text") for part in parts
+            )
+            # Without incremental rendering only the final event is readable
+            if visible and (streaming or not event.get("partial")) and received["ttft"] is None:
+                received["ttft"] = time.perf_counter() - start
+
+    await middleware({"type": "http", "path": "/run_sse"}, None, client_send)
+    return {
+        "mode": "streaming" if streaming else "buffered",
+        "ttft_ms": received["ttft"] * 1000,
+        "total_ms": (time.perf_counter() - start) * 1000,
+        "bytes": received["bytes"],
+        "events": received["events"],
+    }
+
+
+def run_streaming_benchmark(token_interval_ms: float = 20.0):
+    """Compare TTFT and streamed bytes with and without incremental streaming"""
+
+    print(f"🔬 Streaming Benchmark (fake model, {token_interval_ms:.0f}ms per chunk)")
+    print("=" * 60)
+
+    token_interval = token_interval_ms / 1000
+    results = [
+        asyncio.run(measure(token_interval, streaming=False)),
+        asyncio.run(measure(token_interval, streaming=True)),
+    ]
+
+    print(f"{'mode':>10} {'ttft_ms':>10} {'total_ms':>10} {'bytes':>8} {'events':>7}")
+    for row in results:
+        print(
+            f"{row['mode']:>10} {row['ttft_ms']:>10.1f} {row['total_ms']:>10.1f} "
+            f"{row['bytes']:>8} {row['events']:>7}"
+        )
+
+    buffered, streaming = results
+    print()
+    print(f"TTFT reduced by {buffered['ttft_ms'] - streaming['ttft_ms']:.1f}ms "
+          f"({streaming['ttft_ms'] / buffered['ttft_ms']:.0%} of buffered)")
+    print(f"Bytes streamed: {streaming['bytes'] / buffered['bytes']:.0%} of buffered")
+
+    report = {
+        "timestamp": datetime.now().isoformat(),
+        "token_interval_ms": token_interval_ms,
+        "chunk_chars": CHUNK_CHARS,
+        "results": results,
+    }
+
+    Path("evals").mkdir(exist_ok=True)
+    report_file = f"evals/streaming_benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(report_file, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"📊 Detailed report saved to: {report_file}")
+    return report
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    run_streaming_benchmark(float(sys.argv[1]) if len(sys.argv) > 1 else 20.0)
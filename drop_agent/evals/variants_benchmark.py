@@ -0,0 +1,262 @@
+"""
+82ndrop Prompt Variants Benchmark
+
+Compares the two ways of getting N Master Prompts for one idea, on the fake
+model backend (see ``drop_agent/fake_llm.py``):
+- separate: N full pipeline runs of the idea, one session each
+- variants: one run asking for "N versions", where guide and search run
+  once and prompt_writer returns every variant from a single call
+
+Every model call is given an emulated time to first token plus a per output
+token time, and is priced from the tokens in the fake usage metadata, so the
+larger variants response is paid for in both latency and cost.
+
+Reported per mode: wall-clock latency, model calls, prompt and output tokens,
+estimated cost, and whether N prompts came back (distinct ones, after the
+near-duplicate filter, in variant mode). The fake backend answers variant
+requests with three variants, so N is 3; its separate runs of one idea are
+identical, so how much real separate runs would differ needs live runs.
+
+Variant detection is checked first on requests that ask for variants and on
+ideas that only mention numbers of things (which must stay single prompts:
+variant mode multiplies the output cost).
+
+Exits non-zero when a detection case fails or a mode doesn't return N
+prompts per idea.
+
+Usage:
+    python drop_agent/evals/variants_benchmark.py [--repeat 3]
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import logging
+import argparse
+from pathlib import Path
+from datetime import datetime
+
+# Add project root to path for imports
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from dotenv import load_dotenv
+
+VARIANTS = 3
+
+# Emulated model timing (ms) and list prices (USD per 1M tokens)
+MODEL_PROFILE = {"first_token_ms": 500, "per_output_token_ms": 4, "input_per_m": 0.10, "output_per_m": 0.40}
+
+IDEAS = (
+    "cat reviews fancy restaurants",
+    "gorilla explains stocks",
+    "morning routine of a busy baker",
+)
+
+# (message, expected variant count)
+DETECTION_CASES = (
+    ("give me three versions of cat reviews fancy restaurants", 3),
+    ("Write 2 different variants of a dog explaining taxes", 2),
+    ("Can you generate 4 variations of gorilla explains stocks", 4),
+    ("Love it. Now create a couple of versions of this", 2),
+    ("I want 3 versions of a baker's morning routine", 3),
+    ("A finance guru ranks the 3 options for retirement savings", 1),
+    ("Explain two alternatives to coffee", 1),
+    ("chef shows 4 takes on a classic burger", 1),
+    ("a robot with 2 prompts on screen", 1),
+    ("watch a baker make 3 versions of a cake", 1),
+    ("a car evolves through 5 versions of itself", 1),
+)
+
+
+def _check_detection():
+    from drop_agent.variants import detect_variant_count
+
+    failures = []
+    for message, expected in DETECTION_CASES:
+        count = detect_variant_count(message)
+        if count != expected:
+            failures.append({"message": message, "expected": expected, "detected": count})
+            print(f"   ❌ {message!r}: {count} variants, expected {expected}")
+    print(f"Variant detection: {len(DETECTION_CASES) - len(failures)}/{len(DETECTION_CASES)} cases {'✅' if not failures else '❌'}")
+    return failures
+
+
+def _install_profiled_backend(calls, seed: int = 82):
+    """Make FakeLlm answer with emulated latency and record every call."""
+    from drop_agent.fake_llm import FakeLlm
+
+    original = FakeLlm.generate_content_async
+    rng = random.Random(seed)
+
+    async def profiled(self, llm_request, stream=False):
+        await asyncio.sleep(MODEL_PROFILE["first_token_ms"] * rng.uniform(0.8, 1.2) / 1000)
+        async for response in original(self, llm_request, stream):
+            if not response.partial and response.usage_metadata:
+                usage = response.usage_metadata
+                output_tokens = usage.candidates_token_count or 0
+                await asyncio.sleep(output_tokens * MODEL_PROFILE["per_output_token_ms"] / 1000)
+                calls.append(
+                    {
+                        "agent": self.agent_name,
+                        "prompt_tokens": usage.prompt_token_count or 0,
+                        "output_tokens": output_tokens,
+                    }
+                )
+            yield response
+
+    FakeLlm.generate_content_async = profiled
+    return original
+
+
+def _cost(calls) -> float:
+    return sum(
+        call["prompt_tokens"] * MODEL_PROFILE["input_per_m"] + call["output_tokens"] * MODEL_PROFILE["output_per_m"]
+        for call in calls
+    ) / 1_000_000
+
+
+async def _run_message(runner, user_id: str, text: str):
+    """One pipeline run; returns the final prompt text and any error."""
+    from google.genai import types
+
+    session = await runner.session_service.create_session(app_name=runner.app_name, user_id=user_id)
+    final_text, error = "", None
+    async for event in runner.run_async(
+        user_id=user_id,
+        session_id=session.id,
+        new_message=types.Content(role="user", parts=[types.Part(text=text)]),
+    ):
+        if event.error_code:
+            error = f"{event.error_code}: {event.error_message}"
+        if event.author == "prompt_writer_agent" and event.content and event.content.parts and not event.partial:
+            final_text = "".join(part.text for part in event.content.parts if part.text) or final_text
+    return final_text, error
+
+
+async def _run_idea(runner, mode: str, idea: str, index: int, calls):
+    first_call = len(calls)
+    started = time.perf_counter()
+    if mode == "separate":
+        prompts, errors = [], []
+        for run in range(VARIANTS):
+            text, error = await _run_message(runner, f"variants_user_{index}_{run}", idea)
+            prompts.append(text)
+            errors.append(error)
+        error = next((e for e in errors if e), None)
+    else:
+        text, error = await _run_message(runner, f"variants_user_{index}", f"give me three versions of {idea}")
+        prompts = text.split("\n\n---\n\n") if text else []
+    wall = time.perf_counter() - started
+
+    idea_calls = calls[first_call:]
+    return {
+        "wall_ms": wall * 1000,
+        "model_calls": len(idea_calls),
+        "prompt_tokens": sum(call["prompt_tokens"] for call in idea_calls),
+        "output_tokens": sum(call["output_tokens"] for call in idea_calls),
+        "cost_usd": _cost(idea_calls),
+        "prompts": len(set(prompts) if mode == "variants" else [prompt for prompt in prompts if prompt]),
+        "error": error,
+    }
+
+
+async def _run_mode(mode: str, repeat: int):
+    from google.adk.runners import InMemoryRunner
+    from drop_agent.agent import root_agent
+
+    calls = []
+    original = _install_profiled_backend(calls)
+    runner = InMemoryRunner(agent=root_agent, app_name="drop_agent")
+    runs = []
+    try:
+        for round_ in range(repeat):
+            for index, idea in enumerate(IDEAS):
+                runs.append(await _run_idea(runner, mode, idea, round_ * len(IDEAS) + index, calls))
+    finally:
+        from drop_agent.fake_llm import FakeLlm
+
+        FakeLlm.generate_content_async = original
+
+    count = len(runs)
+    return {
+        "ideas": count,
+        "mean_ms": sum(run["wall_ms"] for run in runs) / count,
+        "model_calls_per_idea": sum(run["model_calls"] for run in runs) / count,
+        "prompt_tokens_per_idea": sum(run["prompt_tokens"] for run in runs) / count,
+        "output_tokens_per_idea": sum(run["output_tokens"] for run in runs) / count,
+        "cost_per_idea_usd": sum(run["cost_usd"] for run in runs) / count,
+        "complete": sum(run["prompts"] == VARIANTS and not run["error"] for run in runs),
+        "errors": [run["error"] for run in runs if run["error"]],
+    }
+
+
+def run_variants_benchmark(repeat: int = 3):
+    """Compare one multi-variant run with N separate runs"""
+
+    # Agents build their models at import; keep them offline
+    os.environ["FAKE_LLM"] = "true"
+    os.environ.setdefault("GOOGLE_CLOUD_PROJECT", "variants-benchmark")
+    os.environ["FAKE_LLM_LATENCY_MS"] = "0"
+    os.environ["FAKE_LLM_LATENCY_JITTER_MS"] = "0"
+    for name in ("MODEL_RESPONSE_CACHE", "SEMANTIC_CACHE", "TOOL_CACHE", "INSTRUMENTATION", "MODEL_ROUTING"):
+        os.environ[name] = "false"
+    logging.getLogger().setLevel(logging.WARNING)
+
+    print(f"🎛️ Prompt Variants Benchmark ({VARIANTS} prompts for {len(IDEAS)} ideas x {repeat})")
+    print("=" * 60)
+
+    detection_failures = _check_detection()
+    print()
+
+    results = {}
+    for mode in ("separate", "variants"):
+        results[mode] = asyncio.run(_run_mode(mode, repeat))
+        r = results[mode]
+        print(
+            f"{mode:>9}: mean {r['mean_ms']:.0f}ms, {r['model_calls_per_idea']:.1f} calls, "
+            f"{r['prompt_tokens_per_idea']:.0f} prompt / {r['output_tokens_per_idea']:.0f} output tokens, "
+            f"${r['cost_per_idea_usd'] * 1000:.3f} per 1k ideas, complete {r['complete']}/{r['ideas']}"
+        )
+
+    separate, variants = results["separate"], results["variants"]
+    complete = separate["complete"] == separate["ideas"] and variants["complete"] == variants["ideas"]
+    passed = complete and not detection_failures
+    print()
+    print(
+        f"Variant mode: latency {separate['mean_ms']:.0f}ms -> {variants['mean_ms']:.0f}ms, "
+        f"calls {separate['model_calls_per_idea']:.1f} -> {variants['model_calls_per_idea']:.1f}, "
+        f"cost {(1 - variants['cost_per_idea_usd'] / separate['cost_per_idea_usd']):.0%} lower"
+    )
+    print(f"   {VARIANTS} prompts per idea in both modes {'✅' if complete else '❌'}")
+
+    Path("evals").mkdir(exist_ok=True)
+    report_file = f"evals/variants_benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(report_file, "w") as f:
+        json.dump(
+            {
+                "timestamp": datetime.now().isoformat(),
+                "variants": VARIANTS,
+                "repeat": repeat,
+                "model_profile": MODEL_PROFILE,
+                "detection_failures": detection_failures,
+                "results": results,
+                "passed": passed,
+            },
+            f,
+            indent=2,
+        )
+
+    print(f"📊 Detailed report saved to: {report_file}")
+    return passed
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Multi-variant prompt cost and latency benchmark")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs of the ideas per mode")
+    args = parser.parse_args()
+    sys.exit(0 if run_variants_benchmark(args.repeat) else 1)
@@ -0,0 +1,172 @@
+"""
+82ndrop Startup Warm-up Benchmark
+
+Measures the latency of the first request on a fresh process, with and
+without the startup warm-up (WARMUP). Every trial starts a new Python
+process that imports ``main.py``, runs the app's lifespan, waits for
+``/ready`` and then times:
+- the first request (create a session and run one idea through ``/run``)
+- a second request, for reference
+
+Requests go through an in-process ASGI transport with Firebase token
+verification patched out, on the fake model backend (FAKE_LLM). With
+--offline the outbound warm-up steps (Vertex AI, Firebase) are skipped, so
+only in-process work (imports, agent graph, runners) is compared.
+
+Usage:
+    python drop_agent/evals/warmup_benchmark.py [--trials 3] [--offline]
+"""
+
+import os
+import sys
+import json
+import subprocess
+import argparse
+from pathlib import Path
+from datetime import datetime
+
+# Add project root to path for imports
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from dotenv import load_dotenv
+
+# Runs in a fresh interpreter for every trial and prints one JSON line
+TRIAL_SCRIPT = r'''
+import json, time, asyncio, logging
+started = time.perf_counter()
+logging.disable(logging.WARNING)
+from firebase_admin import auth
+auth.verify_id_token = lambda token, *args, **kwargs: {"uid": token, "agent_access": True}
+import httpx
+from main import app
+imported = time.perf_counter() - started
+
+
+async def lifespan_startup():
+    queue = asyncio.Queue()
+    await queue.put({"type": "lifespan.startup"})
+    started_up = asyncio.Event()
+
+    async def send(message):
+        if message["type"] == "lifespan.startup.complete":
+            started_up.set()
+
+    task = asyncio.create_task(
+        app({"type": "lifespan", "asgi": {"version": "3.0"}, "state": {}}, queue.get, send)
+    )
+    await started_up.wait()
+    return task
+
+
+async def run_idea(client, user_id, idea):
+    headers = {"Authorization": f"Bearer {user_id}"}
+    started = time.perf_counter()
+    response = await client.post(f"/apps/drop_agent/users/{user_id}/sessions", headers=headers, json={})
+    response.raise_for_status()
+    response = await client.post("/run", headers=headers, json={
+        "appName": "drop_agent",
+        "userId": user_id,
+        "sessionId": response.json()["id"],
+        "newMessage": {"role": "user", "parts": [{"text": idea}]},
+    })
+    response.raise_for_status()
+    return time.perf_counter() - started
+
+
+async def main():
+    lifespan = await lifespan_startup()
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://warmup") as client:
+        while True:
+            response = await client.get("/ready")
+            if response.status_code == 200:
+                break
+            await asyncio.sleep(0.01)
+        ready = time.perf_counter() - started
+        warmup = response.json()["warmup"]
+        first = await run_idea(client, "warmup_user_1", "gorilla explains stocks")
+        second = await run_idea(client, "warmup_user_2", "cat reviews fancy restaurants")
+    lifespan.cancel()
+    print(json.dumps({
+        "import_s": imported, "ready_s": ready, "first_request_s": first,
+        "second_request_s": second, "warmup": warmup,
+    }))
+
+
+asyncio.run(main())
+'''
+
+
+def _run_trial(warmup: bool, offline: bool):
+    env = dict(
+        os.environ,
+        FAKE_LLM="true",
+        WARMUP="true" if warmup else "false",
+        GOOGLE_CLOUD_PROJECT=os.getenv("GOOGLE_CLOUD_PROJECT") or "warmup-benchmark",
+    )
+    if offline:
+        env["WARMUP_CONNECTIONS"] = "false"
+    completed = subprocess.run(
+        [sys.executable, "-c", TRIAL_SCRIPT],
+        cwd=project_root,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    for line in reversed(completed.stdout.splitlines()):
+        if line.startswith("{"):
+            return json.loads(line)
+    raise RuntimeError(f"Trial failed: {completed.stderr[-2000:]}")
+
+
+def _mean(values):
+    return sum(values) / len(values) if values else 0.0
+
+
+def run_warmup_benchmark(trials: int = 3, offline: bool = False):
+    """Compare first-request latency on fresh processes with and without warm-up"""
+
+    print(f"🔬 Startup Warm-up Benchmark ({trials} trials per mode)")
+    print("=" * 60)
+
+    results = {}
+    for mode, warmup in (("cold", False), ("warmed", True)):
+        runs = [_run_trial(warmup, offline) for _ in range(trials)]
+        results[mode] = {
+            "import_ms": _mean([r["import_s"] for r in runs]) * 1000,
+            "ready_ms": _mean([r["ready_s"] for r in runs]) * 1000,
+            "first_request_ms": _mean([r["first_request_s"] for r in runs]) * 1000,
+            "second_request_ms": _mean([r["second_request_s"] for r in runs]) * 1000,
+            "warmup_steps": runs[-1]["warmup"]["steps"],
+            "runs": runs,
+        }
+        print(
+            f"{mode:>6}: ready after {results[mode]['ready_ms']:.0f}ms, first request "
+            f"{results[mode]['first_request_ms']:.0f}ms, second {results[mode]['second_request_ms']:.0f}ms"
+        )
+
+    cold, warmed = results["cold"]["first_request_ms"], results["warmed"]["first_request_ms"]
+    print()
+    print(f"First-request latency: {cold:.0f}ms -> {warmed:.0f}ms ({(cold - warmed) / cold:.0%} faster)")
+    print(f"Warm-up steps: {results['warmed']['warmup_steps']}")
+
+    Path("evals").mkdir(exist_ok=True)
+    report_file = f"evals/warmup_benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(report_file, "w") as f:
+        json.dump(
+            {"timestamp": datetime.now().isoformat(), "trials": trials, "offline": offline, "results": results},
+            f,
+            indent=2,
+        )
+
+    print(f"📊 Detailed report saved to: {report_file}")
+    return results
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Startup warm-up benchmark")
+    parser.add_argument("--trials", type=int, default=3)
+    parser.add_argument("--offline", action="store_true", help="Skip the outbound warm-up steps")
+    args = parser.parse_args()
+    run_warmup_benchmark(args.trials, args.offline)
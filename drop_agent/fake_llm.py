@@ -0,0 +1,232 @@
+"""
+Offline fake model backend for the 82ndrop Agent System.
+
+``FakeLlm`` answers every agent without network calls, so the full agent
+graph (root agent, sub-agents, ``SearchEnhancementTool``) can be pushed
+through ``main.py``'s app at load-test concurrency for free. Responses are
+generated from a per-agent template by default:
+- drop_agent: transfer to guide_agent, then call search_enhancement, then
+  transfer to prompt_writer_agent
+- guide_agent: a templated analysis, then a transfer back to drop_agent
+- search_agent: templated trend insights
+- prompt_writer_agent: Master Prompt slot JSON (variants when requested)
+
+A JSON script can replace the templates per agent. Its n-th entry answers
+the agent's n-th model turn in a conversation:
+    {"guide_agent": [{"text": "...", "function_call": {"name": "...", "args": {}}}]}
+
+Latency and streaming are configurable; streamed text is split into
+partial chunks like Gemini's, followed by the aggregated final response.
+
+The class is registered with ADK's model registry for "fake-*" model
+names; ``drop_agent.models.build_model`` returns instances that keep the
+real model name so model-specific tools (google_search) still configure.
+
+Configuration (environment variables):
+- FAKE_LLM: "true" to run every agent on the fake backend
+- FAKE_LLM_SCRIPT: path to a JSON script of responses per agent
+- FAKE_LLM_LATENCY_MS: mean time to first response in ms (default 200)
+- FAKE_LLM_LATENCY_JITTER_MS: uniform jitter around the mean in ms (default 100)
+- FAKE_LLM_CHUNK_CHARS: characters per streamed chunk (default 24)
+- FAKE_LLM_CHUNK_DELAY_MS: delay between streamed chunks in ms (default 10)
+"""
+
+import os
+import json
+import random
+import asyncio
+import logging
+from functools import lru_cache
+from typing import Any, AsyncGenerator, Dict, List, Optional
+
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.adk.models.registry import LLMRegistry
+from google.genai import types
+
+from .config import env_flag, env_float, env_int
+
+logger = logging.getLogger(__name__)
+
+# Markers that let the root agent's script tell which steps already ran
+GUIDE_MARKER = "GUIDE ANALYSIS:"
+SEARCH_TOOL_NAME = "search_enhancement"
+
+
+def is_fake_llm_enabled() -> bool:
+    return env_flag("FAKE_LLM")
+
+
+@lru_cache(maxsize=4)
+def _load_script(path: str) -> Dict[str, List[Dict[str, Any]]]:
+    with open(path) as f:
+        return json.load(f)
+
+
+def _texts(llm_request: LlmRequest) -> List[str]:
+    return [
+        part.text
+        for content in llm_request.contents or []
+        for part in content.parts or []
+        if getattr(part, "text", None)
+    ]
+
+
+def _user_idea(llm_request: LlmRequest) -> str:
+    """The user's message: the first user text that is not another agent's transcript."""
+    for content in llm_request.contents or []:
+        if content.role != "user":
+            continue
+        for part in content.parts or []:
+            if getattr(part, "text", None) and not part.text.startswith("For context"):
+                return part.text.strip()
+    return "a short vertical video"
+
+
+def _called_tool(llm_request: LlmRequest, name: str) -> bool:
+    return any(
+        getattr(part, "function_response", None) and part.function_response.name == name
+        for content in llm_request.contents or []
+        for part in content.parts or []
+    )
+
+
+def _transfer(agent_name: str) -> Dict[str, Any]:
+    return {"function_call": {"name": "transfer_to_agent", "args": {"agent_name": agent_name}}}
+
+
+def _slots(idea: str, index: int = 0) -> Dict[str, Any]:
+    hooks = ["You Won't Believe This", "Watch Until The End", "Nobody Talks About This"]
+    # Variants differ in their shot, as distinct takes on one idea would
+    shots = [
+        "filmed handheld in a vertical close-up with warm natural lighting and quick cuts between reactions",
+        "shot as a locked-off wide frame under cool neon, played deadpan with slow zooms",
+        "told through a first-person POV walkthrough at golden hour with whip pans",
+    ]
+    return {
+        "duration": 30,
+        "top_line": f"{hooks[index % len(hooks)]}: {idea[:60].title()}",
+        "font_style": "bold, high-contrast sans-serif",
+        "main_scene_description": f"{idea}, {shots[index % len(shots)]}",
+        "background_description": "slow-motion city lights with soft bokeh",
+        "captions": [
+            {"time": "0-10s", "caption": "It starts like any other day"},
+            {"time": "10-20s", "caption": "Then everything changes"},
+            {"time": "20-30s", "caption": "Follow for part two"},
+        ],
+    }
+
+
+def template_response(agent_name: str, llm_request: LlmRequest) -> Dict[str, Any]:
+    """
+    Generate the scripted pipeline step of ``agent_name`` for a request.
+
+    Returns:
+        A response spec with optional "text" and "function_call" entries
+    """
+    idea = _user_idea(llm_request)
+
+    if agent_name == "drop_agent":
+        guide_done = any(GUIDE_MARKER in text for text in _texts(llm_request))
+        if not guide_done:
+            return _transfer("guide_agent")
+        if not _called_tool(llm_request, SEARCH_TOOL_NAME):
+            return {"function_call": {"name": SEARCH_TOOL_NAME, "args": {"input_text": idea}}}
+        return _transfer("prompt_writer_agent")
+
+    if agent_name == "guide_agent":
+        return {
+            "text": (
+                f"{GUIDE_MARKER} Vertical 9:16 concept for '{idea}'. Hook in the top "
+                "third, main scene centered, captions and branding in the bottom "
+                "third, 30 seconds with three caption beats."
+            ),
+            **_transfer("drop_agent"),
+        }
+
+    if agent_name == "search_agent":
+        return {
+            "text": (
+                f"TREND INSIGHTS: '{idea}' fits current POV and storytime formats; "
+                "fast hooks in the first two seconds and on-screen captions perform best."
+            )
+        }
+
+    if agent_name == "prompt_writer_agent":
+        schema = getattr(llm_request.config, "response_schema", None) if llm_request.config else None
+        if getattr(schema, "__name__", "") == "MasterPromptVariants":
+            return {"text": json.dumps({"variants": [_slots(idea, i) for i in range(3)]})}
+        return {"text": json.dumps(_slots(idea))}
+
+    return {"text": f"Fake response from {agent_name or 'model'} for: {idea}"}
+
+
+class FakeLlm(BaseLlm):
+    """Offline model returning scripted or template-generated responses."""
+
+    model: str = "fake-gemini"
+    agent_name: str = ""
+
+    @classmethod
+    def supported_models(cls) -> List[str]:
+        return [r"fake-.*"]
+
+    def _response_spec(self, llm_request: LlmRequest) -> Dict[str, Any]:
+        script_path = os.getenv("FAKE_LLM_SCRIPT")
+        if script_path:
+            entries = _load_script(script_path).get(self.agent_name)
+            if entries:
+                turn = sum(1 for content in llm_request.contents or [] if content.role == "model")
+                return entries[min(turn, len(entries) - 1)]
+        return template_response(self.agent_name, llm_request)
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        spec = self._response_spec(llm_request)
+        text: Optional[str] = spec.get("text")
+        function_call = spec.get("function_call")
+
+        latency = env_float("FAKE_LLM_LATENCY_MS", 200.0)
+        jitter = env_float("FAKE_LLM_LATENCY_JITTER_MS", 100.0)
+        await asyncio.sleep(max(0.0, latency + random.uniform(-jitter, jitter)) / 1000)
+
+        if stream and text:
+            chunk_chars = env_int("FAKE_LLM_CHUNK_CHARS", 24)
+            chunk_delay = env_float("FAKE_LLM_CHUNK_DELAY_MS", 10.0) / 1000
+            for start in range(0, len(text), chunk_chars):
+                if start:
+                    await asyncio.sleep(chunk_delay)
+                yield LlmResponse(
+                    content=types.Content(
+                        role="model", parts=[types.Part(text=text[start:start + chunk_chars])]
+                    ),
+                    partial=True,
+                )
+
+        parts = []
+        if text:
+            parts.append(types.Part(text=text))
+        if function_call:
+            parts.append(
+                types.Part(
+                    function_call=types.FunctionCall(
+                        name=function_call["name"], args=function_call.get("args") or {}
+                    )
+                )
+            )
+
+        prompt_chars = sum(len(text) for text in _texts(llm_request))
+        yield LlmResponse(
+            content=types.Content(role="model", parts=parts),
+            usage_metadata=types.GenerateContentResponseUsageMetadata(
+                prompt_token_count=prompt_chars // 4 + 1,
+                candidates_token_count=len(text or "") // 4 + 1,
+                total_token_count=(prompt_chars + len(text or "")) // 4 + 2,
+            ),
+            turn_complete=True,
+        )
+
+
+LLMRegistry.register(FakeLlm)
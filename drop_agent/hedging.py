@@ -0,0 +1,430 @@
+"""
+Deadlines, hedged requests and circuit breaking for model calls in the
+82ndrop Agent System.
+
+A few Gemini calls take many times the median latency and push a whole
+pipeline past the HTTP keep-alive. ``HedgedGemini`` wraps the ADK Gemini
+model with two safeguards:
+- a per-step deadline: a call that has not finished in time is abandoned and
+  answered with a ``DEADLINE_EXCEEDED`` error response
+- optional hedging: when the first response has not arrived after the
+  hedge delay, an identical second request is sent and whichever answers
+  first is used (the other is cancelled)
+
+Both are opt-in: without MODEL_CALL_DEADLINE(S) calls have no deadline.
+A hedge is a second model call of the invocation. The model callbacks
+(see ``callbacks/model.py``) hand each call's accounting to the model
+through ``set_hedge_accounting``. A hedge is only sent when the invocation
+budget admits it. Its prompt tokens (the same as the answered request's)
+go to the budget and the usage ledger; the cancelled request's output is
+never reported.
+
+Each model also has a circuit breaker (see ``drop_agent.circuit_breaker``):
+while it is open, calls use CIRCUIT_FALLBACK_MODEL or fail fast.
+
+The hedge delay adapts to observed latency: it is a percentile of the
+recent time-to-first-response history of each (agent, model) pair,
+measured from the primary request (the time until the first of the
+primary and the hedge answered, or the deadline). Streams
+are hedged on their first chunk; once a request has answered, the rest of
+its stream is consumed from that request only.
+
+Configuration (environment variables):
+- MODEL_CALL_DEADLINE: seconds per model call (default: no deadline)
+- MODEL_CALL_DEADLINES: per-agent overrides, e.g. "prompt_writer_agent=45,guide_agent=20"
+- MODEL_HEDGING: "true" to enable hedged requests
+- HEDGE_PERCENTILE: latency percentile that triggers the hedge (default 0.95)
+- HEDGE_MIN_SAMPLES: observations needed before hedging an (agent, model) pair (default 20)
+- HEDGE_MIN_DELAY: lower bound of the hedge delay in seconds (default 1.0)
+- HEDGE_HISTORY_SIZE: latencies kept per (agent, model) pair (default 200)
+"""
+
+import os
+import asyncio
+import logging
+import threading
+import contextvars
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, AsyncGenerator, Callable, Deque, Dict, Optional, Tuple
+
+try:
+    from google.adk.models.google_llm import Gemini
+    from google.adk.models.llm_request import LlmRequest
+    from google.adk.models.llm_response import LlmResponse
+    from google.genai import types
+except ImportError:
+    # Fallback for development/testing
+    Gemini = object
+    LlmRequest = Any
+    LlmResponse = Any
+    types = Any
+
+from drop_agent.circuit_breaker import (
+    CIRCUIT_OPEN_ERROR,
+    MODEL_BREAKER_PREFIX,
+    CircuitBreaker,
+    get_breaker,
+    maybe_inject_failure,
+)
+from drop_agent.config import env_flag, env_float, env_int
+
+logger = logging.getLogger(__name__)
+
+DEADLINE_EXCEEDED_ERROR = "DEADLINE_EXCEEDED"
+
+_END = object()
+
+
+@dataclass
+class HedgeAccounting:
+    """Budget admission and usage recording for a model call's hedge."""
+
+    # Admits the hedge against the invocation budget (False refuses it)
+    admit: Callable[[], bool]
+    # Records the usage metadata of the duplicate request
+    record: Callable[[Any], None]
+
+
+# Accounting of the model call about to run in this task, set by
+# before_model_callback for every call it sends to the model
+_hedge_accounting: contextvars.ContextVar = contextvars.ContextVar("drop_agent_hedge_accounting", default=None)
+
+
+def set_hedge_accounting(accounting: Optional[HedgeAccounting]) -> None:
+    """Account the hedge of the next model call in this task with ``accounting``."""
+    _hedge_accounting.set(accounting)
+
+
+def get_deadline(agent_name: str) -> Optional[float]:
+    """Deadline in seconds for one model call of ``agent_name`` (None when disabled)."""
+    overrides = {}
+    for item in (os.getenv("MODEL_CALL_DEADLINES") or "").split(","):
+        if "=" in item:
+            name, seconds = item.split("=", 1)
+            if seconds.strip():
+                overrides[name.strip()] = float(seconds)
+    deadline = overrides.get(agent_name, env_float("MODEL_CALL_DEADLINE", 0.0))
+    return deadline if deadline > 0 else None
+
+
+def is_hedging_enabled() -> bool:
+    return env_flag("MODEL_HEDGING")
+
+
+class LatencyTracker:
+    """Recent time-to-first-response latencies per (agent, model) pair."""
+
+    def __init__(
+        self,
+        percentile: float = 0.95,
+        min_samples: int = 20,
+        min_delay: float = 1.0,
+        history_size: int = 200,
+    ):
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.history_size = history_size
+        self._history: Dict[Tuple[str, str], Deque[float]] = {}
+        self._lock = threading.Lock()
+        self.stats = {"calls": 0, "hedges": 0, "hedge_wins": 0, "hedges_refused": 0, "deadlines": 0}
+
+    @classmethod
+    def from_env(cls) -> "LatencyTracker":
+        return cls(
+            percentile=env_float("HEDGE_PERCENTILE", 0.95),
+            min_samples=env_int("HEDGE_MIN_SAMPLES", 20),
+            min_delay=env_float("HEDGE_MIN_DELAY", 1.0),
+            history_size=env_int("HEDGE_HISTORY_SIZE", 200),
+        )
+
+    def record(self, key: Tuple[str, str], latency: float) -> None:
+        with self._lock:
+            history = self._history.setdefault(key, deque(maxlen=self.history_size))
+            history.append(latency)
+
+    def hedge_delay(self, key: Tuple[str, str]) -> Optional[float]:
+        """
+        Seconds to wait before hedging a call.
+
+        Returns:
+            The delay, or None while there is too little history for ``key``
+        """
+        with self._lock:
+            history = sorted(self._history.get(key, ()))
+        if len(history) < self.min_samples:
+            return None
+        index = min(len(history) - 1, int(self.percentile * len(history)))
+        return max(self.min_delay, history[index])
+
+    def count(self, stat: str) -> None:
+        with self._lock:
+            self.stats[stat] += 1
+
+    def summary(self) -> Dict[str, Any]:
+        """Hedging counters and the current hedge delay of every pair."""
+        with self._lock:
+            keys = list(self._history)
+            stats = dict(self.stats)
+        return {
+            **stats,
+            "hedge_delays": {f"{agent}/{model}": self.hedge_delay((agent, model)) for agent, model in keys},
+        }
+
+
+_latency_tracker = None
+
+
+def get_latency_tracker() -> LatencyTracker:
+    """Get or initialize the shared latency tracker."""
+    global _latency_tracker
+    if _latency_tracker is None:
+        _latency_tracker = LatencyTracker.from_env()
+    return _latency_tracker
+
+
+def deadline_exceeded_response(agent_name: str, deadline: float) -> LlmResponse:
+    """Error response that ends the agent's turn when a call misses its deadline."""
+    message = f"{agent_name or 'model'} call exceeded its {deadline:g}s deadline"
+    return LlmResponse(
+        error_code=DEADLINE_EXCEEDED_ERROR,
+        error_message=message,
+        custom_metadata={"deadline_exceeded": message},
+        turn_complete=True,
+    )
+
+
+def circuit_open_response(breaker_name: str) -> LlmResponse:
+    """Local response that ends the agent's turn while a model's circuit is open."""
+    message = f"circuit '{breaker_name}' is open"
+    return LlmResponse(
+        content=types.Content(
+            role="model",
+            parts=[
+                types.Part(
+                    text=(
+                        "⚠️ The AI service is temporarily unavailable. "
+                        "Please try again in a minute."
+                    )
+                )
+            ],
+        ),
+        error_code=CIRCUIT_OPEN_ERROR,
+        error_message=message,
+        custom_metadata={"circuit_open": breaker_name},
+        turn_complete=True,
+    )
+
+
+async def _next_response(stream: AsyncGenerator) -> Any:
+    try:
+        return await stream.__anext__()
+    except StopAsyncIteration:
+        return _END
+
+
+def _abandon(tasks: Dict["asyncio.Future", AsyncGenerator]) -> None:
+    """Cancel pending calls and close their streams in the background."""
+    for task, stream in tasks.items():
+        task.cancel()
+        task.add_done_callback(lambda _, stream=stream: asyncio.ensure_future(stream.aclose()))
+
+
+async def hedged_generate(
+    start_call,
+    key: Tuple[str, str],
+    deadline: Optional[float],
+    hedging: bool,
+    tracker: LatencyTracker,
+    admit_hedge: Optional[Callable[[], bool]] = None,
+) -> AsyncGenerator[Any, None]:
+    """
+    Run a model call with a deadline and an optional hedged duplicate.
+
+    Args:
+        start_call: Function returning a new response stream for the request
+        key: (agent, model) pair used for the latency history
+        deadline: Seconds the whole call may take, or None
+        hedging: Whether a duplicate request may be sent
+        tracker: Latency history that sets the hedge delay
+        admit_hedge: Called before sending the hedge; False refuses it
+
+    Yields:
+        The responses of whichever request answered first, or a single
+        ``DEADLINE_EXCEEDED`` error response
+    """
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    deadline_at = started + deadline if deadline else None
+    hedge_delay = tracker.hedge_delay(key) if hedging else None
+    hedge_at = started + hedge_delay if hedge_delay is not None else None
+    tracker.count("calls")
+
+    stream = start_call()
+    tasks = {asyncio.ensure_future(_next_response(stream)): stream}
+    primary = stream
+    winner, first, failure = None, None, None
+
+    try:
+        while winner is None:
+            wake_times = [at for at in (deadline_at, hedge_at) if at is not None]
+            timeout = max(0.0, min(wake_times) - loop.time()) if wake_times else None
+            done, _ = await asyncio.wait(list(tasks), timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+            for task in done:
+                stream = tasks.pop(task)
+                if task.exception() is None:
+                    winner, first = stream, task.result()
+                    break
+                failure = task.exception()
+                if not tasks and hedge_at is None:
+                    raise failure
+                logger.warning(f"{key[0]}/{key[1]} call failed, relying on the hedge: {task.exception()}")
+                if not tasks:
+                    # Send the hedge right away instead of waiting for its delay
+                    hedge_at = loop.time()
+            if winner is not None:
+                break
+
+            now = loop.time()
+            if hedge_at is not None and now >= hedge_at:
+                hedge_at = None
+                if admit_hedge is None or admit_hedge():
+                    hedge = start_call()
+                    tasks[asyncio.ensure_future(_next_response(hedge))] = hedge
+                    tracker.count("hedges")
+                    logger.info(f"Hedging {key[0]}/{key[1]} call after {now - started:.2f}s")
+                else:
+                    tracker.count("hedges_refused")
+                    logger.info(f"Hedge of {key[0]}/{key[1]} call refused by the invocation budget")
+                    if not tasks:
+                        raise failure
+            elif deadline_at is not None and now >= deadline_at:
+                # The primary took at least this long
+                tracker.record(key, now - started)
+                tracker.count("deadlines")
+                logger.warning(f"{key[0]}/{key[1]} call missed its {deadline:g}s deadline")
+                yield deadline_exceeded_response(key[0], deadline)
+                return
+    finally:
+        _abandon(tasks)
+
+    # Time since the primary was sent, also when the hedge answered first:
+    # recording the winner's own latency would drop the slow calls hedging
+    # hides and pull the hedge delay down with every hedge that wins
+    tracker.record(key, loop.time() - started)
+    if winner is not primary:
+        tracker.count("hedge_wins")
+
+    response = first
+    while response is not _END:
+        yield response
+        remaining = deadline_at - loop.time() if deadline_at is not None else None
+        try:
+            response = await asyncio.wait_for(_next_response(winner), remaining)
+        except asyncio.TimeoutError:
+            tracker.count("deadlines")
+            logger.warning(f"{key[0]}/{key[1]} stream missed its {deadline:g}s deadline")
+            await winner.aclose()
+            yield deadline_exceeded_response(key[0], deadline)
+            return
+
+
+class HedgedGemini(Gemini):
+    """
+    Gemini model with a per-step deadline, optional hedged requests and a
+    circuit breaker per model.
+    """
+
+    agent_name: str = ""
+
+    def _admit(self, llm_request: LlmRequest) -> Tuple[Optional[CircuitBreaker], bool]:
+        """
+        Pick the breaker for this call, falling back to another model when open.
+
+        Returns:
+            (breaker, admitted) where breaker is None when breakers are disabled
+        """
+        model = llm_request.model or self.model
+        breaker = get_breaker(MODEL_BREAKER_PREFIX + model)
+        if breaker is None or breaker.allow():
+            return breaker, True
+
+        fallback = os.getenv("CIRCUIT_FALLBACK_MODEL")
+        if fallback and fallback != model:
+            fallback_breaker = get_breaker(MODEL_BREAKER_PREFIX + fallback)
+            if fallback_breaker.allow():
+                logger.warning(f"Circuit open for {model}, {self.agent_name} falls back to {fallback}")
+                llm_request.model = fallback
+                return fallback_breaker, True
+        return breaker, False
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        breaker, admitted = self._admit(llm_request)
+        if not admitted:
+            logger.warning(f"Circuit open for {breaker.name}, failing {self.agent_name} call fast")
+            yield circuit_open_response(breaker.name)
+            return
+
+        hedging = is_hedging_enabled()
+        # Snapshot before the first call, which preprocesses its request in place
+        snapshot = (
+            llm_request.model_copy(
+                update={
+                    "contents": [content.model_copy(deep=True) for content in llm_request.contents],
+                    "config": llm_request.config.model_copy(deep=True),
+                }
+            )
+            if hedging
+            else None
+        )
+        requests = [llm_request]
+        accounting = _hedge_accounting.get() if hedging else None
+        hedged = []
+
+        def admit_hedge() -> bool:
+            if accounting is not None and not accounting.admit():
+                return False
+            hedged.append(True)
+            return True
+
+        def start_call():
+            # The first call uses ADK's request; the hedge gets its own copy
+            request = requests.pop() if requests else snapshot
+            return super(HedgedGemini, self).generate_content_async(request, stream)
+
+        key = (self.agent_name, llm_request.model or self.model)
+        succeeded = None
+        usage_metadata = None
+        try:
+            if breaker is not None:
+                maybe_inject_failure(breaker.name)
+            async for response in hedged_generate(
+                start_call,
+                key,
+                deadline=get_deadline(self.agent_name),
+                hedging=hedging,
+                tracker=get_latency_tracker(),
+                admit_hedge=admit_hedge,
+            ):
+                if response.error_code == DEADLINE_EXCEEDED_ERROR:
+                    succeeded = False
+                if not response.partial and response.usage_metadata:
+                    usage_metadata = response.usage_metadata
+                yield response
+            if succeeded is None:
+                succeeded = True
+        except Exception:
+            succeeded = False
+            raise
+        finally:
+            if hedged and accounting is not None:
+                accounting.record(usage_metadata)
+            # A call abandoned by the consumer reports nothing
+            if breaker is not None and succeeded is True:
+                breaker.record_success()
+            elif breaker is not None and succeeded is False:
+                breaker.record_failure()
@@ -0,0 +1,177 @@
+"""
+Low-overhead callback instrumentation for the 82ndrop Agent System.
+
+Every agent, model and tool hop runs a before and an after callback. Instead
+of several INFO lines each, the callbacks emit one structured event per hop
+(``agent.start``, ``agent.end``, ``model.request``, ``model.response``,
+``tool.start``, ``tool.end``) through the hop sink:
+- sampling is per invocation (a hash of the invocation id), so a sampled
+  request keeps all of its hops and an unsampled one costs a single check
+- errors and hops slower than INSTRUMENTATION_SLOW_MS are always emitted
+- the event is a lazy payload: it is serialized to JSON only when a handler
+  actually formats the record, and long fields (tool responses, arguments)
+  are truncated to INSTRUMENTATION_MAX_FIELD_CHARS
+- agents can be switched off or given their own sample rate
+- with tracing enabled (see tracing.py), events carry the trace id
+
+Events are logged by the ``drop_agent.instrumentation`` logger, so they can
+be routed or silenced like any other logger.
+
+Configuration (environment variables):
+- INSTRUMENTATION: "false" to disable hop events
+- INSTRUMENTATION_SAMPLE_RATE: fraction of invocations emitted (default 0.1)
+- INSTRUMENTATION_SLOW_MS: hops at least this slow are always emitted (default 5000)
+- INSTRUMENTATION_MAX_FIELD_CHARS: max characters per field (default 256)
+- INSTRUMENTATION_AGENTS: per-agent overrides, e.g. "search_agent=off,prompt_writer_agent=1"
+"""
+
+import os
+import json
+import zlib
+import random
+import logging
+from typing import Any, Dict, Optional
+
+from .tracing import current_span_ids
+
+from .config import env_flag, env_float, env_int
+
+logger = logging.getLogger(__name__)
+
+
+def parse_agent_overrides(value: str) -> Dict[str, float]:
+    """Parse "agent=rate" pairs; "on"/"off" mean 1 and 0."""
+    overrides = {}
+    for item in value.split(","):
+        name, _, rate = item.partition("=")
+        name, rate = name.strip(), rate.strip().lower()
+        if not name:
+            continue
+        if rate in ("off", "false", "no"):
+            overrides[name] = 0.0
+        elif rate in ("", "on", "true", "yes"):
+            overrides[name] = 1.0
+        else:
+            overrides[name] = float(rate)
+    return overrides
+
+
+def _truncate(value: Any, max_chars: int) -> Any:
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    text = value if isinstance(value, str) else json.dumps(value, default=str)
+    if len(text) > max_chars:
+        return f"{text[:max_chars]}...[{len(text) - max_chars} more]"
+    return text
+
+
+class HopEvent:
+    """One hop's fields, formatted only when a log handler renders them."""
+
+    __slots__ = ("fields", "max_chars")
+
+    def __init__(self, fields: Dict[str, Any], max_chars: int):
+        self.fields = fields
+        self.max_chars = max_chars
+
+    def __str__(self) -> str:
+        return json.dumps(
+            {
+                name: _truncate(value, self.max_chars)
+                for name, value in self.fields.items()
+                if value is not None
+            }
+        )
+
+
+class HopSink:
+    """Sampling-aware sink for callback hop events."""
+
+    def __init__(
+        self,
+        sample_rate: float = 0.1,
+        slow_ms: float = 5000.0,
+        max_field_chars: int = 256,
+        agents: Optional[Dict[str, float]] = None,
+    ):
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.max_field_chars = max_field_chars
+        self.agents = agents or {}
+        self.emitted = 0
+        self.dropped = 0
+
+    @classmethod
+    def from_env(cls) -> "HopSink":
+        return cls(
+            sample_rate=env_float("INSTRUMENTATION_SAMPLE_RATE", 0.1),
+            slow_ms=env_float("INSTRUMENTATION_SLOW_MS", 5000.0),
+            max_field_chars=env_int("INSTRUMENTATION_MAX_FIELD_CHARS", 256),
+            agents=parse_agent_overrides(os.getenv("INSTRUMENTATION_AGENTS") or ""),
+        )
+
+    def should_emit(
+        self,
+        agent: str,
+        invocation_id: Optional[str] = None,
+        error: bool = False,
+        duration_ms: Optional[float] = None,
+    ) -> bool:
+        rate = self.agents.get(agent, self.sample_rate)
+        if rate <= 0 or not logger.isEnabledFor(logging.INFO):
+            return False
+        if rate >= 1 or error or (duration_ms is not None and duration_ms >= self.slow_ms):
+            return True
+        if invocation_id:
+            # Same decision for every hop of the invocation
+            return zlib.crc32(invocation_id.encode()) / 0xFFFFFFFF < rate
+        return random.random() < rate
+
+    def emit(
+        self,
+        hop: str,
+        agent: str,
+        invocation_id: Optional[str] = None,
+        error: bool = False,
+        duration_ms: Optional[float] = None,
+        **fields: Any,
+    ) -> None:
+        """Emit one hop event if it is sampled; fields are formatted lazily."""
+        if not self.should_emit(agent, invocation_id, error, duration_ms):
+            self.dropped += 1
+            return
+        self.emitted += 1
+        event = {"hop": hop, "agent": agent, "invocation_id": invocation_id}
+        if duration_ms is not None:
+            event["duration_ms"] = round(duration_ms, 2)
+        if error:
+            event["error"] = error
+        trace_id, _ = current_span_ids()
+        if trace_id:
+            event["trace_id"] = trace_id
+        event.update(fields)
+        logger.log(logging.WARNING if error else logging.INFO, "%s", HopEvent(event, self.max_field_chars))
+
+
+_hop_sink = None
+
+
+def get_hop_sink() -> Optional[HopSink]:
+    """Get or initialize the hop sink (None when disabled)."""
+    global _hop_sink
+    if _hop_sink is None and env_flag("INSTRUMENTATION", default=True):
+        _hop_sink = HopSink.from_env()
+    return _hop_sink
+
+
+def reset_hop_sink() -> None:
+    """Drop the sink so the next call re-reads the configuration."""
+    global _hop_sink
+    _hop_sink = None
+
+
+def emit_hop(hop: str, agent: str, **fields: Any) -> None:
+    """Emit a hop event through the process-wide sink."""
+    sink = get_hop_sink()
+    if sink is not None:
+        sink.emit(hop, agent, **fields)
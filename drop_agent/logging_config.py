@@ -1,17 +1,75 @@
 """
 Logging and Analytics Configuration for 82ndrop API
 Tracks user behavior, API usage, and system performance
+
+Log calls don't touch the disk: the API loggers put records on a bounded
+queue and a background listener thread writes them to the file (and
+console) handlers. When the queue is full, the overflow policy decides
+what is lost:
+- drop_debug: make room by dropping the least important queued record
+  below the new one's level (debug first, then info...), else drop the new one
+- drop_new: drop the new record
+- block: wait up to LOG_QUEUE_BLOCK_SECONDS for room, then drop it
+Queued records are flushed on shutdown (``api_logger.shutdown()``, also
+run at exit).
+
+The log files rotate when they reach LOG_MAX_BYTES or LOG_ROTATE_SECONDS,
+whichever comes first. Rotated segments are compressed (gzip, or zstd with
+the zstandard package) and listed in logs/manifest.json; when the directory
+exceeds LOG_TOTAL_MAX_BYTES the oldest segments are deleted first, so logs
+can't fill an in-memory filesystem. ``iter_log_lines()`` reads a log
+across its segments and the live file.
+
+AnalyticsTracker keeps memory bounded: daily unique users are counted with
+a HyperLogLog (about 1.6% error) and response times go to a DDSketch (1%
+relative error on p50/p95/p99), days older than ANALYTICS_RETENTION_DAYS
+are dropped, and per-user stats keep the ANALYTICS_MAX_USERS most recently
+seen users. A lock lets request analytics apply batches from a worker
+thread while the endpoints read summaries.
+
+Configuration (environment variables):
+- LOG_QUEUE: "false" to write from the calling thread (default enabled)
+- LOG_QUEUE_SIZE: records the queue holds (default 10000)
+- LOG_QUEUE_OVERFLOW: drop_debug, drop_new or block (default drop_debug)
+- LOG_QUEUE_BLOCK_SECONDS: longest wait of the block policy (default 0.1)
+- LOG_ROTATION: "false" to write plain, never rotated files (default enabled)
+- LOG_MAX_BYTES: size at which a log file rotates (default 10MB)
+- LOG_ROTATE_SECONDS: age at which a log file rotates (default 86400)
+- LOG_TOTAL_MAX_BYTES: cap on the logs directory (default 50MB)
+- LOG_COMPRESSION: gzip, zstd or none (default gzip)
+- ANALYTICS_RETENTION_DAYS: days of analytics kept in memory (default 30)
+- ANALYTICS_MAX_USERS: users with per-user stats kept in memory (default 10000)
 """
 
+import io
+import gzip
 import logging
+import logging.handlers
 import json
 import time
-from datetime import datetime
-from typing import Dict, Any, Optional
+import queue
+import atexit
+import math
+import shutil
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Any, Iterator, List, Optional
 from dataclasses import dataclass, asdict
 from pathlib import Path
 import os
 
+from .config import env_flag, env_float, env_int
+
+try:
+    import zstandard
+
+    ZSTD_AVAILABLE = True
+except ImportError:
+    # Fallback when zstandard is not installed: segments are gzipped
+    ZSTD_AVAILABLE = False
+
 # Create logs directory
 logs_dir = Path("logs")
 logs_dir.mkdir(exist_ok=True)
@@ -33,15 +91,253 @@ class UserAnalytics:
     error_message: Optional[str] = None
     user_agent: Optional[str] = None
     ip_address: Optional[str] = None
+    request_bytes: Optional[int] = None
+    response_bytes: Optional[int] = None
     
     def __post_init__(self):
         if self.timestamp is None:
             self.timestamp = datetime.now().isoformat()
 
+OVERFLOW_POLICIES = ("drop_debug", "drop_new", "block")
+
+# Endpoints that carry a chat message to the agent
+CHAT_ENDPOINTS = ("/chat", "/run", "/run_sse")
+
+MANIFEST_NAME = "manifest.json"
+CODEC_SUFFIXES = {"gzip": ".gz", "zstd": ".zst", "none": ""}
+
+
+class BoundedQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler for a bounded queue, with an overflow policy"""
+
+    def __init__(self, log_queue: queue.Queue, overflow: str = "drop_debug", block_seconds: float = 0.1):
+        super().__init__(log_queue)
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown log queue overflow policy: {overflow}")
+        self.overflow = overflow
+        self.block_seconds = block_seconds
+        self.dropped: Dict[str, int] = {}
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+            return
+        except queue.Full:
+            pass
+
+        try:
+            if self.overflow == "block":
+                self.queue.put(record, timeout=self.block_seconds)
+                return
+            if self.overflow == "drop_debug":
+                evicted = self._evict_below(record.levelno)
+                if evicted is not None:
+                    self._count_drop(evicted)
+                    self.queue.put_nowait(record)
+                    return
+        except queue.Full:
+            pass
+        self._count_drop(record)
+
+    def _evict_below(self, level: int) -> Optional[logging.LogRecord]:
+        """Remove the oldest queued record of the lowest level below ``level``"""
+        with self.queue.mutex:
+            victim = None
+            for queued in self.queue.queue:
+                # None is the listener's stop sentinel
+                if queued is not None and queued.levelno < level and (
+                    victim is None or queued.levelno < victim.levelno
+                ):
+                    victim = queued
+            if victim is None:
+                return None
+            self.queue.queue.remove(victim)
+            self.queue.unfinished_tasks -= 1
+            return victim
+
+    def _count_drop(self, record: logging.LogRecord):
+        self.dropped[record.levelname] = self.dropped.get(record.levelname, 0) + 1
+
+
+class FlushingQueueListener(logging.handlers.QueueListener):
+    """QueueListener whose stop waits for room in a full queue instead of failing"""
+
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+
+class SegmentManifest:
+    """Rotated log segments of a log directory, with a total size cap"""
+
+    def __init__(self, log_dir: Path, total_max_bytes: int = 50 * 1024 * 1024):
+        self.log_dir = Path(log_dir)
+        self.path = self.log_dir / MANIFEST_NAME
+        self.total_max_bytes = total_max_bytes
+        self.active: List[Path] = []
+        self._lock = threading.Lock()
+        self.segments: List[Dict[str, Any]] = [
+            segment for segment in self._load() if (self.log_dir / segment["file"]).exists()
+        ]
+
+    def _load(self) -> List[Dict[str, Any]]:
+        try:
+            with open(self.path) as f:
+                return json.load(f).get("segments", [])
+        except (OSError, ValueError):
+            return []
+
+    def _save(self):
+        tmp = self.path.with_suffix(".tmp")
+        with open(tmp, "w") as f:
+            json.dump({"segments": self.segments}, f, indent=2)
+        os.replace(tmp, self.path)
+
+    def add_segment(self, path: Path, opened_at: float, codec: str):
+        """Move a full log file into a (compressed) segment, then apply the cap"""
+        path = Path(path)
+        closed_at = time.time()
+        name = f"{path.name}.{datetime.fromtimestamp(closed_at).strftime('%Y%m%dT%H%M%S')}"
+        with self._lock:
+            # Several rotations within a second get a sequence number
+            sequence = 0
+            while (self.log_dir / f"{name}.{sequence}{CODEC_SUFFIXES[codec]}").exists():
+                sequence += 1
+            segment_path = self.log_dir / f"{name}.{sequence}{CODEC_SUFFIXES[codec]}"
+            raw_bytes = path.stat().st_size
+            _compress(path, segment_path, codec)
+            path.unlink()
+            self.segments.append(
+                {
+                    "log": path.name,
+                    "file": segment_path.name,
+                    "codec": codec,
+                    "opened": datetime.fromtimestamp(opened_at).isoformat(),
+                    "closed": datetime.fromtimestamp(closed_at).isoformat(),
+                    "bytes": raw_bytes,
+                    "stored_bytes": segment_path.stat().st_size,
+                }
+            )
+            self._enforce_cap()
+            self._save()
+
+    def _enforce_cap(self):
+        """Delete the oldest segments (of any log) while the directory is over the cap"""
+        total = sum(segment["stored_bytes"] for segment in self.segments)
+        total += sum(path.stat().st_size for path in self.active if path.exists())
+        while self.segments and total > self.total_max_bytes:
+            oldest = self.segments.pop(0)
+            total -= oldest["stored_bytes"]
+            try:
+                (self.log_dir / oldest["file"]).unlink()
+            except FileNotFoundError:
+                pass
+            logging.getLogger(__name__).debug(f"Deleted log segment {oldest['file']} (size cap)")
+
+    def segments_of(self, log_name: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [segment for segment in self.segments if segment["log"] == log_name]
+
+
+def _compress(source: Path, target: Path, codec: str):
+    with open(source, "rb") as src:
+        if codec == "gzip":
+            with gzip.open(target, "wb") as dst:
+                shutil.copyfileobj(src, dst)
+        elif codec == "zstd":
+            with open(target, "wb") as dst:
+                zstandard.ZstdCompressor().copy_stream(src, dst)
+        else:
+            with open(target, "wb") as dst:
+                shutil.copyfileobj(src, dst)
+
+
+def _open_segment(path: Path, codec: str):
+    if codec == "gzip":
+        return gzip.open(path, "rt", encoding="utf-8")
+    if codec == "zstd":
+        return io.TextIOWrapper(zstandard.ZstdDecompressor().stream_reader(open(path, "rb")), encoding="utf-8")
+    return open(path, encoding="utf-8")
+
+
+class SegmentedLogHandler(logging.handlers.BaseRotatingHandler):
+    """File handler rotating on size and age into compressed, manifest-tracked segments"""
+
+    def __init__(
+        self,
+        filename: Path,
+        manifest: SegmentManifest,
+        max_bytes: int = 10 * 1024 * 1024,
+        rotate_seconds: float = 86400,
+        codec: str = "gzip",
+    ):
+        super().__init__(filename, "a", encoding="utf-8")
+        self.manifest = manifest
+        self.max_bytes = max_bytes
+        self.rotate_seconds = rotate_seconds
+        self.codec = codec
+        self.opened_at = time.time()
+        manifest.active.append(Path(self.baseFilename))
+
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        if self.stream is None:
+            self.stream = self._open()
+        size = self.stream.tell()
+        if not size:
+            return False
+        return bool(
+            (self.max_bytes and size >= self.max_bytes)
+            or (self.rotate_seconds and time.time() - self.opened_at >= self.rotate_seconds)
+        )
+
+    def doRollover(self):
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+        try:
+            self.manifest.add_segment(Path(self.baseFilename), self.opened_at, self.codec)
+        except OSError as e:
+            logging.getLogger(__name__).warning(f"Could not rotate {self.baseFilename}: {e}")
+        self.opened_at = time.time()
+        self.stream = self._open()
+
+
+def iter_log_lines(log_name: str, log_dir: Optional[Path] = None) -> Iterator[str]:
+    """
+    Lines of a log across its rotated segments (oldest first) and the live file
+
+    Args:
+        log_name: File name of the log, e.g. "user_analytics.jsonl"
+        log_dir: Directory of the logs (default ./logs)
+    """
+    log_dir = Path(log_dir) if log_dir is not None else logs_dir
+    for segment in SegmentManifest(log_dir).segments_of(log_name):
+        try:
+            with _open_segment(log_dir / segment["file"], segment["codec"]) as f:
+                yield from f
+        except FileNotFoundError:
+            # Deleted by the size cap while reading
+            continue
+    live = log_dir / log_name
+    if live.exists():
+        with open(live, encoding="utf-8") as f:
+            yield from f
+
+
 class APILogger:
     """Centralized logging system for API usage and analytics"""
     
-    def __init__(self):
+    def __init__(self, log_dir: Optional[Path] = None, use_queue: Optional[bool] = None):
+        self.log_dir = Path(log_dir) if log_dir is not None else logs_dir
+        self.use_queue = env_flag("LOG_QUEUE", default=True) if use_queue is None else use_queue
+        self.queue_handler: Optional[BoundedQueueHandler] = None
+        self.listener: Optional[FlushingQueueListener] = None
+        self._handlers: List[logging.Handler] = []
+        self.manifest: Optional[SegmentManifest] = None
+        if env_flag("LOG_ROTATION", default=True):
+            self.manifest = SegmentManifest(
+                self.log_dir, total_max_bytes=env_int("LOG_TOTAL_MAX_BYTES", 50 * 1024 * 1024)
+            )
+        
         # Configure main API logger
         self.api_logger = logging.getLogger("api_usage")
         self.api_logger.setLevel(logging.INFO)
@@ -55,34 +351,35 @@ class APILogger:
         self.error_logger.setLevel(logging.ERROR)
         
         self._setup_handlers()
+        atexit.register(self.shutdown)
     
     def _setup_handlers(self):
         """Set up file handlers for different log types"""
         
         # API Usage Handler (all API calls)
-        api_handler = logging.FileHandler(logs_dir / "api_usage.log")
+        api_handler = self._file_handler("api_usage.log")
         api_handler.setLevel(logging.INFO)
         api_formatter = logging.Formatter(
             '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
         )
         api_handler.setFormatter(api_formatter)
-        self.api_logger.addHandler(api_handler)
+        self._attach(self.api_logger, api_handler)
         
         # Analytics Handler (structured JSON for analysis)
-        analytics_handler = logging.FileHandler(logs_dir / "user_analytics.jsonl")
+        analytics_handler = self._file_handler("user_analytics.jsonl")
         analytics_handler.setLevel(logging.INFO)
         analytics_formatter = logging.Formatter('%(message)s')
         analytics_handler.setFormatter(analytics_formatter)
-        self.analytics_logger.addHandler(analytics_handler)
+        self._attach(self.analytics_logger, analytics_handler)
         
         # Error Handler (errors and exceptions)
-        error_handler = logging.FileHandler(logs_dir / "api_errors.log")
+        error_handler = self._file_handler("api_errors.log")
         error_handler.setLevel(logging.ERROR)
         error_formatter = logging.Formatter(
             '%(asctime)s - %(name)s - %(levelname)s - %(message)s - %(pathname)s:%(lineno)d'
         )
         error_handler.setFormatter(error_formatter)
-        self.error_logger.addHandler(error_handler)
+        self._attach(self.error_logger, error_handler)
         
         # Console handler for development
         if os.getenv("ENV", "development") == "development":
@@ -92,7 +389,73 @@ class APILogger:
                 '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
             )
             console_handler.setFormatter(console_formatter)
-            self.api_logger.addHandler(console_handler)
+            self._attach(self.api_logger, console_handler)
+        
+        if self.use_queue:
+            # Each handler only takes its own logger's records off the shared queue
+            self.queue_handler = BoundedQueueHandler(
+                queue.Queue(maxsize=env_int("LOG_QUEUE_SIZE", 10000)),
+                overflow=(os.getenv("LOG_QUEUE_OVERFLOW") or "drop_debug").strip().lower(),
+                block_seconds=env_float("LOG_QUEUE_BLOCK_SECONDS", 0.1),
+            )
+            for logger in (self.api_logger, self.analytics_logger, self.error_logger):
+                logger.addHandler(self.queue_handler)
+            self.listener = FlushingQueueListener(
+                self.queue_handler.queue, *self._handlers, respect_handler_level=True
+            )
+            self.listener.start()
+    
+    def _file_handler(self, name: str) -> logging.Handler:
+        """A rotating, compressing handler for one log file (plain without rotation)"""
+        if self.manifest is None:
+            return logging.FileHandler(self.log_dir / name)
+        codec = (os.getenv("LOG_COMPRESSION") or "gzip").strip().lower()
+        if codec == "zstd" and not ZSTD_AVAILABLE:
+            logging.getLogger(__name__).warning("zstandard is not installed; log segments are gzipped")
+            codec = "gzip"
+        if codec not in CODEC_SUFFIXES:
+            raise ValueError(f"Unknown log compression: {codec}")
+        return SegmentedLogHandler(
+            self.log_dir / name,
+            self.manifest,
+            max_bytes=env_int("LOG_MAX_BYTES", 10 * 1024 * 1024),
+            rotate_seconds=env_float("LOG_ROTATE_SECONDS", 86400.0),
+            codec=codec,
+        )
+    
+    def _attach(self, logger: logging.Logger, handler: logging.Handler):
+        """Add a handler directly, or behind the queue when it's enabled"""
+        if self.use_queue:
+            handler.addFilter(logging.Filter(logger.name))
+        else:
+            logger.addHandler(handler)
+        self._handlers.append(handler)
+    
+    def queue_stats(self) -> Dict[str, Any]:
+        """Queue depth and records dropped on overflow, by level"""
+        if self.queue_handler is None:
+            return {"enabled": False}
+        return {
+            "enabled": True,
+            "size": self.queue_handler.queue.qsize(),
+            "capacity": self.queue_handler.queue.maxsize,
+            "overflow": self.queue_handler.overflow,
+            "dropped": dict(self.queue_handler.dropped),
+        }
+    
+    def shutdown(self):
+        """Write out queued records and close the handlers"""
+        if self.listener is not None:
+            # Stopping the listener processes everything still queued
+            self.listener.stop()
+            self.listener = None
+        for logger in (self.api_logger, self.analytics_logger, self.error_logger):
+            for handler in self._handlers + [self.queue_handler]:
+                logger.removeHandler(handler)
+        for handler in self._handlers:
+            handler.flush()
+            handler.close()
+        self._handlers = []
     
     def log_api_request(self, user_analytics: UserAnalytics):
         """Log API request with user analytics"""
@@ -163,34 +526,159 @@ class APILogger:
         else:
             self.api_logger.warning(f"Authentication failed - User: {user_id} ({email}) - Reason: {reason}")
 
+class HyperLogLog:
+    """Mergeable distinct-count sketch (standard error about 1.04 / sqrt(2 ** precision))"""
+
+    def __init__(self, precision: int = 12):
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    def add(self, value: str):
+        hashed = int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big")
+        index = hashed >> (64 - self.precision)
+        rest = hashed & ((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other: "HyperLogLog"):
+        self.registers = bytearray(max(a, b) for a, b in zip(self.registers, other.registers))
+
+    def count(self) -> int:
+        # Ertl's improved estimator: unbiased from small to large cardinalities
+        # without the empirical bias tables of HyperLogLog++
+        m = len(self.registers)
+        q = 64 - self.precision
+        histogram = [0] * (q + 2)
+        for register in self.registers:
+            histogram[register] += 1
+        z = m * _hll_tau(1 - histogram[q + 1] / m)
+        for k in range(q, 0, -1):
+            z = 0.5 * (z + histogram[k])
+        z += m * _hll_sigma(histogram[0] / m)
+        return round(m * m / (2 * math.log(2) * z))
+
+
+def _hll_sigma(x: float) -> float:
+    if x == 1:
+        return math.inf
+    y, z = 1.0, x
+    while True:
+        x *= x
+        previous = z
+        z += x * y
+        y += y
+        if z == previous:
+            return z
+
+
+def _hll_tau(x: float) -> float:
+    if x in (0, 1):
+        return 0.0
+    y, z = 1.0, 1 - x
+    while True:
+        x = math.sqrt(x)
+        previous = z
+        y *= 0.5
+        z -= (1 - x) ** 2 * y
+        if z == previous:
+            return z / 3
+
+
+class DDSketch:
+    """Mergeable quantile sketch with bounded relative error (``relative_accuracy``)"""
+
+    def __init__(self, relative_accuracy: float = 0.01, max_bins: int = 2048):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.max_bins = max_bins
+        self.bins: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+
+    def add(self, value: float):
+        self.count += 1
+        if value <= 0:
+            self.zero_count += 1
+            return
+        key = math.ceil(math.log(value) / self.log_gamma)
+        self.bins[key] = self.bins.get(key, 0) + 1
+        if len(self.bins) > self.max_bins:
+            self._collapse()
+
+    def _collapse(self):
+        # Fold the lowest bins together; only the smallest values lose accuracy
+        keys = sorted(self.bins)
+        excess = len(keys) - self.max_bins + 1
+        folded = sum(self.bins.pop(key) for key in keys[:excess])
+        self.bins[keys[excess]] += folded
+
+    def merge(self, other: "DDSketch"):
+        for key, count in other.bins.items():
+            self.bins[key] = self.bins.get(key, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        if len(self.bins) > self.max_bins:
+            self._collapse()
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for key in sorted(self.bins):
+            seen += self.bins[key]
+            if seen > rank:
+                return 2 * self.gamma ** key / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.bins) / (self.gamma + 1)
+
+
+def _new_day_stats() -> Dict[str, Any]:
+    return {
+        "total_requests": 0,
+        "unique_users": HyperLogLog(),
+        "latency": DDSketch(),
+        "total_response_time": 0,
+        "successful_requests": 0,
+        "failed_requests": 0,
+        "chat_messages": 0,
+        "access_levels": {}
+    }
+
+
 class AnalyticsTracker:
-    """Track and aggregate user analytics"""
+    """Track and aggregate user analytics in bounded memory"""
     
-    def __init__(self):
-        self.daily_stats = {}
-        self.user_stats = {}
+    def __init__(self, retention_days: Optional[int] = None, max_users: Optional[int] = None):
+        self.retention_days = retention_days if retention_days is not None else env_int("ANALYTICS_RETENTION_DAYS", 30)
+        self.max_users = max_users if max_users is not None else env_int("ANALYTICS_MAX_USERS", 10000)
+        self.daily_stats: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.user_stats: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        # Batches are applied from a worker thread while endpoints read on the loop
+        self._lock = threading.Lock()
     
     def track_usage(self, user_analytics: UserAnalytics):
         """Track usage statistics"""
         
+        with self._lock:
+            self._track_usage(user_analytics)
+    
+    def _track_usage(self, user_analytics: UserAnalytics):
         today = datetime.now().strftime("%Y-%m-%d")
         user_id = user_analytics.user_id
         
         # Daily stats
         if today not in self.daily_stats:
-            self.daily_stats[today] = {
-                "total_requests": 0,
-                "unique_users": set(),
-                "total_response_time": 0,
-                "successful_requests": 0,
-                "failed_requests": 0,
-                "chat_messages": 0,
-                "access_levels": {}
-            }
+            self.daily_stats[today] = _new_day_stats()
+            self._evict_old_days(today)
         
         daily = self.daily_stats[today]
         daily["total_requests"] += 1
         daily["unique_users"].add(user_id)
+        daily["latency"].add(user_analytics.response_time_ms)
         daily["total_response_time"] += user_analytics.response_time_ms
         
         if user_analytics.status_code < 400:
@@ -198,14 +686,14 @@ class AnalyticsTracker:
         else:
             daily["failed_requests"] += 1
         
-        if user_analytics.endpoint == "/chat":
+        if user_analytics.endpoint in CHAT_ENDPOINTS:
             daily["chat_messages"] += 1
         
         # Track access levels
         level = user_analytics.access_level
         daily["access_levels"][level] = daily["access_levels"].get(level, 0) + 1
         
-        # User-specific stats
+        # User-specific stats (least recently seen users are dropped first)
         if user_id not in self.user_stats:
             self.user_stats[user_id] = {
                 "total_requests": 0,
@@ -218,6 +706,10 @@ class AnalyticsTracker:
                 "successful_requests": 0,
                 "failed_requests": 0
             }
+            while len(self.user_stats) > self.max_users:
+                self.user_stats.popitem(last=False)
+        else:
+            self.user_stats.move_to_end(user_id)
         
         user = self.user_stats[user_id]
         user["total_requests"] += 1
@@ -230,21 +722,34 @@ class AnalyticsTracker:
         else:
             user["failed_requests"] += 1
         
-        if user_analytics.endpoint == "/chat":
+        if user_analytics.endpoint in CHAT_ENDPOINTS:
             user["total_chat_messages"] += 1
     
+    def _evict_old_days(self, today: str):
+        """Drop days that fell out of the retention window"""
+        oldest = (datetime.strptime(today, "%Y-%m-%d") - timedelta(days=self.retention_days - 1)).strftime("%Y-%m-%d")
+        for date in [date for date in self.daily_stats if date < oldest]:
+            del self.daily_stats[date]
+    
     def get_daily_summary(self, date: str = None) -> Dict[str, Any]:
         """Get daily usage summary"""
         
         if date is None:
             date = datetime.now().strftime("%Y-%m-%d")
         
+        with self._lock:
+            return self._daily_summary(date)
+    
+    def _daily_summary(self, date: str) -> Dict[str, Any]:
         if date not in self.daily_stats:
             # Return default stats for days with no data
             return {
                 "total_requests": 0,
                 "unique_users": 0,
                 "avg_response_time": None,
+                "p50_response_time": None,
+                "p95_response_time": None,
+                "p99_response_time": None,
                 "successful_requests": 0,
                 "failed_requests": 0,
                 "chat_messages": 0,
@@ -252,15 +757,23 @@ class AnalyticsTracker:
             }
         
         stats = self.daily_stats[date].copy()
-        stats["unique_users"] = len(stats["unique_users"])
+        latency = stats.pop("latency")
+        stats["unique_users"] = stats["unique_users"].count()
         stats["avg_response_time"] = stats["total_response_time"] / stats["total_requests"] if stats["total_requests"] > 0 else None
+        for quantile in (50, 95, 99):
+            stats[f"p{quantile}_response_time"] = latency.quantile(quantile / 100)
+        stats["access_levels"] = dict(stats["access_levels"])
         
         return stats
     
     def get_user_summary(self, user_id: str) -> Dict[str, Any]:
         """Get user-specific analytics"""
         
-        if user_id not in self.user_stats:
+        with self._lock:
+            stats = self.user_stats.get(user_id)
+            stats = stats.copy() if stats is not None else None
+        
+        if stats is None:
             # Return default stats for new users
             return {
                 "total_requests": 0,
@@ -275,7 +788,6 @@ class AnalyticsTracker:
                 "failed_requests": 0
             }
         
-        stats = self.user_stats[user_id].copy()
         stats["avg_response_time"] = stats["total_response_time"] / stats["total_requests"] if stats["total_requests"] > 0 else None
         stats["success_rate"] = stats["successful_requests"] / stats["total_requests"] if stats["total_requests"] > 0 else None
         
@@ -287,17 +799,13 @@ class AnalyticsTracker:
         if output_file is None:
             output_file = f"analytics_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
         
-        # Convert sets to lists for JSON serialization
-        export_data = {
-            "daily_stats": {},
-            "user_stats": self.user_stats,
-            "export_timestamp": datetime.now().isoformat()
-        }
-        
-        for date, stats in self.daily_stats.items():
-            export_stats = stats.copy()
-            export_stats["unique_users"] = list(export_stats["unique_users"])
-            export_data["daily_stats"][date] = export_stats
+        # Sketches are exported as their estimates
+        with self._lock:
+            export_data = {
+                "daily_stats": {date: self._daily_summary(date) for date in self.daily_stats},
+                "user_stats": {user_id: stats.copy() for user_id, stats in self.user_stats.items()},
+                "export_timestamp": datetime.now().isoformat()
+            }
         
         with open(logs_dir / output_file, 'w') as f:
             json.dump(export_data, f, indent=2)
@@ -0,0 +1,359 @@
+"""
+Prometheus metrics for the 82ndrop Agent System.
+
+``/metrics`` exposes, in the Prometheus text format:
+- drop_http_request_duration_seconds: HTTP latency by method, route
+  template and status class (a batch's in-process item requests are
+  covered by the batch request)
+- drop_model_call_duration_seconds: model call latency by agent and model
+- drop_tool_call_duration_seconds: tool latency by tool and outcome
+- drop_video_job_duration_seconds: video job duration by outcome
+- drop_invocations_in_flight: agent runs (``/run``, ``/run_sse``) in progress
+- drop_tracked_operations: video operations held in memory, by kind
+- drop_cache_entries: entries of the response, semantic, tool and context caches
+- drop_auth_failures_total: rejected requests by reason
+- drop_quota_errors_total: quota errors by source (model, budget, veo)
+- drop_tool_cache_requests_total: tool cache hits, misses and coalesced calls
+- drop_tool_cache_saved_seconds_total: tool time saved by the tool cache
+- drop_context_cache_requests_total: model calls by agent and whether they
+  referenced cached static instructions
+- drop_context_cache_saved_tokens_total: prompt tokens served from the
+  provider-side context cache, by agent
+
+Label values are bounded: routes are the matched route templates (not raw
+paths), and every label keeps at most METRICS_MAX_LABEL_VALUES distinct
+values before new ones are reported as "other". Label children are cached,
+so the hot path is a dict lookup plus prometheus_client's per-value lock.
+
+With several worker processes, set PROMETHEUS_MULTIPROC_DIR to an empty
+directory shared by the workers; ``/metrics`` then aggregates all of them.
+Sizes (operations, caches) are sampled by each worker every
+METRICS_REFRESH_SECONDS and on scrape.
+
+Requires prometheus-client; without it metrics are disabled.
+
+Configuration (environment variables):
+- METRICS: "false" to disable metrics (default enabled)
+- METRICS_TOKEN: bearer token required by ``/metrics`` (default none)
+- METRICS_MAX_LABEL_VALUES: distinct values per label (default 50)
+- METRICS_REFRESH_SECONDS: interval of the size sampling loop (default 15)
+- PROMETHEUS_MULTIPROC_DIR: shared directory for multi-process mode
+"""
+
+import os
+import time
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional, Set, Tuple
+
+from .batch import get_internal_calls
+
+from .config import env_flag, env_float, env_int
+
+try:
+    from prometheus_client import (
+        CONTENT_TYPE_LATEST,
+        CollectorRegistry,
+        Counter,
+        Gauge,
+        Histogram,
+        generate_latest,
+        multiprocess,
+    )
+
+    PROMETHEUS_AVAILABLE = True
+except ImportError:
+    # Fallback when prometheus-client is not installed: metrics stay disabled
+    PROMETHEUS_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+OTHER_LABEL = "other"
+
+# Routes whose requests run the agent pipeline
+AGENT_RUN_ROUTES = ("/run", "/run_sse")
+
+# Error codes and messages that mean a provider quota was hit
+QUOTA_MARKERS = ("RESOURCE_EXHAUSTED", "429", "quota")
+
+MODEL_BUCKETS = (0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.0, 32.0, 64.0)
+TOOL_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+VIDEO_BUCKETS = (30.0, 60.0, 120.0, 240.0, 480.0, 960.0, 1920.0)
+
+
+def is_quota_error(error: Any) -> bool:
+    """Whether an error code or message reports an exhausted quota."""
+    text = str(error or "")
+    return any(marker in text for marker in QUOTA_MARKERS)
+
+
+class Metrics:
+    """The app's metrics with bounded, cached label children."""
+
+    def __init__(self, max_label_values: int = 50):
+        self.max_label_values = max_label_values
+        self.multiprocess = bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+        self.registry = CollectorRegistry()
+        self._label_values: Dict[str, Set[str]] = {}
+        self._children: Dict[Tuple[Any, ...], Any] = {}
+        self._sizes: Dict[Tuple[str, str], Callable[[], int]] = {}
+
+        self.http_latency = Histogram(
+            "drop_http_request_duration_seconds",
+            "HTTP request latency",
+            ["method", "route", "status"],
+            registry=self.registry,
+        )
+        self.model_latency = Histogram(
+            "drop_model_call_duration_seconds",
+            "Model call latency",
+            ["agent", "model"],
+            buckets=MODEL_BUCKETS,
+            registry=self.registry,
+        )
+        self.tool_latency = Histogram(
+            "drop_tool_call_duration_seconds",
+            "Tool call latency",
+            ["tool", "outcome"],
+            buckets=TOOL_BUCKETS,
+            registry=self.registry,
+        )
+        self.video_duration = Histogram(
+            "drop_video_job_duration_seconds",
+            "Video generation job duration, from start to final status",
+            ["outcome"],
+            buckets=VIDEO_BUCKETS,
+            registry=self.registry,
+        )
+        self.invocations_in_flight = Gauge(
+            "drop_invocations_in_flight",
+            "Agent runs in progress",
+            multiprocess_mode="livesum",
+            registry=self.registry,
+        )
+        self.tracked_operations = Gauge(
+            "drop_tracked_operations",
+            "Video operations held in memory",
+            ["kind"],
+            multiprocess_mode="livesum",
+            registry=self.registry,
+        )
+        self.cache_entries = Gauge(
+            "drop_cache_entries",
+            "Entries held by the in-process caches",
+            ["cache"],
+            multiprocess_mode="livesum",
+            registry=self.registry,
+        )
+        self.auth_failures = Counter(
+            "drop_auth_failures_total",
+            "Requests rejected by authentication",
+            ["reason"],
+            registry=self.registry,
+        )
+        self.quota_errors = Counter(
+            "drop_quota_errors_total",
+            "Quota errors by source",
+            ["source"],
+            registry=self.registry,
+        )
+        self.tool_cache_requests = Counter(
+            "drop_tool_cache_requests_total",
+            "Tool cache lookups by result (hit, miss, coalesced)",
+            ["tool", "result"],
+            registry=self.registry,
+        )
+        self.tool_cache_saved = Counter(
+            "drop_tool_cache_saved_seconds_total",
+            "Tool execution time saved by the tool cache",
+            ["tool"],
+            registry=self.registry,
+        )
+        self.context_cache_requests = Counter(
+            "drop_context_cache_requests_total",
+            "Model calls by whether they referenced cached static instructions",
+            ["agent", "cached"],
+            registry=self.registry,
+        )
+        self.context_cache_saved_tokens = Counter(
+            "drop_context_cache_saved_tokens_total",
+            "Prompt tokens served from the provider-side context cache",
+            ["agent"],
+            registry=self.registry,
+        )
+
+    @classmethod
+    def from_env(cls) -> "Metrics":
+        return cls(max_label_values=env_int("METRICS_MAX_LABEL_VALUES", 50))
+
+    def _bounded(self, label: str, value: Any) -> str:
+        value = str(value) if value is not None else "unknown"
+        seen = self._label_values.setdefault(label, set())
+        if value in seen:
+            return value
+        if len(seen) >= self.max_label_values:
+            return OTHER_LABEL
+        seen.add(value)
+        return value
+
+    def _child(self, metric, *values: str):
+        key = (id(metric),) + values
+        child = self._children.get(key)
+        if child is None:
+            child = self._children[key] = metric.labels(*values)
+        return child
+
+    # --- Hot path ----------------------------------------------------------
+
+    def observe_http(self, method: str, route: str, status: int, seconds: float) -> None:
+        self._child(
+            self.http_latency, method, self._bounded("route", route), f"{status // 100}xx"
+        ).observe(seconds)
+
+    def observe_model(self, agent: str, model: Optional[str], seconds: float, error_code: Optional[str] = None) -> None:
+        self._child(
+            self.model_latency, self._bounded("agent", agent), self._bounded("model", model)
+        ).observe(seconds)
+        if error_code and is_quota_error(error_code):
+            self.count_quota_error("model")
+
+    def observe_tool(self, tool: str, seconds: float, ok: bool) -> None:
+        self._child(self.tool_latency, self._bounded("tool", tool), "ok" if ok else "error").observe(seconds)
+
+    def observe_video_job(self, created_at: str, outcome: str) -> None:
+        """Record a finished video job from its ISO ``created_at``."""
+        try:
+            seconds = (datetime.now() - datetime.fromisoformat(created_at)).total_seconds()
+        except (TypeError, ValueError):
+            return
+        self._child(self.video_duration, self._bounded("outcome", outcome)).observe(seconds)
+
+    def observe_tool_cache(self, tool: str, result: str, saved_seconds: float) -> None:
+        tool = self._bounded("tool", tool)
+        self._child(self.tool_cache_requests, tool, result).inc()
+        if saved_seconds:
+            self._child(self.tool_cache_saved, tool).inc(saved_seconds)
+
+    def observe_context_cache(self, agent: str, cached: bool, cached_tokens: int) -> None:
+        agent = self._bounded("agent", agent)
+        self._child(self.context_cache_requests, agent, "true" if cached else "false").inc()
+        if cached_tokens:
+            self._child(self.context_cache_saved_tokens, agent).inc(cached_tokens)
+
+    def count_auth_failure(self, reason: str) -> None:
+        self._child(self.auth_failures, reason).inc()
+
+    def count_quota_error(self, source: str) -> None:
+        self._child(self.quota_errors, source).inc()
+
+    # --- Sizes ---------------------------------------------------------------
+
+    def register_size(self, gauge: str, label: str, read: Callable[[], int]) -> None:
+        """Sample ``read()`` into ``drop_<gauge>{...=label}`` on every refresh."""
+        self._sizes[(gauge, label)] = read
+
+    def refresh_sizes(self) -> None:
+        gauges = {"tracked_operations": self.tracked_operations, "cache_entries": self.cache_entries}
+        for (gauge, label), read in self._sizes.items():
+            try:
+                self._child(gauges[gauge], label).set(read())
+            except Exception as e:
+                logger.debug(f"Could not sample {gauge}/{label}: {e}")
+
+    def render(self) -> Tuple[bytes, str]:
+        """The metrics in the Prometheus text format, with its content type."""
+        self.refresh_sizes()
+        if self.multiprocess:
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+            return generate_latest(registry), CONTENT_TYPE_LATEST
+        return generate_latest(self.registry), CONTENT_TYPE_LATEST
+
+
+def _register_cache_sizes(metrics: Metrics) -> None:
+    from .context_cache import get_context_cache
+    from .response_cache import get_response_cache
+    from .semantic_cache import get_semantic_cache
+    from .tool_cache import get_tool_cache
+
+    def size_of(get_cache):
+        def read():
+            cache = get_cache()
+            return len(cache) if cache is not None else 0
+
+        return read
+
+    metrics.register_size("cache_entries", "response", size_of(get_response_cache))
+    metrics.register_size("cache_entries", "semantic", size_of(get_semantic_cache))
+    metrics.register_size("cache_entries", "tool", size_of(get_tool_cache))
+    metrics.register_size(
+        "cache_entries",
+        "context",
+        lambda: get_context_cache().savings_summary()["live_handles"] if get_context_cache() else 0,
+    )
+
+
+_metrics = None
+_metrics_initialized = False
+
+
+def get_metrics() -> Optional[Metrics]:
+    """Get or initialize the metrics (None when disabled or unavailable)."""
+    global _metrics, _metrics_initialized
+    if not _metrics_initialized:
+        _metrics_initialized = True
+        if env_flag("METRICS", default=True) and PROMETHEUS_AVAILABLE:
+            _metrics = Metrics.from_env()
+            _register_cache_sizes(_metrics)
+        elif env_flag("METRICS", default=True):
+            logger.info("prometheus-client is not installed; metrics disabled")
+    return _metrics
+
+
+async def run_refresh_loop() -> None:
+    """Sample sizes periodically, so every worker reports its own."""
+    metrics = get_metrics()
+    if metrics is None:
+        return
+    interval = env_float("METRICS_REFRESH_SECONDS", 15.0)
+    while True:
+        metrics.refresh_sizes()
+        await asyncio.sleep(interval)
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware timing every HTTP request, streaming bodies included."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        metrics = get_metrics()
+        if scope["type"] != "http" or metrics is None:
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+        # A batch's own item requests are timed as part of the batch request
+        internal = get_internal_calls().claims(scope) is not None
+        agent_run = scope["path"] in AGENT_RUN_ROUTES
+        if agent_run:
+            metrics.invocations_in_flight.inc()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            if agent_run:
+                metrics.invocations_in_flight.dec()
+            # The router stores the matched route in the scope; unmatched paths share a label
+            route = getattr(scope.get("route"), "path", None) or OTHER_LABEL
+            if not internal:
+                metrics.observe_http(scope["method"], route, status, time.perf_counter() - started)
@@ -0,0 +1,51 @@
+"""
+Model construction for the 82ndrop agents.
+
+Agents get their model from ``build_model`` instead of a bare model name,
+so call-level behaviour (deadlines, hedging, circuit breaking), the
+offline fake backend and record/replay cassettes are configured in one place.
+"""
+
+from typing import Union
+
+from drop_agent.cassettes import CassetteLlm, get_cassette_mode
+from drop_agent.circuit_breaker import is_circuit_breaking_enabled
+from drop_agent.fake_llm import FakeLlm, is_fake_llm_enabled
+from drop_agent.hedging import HedgedGemini, get_deadline, is_hedging_enabled
+
+
+def build_model(
+    agent_name: str, model: str = "gemini-2.0-flash"
+) -> Union[str, HedgedGemini, FakeLlm, CassetteLlm]:
+    """
+    Build the model an agent runs on.
+
+    Args:
+        agent_name: Name of the agent using the model (keys latency history)
+        model: Gemini model name
+
+    Returns:
+        A ``FakeLlm`` when FAKE_LLM is set, a ``HedgedGemini`` when deadlines,
+        hedging or circuit breaking apply, otherwise the model name; wrapped
+        in a ``CassetteLlm`` when CASSETTE_MODE is set
+    """
+    if get_cassette_mode():
+        inner = _build_inner_model(agent_name, model)
+        return CassetteLlm(
+            model=model,
+            agent_name=agent_name,
+            inner=inner if not isinstance(inner, str) else None,
+        )
+    return _build_inner_model(agent_name, model)
+
+
+def _build_inner_model(agent_name: str, model: str) -> Union[str, HedgedGemini, FakeLlm]:
+    if is_fake_llm_enabled():
+        return FakeLlm(model=model, agent_name=agent_name)
+    if (
+        get_deadline(agent_name) is None
+        and not is_hedging_enabled()
+        and not is_circuit_breaking_enabled()
+    ):
+        return model
+    return HedgedGemini(model=model, agent_name=agent_name)
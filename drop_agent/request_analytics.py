@@ -0,0 +1,207 @@
+"""
+Per-request analytics for the 82ndrop Agent System.
+
+RequestAnalyticsMiddleware is a pure ASGI middleware that builds one
+compact ``UserAnalytics`` record per request from:
+- the Firebase claims FirebaseAuthMiddleware stores on the request state
+  (user id, email, access level)
+- the matched route template and session id path parameter
+- the response status and the time to the end of the response body
+- request and response sizes, counted as body chunks pass through (bodies
+  are never buffered, so SSE streams are counted as they stream)
+
+The request path only appends the record to a bounded buffer. A background
+task hands batches to the analytics tracker and the API logger (see
+logging_config.py) in a worker thread, every REQUEST_ANALYTICS_BATCH_SIZE
+records or REQUEST_ANALYTICS_FLUSH_SECONDS, whichever comes first. When
+the buffer is full, new records are dropped and counted.
+
+Configuration (environment variables):
+- REQUEST_ANALYTICS: "false" to disable per-request analytics (default enabled)
+- REQUEST_ANALYTICS_BATCH_SIZE: records handed over per batch (default 100)
+- REQUEST_ANALYTICS_FLUSH_SECONDS: longest wait before a partial batch (default 2)
+- REQUEST_ANALYTICS_MAX_PENDING: records buffered before dropping (default 10000)
+"""
+
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+from .batch import get_internal_calls
+from .logging_config import UserAnalytics, analytics_tracker, api_logger
+
+from .config import env_flag, env_float, env_int
+
+logger = logging.getLogger(__name__)
+
+# Probes and scrapes aren't user traffic (nor are a batch's own item requests)
+SKIPPED_PATHS = ("/health", "/ready", "/metrics")
+
+
+class RequestAnalytics:
+    """Buffers request records and hands them over in batches."""
+
+    def __init__(self, batch_size: int = 100, flush_seconds: float = 2.0, max_pending: int = 10000):
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.max_pending = max_pending
+        self._pending: "deque[UserAnalytics]" = deque()
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"submitted": 0, "processed": 0, "dropped": 0, "batches": 0}
+
+    @classmethod
+    def from_env(cls) -> "RequestAnalytics":
+        return cls(
+            batch_size=env_int("REQUEST_ANALYTICS_BATCH_SIZE", 100),
+            flush_seconds=env_float("REQUEST_ANALYTICS_FLUSH_SECONDS", 2.0),
+            max_pending=env_int("REQUEST_ANALYTICS_MAX_PENDING", 10000),
+        )
+
+    def submit(self, record: UserAnalytics) -> None:
+        """Queue a record (called on the request path; never blocks)."""
+        if len(self._pending) >= self.max_pending:
+            self.stats["dropped"] += 1
+            return
+        self._pending.append(record)
+        self.stats["submitted"] += 1
+        if self._task is None:
+            self._wake = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        elif len(self._pending) >= self.batch_size:
+            self._wake.set()
+
+    def _take_batch(self) -> List[UserAnalytics]:
+        batch = []
+        while self._pending and len(batch) < self.batch_size:
+            batch.append(self._pending.popleft())
+        return batch
+
+    @staticmethod
+    def _process(batch: List[UserAnalytics]) -> None:
+        for record in batch:
+            try:
+                analytics_tracker.track_usage(record)
+                api_logger.log_api_request(record)
+            except Exception as e:
+                logger.warning(f"Could not record request analytics: {e}")
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+    async def flush(self) -> None:
+        """Hand every buffered record over, batch by batch."""
+        while self._pending:
+            batch = self._take_batch()
+            await asyncio.to_thread(self._process, batch)
+            self.stats["processed"] += len(batch)
+            self.stats["batches"] += 1
+
+    async def stop(self) -> None:
+        """Stop the background task and hand over what is still buffered."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {**self.stats, "pending": len(self._pending)}
+
+
+_request_analytics = None
+
+
+def get_request_analytics() -> Optional[RequestAnalytics]:
+    """Get or initialize the request analytics buffer (None when disabled)."""
+    global _request_analytics
+    if _request_analytics is None and env_flag("REQUEST_ANALYTICS", default=True):
+        _request_analytics = RequestAnalytics.from_env()
+    return _request_analytics
+
+
+def _header(scope, name: bytes) -> Optional[str]:
+    for key, value in scope.get("headers", ()):
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+def build_record(
+    scope, status: int, seconds: float, request_bytes: int, response_bytes: int
+) -> UserAnalytics:
+    """The analytics record of a finished request."""
+    claims = (scope.get("state") or {}).get("user") or {}
+    client = scope.get("client")
+    forwarded = _header(scope, b"x-forwarded-for")
+    return UserAnalytics(
+        user_id=claims.get("uid") or claims.get("user_id") or "anonymous",
+        email=claims.get("email"),
+        access_level=claims.get("access_level") or ("basic" if claims.get("agent_access") else "none"),
+        # Route templates keep the number of distinct endpoints bounded
+        endpoint=getattr(scope.get("route"), "path", None) or scope["path"],
+        method=scope["method"],
+        status_code=status,
+        response_time_ms=seconds * 1000,
+        session_id=(scope.get("path_params") or {}).get("session_id"),
+        user_agent=_header(scope, b"user-agent"),
+        ip_address=forwarded.split(",")[0].strip() if forwarded else (client[0] if client else None),
+        request_bytes=request_bytes,
+        response_bytes=response_bytes,
+    )
+
+
+class RequestAnalyticsMiddleware:
+    """Pure ASGI middleware recording one analytics record per HTTP request."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        analytics = get_request_analytics()
+        if (
+            scope["type"] != "http"
+            or analytics is None
+            or scope["path"] in SKIPPED_PATHS
+            or get_internal_calls().claims(scope) is not None
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+        request_bytes = 0
+        response_bytes = 0
+
+        async def counting_receive():
+            nonlocal request_bytes
+            message = await receive()
+            if message["type"] == "http.request":
+                request_bytes += len(message.get("body", b""))
+            return message
+
+        async def counting_send(message):
+            nonlocal status, response_bytes
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                response_bytes += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, counting_receive, counting_send)
+        finally:
+            analytics.submit(
+                build_record(scope, status, time.perf_counter() - started, request_bytes, response_bytes)
+            )
@@ -0,0 +1,361 @@
+"""
+Exact-match model response cache for the 82ndrop Agent System.
+
+Responses are keyed on (model, system-instruction hash, normalized contents,
+generation config). Lookups happen in ``before_model_callback``, which can
+return a cached ``LlmResponse`` to skip the model call entirely; new
+responses are stored from ``after_model_callback``.
+
+The cache is opt-in and has two tiers:
+- an in-process LRU (always on when the cache is enabled)
+- an optional on-disk SQLite tier shared across restarts and processes
+
+Model callbacks run on the event loop, so only the LRU is on their path.
+The disk tier belongs to a writer thread: it prefills the LRU with the
+newest entries at startup and writes new entries behind, from a bounded
+queue (when it is full, new entries only reach the LRU).
+
+Configuration (environment variables):
+- MODEL_RESPONSE_CACHE: "true" to enable the cache
+- MODEL_RESPONSE_CACHE_SIZE: max entries in the LRU tier (default 256)
+- MODEL_RESPONSE_CACHE_TTL: entry lifetime in seconds (default: no expiry)
+- MODEL_RESPONSE_CACHE_DB: path to a SQLite file to enable the disk tier
+- MODEL_RESPONSE_CACHE_WRITE_QUEUE: entries waiting for the disk tier (default 1000)
+- MODEL_RESPONSE_CACHE_MAX_TEMPERATURE: skip requests sampled above this
+"""
+
+import os
+import json
+import time
+import hashlib
+import queue
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from .config import env_flag, env_int
+
+try:
+    from google.adk.models.llm_request import LlmRequest
+    from google.adk.models.llm_response import LlmResponse
+except ImportError:
+    # Fallback for development/testing
+    LlmRequest = Any
+    LlmResponse = Any
+
+logger = logging.getLogger(__name__)
+
+# Invocation-scoped state key ("temp:" keys are never persisted by ADK)
+CACHE_STATE_KEY = "temp:model_cache"
+
+# Queued disk operation that drops every entry
+_CLEAR = object()
+
+# Generation config fields that never influence the generated content
+_CONFIG_EXCLUDE = {"system_instruction", "http_options", "labels"}
+
+
+def _normalize_text(text: str) -> str:
+    """Collapse whitespace so cosmetic differences share a cache entry."""
+    return " ".join(text.split())
+
+
+def _normalize_part(part: Any) -> Dict[str, Any]:
+    normalized = {}
+    if getattr(part, "text", None):
+        normalized["text"] = _normalize_text(part.text)
+    function_call = getattr(part, "function_call", None)
+    if function_call:
+        normalized["function_call"] = {
+            "name": function_call.name,
+            "args": function_call.args or {},
+        }
+    function_response = getattr(part, "function_response", None)
+    if function_response:
+        normalized["function_response"] = {
+            "name": function_response.name,
+            "response": function_response.response or {},
+        }
+    inline_data = getattr(part, "inline_data", None)
+    if inline_data and inline_data.data:
+        normalized["inline_data"] = hashlib.sha256(inline_data.data).hexdigest()
+    return normalized
+
+
+def _system_instruction_text(llm_request: LlmRequest) -> str:
+    config = getattr(llm_request, "config", None)
+    instruction = getattr(config, "system_instruction", None) if config else None
+    if instruction is None:
+        return ""
+    if isinstance(instruction, str):
+        return instruction
+    parts = getattr(instruction, "parts", None) or []
+    return "\n".join(part.text for part in parts if getattr(part, "text", None))
+
+
+def _config_data(config: Any) -> Dict[str, Any]:
+    """Serialize the generation config, including class-valued response schemas."""
+    if config is None:
+        return {}
+    data = config.model_dump(
+        mode="json",
+        exclude_none=True,
+        exclude=_CONFIG_EXCLUDE | {"response_schema"},
+    )
+    schema = config.response_schema
+    if schema is not None:
+        data["response_schema"] = (
+            schema.model_json_schema() if hasattr(schema, "model_json_schema") else str(schema)
+        )
+    return data
+
+
+def build_cache_key(llm_request: LlmRequest) -> str:
+    """
+    Build the exact-match cache key for a model request.
+
+    Args:
+        llm_request: The request about to be sent to the model
+
+    Returns:
+        Hex digest identifying the request
+    """
+    system_hash = hashlib.sha256(
+        _system_instruction_text(llm_request).encode("utf-8")
+    ).hexdigest()
+
+    contents = [
+        {
+            "role": getattr(content, "role", None),
+            "parts": [_normalize_part(part) for part in (content.parts or [])],
+        }
+        for content in (llm_request.contents or [])
+    ]
+
+    payload = json.dumps(
+        {
+            "model": llm_request.model,
+            "system": system_hash,
+            "contents": contents,
+            "config": _config_data(getattr(llm_request, "config", None)),
+        },
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def get_bypass_reason(llm_request: LlmRequest) -> Optional[str]:
+    """
+    Decide whether a request must skip the cache.
+
+    Tool-calling turns (the latest content carries function responses) and
+    nondeterministic requests (live grounding, multiple candidates, sampling
+    above the configured temperature) are never served from the cache.
+
+    Returns:
+        A short reason string, or None when the request is cacheable
+    """
+    contents = llm_request.contents or []
+    if contents and any(
+        getattr(part, "function_response", None) for part in (contents[-1].parts or [])
+    ):
+        return "tool_turn"
+
+    config = getattr(llm_request, "config", None)
+    if config is None:
+        return None
+
+    for tool in config.tools or []:
+        if getattr(tool, "google_search", None) or getattr(
+            tool, "google_search_retrieval", None
+        ):
+            return "grounded_search"
+
+    if config.candidate_count and config.candidate_count > 1:
+        return "multiple_candidates"
+
+    max_temperature = os.getenv("MODEL_RESPONSE_CACHE_MAX_TEMPERATURE")
+    if (
+        max_temperature
+        and config.temperature is not None
+        and config.temperature > float(max_temperature)
+    ):
+        return "temperature"
+
+    return None
+
+
+def is_cacheable_response(llm_response: LlmResponse) -> bool:
+    """Only complete, error-free, text-only responses are stored."""
+    if llm_response is None or llm_response.partial:
+        return False
+    if llm_response.error_code or not llm_response.content:
+        return False
+    parts = llm_response.content.parts or []
+    if not parts:
+        return False
+    return not any(getattr(part, "function_call", None) for part in parts)
+
+
+class ModelResponseCache:
+    """Two-tier (LRU + optional SQLite) store of serialized model responses."""
+
+    def __init__(
+        self,
+        max_entries: int = 256,
+        ttl_seconds: Optional[float] = None,
+        db_path: Optional[str] = None,
+        write_queue_size: int = 1000,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.db_path = db_path
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes: "queue.Queue[Any]" = queue.Queue(maxsize=write_queue_size)
+        self._writer: Optional[threading.Thread] = None
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "preloaded": 0, "dropped_writes": 0}
+
+        if db_path:
+            self._writer = threading.Thread(target=self._run_writer, name="model-response-cache", daemon=True)
+            self._writer.start()
+
+    def _expired(self, created_at: float) -> bool:
+        return self.ttl_seconds is not None and time.time() - created_at > self.ttl_seconds
+
+    def _remember(self, key: str, created_at: float, payload: str) -> None:
+        self._entries[key] = (created_at, payload)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _run_writer(self) -> None:
+        """Own the SQLite tier: prefill the LRU, then write queued entries."""
+        try:
+            db = sqlite3.connect(self.db_path)
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS model_responses ("
+                "key TEXT PRIMARY KEY, response TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            db.commit()
+            self._preload(db)
+        except Exception as e:
+            logger.error(f"Model response cache disk tier unavailable: {e}")
+            return
+
+        while True:
+            item = self._writes.get()
+            batch = [item]
+            # Commit whatever queued up meanwhile in one transaction
+            while item is not None:
+                try:
+                    item = self._writes.get_nowait()
+                except queue.Empty:
+                    break
+                batch.append(item)
+            try:
+                for entry in batch:
+                    if entry is _CLEAR:
+                        db.execute("DELETE FROM model_responses")
+                    elif entry is not None:
+                        db.execute(
+                            "INSERT OR REPLACE INTO model_responses (key, response, created_at) "
+                            "VALUES (?, ?, ?)",
+                            entry,
+                        )
+                db.commit()
+            except Exception as e:
+                logger.error(f"Error writing model response cache entries: {e}")
+            if batch[-1] is None:
+                db.close()
+                return
+
+    def _preload(self, db: sqlite3.Connection) -> None:
+        rows = db.execute(
+            "SELECT key, response, created_at FROM model_responses ORDER BY created_at DESC LIMIT ?",
+            (self.max_entries,),
+        ).fetchall()
+        with self._lock:
+            # Behind the entries stored since startup, oldest first in line for eviction
+            for key, payload, created_at in rows:
+                if key not in self._entries and not self._expired(created_at):
+                    self._entries[key] = (created_at, payload)
+                    self._entries.move_to_end(key, last=False)
+                    self.stats["preloaded"] += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _queue_write(self, item: Any) -> None:
+        try:
+            self._writes.put_nowait(item)
+        except queue.Full:
+            self.stats["dropped_writes"] += 1
+            logger.debug("Model response cache write queue full - entry kept in memory only")
+
+    def get(self, key: str) -> Optional[LlmResponse]:
+        """Return the cached response for ``key`` or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and self._expired(entry[0]):
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            payload = entry[1]
+
+        return LlmResponse.model_validate_json(payload)
+
+    def put(self, key: str, llm_response: LlmResponse) -> None:
+        """Store a response under ``key``; the disk tier is written behind."""
+        payload = llm_response.model_dump_json(exclude_none=True)
+        created_at = time.time()
+        with self._lock:
+            self._remember(key, created_at, payload)
+            self.stats["stores"] += 1
+        if self._writer is not None:
+            self._queue_write((key, payload, created_at))
+
+    def clear(self) -> None:
+        """Drop every entry from both tiers."""
+        with self._lock:
+            self._entries.clear()
+        if self._writer is not None:
+            self._writes.put(_CLEAR)
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Write out queued entries and close the disk tier."""
+        if self._writer is None:
+            return
+        self._writes.put(None)
+        self._writer.join(timeout)
+        self._writer = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+_response_cache = None
+
+
+def get_response_cache() -> Optional[ModelResponseCache]:
+    """Get or initialize the model response cache (None when disabled)."""
+    global _response_cache
+    if _response_cache is None and env_flag("MODEL_RESPONSE_CACHE"):
+        ttl = os.getenv("MODEL_RESPONSE_CACHE_TTL")
+        _response_cache = ModelResponseCache(
+            max_entries=env_int("MODEL_RESPONSE_CACHE_SIZE", 256),
+            ttl_seconds=float(ttl) if ttl else None,
+            db_path=os.getenv("MODEL_RESPONSE_CACHE_DB") or None,
+            write_queue_size=env_int("MODEL_RESPONSE_CACHE_WRITE_QUEUE", 1000),
+        )
+        logger.info(
+            f"Model response cache enabled (size={_response_cache.max_entries}, "
+            f"disk={'yes' if _response_cache.db_path else 'no'})"
+        )
+    return _response_cache
@@ -0,0 +1,109 @@
+"""
+Complexity-based model routing for the 82ndrop Agent System.
+
+Short, simple ideas don't need the same model as long multi-character
+dialogue scripts. Each invocation's user message is classified locally (no
+model call) by length, entity count and the presence of dialogue or timing
+cues, and the model of each agent step is picked from that:
+- guide_agent uses the fast model for simple requests
+- prompt_writer_agent keeps the strong model unless explicitly allowed
+- the root orchestrator is never rerouted (it drives the transfers)
+- search_agent is never rerouted: its only tool is Google Search grounding,
+  which the fast (lite) models don't support
+
+drop_agent/evals/routing_benchmark.py compares latency, cost and routing
+decisions with and without routing on the fake model backend.
+
+Configuration (environment variables):
+- MODEL_ROUTING: "true" to enable routing
+- ROUTING_FAST_MODEL: model for simple requests (default gemini-2.0-flash-lite)
+- ROUTING_STRONG_MODEL: model for complex requests (default gemini-2.0-flash)
+- ROUTING_FAST_PROMPT_WRITER: "true" to also route simple prompt_writer calls
+- ROUTING_MAX_SIMPLE_WORDS: longest message still considered simple (default 40)
+- ROUTING_MAX_SIMPLE_ENTITIES: most named entities in a simple message (default 3)
+"""
+
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+from .config import env_flag, env_int
+
+# Invocation-scoped state key ("temp:" keys are never persisted by ADK)
+ROUTING_STATE_KEY = "temp:model_route"
+
+SIMPLE = "simple"
+COMPLEX = "complex"
+
+# Agents whose tools every routed model supports
+FAST_ELIGIBLE_AGENTS = ("guide_agent",)
+PROMPT_WRITER_AGENT = "prompt_writer_agent"
+
+_DIALOGUE_PATTERN = re.compile(
+    r'["“”]|\b(?:says?|said|asks?|replies|dialogue|conversation|voice[- ]?over|'
+    r"podcast|interview|monologue|narrat\w*)\b|^\s*\w+\s*:",
+    re.IGNORECASE | re.MULTILINE,
+)
+_TIMING_PATTERN = re.compile(
+    r"\b\d+(?:\.\d+)?\s*(?:s|sec|secs|seconds?|minutes?)\b|\b\d+\s*-\s*\d+\s*s\b|\b\d{1,2}:\d{2}\b",
+    re.IGNORECASE,
+)
+_ENTITY_PATTERN = re.compile(r"(?<![.!?]\s)(?<!^)\b[A-Z][a-zA-Z'’]+|@\w+|#\w+")
+
+
+@dataclass
+class RouteDecision:
+    """Local classification of a request."""
+
+    complexity: str
+    features: Dict[str, int] = field(default_factory=dict)
+
+
+def classify_request(text: str) -> RouteDecision:
+    """
+    Classify a user message as simple or complex without calling a model.
+
+    Args:
+        text: The invocation's user message
+
+    Returns:
+        The complexity label and the features it was based on
+    """
+    text = text or ""
+    features = {
+        "words": len(text.split()),
+        "entities": len(set(_ENTITY_PATTERN.findall(text))),
+        "dialogue": int(bool(_DIALOGUE_PATTERN.search(text))),
+        "timing": int(bool(_TIMING_PATTERN.search(text))),
+    }
+    simple = (
+        features["words"] <= env_int("ROUTING_MAX_SIMPLE_WORDS", 40)
+        and features["entities"] <= env_int("ROUTING_MAX_SIMPLE_ENTITIES", 3)
+        and not features["dialogue"]
+        and not features["timing"]
+    )
+    return RouteDecision(SIMPLE if simple else COMPLEX, features)
+
+
+def select_model(agent_name: str, complexity: str) -> Optional[str]:
+    """
+    Pick the model for an agent step.
+
+    Returns:
+        The model to use, or None to keep the agent's configured model
+    """
+    fast_model = os.getenv("ROUTING_FAST_MODEL") or "gemini-2.0-flash-lite"
+    strong_model = os.getenv("ROUTING_STRONG_MODEL") or "gemini-2.0-flash"
+
+    if agent_name in FAST_ELIGIBLE_AGENTS:
+        return fast_model if complexity == SIMPLE else strong_model
+    if agent_name == PROMPT_WRITER_AGENT:
+        if complexity == SIMPLE and env_flag("ROUTING_FAST_PROMPT_WRITER"):
+            return fast_model
+        return strong_model
+    return None
+
+
+def is_routing_enabled() -> bool:
+    return env_flag("MODEL_ROUTING")
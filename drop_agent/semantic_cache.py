@@ -0,0 +1,347 @@
+"""
+Semantic cache of final Master Prompts for the 82ndrop Agent System.
+
+Many user ideas are paraphrases of each other. This cache embeds each fresh
+idea, looks it up in a local vector index and, when a previous idea is
+similar enough, returns the stored ``video_prompts_response`` without
+running the guide/search/prompt_writer pipeline.
+
+The agent callbacks use the async ``alookup``/``astore``, so embedding
+calls to Vertex AI don't block the event loop.
+
+Configuration (environment variables):
+- SEMANTIC_CACHE: "true" to enable the cache
+- SEMANTIC_CACHE_THRESHOLD: minimum cosine similarity for a hit (default 0.88)
+- SEMANTIC_CACHE_SCOPE: "user" (default) or "global"
+- SEMANTIC_CACHE_SIZE: max entries per scope (default 500)
+- SEMANTIC_CACHE_EMBEDDER: "vertex" (default) or "local" (offline hashing)
+- SEMANTIC_CACHE_EMBEDDING_MODEL: Vertex embedding model (default text-embedding-004)
+- SEMANTIC_CACHE_REFRESH: "true" to refresh a hit in the background
+"""
+
+import os
+import re
+import math
+import time
+import asyncio
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from .config import env_flag, env_float, env_int
+
+try:
+    import numpy as np
+except ImportError:
+    # Pure-Python similarity search is used when numpy is unavailable
+    np = None
+
+logger = logging.getLogger(__name__)
+
+# Invocation-scoped state key ("temp:" keys are never persisted by ADK)
+SEMANTIC_CACHE_STATE_KEY = "temp:semantic_cache"
+
+# Session state flag set on background refresh sessions so they skip lookups
+SEMANTIC_CACHE_BYPASS_KEY = "semantic_cache_bypass"
+
+# The orchestrator whose runs the cache short-circuits
+ROOT_AGENT_NAME = "drop_agent"
+
+# The final agent in the pipeline and its output key. Agents that transfer
+# never reach after_agent_callback, so results are stored when it finishes
+FINAL_AGENT_NAME = "prompt_writer_agent"
+FINAL_OUTPUT_KEY = "video_prompts_response"
+
+GLOBAL_SCOPE = "global"
+
+
+def _normalize(vector: List[float]) -> List[float]:
+    norm = math.sqrt(sum(value * value for value in vector))
+    if norm == 0:
+        return vector
+    return [value / norm for value in vector]
+
+
+class LocalHashingEmbedder:
+    """
+    Offline embedder based on hashed word and character n-grams.
+
+    It needs no network access and is deterministic, which makes it suitable
+    for tests and evals, but it only captures lexical similarity.
+    """
+
+    def __init__(self, dimensions: int = 512):
+        self.dimensions = dimensions
+
+    def _features(self, text: str) -> List[str]:
+        words = re.findall(r"[a-z0-9']+", text.lower())
+        features = [f"w:{word}" for word in words]
+        features += [f"b:{a}_{b}" for a, b in zip(words, words[1:])]
+        for word in words:
+            padded = f"#{word}#"
+            features += [f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2)]
+        return features
+
+    async def aembed(self, text: str) -> List[float]:
+        # Local and CPU-cheap (microseconds); no need for a thread
+        return self.embed(text)
+
+    def embed(self, text: str) -> List[float]:
+        vector = [0.0] * self.dimensions
+        for feature in self._features(text):
+            digest = hashlib.md5(feature.encode("utf-8")).digest()
+            index = int.from_bytes(digest[:4], "little") % self.dimensions
+            vector[index] += 1.0 if digest[4] & 1 else -1.0
+        return _normalize(vector)
+
+
+class VertexEmbedder:
+    """Embedder backed by a Vertex AI text embedding model."""
+
+    def __init__(self, model: str = "text-embedding-004"):
+        self.model = model
+        self._client = None
+
+    def _get_client(self):
+        if self._client is None:
+            from google import genai
+
+            self._client = genai.Client()
+        return self._client
+
+    def embed(self, text: str) -> List[float]:
+        response = self._get_client().models.embed_content(model=self.model, contents=text)
+        return _normalize(list(response.embeddings[0].values))
+
+    async def aembed(self, text: str) -> List[float]:
+        response = await self._get_client().aio.models.embed_content(model=self.model, contents=text)
+        return _normalize(list(response.embeddings[0].values))
+
+
+@dataclass
+class CachedPrompt:
+    """A cached idea and the final Master Prompt generated for it."""
+
+    idea: str
+    prompt: str
+    vector: List[float] = field(repr=False)
+    created_at: float = field(default_factory=time.time)
+    hits: int = 0
+
+
+class VectorIndex:
+    """
+    Bounded, brute-force cosine-similarity index over normalized vectors.
+
+    Entries are evicted oldest-stored first; storing an idea again refreshes it.
+    """
+
+    def __init__(self, max_entries: int = 500):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, CachedPrompt]" = OrderedDict()
+        self._matrix = None
+
+    def add(self, entry_id: str, entry: CachedPrompt) -> None:
+        self._entries[entry_id] = entry
+        self._entries.move_to_end(entry_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        self._matrix = None
+
+    def search(self, vector: List[float]) -> Optional[Tuple[str, CachedPrompt, float]]:
+        """Return the most similar entry as (entry_id, entry, similarity)."""
+        if not self._entries:
+            return None
+
+        entry_ids = list(self._entries)
+        if np is not None:
+            if self._matrix is None:
+                self._matrix = np.array([self._entries[i].vector for i in entry_ids])
+            scores = self._matrix @ np.array(vector)
+            best = int(scores.argmax())
+            similarity = float(scores[best])
+        else:
+            best, similarity = 0, -1.0
+            for position, entry_id in enumerate(entry_ids):
+                score = sum(a * b for a, b in zip(vector, self._entries[entry_id].vector))
+                if score > similarity:
+                    best, similarity = position, score
+
+        entry_id = entry_ids[best]
+        return entry_id, self._entries[entry_id], similarity
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SemanticPromptCache:
+    """Scoped semantic cache mapping ideas to final Master Prompts."""
+
+    def __init__(
+        self,
+        embedder: Any,
+        threshold: float = 0.88,
+        scope: str = "user",
+        max_entries: int = 500,
+    ):
+        self.embedder = embedder
+        self.threshold = threshold
+        self.scope = scope
+        self.max_entries = max_entries
+        self._indexes: Dict[str, VectorIndex] = {}
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "stores": 0}
+
+    def _scope_key(self, user_id: Optional[str]) -> str:
+        if self.scope == GLOBAL_SCOPE or not user_id:
+            return GLOBAL_SCOPE
+        return user_id
+
+    def lookup(
+        self, idea: str, user_id: Optional[str] = None
+    ) -> Optional[Tuple[CachedPrompt, float]]:
+        """
+        Find a cached prompt for an idea.
+
+        Args:
+            idea: The user's video idea
+            user_id: Owner of the idea, used when the scope is per-user
+
+        Returns:
+            (entry, similarity) when a cached idea clears the threshold
+        """
+        return self._match(self.embedder.embed(idea), user_id)
+
+    async def alookup(
+        self, idea: str, user_id: Optional[str] = None
+    ) -> Optional[Tuple[CachedPrompt, float]]:
+        """``lookup`` with the idea embedded asynchronously."""
+        return self._match(await self.embedder.aembed(idea), user_id)
+
+    def _match(
+        self, vector: List[float], user_id: Optional[str]
+    ) -> Optional[Tuple[CachedPrompt, float]]:
+        with self._lock:
+            index = self._indexes.get(self._scope_key(user_id))
+            match = index.search(vector) if index else None
+            if match is None or match[2] < self.threshold:
+                self.stats["misses"] += 1
+                return None
+            _, entry, similarity = match
+            entry.hits += 1
+            self.stats["hits"] += 1
+        return entry, similarity
+
+    def store(self, idea: str, prompt: str, user_id: Optional[str] = None) -> None:
+        """Cache the final prompt generated for an idea."""
+        self._add(idea, prompt, self.embedder.embed(idea), user_id)
+
+    async def astore(self, idea: str, prompt: str, user_id: Optional[str] = None) -> None:
+        """``store`` with the idea embedded asynchronously."""
+        self._add(idea, prompt, await self.embedder.aembed(idea), user_id)
+
+    def _add(self, idea: str, prompt: str, vector: List[float], user_id: Optional[str]) -> None:
+        entry_id = hashlib.sha256(" ".join(idea.lower().split()).encode("utf-8")).hexdigest()
+        with self._lock:
+            index = self._indexes.setdefault(
+                self._scope_key(user_id), VectorIndex(self.max_entries)
+            )
+            index.add(entry_id, CachedPrompt(idea=idea, prompt=prompt, vector=vector))
+            self.stats["stores"] += 1
+
+    def __len__(self) -> int:
+        return sum(len(index) for index in self._indexes.values())
+
+
+_semantic_cache = None
+_refresh_tasks = set()
+_refreshing_ideas = set()
+
+
+def build_embedder(kind: Optional[str] = None) -> Any:
+    """Build the configured embedder ("vertex" or "local")."""
+    kind = kind or os.getenv("SEMANTIC_CACHE_EMBEDDER") or "vertex"
+    if kind == "local":
+        return LocalHashingEmbedder()
+    return VertexEmbedder(os.getenv("SEMANTIC_CACHE_EMBEDDING_MODEL") or "text-embedding-004")
+
+
+def get_semantic_cache() -> Optional[SemanticPromptCache]:
+    """Get or initialize the semantic prompt cache (None when disabled)."""
+    global _semantic_cache
+    if _semantic_cache is None and env_flag("SEMANTIC_CACHE"):
+        _semantic_cache = SemanticPromptCache(
+            embedder=build_embedder(),
+            threshold=env_float("SEMANTIC_CACHE_THRESHOLD", 0.88),
+            scope=os.getenv("SEMANTIC_CACHE_SCOPE") or "user",
+            max_entries=env_int("SEMANTIC_CACHE_SIZE", 500),
+        )
+        logger.info(
+            f"Semantic prompt cache enabled (scope={_semantic_cache.scope}, "
+            f"threshold={_semantic_cache.threshold})"
+        )
+    return _semantic_cache
+
+
+def schedule_refresh(idea: str, user_id: str) -> None:
+    """
+    Regenerate the prompt for a cached idea in the background.
+
+    The refresh runs the full pipeline through the served app in a throwaway
+    session flagged to bypass the cache, which is deleted afterwards;
+    after_agent_callback stores the fresh result.
+    """
+    if not env_flag("SEMANTIC_CACHE_REFRESH") or idea in _refreshing_ideas:
+        return
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        logger.debug("No running event loop - skipping semantic cache refresh")
+        return
+
+    _refreshing_ideas.add(idea)
+    task = loop.create_task(_refresh(idea, user_id))
+    _refresh_tasks.add(task)
+    task.add_done_callback(_refresh_tasks.discard)
+    task.add_done_callback(lambda _: _refreshing_ideas.discard(idea))
+
+
+async def _refresh(idea: str, user_id: str) -> None:
+    from .batch import AGENT_APP_NAME, INTERNAL_CALL_HEADER, get_internal_calls, get_internal_client
+
+    client = get_internal_client()
+    if client is None:
+        logger.debug("No served app - skipping semantic cache refresh")
+        return
+
+    # The run goes through the served app's own routes and runner, acting
+    # for the user whose request hit the cache
+    sessions_url = f"/apps/{AGENT_APP_NAME}/users/{user_id}/sessions"
+    try:
+        with get_internal_calls().register({"uid": user_id, "agent_access": True}) as token:
+            headers = {INTERNAL_CALL_HEADER: token}
+            response = await client.post(
+                sessions_url, headers=headers, json={"state": {SEMANTIC_CACHE_BYPASS_KEY: True}}
+            )
+            response.raise_for_status()
+            session_id = response.json()["id"]
+            try:
+                response = await client.post(
+                    "/run",
+                    headers=headers,
+                    json={
+                        "appName": AGENT_APP_NAME,
+                        "userId": user_id,
+                        "sessionId": session_id,
+                        "newMessage": {"role": "user", "parts": [{"text": idea}]},
+                    },
+                )
+                response.raise_for_status()
+            finally:
+                await client.delete(f"{sessions_url}/{session_id}", headers=headers)
+        logger.info("Semantic cache entry refreshed in the background")
+    except Exception as e:
+        logger.error(f"Error refreshing semantic cache entry: {e}")
@@ -0,0 +1,125 @@
+"""
+Per-session telemetry side channel for the 82ndrop Agent System.
+
+The callbacks used to keep their telemetry in session state (tool usage
+history, per-call tool metrics, start times). Every write there becomes a
+state delta that is persisted with the session and shipped with every
+session payload, and the per-call lists grew without bound.
+
+This module keeps that telemetry in process instead:
+- fixed-size ring buffers of recent tool uses and tool metrics per session,
+  for at most SESSION_TELEMETRY_SESSIONS sessions (least recently active
+  sessions are dropped first)
+- start times of running agents and tools, on the monotonic clock, so
+  durations no longer round-trip through state
+
+Aggregates go to the metrics sink (see metrics.py); the buffers are for
+inspecting one session (``/telemetry``). Each session's buffers remember
+the user they were recorded for, so a caller can be limited to their own.
+
+Configuration (environment variables):
+- SESSION_TELEMETRY_EVENTS: entries kept per buffer and session (default 50)
+- SESSION_TELEMETRY_SESSIONS: sessions tracked at once (default 1000)
+"""
+
+import time
+import logging
+import threading
+from collections import OrderedDict, deque
+from typing import Any, Dict, Hashable, List, Optional
+
+from .config import env_int
+
+logger = logging.getLogger(__name__)
+
+TOOL_USAGE = "tool_usage"
+TOOL_METRICS = "tool_metrics"
+
+# Timers started but never stopped (e.g. a tool that raised); oldest dropped first
+MAX_PENDING_TIMERS = 1000
+
+
+def session_id_of(context: Any) -> str:
+    """The session id of an ADK callback or tool context."""
+    session = getattr(context, "session", None)
+    return getattr(session, "id", None) or getattr(context, "session_id", None) or "unknown"
+
+
+class SessionTelemetry:
+    """Bounded per-session ring buffers plus hop timers."""
+
+    def __init__(self, max_events: int = 50, max_sessions: int = 1000):
+        self.max_events = max_events
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, Dict[str, deque]]" = OrderedDict()
+        self._owners: Dict[str, Optional[str]] = {}
+        self._timers: "OrderedDict[Hashable, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "SessionTelemetry":
+        return cls(
+            max_events=env_int("SESSION_TELEMETRY_EVENTS", 50),
+            max_sessions=env_int("SESSION_TELEMETRY_SESSIONS", 1000),
+        )
+
+    def start_timer(self, key: Hashable) -> None:
+        self._timers[key] = time.perf_counter()
+        while len(self._timers) > MAX_PENDING_TIMERS:
+            self._timers.popitem(last=False)
+
+    def stop_timer(self, key: Hashable) -> Optional[float]:
+        """Seconds since ``start_timer(key)``, or None if it wasn't started."""
+        started = self._timers.pop(key, None)
+        return time.perf_counter() - started if started is not None else None
+
+    def record(
+        self, session_id: str, kind: str, entry: Dict[str, Any], user_id: Optional[str] = None
+    ) -> None:
+        """Append an entry to one of the session's ring buffers."""
+        with self._lock:
+            buffers = self._sessions.get(session_id)
+            if buffers is None:
+                buffers = self._sessions[session_id] = {}
+                self._owners[session_id] = user_id
+                while len(self._sessions) > self.max_sessions:
+                    evicted, _ = self._sessions.popitem(last=False)
+                    self._owners.pop(evicted, None)
+            else:
+                self._sessions.move_to_end(session_id)
+            buffer = buffers.get(kind)
+            if buffer is None:
+                buffer = buffers[kind] = deque(maxlen=self.max_events)
+            buffer.append(entry)
+
+    def get_session(
+        self, session_id: str, user_id: Optional[str] = None
+    ) -> Optional[Dict[str, List[Dict[str, Any]]]]:
+        """The session's buffers (None if unknown or, with ``user_id``, someone else's)."""
+        with self._lock:
+            buffers = self._sessions.get(session_id)
+            if buffers is None or (user_id is not None and self._owners.get(session_id) != user_id):
+                return None
+            return {kind: list(buffer) for kind, buffer in buffers.items()}
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "tracked_sessions": len(self._sessions),
+                "pending_timers": len(self._timers),
+                "max_events": self.max_events,
+            }
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+
+_session_telemetry = None
+
+
+def get_session_telemetry() -> SessionTelemetry:
+    """Get or initialize the session telemetry store."""
+    global _session_telemetry
+    if _session_telemetry is None:
+        _session_telemetry = SessionTelemetry.from_env()
+    return _session_telemetry
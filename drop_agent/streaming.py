@@ -0,0 +1,132 @@
+"""
+Server-sent event filtering for the 82ndrop Agent System.
+
+``/run_sse`` streams every event of every agent. Only the final agent's
+text is meant for the user; the orchestration chatter of the root and
+guide/search agents delays the useful tokens and grows the stream. The
+filter keeps:
+- every text event of the streaming agent (prompt_writer_agent)
+- the final answer wherever it comes from (events writing the final output
+  key, e.g. semantic cache hits) and error events
+- other agents' complete text-only replies, e.g. the root agent answering
+  or asking for clarification itself
+- function calls/responses, transfers and the author of other agents'
+  events, with the text that accompanies them removed, so clients can still
+  show workflow progress
+
+Other agents' partial text chunks are dropped entirely (their complete
+reply follows as a non-partial event). Session history is
+untouched; only the HTTP stream is filtered.
+
+Configuration (environment variables):
+- SSE_SUPPRESS_CHATTER: "false" to stream every event unchanged (default enabled)
+"""
+
+import json
+import logging
+from typing import Any, Dict, Optional
+
+from .config import env_flag
+
+logger = logging.getLogger(__name__)
+
+STREAMING_AGENT = "prompt_writer_agent"
+FINAL_OUTPUT_KEY = "video_prompts_response"
+SSE_PATH = "/run_sse"
+
+_EVENT_SEPARATOR = b"\n\n"
+_DATA_PREFIX = b"data: "
+
+
+def filter_sse_event(event: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Decide what part of an ADK event reaches the client.
+
+    Args:
+        event: The event as serialized by ``/run_sse`` (camelCase keys)
+
+    Returns:
+        The event to send (possibly with its text removed), or None to drop it
+    """
+    if "author" not in event or event.get("errorCode"):
+        return event
+
+    state_delta = (event.get("actions") or {}).get("stateDelta") or {}
+    if event["author"] == STREAMING_AGENT or FINAL_OUTPUT_KEY in state_delta:
+        return event
+
+    if event.get("partial"):
+        return None
+
+    content = event.get("content") or {}
+    parts = [part for part in content.get("parts") or [] if "text" not in part]
+    transfer = (event.get("actions") or {}).get("transferToAgent")
+    if not parts and not transfer:
+        # A reply of its own (no tool call or handoff): it is meant for the user
+        return event
+    if parts:
+        return {**event, "content": {**content, "parts": parts}}
+    return {key: value for key, value in event.items() if key != "content"}
+
+
+class SSEChatterFilterMiddleware:
+    """
+    ASGI middleware applying ``filter_sse_event`` to ``/run_sse`` responses.
+
+    Implemented at the ASGI level (not ``BaseHTTPMiddleware``) so events are
+    forwarded as soon as they are produced.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.enabled = env_flag("SSE_SUPPRESS_CHATTER", default=True)
+
+    async def __call__(self, scope, receive, send):
+        if not self.enabled or scope["type"] != "http" or scope["path"] != SSE_PATH:
+            await self.app(scope, receive, send)
+            return
+
+        buffer = bytearray()
+        streaming = False
+
+        async def filtered_send(message):
+            nonlocal buffer, streaming
+            if message["type"] == "http.response.start":
+                headers = dict(message.get("headers") or [])
+                streaming = headers.get(b"content-type", b"").startswith(b"text/event-stream")
+                await send(message)
+                return
+            if message["type"] != "http.response.body" or not streaming:
+                await send(message)
+                return
+
+            buffer += message.get("body", b"")
+            more_body = message.get("more_body", False)
+            *events, rest = bytes(buffer).split(_EVENT_SEPARATOR)
+            if not more_body and rest:
+                events.append(rest)
+                rest = b""
+            buffer = bytearray(rest)
+
+            kept = [self._filter_event(raw) for raw in events if raw]
+            body = b"".join(event + _EVENT_SEPARATOR for event in kept if event)
+            if body or not more_body:
+                await send({"type": "http.response.body", "body": body, "more_body": more_body})
+
+        await self.app(scope, receive, filtered_send)
+
+    @staticmethod
+    def _filter_event(raw: bytes) -> bytes:
+        """Filter one serialized event; returns b"" to drop it."""
+        if not raw.startswith(_DATA_PREFIX):
+            return raw
+        try:
+            event = json.loads(raw[len(_DATA_PREFIX):])
+        except ValueError:
+            return raw
+        filtered = filter_sse_event(event)
+        if filtered is None:
+            return b""
+        if filtered is event:
+            return raw
+        return _DATA_PREFIX + json.dumps(filtered, ensure_ascii=False).encode("utf-8")
@@ -4,6 +4,7 @@ from google.adk import Agent
 from google.adk.tools.agent_tool import AgentTool
 from drop_agent.sub_agents.guide.prompt import GUIDE_PROMPT
 from drop_agent.sub_agents.prompt_writer.agent import prompt_writer_agent
+from drop_agent.models import build_model
 from drop_agent.callbacks import (
     before_agent_callback,
     after_agent_callback,
@@ -11,11 +12,12 @@ from drop_agent.callbacks import (
     after_model_callback,
     before_tool_callback,
     after_tool_callback,
+    on_tool_error_callback,
 )
 
 guide_agent = Agent(
     name="guide_agent",
-    model="gemini-2.0-flash",
+    model=build_model("guide_agent"),
     description="Specialist agent for analyzing and structuring user video ideas for vertical (9:16) composition using Master Prompt Template structure.",
     instruction="""You are a video structure specialist that creates detailed vertical (9:16) video concepts.
     
@@ -37,4 +39,5 @@ guide_agent = Agent(
     after_model_callback=after_model_callback,
     before_tool_callback=before_tool_callback,
     after_tool_callback=after_tool_callback,
+    on_tool_error_callback=on_tool_error_callback,
 )
@@ -2,26 +2,35 @@
 
 from google.adk import Agent
 from drop_agent.sub_agents.prompt_writer.prompt import INSTRUCTION
+from drop_agent.models import build_model
 from drop_agent.callbacks import (
     before_agent_callback,
     after_agent_callback,
-    before_model_callback,
-    after_model_callback,
     before_tool_callback,
     after_tool_callback,
+    on_tool_error_callback,
+)
+from drop_agent.sub_agents.prompt_writer.callbacks import (
+    before_prompt_writer_model_callback,
+    after_prompt_writer_model_callback,
 )
 
 prompt_writer_agent = Agent(
     name="prompt_writer_agent",
-    model="gemini-2.0-flash",
+    model=build_model("prompt_writer_agent"),
     description="Final step specialist who creates Master Prompt Template outputs for vertical video generation using natural language format.",
     instruction=INSTRUCTION,
     output_key="video_prompts_response",
+    # Final step: the model answers with JSON slot values (rendered locally),
+    # and JSON responses cannot be combined with the transfer function call
+    disallow_transfer_to_parent=True,
+    disallow_transfer_to_peers=True,
     # Re-enabling callbacks for production monitoring and analytics
     before_agent_callback=before_agent_callback,
     after_agent_callback=after_agent_callback,
-    before_model_callback=before_model_callback,
-    after_model_callback=after_model_callback,
+    before_model_callback=before_prompt_writer_model_callback,
+    after_model_callback=after_prompt_writer_model_callback,
     before_tool_callback=before_tool_callback,
     after_tool_callback=after_tool_callback,
+    on_tool_error_callback=on_tool_error_callback,
 )
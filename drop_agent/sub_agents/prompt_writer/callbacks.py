@@ -0,0 +1,192 @@
+"""
+Model callbacks specific to the prompt writer agent.
+
+They wrap the shared model callbacks: the request is constrained to the
+``MasterPromptSlots`` response schema, and the slot values returned by the
+model are validated, repaired and rendered into the Master Prompt Template
+locally before the response reaches the session.
+
+When the user asks for several versions of an idea, the same single call
+returns a ``MasterPromptVariants`` list that is deduplicated and rendered
+as one numbered response.
+
+In streaming mode (``/run_sse``) each partial chunk of slot JSON is replaced
+by the Master Prompt text it completes, so the prompt appears token by token.
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Optional
+
+try:
+    from google.adk.agents.callback_context import CallbackContext
+    from google.adk.models.llm_request import LlmRequest
+    from google.adk.models.llm_response import LlmResponse
+    from google.genai import types
+except ImportError:
+    # Fallback for development/testing
+    CallbackContext = Any
+    LlmRequest = Any
+    LlmResponse = Any
+    types = Any
+
+from drop_agent.callbacks import before_model_callback, after_model_callback
+from drop_agent.sub_agents.prompt_writer.template import (
+    MasterPromptSlots,
+    MasterPromptVariants,
+    StreamingSlotRenderer,
+    dedupe_variants,
+    parse_slots,
+    parse_variants,
+    render_master_prompt,
+    render_variants,
+)
+from drop_agent.variants import detect_variant_count
+
+logger = logging.getLogger(__name__)
+
+# Invocation-scoped state key ("temp:" keys are never persisted by ADK)
+SLOT_RENDER_STATE_KEY = "temp:slot_render"
+
+# Streams rendered at once; older ones are dropped first
+MAX_ACTIVE_STREAMS = 1000
+
+_stream_renderers: "OrderedDict[str, StreamingSlotRenderer]" = OrderedDict()
+_stream_lock = threading.Lock()
+
+
+def _response_text(llm_response: LlmResponse) -> str:
+    if not llm_response or not llm_response.content or not llm_response.content.parts:
+        return ""
+    return "".join(part.text for part in llm_response.content.parts if getattr(part, "text", None))
+
+
+def _variant_count(callback_context: CallbackContext) -> int:
+    content = getattr(callback_context, "user_content", None)
+    if not content or not content.parts:
+        return 1
+    return detect_variant_count(
+        " ".join(part.text for part in content.parts if getattr(part, "text", None))
+    )
+
+
+def _stream_renderer(invocation_id: str) -> StreamingSlotRenderer:
+    with _stream_lock:
+        renderer = _stream_renderers.get(invocation_id)
+        if renderer is None:
+            renderer = _stream_renderers[invocation_id] = StreamingSlotRenderer()
+            while len(_stream_renderers) > MAX_ACTIVE_STREAMS:
+                _stream_renderers.popitem(last=False)
+        return renderer
+
+
+def _end_stream(invocation_id: str) -> None:
+    with _stream_lock:
+        _stream_renderers.pop(invocation_id, None)
+
+
+def _render_partial_response(
+    callback_context: CallbackContext, llm_response: LlmResponse
+) -> LlmResponse:
+    """
+    Replace a streamed chunk of slot JSON with the Master Prompt text it completes.
+
+    Variant-mode output is not streamed; its chunks are emptied and the
+    numbered variants arrive with the final response.
+    """
+    delta = ""
+    try:
+        chunk = _response_text(llm_response)
+        if chunk and _variant_count(callback_context) == 1:
+            delta = _stream_renderer(callback_context.invocation_id).feed(chunk)
+    except Exception as e:
+        logger.error(f"Error rendering streamed prompt writer output: {e}")
+
+    content = types.Content(role="model", parts=[types.Part(text=delta)]) if delta else None
+    return llm_response.model_copy(update={"content": content})
+
+
+def before_prompt_writer_model_callback(
+    callback_context: CallbackContext, llm_request: LlmRequest = None
+) -> Optional[LlmResponse]:
+    """
+    Ask the model for slot values only, then run the shared callback.
+
+    The schema is applied first so it is part of the response cache key.
+    """
+    try:
+        if llm_request is not None:
+            variant_count = _variant_count(callback_context)
+            llm_request.config.response_mime_type = "application/json"
+            if variant_count > 1:
+                llm_request.config.response_schema = MasterPromptVariants
+                llm_request.append_instructions(
+                    [
+                        f"VARIANT MODE: return {variant_count} clearly distinct variants "
+                        'as {"variants": [...]}, each a complete slot object. Vary the '
+                        "hook, scene concept and captions - not just the wording."
+                    ]
+                )
+            else:
+                llm_request.config.response_schema = MasterPromptSlots
+    except Exception as e:
+        logger.error(f"Error in before_prompt_writer_model_callback: {e}")
+
+    return before_model_callback(callback_context, llm_request)
+
+
+def after_prompt_writer_model_callback(
+    callback_context: CallbackContext, llm_response: LlmResponse = None
+) -> Optional[LlmResponse]:
+    """
+    Render the Master Prompt from the model's slot values.
+
+    Streamed partial chunks are rendered incrementally; the final response
+    always carries the complete, validated rendering. The rendered response is handed to the shared callback, so the response
+    cache stores the final text. Output that cannot be repaired is passed
+    through unchanged.
+
+    Returns:
+        The rendered (partial) response, or None to keep the model response
+    """
+    if llm_response is None:
+        return after_model_callback(callback_context, llm_response)
+    if llm_response.partial:
+        after_model_callback(callback_context, llm_response)
+        return _render_partial_response(callback_context, llm_response)
+
+    _end_stream(callback_context.invocation_id)
+
+    rendered_response = None
+    try:
+        raw_text = _response_text(llm_response)
+        if raw_text:
+            variant_count = _variant_count(callback_context)
+            if variant_count > 1:
+                variants, repaired = parse_variants(raw_text)
+                variants = dedupe_variants(variants)
+                rendered = render_variants(variants)
+                logger.info(f"Rendered {len(variants)} of {variant_count} requested variants")
+            else:
+                slots, repaired = parse_slots(raw_text)
+                rendered = render_master_prompt(slots)
+            rendered_response = llm_response.model_copy(
+                update={"content": types.Content(role="model", parts=[types.Part(text=rendered)])}
+            )
+            callback_context.state[SLOT_RENDER_STATE_KEY] = {
+                "model_chars": len(raw_text),
+                "rendered_chars": len(rendered),
+                "repaired": repaired,
+            }
+            logger.info(
+                f"Rendered Master Prompt locally ({len(raw_text)} model chars -> "
+                f"{len(rendered)} chars{', repaired' if repaired else ''})"
+            )
+    except ValueError as e:
+        logger.warning(f"Could not render prompt writer slots, passing output through: {e}")
+    except Exception as e:
+        logger.error(f"Error in after_prompt_writer_model_callback: {e}")
+
+    after_model_callback(callback_context, rendered_response or llm_response)
+    return rendered_response
@@ -0,0 +1,479 @@
+"""
+Master Prompt Template slots and local rendering.
+
+The prompt writer model only emits the slot values (as JSON matching
+``MasterPromptSlots``, or ``MasterPromptVariants`` in variant mode); the
+fixed template boilerplate is rendered here.
+Malformed model output is repaired locally instead of paying for another
+model round trip.
+
+While the model is still streaming, ``StreamingSlotRenderer`` renders the
+template prefix that the slots received so far already determine, so the
+user sees the prompt being written instead of raw JSON.
+"""
+
+import re
+import json
+from string import Formatter
+from typing import Any, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel, Field, ValidationError
+
+MIN_DURATION = 15
+MAX_DURATION = 60
+DEFAULT_DURATION = 30
+DEFAULT_FONT_STYLE = "bold, high-contrast sans-serif"
+VARIANT_SIMILARITY_THRESHOLD = 0.8
+BRANDING_TEXT = "@82ndrop | #tiktokfilm"
+
+MASTER_PROMPT_TEMPLATE = """Generate a single, cohesive vertical short-form video (9:16 aspect ratio, optimized for TikTok mobile viewing), {duration} seconds long. The screen is a composite of the following layers:
+
+Top Third:
+Display the static text: "{top_line}" in a {font_style} font. This stays visible for the full duration.
+
+Center (Main Scene):
+Show {main_scene_description}. Frame it vertically for mobile viewing.
+
+Bottom Third:
+Over a motion B-roll {background_description}, display the following captions:
+{captions}
+Include the branding text "{branding}" in the bottom third.
+
+All visual layers should feel cinematic, coherent, and aligned with the TikTok 9:16 format."""
+
+
+class TimedCaption(BaseModel):
+    """A caption shown in the bottom third during a time window."""
+
+    time: str = Field(description='Time window, e.g. "0-5s"')
+    caption: str = Field(description="Caption text shown during the window")
+
+
+class MasterPromptSlots(BaseModel):
+    """Slot values filled in by the prompt writer model."""
+
+    duration: int = Field(
+        ge=MIN_DURATION, le=MAX_DURATION, description="Video length in seconds (15-60)"
+    )
+    top_line: str = Field(description="Hook headline shown in the top third")
+    font_style: str = Field(description="Mobile-readable font style for the top line")
+    main_scene_description: str = Field(
+        description="Main scene, including camera style, mood and any voice-over"
+    )
+    background_description: str = Field(
+        description="Motion B-roll shown behind the bottom-third captions"
+    )
+    captions: List[TimedCaption] = Field(description="Timed captions in order")
+
+
+class MasterPromptVariants(BaseModel):
+    """Several distinct sets of slot values generated in one model call."""
+
+    variants: List[MasterPromptSlots] = Field(description="Distinct Master Prompt variants")
+
+
+# Upper-case template placeholders and common model variations
+_FIELD_ALIASES = {
+    "duration": "duration",
+    "duration_seconds": "duration",
+    "top_line": "top_line",
+    "topline": "top_line",
+    "headline": "top_line",
+    "font_style": "font_style",
+    "font": "font_style",
+    "main_scene_description": "main_scene_description",
+    "main_scene": "main_scene_description",
+    "scene": "main_scene_description",
+    "background_description": "background_description",
+    "background": "background_description",
+    "b_roll": "background_description",
+    "captions": "captions",
+    "timed_captions": "captions",
+}
+
+_CAPTION_LINE = re.compile(r'^\s*\[?([\d.:]+\s*-\s*[\d.:]+\s*s?)\]?\s*[:\-–]\s*"?(.*?)"?\s*$')
+
+
+def _extract_json(text: str) -> Optional[Any]:
+    """Pull the first JSON value out of model text, fixing common defects."""
+    text = re.sub(r"^```(?:json)?\s*|\s*```$", "", text.strip())
+    start = min((i for i in (text.find("{"), text.find("[")) if i >= 0), default=-1)
+    if start < 0:
+        return None
+    end = max(text.rfind("}"), text.rfind("]"))
+    candidate = text[start:end + 1]
+    for attempt in (candidate, re.sub(r",\s*([}\]])", r"\1", candidate)):
+        try:
+            return json.loads(attempt)
+        except json.JSONDecodeError:
+            continue
+    return None
+
+
+def _repair_duration(value: Any) -> int:
+    match = re.search(r"\d+", str(value)) if value is not None else None
+    duration = int(match.group()) if match else DEFAULT_DURATION
+    return max(MIN_DURATION, min(MAX_DURATION, duration))
+
+
+def _repair_captions(value: Any) -> List[Dict[str, str]]:
+    if isinstance(value, dict):
+        value = [{"time": k, "caption": v} for k, v in value.items()]
+    if isinstance(value, str):
+        value = value.splitlines()
+
+    captions = []
+    for item in value or []:
+        if isinstance(item, dict):
+            time = item.get("time") or item.get("timing") or item.get("TIME") or ""
+            caption = item.get("caption") or item.get("text") or item.get("CAPTION") or ""
+        else:
+            match = _CAPTION_LINE.match(str(item))
+            if not match:
+                continue
+            time, caption = match.groups()
+        time, caption = str(time).strip(), str(caption).strip().strip('"')
+        if caption:
+            captions.append({"time": time or f"{len(captions) * 5}-{len(captions) * 5 + 5}s", "caption": caption})
+    return captions
+
+
+def repair_slots(data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Normalize keys and values of slot data produced by the model.
+
+    Args:
+        data: Decoded model output
+
+    Returns:
+        Slot data ready for ``MasterPromptSlots`` validation
+    """
+    repaired = {}
+    for key, value in data.items():
+        field = _FIELD_ALIASES.get(key.strip().strip("[]").lower())
+        if field and field not in repaired:
+            repaired[field] = value
+
+    repaired["duration"] = _repair_duration(repaired.get("duration"))
+    repaired["font_style"] = str(repaired.get("font_style") or DEFAULT_FONT_STYLE).strip()
+    repaired["font_style"] = re.sub(r"\s+font$", "", repaired["font_style"], flags=re.IGNORECASE)
+    repaired["captions"] = _repair_captions(repaired.get("captions"))
+    for field in ("top_line", "main_scene_description", "background_description"):
+        repaired[field] = str(repaired.get(field) or "").strip().strip('"')
+    repaired["main_scene_description"] = re.sub(r"^show\s+", "", repaired["main_scene_description"], flags=re.IGNORECASE)
+    return repaired
+
+
+def parse_slots(text: str) -> Tuple[MasterPromptSlots, bool]:
+    """
+    Validate model output, repairing it locally when needed.
+
+    Args:
+        text: Raw model output
+
+    Returns:
+        (slots, repaired) where ``repaired`` tells whether fixes were needed
+
+    Raises:
+        ValueError: If the output cannot be turned into usable slots
+    """
+    try:
+        return MasterPromptSlots.model_validate_json(text), False
+    except ValidationError:
+        pass
+
+    data = _extract_json(text)
+    if isinstance(data, list) and data and isinstance(data[0], dict):
+        data = data[0]
+    if not isinstance(data, dict):
+        raise ValueError("Prompt writer output contains no slot object")
+
+    repaired = repair_slots(data)
+    if not repaired["main_scene_description"] or not repaired["top_line"]:
+        raise ValueError("Prompt writer output is missing required slots")
+    return MasterPromptSlots.model_validate(repaired), True
+
+
+def parse_variants(text: str) -> Tuple[List[MasterPromptSlots], bool]:
+    """
+    Validate variant-mode output, repairing each variant locally when needed.
+
+    A single slot object is accepted as a one-variant answer.
+
+    Returns:
+        (variants, repaired) where ``repaired`` tells whether fixes were needed
+
+    Raises:
+        ValueError: If no usable variant can be recovered
+    """
+    try:
+        return MasterPromptVariants.model_validate_json(text).variants, False
+    except ValidationError:
+        pass
+
+    data = _extract_json(text)
+    if isinstance(data, dict):
+        data = data.get("variants", [data])
+    if not isinstance(data, list):
+        raise ValueError("Prompt writer output contains no variants")
+
+    variants = []
+    for item in data:
+        if not isinstance(item, dict):
+            continue
+        repaired = repair_slots(item)
+        if repaired["main_scene_description"] and repaired["top_line"]:
+            variants.append(MasterPromptSlots.model_validate(repaired))
+    if not variants:
+        raise ValueError("Prompt writer output contains no usable variants")
+    return variants, True
+
+
+def _word_set(slots: MasterPromptSlots) -> set:
+    text = f"{slots.top_line} {slots.main_scene_description}".lower()
+    return set(re.findall(r"[a-z0-9']+", text))
+
+
+def dedupe_variants(
+    variants: List[MasterPromptSlots], threshold: float = VARIANT_SIMILARITY_THRESHOLD
+) -> List[MasterPromptSlots]:
+    """
+    Drop variants that are near-duplicates of an earlier one.
+
+    Similarity is the Jaccard overlap of the words in the top line and main
+    scene description.
+    """
+    unique, seen = [], []
+    for slots in variants:
+        words = _word_set(slots)
+        if any(len(words & other) / max(1, len(words | other)) >= threshold for other in seen):
+            continue
+        unique.append(slots)
+        seen.append(words)
+    return unique
+
+
+def render_variants(variants: List[MasterPromptSlots]) -> str:
+    """Render every variant, numbered and separated, in one response."""
+    if len(variants) == 1:
+        return render_master_prompt(variants[0])
+    return "\n\n---\n\n".join(
+        f"Variant {index} of {len(variants)}:\n\n{render_master_prompt(slots)}"
+        for index, slots in enumerate(variants, start=1)
+    )
+
+
+def render_master_prompt(slots: MasterPromptSlots) -> str:
+    """Render the full natural language Master Prompt from slot values."""
+    captions = "\n".join(f'{c.time}: "{c.caption}"' for c in slots.captions)
+    return MASTER_PROMPT_TEMPLATE.format(
+        duration=slots.duration,
+        top_line=slots.top_line,
+        font_style=slots.font_style,
+        main_scene_description=slots.main_scene_description.rstrip("."),
+        background_description=slots.background_description.rstrip("."),
+        captions=captions,
+        branding=BRANDING_TEXT,
+    )
+
+
+class _Incomplete:
+    """Marks a JSON value that was cut off by the end of the stream so far."""
+
+    __slots__ = ("value",)
+
+    def __init__(self, value: Any):
+        self.value = value
+
+
+_MISSING = object()
+_SCALAR = re.compile(r"-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?|true|false|null")
+_PARTIAL_ESCAPE = re.compile(r"\\(?:u[0-9a-fA-F]{0,3})?$")
+
+
+def _skip_whitespace(text: str, index: int) -> int:
+    while index < len(text) and text[index] in " \t\r\n":
+        index += 1
+    return index
+
+
+def _parse_partial_string(text: str, index: int) -> Tuple[Any, int]:
+    escaped = False
+    for end in range(index + 1, len(text)):
+        if escaped:
+            escaped = False
+        elif text[end] == "\\":
+            escaped = True
+        elif text[end] == '"':
+            return json.loads(text[index:end + 1]), end + 1
+    prefix = _PARTIAL_ESCAPE.sub("", text[index + 1:])
+    try:
+        return _Incomplete(json.loads(f'"{prefix}"')), len(text)
+    except json.JSONDecodeError:
+        return _MISSING, len(text)
+
+
+def _parse_partial_container(text: str, index: int) -> Tuple[Any, int]:
+    is_object = text[index] == "{"
+    closer = "}" if is_object else "]"
+    result: Any = {} if is_object else []
+    index += 1
+    while True:
+        index = _skip_whitespace(text, index)
+        if index >= len(text):
+            return _Incomplete(result), index
+        if text[index] == closer:
+            return result, index + 1
+
+        if is_object:
+            if text[index] != '"':
+                raise ValueError(f"Expected an object key at {index}")
+            key, index = _parse_partial_string(text, index)
+            if key is _MISSING or isinstance(key, _Incomplete):
+                return _Incomplete(result), index
+            index = _skip_whitespace(text, index)
+            if index >= len(text):
+                return _Incomplete(result), index
+            if text[index] != ":":
+                raise ValueError(f"Expected ':' at {index}")
+            index += 1
+
+        value, index = _parse_partial_value(text, index)
+        if value is _MISSING:
+            return _Incomplete(result), index
+        if is_object:
+            result[key] = value
+        else:
+            result.append(value)
+        if isinstance(value, _Incomplete):
+            return _Incomplete(result), index
+
+        index = _skip_whitespace(text, index)
+        if index >= len(text):
+            return _Incomplete(result), index
+        if text[index] == ",":
+            index += 1
+        elif text[index] != closer:
+            raise ValueError(f"Expected ',' or '{closer}' at {index}")
+
+
+def _parse_partial_value(text: str, index: int) -> Tuple[Any, int]:
+    """
+    Parse a JSON value that may be truncated.
+
+    Strings and containers cut off by the end of the text are returned
+    wrapped in ``_Incomplete``; scalars that could still grow (``3`` of
+    ``30``) are reported as missing.
+    """
+    index = _skip_whitespace(text, index)
+    if index >= len(text):
+        return _MISSING, index
+    if text[index] == '"':
+        return _parse_partial_string(text, index)
+    if text[index] in "{[":
+        return _parse_partial_container(text, index)
+    match = _SCALAR.match(text, index)
+    if not match:
+        raise ValueError(f"Unexpected character at {index}")
+    if match.end() >= len(text):
+        return _MISSING, match.end()
+    return json.loads(match.group()), match.end()
+
+
+def _partial_captions(value: Any) -> Tuple[str, bool]:
+    """Render the caption lines received so far; the bool tells if the list is complete."""
+    complete = not isinstance(value, _Incomplete)
+    items = value.value if isinstance(value, _Incomplete) else value
+    lines = []
+    for item in items if isinstance(items, list) else []:
+        item_complete = not isinstance(item, _Incomplete)
+        item = item.value if isinstance(item, _Incomplete) else item
+        if not isinstance(item, dict):
+            break
+        time, caption = item.get("time"), item.get("caption")
+        if not isinstance(time, str):
+            break
+        if isinstance(caption, _Incomplete):
+            lines.append(f'{time}: "{caption.value}')
+            break
+        if not isinstance(caption, str):
+            if not item_complete:
+                break
+            continue
+        lines.append(f'{time}: "{caption}"')
+        if not item_complete:
+            break
+    return "\n".join(lines), complete
+
+
+def render_partial_master_prompt(data: Dict[str, Any]) -> str:
+    """
+    Render the part of the Master Prompt determined by partially streamed slots.
+
+    Slots are filled in template order; rendering stops at the first slot
+    that has not been fully received, after writing whatever prefix of it is
+    already known. A longer stream never changes text rendered earlier.
+    """
+    rendered = []
+    for literal, field, _, _ in Formatter().parse(MASTER_PROMPT_TEMPLATE):
+        rendered.append(literal)
+        if field is None:
+            break
+        if field == "branding":
+            rendered.append(BRANDING_TEXT)
+            continue
+
+        value = data.get(field, _MISSING)
+        if value is _MISSING:
+            break
+        if field == "captions":
+            captions, complete = _partial_captions(value)
+            rendered.append(captions)
+            if not complete:
+                break
+            continue
+
+        complete = not isinstance(value, _Incomplete)
+        value = value.value if isinstance(value, _Incomplete) else value
+        if field == "duration":
+            value = _repair_duration(value)
+        elif field in ("main_scene_description", "background_description"):
+            value = str(value).rstrip(".")
+        rendered.append(str(value))
+        if not complete:
+            break
+    return "".join(rendered)
+
+
+class StreamingSlotRenderer:
+    """
+    Turns streamed slot JSON chunks into rendered Master Prompt text deltas.
+    """
+
+    def __init__(self):
+        self._chunks: List[str] = []
+        self.rendered = ""
+
+    def feed(self, chunk: str) -> str:
+        """
+        Add a streamed chunk of model output.
+
+        Returns:
+            The newly renderable text (empty when nothing new can be shown)
+        """
+        self._chunks.append(chunk)
+        try:
+            data, _ = _parse_partial_value("".join(self._chunks).lstrip(), 0)
+        except ValueError:
+            return ""
+        if isinstance(data, _Incomplete):
+            data = data.value
+        if not isinstance(data, dict):
+            return ""
+
+        rendered = render_partial_master_prompt(data)
+        if len(rendered) <= len(self.rendered) or not rendered.startswith(self.rendered):
+            return ""
+        delta = rendered[len(self.rendered):]
+        self.rendered = rendered
+        return delta
@@ -1,6 +1,7 @@
 from google.adk import Agent
 from google.adk.tools import google_search
 from drop_agent.sub_agents.search.prompt import DESCRIPTION, INSTRUCTION
+from drop_agent.models import build_model
 from drop_agent.callbacks import (
     before_agent_callback,
     after_agent_callback,
@@ -8,11 +9,12 @@ from drop_agent.callbacks import (
     after_model_callback,
     before_tool_callback,
     after_tool_callback,
+    on_tool_error_callback,
 )
 
 search_agent = Agent(
     name="search_agent",
-    model="gemini-2.0-flash",
+    model=build_model("search_agent"),
     description=DESCRIPTION,
     instruction=INSTRUCTION,
     tools=[google_search],  # Only use the google_search tool
@@ -23,4 +25,5 @@ search_agent = Agent(
     after_model_callback=after_model_callback,
     before_tool_callback=before_tool_callback,
     after_tool_callback=after_tool_callback,
+    on_tool_error_callback=on_tool_error_callback,
 )
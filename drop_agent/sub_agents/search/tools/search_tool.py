@@ -1,29 +1,77 @@
 from google.adk.tools import BaseTool
-from vertexai.preview.reasoning_engines import AdkApp
+from google.adk.runners import InMemoryRunner
+from google.genai import types
 from ..agent import search_agent
+from ....budget import PARENT_INVOCATION_STATE_KEY
 
 class SearchEnhancementTool(BaseTool):
     """Tool that wraps the search agent for trend enhancement."""
-    
+
     def __init__(self):
         super().__init__(
             name="search_enhancement",
             description="Enhances video concepts with current trends and viral references"
         )
-        self.app = AdkApp(agent=search_agent)
-    
-    async def __call__(self, input_text: str) -> str:
+        # Run the search agent in-process: no Vertex reasoning engine or
+        # credentials needed, and no blocking calls on the event loop
+        self.runner = InMemoryRunner(agent=search_agent, app_name="search_enhancement")
+
+    def _get_declaration(self) -> types.FunctionDeclaration:
+        return types.FunctionDeclaration(
+            name=self.name,
+            description=self.description,
+            parameters=types.Schema(
+                type=types.Type.OBJECT,
+                properties={
+                    "input_text": types.Schema(
+                        type=types.Type.STRING,
+                        description="The video concept to enhance",
+                    )
+                },
+                required=["input_text"],
+            ),
+        )
+
+    async def run_async(self, *, args, tool_context) -> str:
+        user_id = getattr(tool_context, "user_id", None) or "search_enhancement"
+        return await self(
+            args.get("input_text", ""),
+            user_id=user_id,
+            invocation_id=getattr(tool_context, "invocation_id", None),
+        )
+
+    async def __call__(
+        self, input_text: str, user_id: str = "search_enhancement", invocation_id: str = None
+    ) -> str:
         """
         Call the search agent to enhance the input with trends.
-        
+
         Args:
             input_text: The video concept to enhance
-            
+            user_id: User the search session is created for
+            invocation_id: Invocation whose budget the search agent's model
+                calls are charged to (its own runner invocation if None)
+
         Returns:
             Enhanced video concept with trends
         """
-        # Use the search agent to process the input
-        response = None
-        for event in self.app.stream_query(user_id="test_user", message=input_text):
-            response = event
-        return response.get("content", {}).get("parts", [{}])[0].get("text", "") 
\ No newline at end of file
+        # Use the search agent to process the input in a throwaway session
+        state = {PARENT_INVOCATION_STATE_KEY: invocation_id} if invocation_id else None
+        session = await self.runner.session_service.create_session(
+            app_name=self.runner.app_name, user_id=user_id, state=state
+        )
+        response = ""
+        try:
+            async for event in self.runner.run_async(
+                user_id=user_id,
+                session_id=session.id,
+                new_message=types.Content(role="user", parts=[types.Part(text=input_text)]),
+            ):
+                if event.content and event.content.parts and not event.partial:
+                    text = "".join(part.text for part in event.content.parts if part.text)
+                    response = text or response
+        finally:
+            await self.runner.session_service.delete_session(
+                app_name=self.runner.app_name, user_id=user_id, session_id=session.id
+            )
+        return response
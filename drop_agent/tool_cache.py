@@ -0,0 +1,231 @@
+"""
+Tool result cache for the 82ndrop Agent System.
+
+``before_tool_callback`` can answer a tool call itself. For the tools in
+the policy registry (``TOOL_CACHE_POLICIES``) it does so from this cache:
+- results are keyed on the tool name plus normalized arguments (string
+  arguments are whitespace-collapsed and, unless the policy says otherwise,
+  lowercased; the user id is part of the key for per-user tools)
+- every tool has its own LRU with a TTL
+- concurrent identical calls are coalesced: the first call runs the tool in
+  a shared task and the others await its result instead of running it again
+- failed results (errors, exceptions) are never cached
+
+Every call reports whether it was a hit, a coalesced wait or a miss, and how
+much tool time a hit saved (the recorded duration of the cached run).
+
+Configuration (environment variables):
+- TOOL_CACHE: "true" to enable the cache
+- TOOL_CACHE_POLICIES: per-tool overrides as "tool=ttl_seconds:max_entries",
+  e.g. "search_enhancement=600:128"; a ttl of 0 disables a tool
+"""
+
+import os
+import copy
+import json
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from .config import env_flag
+
+logger = logging.getLogger(__name__)
+
+HIT = "hit"
+MISS = "miss"
+COALESCED = "coalesced"
+
+# Calls whose outcome hasn't been collected by after_tool_callback yet
+MAX_PENDING_OUTCOMES = 1000
+
+
+@dataclass(frozen=True)
+class ToolCachePolicy:
+    """How one tool's results are cached."""
+
+    ttl_seconds: float = 3600.0
+    max_entries: int = 256
+    # Results depend on the caller, so the user id is part of the key
+    per_user: bool = False
+    # Lowercase string arguments before keying
+    case_insensitive: bool = True
+
+
+# Tools whose results may be cached. Search results follow trends, which
+# move slowly compared to how often the same concept is enhanced.
+TOOL_CACHE_POLICIES: Dict[str, ToolCachePolicy] = {
+    "search_enhancement": ToolCachePolicy(ttl_seconds=3600.0, max_entries=256),
+}
+
+
+def load_policies(value: str) -> Dict[str, ToolCachePolicy]:
+    """The registry with "tool=ttl:max_entries" overrides applied."""
+    policies = dict(TOOL_CACHE_POLICIES)
+    for item in value.split(","):
+        name, _, spec = item.partition("=")
+        name, spec = name.strip(), spec.strip()
+        if not name or not spec:
+            continue
+        ttl, _, max_entries = spec.partition(":")
+        policy = replace(policies.get(name, ToolCachePolicy()), ttl_seconds=float(ttl))
+        if max_entries:
+            policy = replace(policy, max_entries=int(max_entries))
+        policies[name] = policy
+    return {name: policy for name, policy in policies.items() if policy.ttl_seconds > 0}
+
+
+def _normalize(value: Any, case_insensitive: bool) -> Any:
+    if isinstance(value, str):
+        value = " ".join(value.split())
+        return value.lower() if case_insensitive else value
+    if isinstance(value, dict):
+        return {key: _normalize(item, case_insensitive) for key, item in sorted(value.items())}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(item, case_insensitive) for item in value]
+    return value
+
+
+def build_tool_cache_key(
+    tool_name: str, args: Dict[str, Any], policy: ToolCachePolicy, user_id: Optional[str] = None
+) -> str:
+    normalized = _normalize(args or {}, policy.case_insensitive)
+    scope = user_id if policy.per_user else None
+    return json.dumps([tool_name, scope, normalized], sort_keys=True, default=str)
+
+
+def is_failed_result(result: Any) -> bool:
+    """Results that must not be cached."""
+    if result is None:
+        return True
+    if isinstance(result, str):
+        return not result.strip() or result.startswith("Error:")
+    return isinstance(result, dict) and ("error" in result or result.get("status") == "skipped")
+
+
+class ToolResultCache:
+    """Per-tool TTL + LRU caches of tool results, with call coalescing."""
+
+    def __init__(self, policies: Dict[str, ToolCachePolicy]):
+        self.policies = policies
+        # tool -> key -> (stored_at, duration_seconds, result)
+        self._entries: Dict[str, "OrderedDict[str, Tuple[float, float, Any]]"] = {}
+        self._inflight: Dict[str, "asyncio.Task"] = {}
+        self._outcomes: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0, "stores": 0, "saved_seconds": 0.0}
+
+    def policy_for(self, tool_name: str) -> Optional[ToolCachePolicy]:
+        return self.policies.get(tool_name)
+
+    def _lookup(self, tool_name: str, key: str) -> Optional[Tuple[float, float, Any]]:
+        entries = self._entries.get(tool_name)
+        entry = entries.get(key) if entries else None
+        if entry is None:
+            return None
+        if time.time() - entry[0] > self.policies[tool_name].ttl_seconds:
+            del entries[key]
+            return None
+        entries.move_to_end(key)
+        return entry
+
+    def _store(self, tool_name: str, key: str, duration: float, result: Any) -> None:
+        entries = self._entries.setdefault(tool_name, OrderedDict())
+        entries[key] = (time.time(), duration, result)
+        entries.move_to_end(key)
+        while len(entries) > self.policies[tool_name].max_entries:
+            entries.popitem(last=False)
+        self.stats["stores"] += 1
+
+    def _record_outcome(self, call_id: str, outcome: str, saved_seconds: float = 0.0) -> None:
+        self._outcomes[call_id] = (outcome, saved_seconds)
+        while len(self._outcomes) > MAX_PENDING_OUTCOMES:
+            self._outcomes.popitem(last=False)
+
+    def pop_outcome(self, call_id: str) -> Optional[Tuple[str, float]]:
+        """The (outcome, saved_seconds) of a call served through the cache."""
+        return self._outcomes.pop(call_id, None)
+
+    def serve(
+        self,
+        tool_name: str,
+        args: Dict[str, Any],
+        call_id: str,
+        run_tool: Callable[[], Awaitable[Any]],
+        user_id: Optional[str] = None,
+    ) -> Any:
+        """
+        Answer a tool call from the cache.
+
+        Args:
+            tool_name: Name of the called tool (must have a policy)
+            args: The call's arguments
+            call_id: Function call id, to look the outcome up in after_tool_callback
+            run_tool: Runs the tool for real on a miss
+            user_id: Caller, for per-user policies
+
+        Returns:
+            The cached result on a hit, otherwise an awaitable resolving to
+            the result of the shared (possibly already running) execution
+        """
+        policy = self.policies[tool_name]
+        key = build_tool_cache_key(tool_name, args, policy, user_id)
+
+        entry = self._lookup(tool_name, key)
+        if entry is not None:
+            self.stats["hits"] += 1
+            self.stats["saved_seconds"] += entry[1]
+            self._record_outcome(call_id, HIT, entry[1])
+            return copy.deepcopy(entry[2])
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.stats["coalesced"] += 1
+            started = time.perf_counter()
+
+            async def wait_for_shared():
+                result = await asyncio.shield(task)
+                # Time the tool would have taken on its own, minus the wait
+                duration = self._entries.get(tool_name, {}).get(key, (0.0, 0.0, None))[1]
+                self._record_outcome(call_id, COALESCED, max(0.0, duration - (time.perf_counter() - started)))
+                return copy.deepcopy(result)
+
+            return wait_for_shared()
+
+        self.stats["misses"] += 1
+        self._record_outcome(call_id, MISS)
+
+        async def run_and_store():
+            started = time.perf_counter()
+            try:
+                result = await run_tool()
+            finally:
+                self._inflight.pop(key, None)
+            if not is_failed_result(result):
+                self._store(tool_name, key, time.perf_counter() - started, result)
+            return result
+
+        task = self._inflight[key] = asyncio.ensure_future(run_and_store())
+
+        async def wait_for_own():
+            return copy.deepcopy(await asyncio.shield(task))
+
+        return wait_for_own()
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return sum(len(entries) for entries in self._entries.values())
+
+
+_tool_cache = None
+
+
+def get_tool_cache() -> Optional[ToolResultCache]:
+    """Get or initialize the tool result cache (None when disabled)."""
+    global _tool_cache
+    if _tool_cache is None and env_flag("TOOL_CACHE"):
+        _tool_cache = ToolResultCache(load_policies(os.getenv("TOOL_CACHE_POLICIES") or ""))
+    return _tool_cache
@@ -0,0 +1,453 @@
+"""
+Distributed tracing for the 82ndrop Agent System.
+
+OpenTelemetry spans show where a slow request spent its time:
+- a root SERVER span per HTTP request, opened by the auth middleware (it
+  continues an incoming W3C ``traceparent``), with a child span for the
+  Firebase token check
+- a span per agent step, model call and tool call, opened and closed in the
+  before_*/after_* callbacks; model and tool spans are children of their
+  agent's span, and agents run by a tool (search_agent) are children of
+  the tool's span
+
+Our spans use their own tracer provider, so ADK's built-in spans are not
+exported twice. Trace and span ids are added to every log record
+(``%(trace_id)s`` and ``%(span_id)s`` in a log format) and to the callback
+hop events.
+
+Exporters:
+- file: OTLP JSON lines (one ExportTraceServiceRequest per line), readable
+  offline and by the collector's otlpjsonfile receiver
+- memory: kept in-process (``get_memory_exporter()``), for tests and benchmarks
+- otlp: OTLP/HTTP to OTEL_EXPORTER_OTLP_ENDPOINT (requires
+  opentelemetry-exporter-otlp-proto-http)
+
+Tracing needs opentelemetry-sdk (installed with google-adk); without it the
+helpers do nothing.
+
+Configuration (environment variables):
+- TRACING: "true" to enable tracing (default disabled)
+- TRACING_EXPORTER: "file", "memory" or "otlp" (default file)
+- TRACING_FILE_PATH: file exporter output (default traces/spans.jsonl)
+- TRACING_SERVICE_NAME: service.name resource attribute (default 82ndrop-api)
+"""
+
+import os
+import json
+import logging
+import threading
+import contextvars
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+from .config import env_flag
+
+try:
+    from opentelemetry import context as otel_context
+    from opentelemetry import trace
+    from opentelemetry.propagate import extract
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import ReadableSpan, TracerProvider
+    from opentelemetry.sdk.trace.export import (
+        BatchSpanProcessor,
+        SimpleSpanProcessor,
+        SpanExporter,
+        SpanExportResult,
+    )
+    from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+    from opentelemetry.trace import SpanKind, Status, StatusCode
+
+    OTEL_AVAILABLE = True
+except ImportError:
+    # Fallback when OpenTelemetry is not installed: tracing stays disabled
+    OTEL_AVAILABLE = False
+    ReadableSpan = Any
+    SpanExporter = object
+
+logger = logging.getLogger(__name__)
+
+TRACER_NAME = "drop_agent"
+
+# Spans opened by a before_* callback whose after_* never ran (e.g. the call
+# raised); the oldest are ended and dropped first. Reopening a key (an agent
+# that runs again in the same invocation) ends its previous span.
+MAX_OPEN_SPANS = 1000
+
+# Innermost request or tool span of the running task; agent spans hang off it
+_parent_span: contextvars.ContextVar = contextvars.ContextVar("drop_agent_parent_span", default=None)
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    if isinstance(value, (list, tuple)):
+        return {"arrayValue": {"values": [_otlp_value(item) for item in value]}}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes) -> list:
+    return [{"key": key, "value": _otlp_value(value)} for key, value in (attributes or {}).items()]
+
+
+def encode_otlp_json(spans: Sequence[ReadableSpan]) -> Dict[str, Any]:
+    """Encode finished spans as an OTLP/JSON ExportTraceServiceRequest."""
+    resources: Dict[int, Tuple[Any, Dict[str, list]]] = {}
+    for span in spans:
+        _, scopes = resources.setdefault(id(span.resource), (span.resource, {}))
+        scope = span.instrumentation_scope.name if span.instrumentation_scope else ""
+        context = span.get_span_context()
+        encoded = {
+            "traceId": format(context.trace_id, "032x"),
+            "spanId": format(context.span_id, "016x"),
+            "name": span.name,
+            "kind": span.kind.value + 1,  # OTLP kinds start at 1 (INTERNAL)
+            "startTimeUnixNano": str(span.start_time),
+            "endTimeUnixNano": str(span.end_time),
+            "attributes": _otlp_attributes(span.attributes),
+            "events": [
+                {
+                    "name": event.name,
+                    "timeUnixNano": str(event.timestamp),
+                    "attributes": _otlp_attributes(event.attributes),
+                }
+                for event in span.events
+            ],
+            "status": {"code": span.status.status_code.value, "message": span.status.description or ""},
+        }
+        if span.parent is not None:
+            encoded["parentSpanId"] = format(span.parent.span_id, "016x")
+        scopes.setdefault(scope, []).append(encoded)
+
+    return {
+        "resourceSpans": [
+            {
+                "resource": {"attributes": _otlp_attributes(resource.attributes)},
+                "scopeSpans": [
+                    {"scope": {"name": scope}, "spans": encoded_spans}
+                    for scope, encoded_spans in scopes.items()
+                ],
+            }
+            for resource, scopes in resources.values()
+        ]
+    }
+
+
+class OtlpJsonFileExporter(SpanExporter):
+    """Appends each batch of spans to a file as one OTLP/JSON line."""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def export(self, spans: Sequence[ReadableSpan]) -> "SpanExportResult":
+        try:
+            line = json.dumps(encode_otlp_json(spans))
+            with self._lock, open(self.path, "a") as f:
+                f.write(line + "\n")
+            return SpanExportResult.SUCCESS
+        except Exception as e:
+            logger.warning(f"Could not export spans to {self.path}: {e}")
+            return SpanExportResult.FAILURE
+
+    def shutdown(self) -> None:
+        pass
+
+
+class Tracing:
+    """Our tracer plus the spans opened by before_* callbacks."""
+
+    def __init__(self, provider: "TracerProvider", memory_exporter: Optional["InMemorySpanExporter"] = None):
+        self.provider = provider
+        self.tracer = provider.get_tracer(TRACER_NAME)
+        self.memory_exporter = memory_exporter
+        self._open: "OrderedDict[Tuple[str, ...], Any]" = OrderedDict()
+        # Parent span to restore when a tool call ends, by call id
+        self._tool_parents: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> Optional["Tracing"]:
+        resource = Resource.create(
+            {"service.name": os.getenv("TRACING_SERVICE_NAME") or "82ndrop-api"}
+        )
+        provider = TracerProvider(resource=resource)
+        exporter_name = (os.getenv("TRACING_EXPORTER") or "file").strip().lower()
+        memory_exporter = None
+        if exporter_name == "memory":
+            memory_exporter = InMemorySpanExporter()
+            provider.add_span_processor(SimpleSpanProcessor(memory_exporter))
+        elif exporter_name == "otlp":
+            try:
+                from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+            except ImportError:
+                logger.warning(
+                    "TRACING_EXPORTER=otlp requires opentelemetry-exporter-otlp-proto-http; tracing disabled"
+                )
+                return None
+            provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+        else:
+            path = os.getenv("TRACING_FILE_PATH") or "traces/spans.jsonl"
+            provider.add_span_processor(BatchSpanProcessor(OtlpJsonFileExporter(path)))
+        return cls(provider, memory_exporter)
+
+    def start_span(
+        self,
+        key: Tuple[str, ...],
+        name: str,
+        parent: Any = None,
+        attributes: Optional[Dict[str, Any]] = None,
+    ):
+        """Open a span that a later callback ends with ``end_span(key)``."""
+        parent = parent if parent is not None and parent.is_recording() else _parent_span.get()
+        span = self.tracer.start_span(
+            name,
+            context=trace.set_span_in_context(parent) if parent is not None else None,
+            attributes=attributes,
+        )
+        with self._lock:
+            previous = self._open.pop(key, None)
+            self._open[key] = span
+            while len(self._open) > MAX_OPEN_SPANS:
+                _, abandoned = self._open.popitem(last=False)
+                abandoned.set_attribute("drop_agent.abandoned", True)
+                abandoned.end()
+        if previous is not None:
+            previous.end()
+        return span
+
+    def get_span(self, key: Tuple[str, ...]):
+        return self._open.get(key)
+
+    def end_span(
+        self,
+        key: Tuple[str, ...],
+        attributes: Optional[Dict[str, Any]] = None,
+        error: Optional[str] = None,
+    ) -> None:
+        with self._lock:
+            span = self._open.pop(key, None)
+        if span is None:
+            return
+        for name, value in (attributes or {}).items():
+            if value is not None:
+                span.set_attribute(name, value)
+        if error:
+            span.set_status(Status(StatusCode.ERROR, error))
+        span.end()
+
+    def shutdown(self) -> None:
+        self.provider.shutdown()
+
+
+_tracing = None
+_tracing_initialized = False
+
+
+def get_tracing() -> Optional[Tracing]:
+    """Get or initialize tracing (None when disabled or unavailable)."""
+    global _tracing, _tracing_initialized
+    if not _tracing_initialized:
+        _tracing_initialized = True
+        if env_flag("TRACING") and OTEL_AVAILABLE:
+            _tracing = Tracing.from_env()
+            if _tracing is not None:
+                _install_log_record_factory()
+                logger.info(f"Tracing enabled ({os.getenv('TRACING_EXPORTER', 'file')} exporter)")
+        elif env_flag("TRACING"):
+            logger.warning("TRACING is set but opentelemetry-sdk is not installed; tracing disabled")
+    return _tracing
+
+
+def get_memory_exporter() -> Optional["InMemorySpanExporter"]:
+    """The in-memory exporter when TRACING_EXPORTER=memory."""
+    tracing = get_tracing()
+    return tracing.memory_exporter if tracing else None
+
+
+def current_span_ids() -> Tuple[Optional[str], Optional[str]]:
+    """Hex trace and span id of the running request or tool, if traced."""
+    if _tracing is None:
+        return None, None
+    span = _parent_span.get() or trace.get_current_span()
+    context = span.get_span_context()
+    if not context.is_valid:
+        return None, None
+    return format(context.trace_id, "032x"), format(context.span_id, "016x")
+
+
+def _install_log_record_factory() -> None:
+    """Add trace_id and span_id attributes to every log record."""
+    factory = logging.getLogRecordFactory()
+
+    def record_factory(*args, **kwargs):
+        record = factory(*args, **kwargs)
+        record.trace_id, record.span_id = current_span_ids()
+        return record
+
+    logging.setLogRecordFactory(record_factory)
+
+
+# --- HTTP requests ---------------------------------------------------------
+
+
+async def trace_request(request, handler):
+    """
+    Run ``handler(request)`` inside a root SERVER span.
+
+    Streaming responses end the span when their body is finished, so
+    ``/run_sse`` spans cover the whole stream.
+    """
+    tracing = get_tracing()
+    if tracing is None:
+        return await handler(request)
+
+    span = tracing.tracer.start_span(
+        f"{request.method} {request.url.path}",
+        context=extract(dict(request.headers)),
+        kind=SpanKind.SERVER,
+        attributes={"http.request.method": request.method, "url.path": request.url.path},
+    )
+    token = otel_context.attach(trace.set_span_in_context(span))
+    parent_token = _parent_span.set(span)
+    try:
+        response = await handler(request)
+    except Exception as e:
+        span.record_exception(e)
+        span.set_status(Status(StatusCode.ERROR, str(e)))
+        span.end()
+        raise
+    finally:
+        _parent_span.reset(parent_token)
+        otel_context.detach(token)
+
+    span.set_attribute("http.response.status_code", response.status_code)
+    user = getattr(request.state, "user", None)
+    if user:
+        span.set_attribute("enduser.id", user.get("uid", ""))
+    if response.status_code >= 500:
+        span.set_status(Status(StatusCode.ERROR))
+
+    body = getattr(response, "body_iterator", None)
+    if body is None:
+        span.end()
+        return response
+
+    async def traced_body():
+        try:
+            async for chunk in body:
+                yield chunk
+        finally:
+            span.end()
+
+    response.body_iterator = traced_body()
+    return response
+
+
+def start_auth_span():
+    """Child span around the token check; end it with ``.end()``."""
+    tracing = get_tracing()
+    if tracing is None:
+        return None
+    return tracing.tracer.start_span("firebase.verify_id_token", context=otel_context.get_current())
+
+
+# --- Callback spans ----------------------------------------------------------
+
+
+def _agent_key(invocation_id: str, agent_name: str) -> Tuple[str, ...]:
+    return ("agent", invocation_id, agent_name)
+
+
+def start_agent_span(invocation_id: str, agent_name: str, user_id: Optional[str] = None) -> None:
+    tracing = get_tracing()
+    if tracing is None:
+        return
+    tracing.start_span(
+        _agent_key(invocation_id, agent_name),
+        f"invoke_agent {agent_name}",
+        attributes={
+            "gen_ai.operation.name": "invoke_agent",
+            "gen_ai.agent.name": agent_name,
+            "drop_agent.invocation_id": invocation_id,
+            "enduser.id": user_id or "",
+        },
+    )
+
+
+def end_agent_span(invocation_id: str, agent_name: str, **attributes: Any) -> None:
+    tracing = get_tracing()
+    if tracing is not None:
+        tracing.end_span(_agent_key(invocation_id, agent_name), attributes)
+
+
+def start_model_span(invocation_id: str, agent_name: str, model: Optional[str]) -> None:
+    tracing = get_tracing()
+    if tracing is None:
+        return
+    tracing.start_span(
+        ("model", invocation_id, agent_name),
+        f"chat {model}",
+        parent=tracing.get_span(_agent_key(invocation_id, agent_name)),
+        attributes={
+            "gen_ai.operation.name": "chat",
+            "gen_ai.agent.name": agent_name,
+            "gen_ai.request.model": model or "",
+        },
+    )
+
+
+def end_model_span(
+    invocation_id: str, agent_name: str, usage_metadata: Any = None, error: Optional[str] = None
+) -> None:
+    tracing = get_tracing()
+    if tracing is None:
+        return
+    tracing.end_span(
+        ("model", invocation_id, agent_name),
+        {
+            "gen_ai.usage.input_tokens": getattr(usage_metadata, "prompt_token_count", None),
+            "gen_ai.usage.output_tokens": getattr(usage_metadata, "candidates_token_count", None),
+        },
+        error=error,
+    )
+
+
+def start_tool_span(invocation_id: str, agent_name: str, tool_name: str, call_id: str) -> None:
+    """Open a tool span; agents the tool runs become its children."""
+    tracing = get_tracing()
+    if tracing is None:
+        return
+    previous = _parent_span.get()
+    span = tracing.start_span(
+        ("tool", call_id),
+        f"execute_tool {tool_name}",
+        parent=tracing.get_span(_agent_key(invocation_id, agent_name)),
+        attributes={
+            "gen_ai.operation.name": "execute_tool",
+            "gen_ai.tool.name": tool_name,
+            "gen_ai.tool.call.id": call_id,
+        },
+    )
+    with tracing._lock:
+        tracing._tool_parents[call_id] = previous
+        while len(tracing._tool_parents) > MAX_OPEN_SPANS:
+            tracing._tool_parents.popitem(last=False)
+    _parent_span.set(span)
+
+
+def end_tool_span(call_id: str, error: Optional[str] = None) -> None:
+    tracing = get_tracing()
+    if tracing is None:
+        return
+    span = tracing.get_span(("tool", call_id))
+    with tracing._lock:
+        previous = tracing._tool_parents.pop(call_id, None)
+    if span is not None and _parent_span.get() is span:
+        _parent_span.set(previous)
+    tracing.end_span(("tool", call_id), error=error)
@@ -0,0 +1,323 @@
+"""
+Token and latency ledger for the 82ndrop Agent System.
+
+Records every completed model call from the model callbacks:
+- tokens from the provider's ``usage_metadata`` (prompt, candidates, cached
+  and thinking tokens)
+- latency on the monotonic clock, from before_model_callback to the final
+  response, plus the time to the first streamed chunk
+
+Hedged duplicates of a call (see hedging.py) are recorded as calls of
+their own, flagged ``hedge``, with the duplicate's prompt tokens.
+
+Calls are aggregated per invocation, agent, user and (UTC) day and can be
+queried in-process (``get_usage_ledger().summary()``, ``/usage``). With
+USAGE_LEDGER_EXPORT_PATH set, every call is also appended to a JSONL file
+for cost and latency dashboards. The file is written by a background
+listener behind a bounded queue (as the API logs are, see logging_config.py),
+so model callbacks never wait on the disk; when the queue is full, new
+entries are dropped and counted.
+
+Configuration (environment variables):
+- USAGE_LEDGER: "false" to disable the ledger (default enabled)
+- USAGE_LEDGER_EXPORT_PATH: JSONL file each model call is appended to
+- USAGE_LEDGER_RECENT_CALLS: calls kept for ``recent()`` (default 500)
+"""
+
+import os
+import json
+import time
+import queue
+import atexit
+import logging
+import threading
+from collections import OrderedDict, deque
+from dataclasses import dataclass, asdict, field
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from .config import env_flag, env_int
+
+logger = logging.getLogger(__name__)
+
+# Invocations tracked at once; older ones are dropped first
+MAX_TRACKED_INVOCATIONS = 1000
+
+# Calls started but not finished (e.g. served from a cache); oldest dropped first
+MAX_PENDING_CALLS = 1000
+
+# Export entries waiting for the writer thread
+EXPORT_QUEUE_SIZE = 10000
+
+
+@dataclass
+class ModelCall:
+    """One completed model call."""
+
+    timestamp: str
+    day: str
+    invocation_id: str
+    agent: str
+    user_id: str
+    model: Optional[str]
+    prompt_tokens: int = 0
+    output_tokens: int = 0
+    cached_tokens: int = 0
+    thoughts_tokens: int = 0
+    total_tokens: int = 0
+    latency_ms: Optional[float] = None
+    first_chunk_ms: Optional[float] = None
+    error_code: Optional[str] = None
+    hedge: bool = False
+
+
+@dataclass
+class LedgerTotals:
+    """Aggregated model calls."""
+
+    calls: int = 0
+    errors: int = 0
+    hedges: int = 0
+    prompt_tokens: int = 0
+    output_tokens: int = 0
+    cached_tokens: int = 0
+    thoughts_tokens: int = 0
+    total_tokens: int = 0
+    latency_ms: float = 0.0
+    max_latency_ms: float = 0.0
+    models: Dict[str, int] = field(default_factory=dict)
+
+    def add(self, call: ModelCall) -> None:
+        self.calls += 1
+        self.errors += 1 if call.error_code else 0
+        self.hedges += 1 if call.hedge else 0
+        self.prompt_tokens += call.prompt_tokens
+        self.output_tokens += call.output_tokens
+        self.cached_tokens += call.cached_tokens
+        self.thoughts_tokens += call.thoughts_tokens
+        self.total_tokens += call.total_tokens
+        if call.latency_ms is not None:
+            self.latency_ms += call.latency_ms
+            self.max_latency_ms = max(self.max_latency_ms, call.latency_ms)
+        if call.model:
+            self.models[call.model] = self.models.get(call.model, 0) + 1
+
+    def as_dict(self) -> Dict[str, Any]:
+        totals = asdict(self)
+        totals["mean_latency_ms"] = self.latency_ms / self.calls if self.calls else 0.0
+        return totals
+
+
+def _usage_counts(usage_metadata: Any) -> Dict[str, int]:
+    counts = {
+        "prompt_tokens": getattr(usage_metadata, "prompt_token_count", 0) or 0,
+        "output_tokens": getattr(usage_metadata, "candidates_token_count", 0) or 0,
+        "cached_tokens": getattr(usage_metadata, "cached_content_token_count", 0) or 0,
+        "thoughts_tokens": getattr(usage_metadata, "thoughts_token_count", 0) or 0,
+    }
+    counts["total_tokens"] = getattr(usage_metadata, "total_token_count", 0) or (
+        counts["prompt_tokens"] + counts["output_tokens"] + counts["thoughts_tokens"]
+    )
+    return counts
+
+
+class UsageLedger:
+    """Per-call token and latency records with running aggregates."""
+
+    def __init__(self, export_path: Optional[str] = None, recent_calls: int = 500):
+        self.export_path = export_path
+        self._pending: "OrderedDict[Tuple[str, str], Dict[str, Any]]" = OrderedDict()
+        self._invocations: "OrderedDict[str, LedgerTotals]" = OrderedDict()
+        self._invocation_users: Dict[str, str] = {}
+        self._by_agent: Dict[str, LedgerTotals] = {}
+        self._by_user: Dict[str, LedgerTotals] = {}
+        self._by_day: Dict[str, LedgerTotals] = {}
+        self._recent: "deque[ModelCall]" = deque(maxlen=recent_calls)
+        self._lock = threading.Lock()
+        self._export_handler = None
+        self._export_listener = None
+        if export_path:
+            self._start_export(export_path)
+
+    @classmethod
+    def from_env(cls) -> "UsageLedger":
+        return cls(
+            export_path=os.getenv("USAGE_LEDGER_EXPORT_PATH") or None,
+            recent_calls=env_int("USAGE_LEDGER_RECENT_CALLS", 500),
+        )
+
+    def start_call(self, invocation_id: str, agent_name: str, model: Optional[str]) -> None:
+        """Mark the start of a model call (an agent makes one call at a time)."""
+        with self._lock:
+            self._pending[(invocation_id, agent_name)] = {
+                "started": time.perf_counter(),
+                "model": model,
+                "first_chunk": None,
+            }
+            while len(self._pending) > MAX_PENDING_CALLS:
+                self._pending.popitem(last=False)
+
+    def elapsed(self, invocation_id: str, agent_name: str) -> Optional[float]:
+        """Seconds since the agent's current call started, if it is tracked."""
+        pending = self._pending.get((invocation_id, agent_name))
+        return time.perf_counter() - pending["started"] if pending else None
+
+    def record_chunk(self, invocation_id: str, agent_name: str) -> None:
+        """Note a streamed partial response (the first one sets time to first chunk)."""
+        pending = self._pending.get((invocation_id, agent_name))
+        if pending and pending["first_chunk"] is None:
+            pending["first_chunk"] = time.perf_counter()
+
+    def finish_call(
+        self,
+        invocation_id: str,
+        agent_name: str,
+        user_id: str,
+        usage_metadata: Any,
+        error_code: Optional[str] = None,
+    ) -> ModelCall:
+        """Record the final response of a call and add it to the aggregates."""
+        finished = time.perf_counter()
+        now = datetime.now(timezone.utc)
+        with self._lock:
+            pending = self._pending.pop((invocation_id, agent_name), None)
+        call = ModelCall(
+            timestamp=now.isoformat(),
+            day=now.date().isoformat(),
+            invocation_id=invocation_id,
+            agent=agent_name,
+            user_id=user_id,
+            model=pending["model"] if pending else None,
+            latency_ms=(finished - pending["started"]) * 1000 if pending else None,
+            first_chunk_ms=(pending["first_chunk"] - pending["started"]) * 1000
+            if pending and pending["first_chunk"] is not None
+            else None,
+            error_code=error_code,
+            **_usage_counts(usage_metadata),
+        )
+        self._add(call)
+        return call
+
+    def record_call(
+        self,
+        invocation_id: str,
+        agent_name: str,
+        user_id: str,
+        model: Optional[str],
+        usage_metadata: Any,
+        hedge: bool = False,
+    ) -> ModelCall:
+        """Record a call that wasn't timed (e.g. a hedged duplicate) and add it to the aggregates."""
+        now = datetime.now(timezone.utc)
+        call = ModelCall(
+            timestamp=now.isoformat(),
+            day=now.date().isoformat(),
+            invocation_id=invocation_id,
+            agent=agent_name,
+            user_id=user_id,
+            model=model,
+            hedge=hedge,
+            **_usage_counts(usage_metadata),
+        )
+        self._add(call)
+        return call
+
+    def _add(self, call: ModelCall) -> None:
+        invocation_id, user_id = call.invocation_id, call.user_id
+        with self._lock:
+            invocation = self._invocations.get(invocation_id)
+            if invocation is None:
+                invocation = self._invocations[invocation_id] = LedgerTotals()
+                self._invocation_users[invocation_id] = user_id
+                while len(self._invocations) > MAX_TRACKED_INVOCATIONS:
+                    evicted, _ = self._invocations.popitem(last=False)
+                    self._invocation_users.pop(evicted, None)
+            for totals in (
+                invocation,
+                self._by_agent.setdefault(call.agent, LedgerTotals()),
+                self._by_user.setdefault(user_id, LedgerTotals()),
+                self._by_day.setdefault(call.day, LedgerTotals()),
+            ):
+                totals.add(call)
+            self._recent.append(call)
+        if self._export_handler is not None:
+            self._export(call)
+
+    def _start_export(self, export_path: str) -> None:
+        from .logging_config import BoundedQueueHandler, FlushingQueueListener
+
+        try:
+            file_handler = logging.FileHandler(export_path)
+        except OSError as e:
+            logger.warning(f"Could not open usage ledger export {export_path}: {e}")
+            return
+        file_handler.setFormatter(logging.Formatter("%(message)s"))
+        self._export_handler = BoundedQueueHandler(queue.Queue(maxsize=EXPORT_QUEUE_SIZE), overflow="drop_new")
+        self._export_listener = FlushingQueueListener(self._export_handler.queue, file_handler)
+        self._export_listener.start()
+        atexit.register(self.close)
+
+    def _export(self, call: ModelCall) -> None:
+        """Queue one JSONL line for the export writer (never blocks)."""
+        self._export_handler.handle(
+            logging.makeLogRecord({"msg": json.dumps(asdict(call)), "levelno": logging.INFO, "levelname": "INFO"})
+        )
+
+    def export_stats(self) -> Dict[str, Any]:
+        if self._export_handler is None:
+            return {"enabled": False}
+        return {
+            "enabled": True,
+            "queued": self._export_handler.queue.qsize(),
+            "dropped": sum(self._export_handler.dropped.values()),
+        }
+
+    def close(self) -> None:
+        """Write out queued export entries and close the export file."""
+        if self._export_listener is not None:
+            self._export_listener.stop()
+            for handler in self._export_listener.handlers:
+                handler.close()
+            self._export_listener = None
+            self._export_handler = None
+
+    def get_invocation(self, invocation_id: str, user_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Totals of one invocation (None if unknown or, with ``user_id``, someone else's)."""
+        with self._lock:
+            totals = self._invocations.get(invocation_id)
+            if totals is None or (user_id is not None and self._invocation_users.get(invocation_id) != user_id):
+                return None
+            return totals.as_dict()
+
+    def recent(self, limit: int = 50, user_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """The most recent calls (of one user, with ``user_id``), newest first."""
+        with self._lock:
+            calls = [call for call in reversed(self._recent) if user_id is None or call.user_id == user_id]
+            return [asdict(call) for call in calls[:limit]]
+
+    def user_summary(self, user_id: str) -> Dict[str, Any]:
+        """Totals of one user."""
+        with self._lock:
+            totals = self._by_user.get(user_id)
+            return {"user_id": user_id, "usage": totals.as_dict() if totals else LedgerTotals().as_dict()}
+
+    def summary(self) -> Dict[str, Any]:
+        """Totals per agent, user and day."""
+        with self._lock:
+            return {
+                "by_agent": {name: totals.as_dict() for name, totals in self._by_agent.items()},
+                "by_user": {user: totals.as_dict() for user, totals in self._by_user.items()},
+                "by_day": {day: totals.as_dict() for day, totals in sorted(self._by_day.items())},
+                "tracked_invocations": len(self._invocations),
+            }
+
+
+_usage_ledger = None
+
+
+def get_usage_ledger() -> Optional[UsageLedger]:
+    """Get or initialize the usage ledger (None when disabled)."""
+    global _usage_ledger
+    if _usage_ledger is None and env_flag("USAGE_LEDGER", default=True):
+        _usage_ledger = UsageLedger.from_env()
+    return _usage_ledger
@@ -0,0 +1,63 @@
+"""
+Variant-mode detection for the 82ndrop Agent System.
+
+Explicit requests such as "give me three versions of ..." are answered with
+N Master Prompt variants from a single guide/search pass and a single
+prompt_writer call instead of N full pipeline runs. Ideas that merely
+mention numbers of things ("ranks the 3 options", "4 takes on a burger")
+are single prompts.
+
+Configuration (environment variables):
+- MAX_PROMPT_VARIANTS: upper bound on variants per request (default 5)
+"""
+
+import re
+
+from .config import env_int
+
+_NUMBER_WORDS = {
+    "two": 2,
+    "three": 3,
+    "four": 4,
+    "five": 5,
+    "six": 6,
+    "seven": 7,
+    "eight": 8,
+    "nine": 9,
+    "ten": 10,
+    "a couple of": 2,
+    "a few": 3,
+}
+
+_VARIANT_NOUNS = r"(?:versions?|variants?|variations?)"
+
+# Only an explicit request counts ("give me three versions of ...", "can you
+# write 2 different variants of ..."), at the start of the message or of a
+# sentence: ideas mentioning "3 options" or "4 takes" are content, not requests
+_VARIANT_PATTERN = re.compile(
+    r"(?:^|[.!?]\s+)(?:(?:now|also|so|ok|okay),?\s+)?(?:please\s+)?(?:(?:can|could|would)\s+you\s+)?"
+    r"(?:please\s+|now\s+|also\s+|just\s+)?"
+    r"(?:give|write|generate|create|make|draft|i\s+(?:want|need|would\s+like))(?:\s+(?:me|us))?\s+"
+    r"(\d+|" + "|".join(_NUMBER_WORDS) + r")\s+(?:different\s+|distinct\s+|unique\s+)?"
+    + _VARIANT_NOUNS + r"\b",
+    re.IGNORECASE,
+)
+
+
+def detect_variant_count(text: str) -> int:
+    """
+    Detect how many prompt variants a message asks for.
+
+    Args:
+        text: The user's message
+
+    Returns:
+        The requested number of variants (1 when no variant mode is requested)
+    """
+    match = _VARIANT_PATTERN.search((text or "").strip())
+    if not match:
+        return 1
+    word = match.group(1).lower()
+    count = int(word) if word.isdigit() else _NUMBER_WORDS[word]
+    max_variants = env_int("MAX_PROMPT_VARIANTS", 5)
+    return max(1, min(count, max_variants))
@@ -0,0 +1,210 @@
+"""
+Startup warm-up for the 82ndrop Agent System.
+
+The first request on a fresh Cloud Run instance otherwise pays for lazy
+imports, building the agent graph, credential refreshes and TLS handshakes
+to Vertex AI and Firebase. The warm-up runs those in the background when the
+app starts:
+- agent_graph: imports the agent package (ADK's agent loader then finds it
+  in ``sys.modules``), resolves every agent's model and touches the
+  in-process runner of ``SearchEnhancementTool``
+- runner: an internal no-op ``/run`` through the served app (see
+  ``get_internal_client`` in batch.py), which makes ADK load the app and
+  build the runner it serves ``/run`` with; the first real ``/run``
+  otherwise does that
+- model_clients: creates the Vertex AI client of every Gemini model and makes
+  a metadata call, which refreshes credentials and opens pooled connections
+- firebase: verifies a well-formed token with a bogus signature, so
+  ``verify_id_token`` creates its client and fetches and caches the
+  signing certificates it needs
+
+A failing step is logged and recorded but does not keep the instance from
+serving. ``/ready`` reports ready only once the warm-up has finished (or
+timed out); point the Cloud Run startup probe at it.
+
+Configuration (environment variables):
+- WARMUP: "false" to skip the warm-up (ready immediately)
+- WARMUP_CONNECTIONS: "false" to skip the outbound model/Firebase steps
+- WARMUP_TIMEOUT: seconds before the warm-up gives up and reports ready (default 60)
+"""
+
+import os
+import json
+import time
+import base64
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
+
+from .config import env_flag, env_float
+
+logger = logging.getLogger(__name__)
+
+# User ID of the warm-up's internal requests
+WARMUP_USER_ID = "warmup"
+
+
+class WarmupState:
+    """Progress of the startup warm-up, reported by ``/ready``."""
+
+    def __init__(self):
+        self.ready = False
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.timed_out = False
+        self.steps: Dict[str, Dict[str, Any]] = {}
+
+    def snapshot(self) -> Dict[str, Any]:
+        duration = None
+        if self.started_at is not None:
+            duration = ((self.finished_at or time.time()) - self.started_at) * 1000
+        return {
+            "ready": self.ready,
+            "duration_ms": duration,
+            "timed_out": self.timed_out,
+            "steps": self.steps,
+        }
+
+
+_warmup_state = WarmupState()
+
+
+def get_warmup_state() -> WarmupState:
+    return _warmup_state
+
+
+def _iter_agents(agent) -> List[Any]:
+    agents = [agent]
+    for sub_agent in getattr(agent, "sub_agents", None) or []:
+        agents.extend(_iter_agents(sub_agent))
+    return agents
+
+
+def _warm_agent_graph() -> Dict[str, Any]:
+    from google.adk.models.google_llm import Gemini
+    from drop_agent.agent import root_agent
+
+    agents = _iter_agents(root_agent)
+    models = []
+    for agent in agents:
+        model = agent.canonical_model
+        if isinstance(model, Gemini) and all(model is not seen for seen in models):
+            models.append(model)
+        for tool in getattr(agent, "tools", None) or []:
+            runner = getattr(tool, "runner", None)
+            if runner is not None:
+                # Builds the tool's in-process runner graph
+                _iter_agents(runner.agent)
+    return {"agents": [agent.name for agent in agents], "models": models}
+
+
+async def _warm_runner() -> None:
+    from drop_agent.batch import AGENT_APP_NAME, INTERNAL_CALL_HEADER, get_internal_calls, get_internal_client
+
+    client = get_internal_client()
+    if client is None:
+        raise RuntimeError("The agent app is not being served")
+
+    # A run in a session that doesn't exist: ADK loads the app and builds its
+    # runner (and plugins), then answers 404 before any callback or model call
+    with get_internal_calls().register({"uid": WARMUP_USER_ID, "agent_access": True}) as token:
+        response = await client.post(
+            "/run",
+            headers={INTERNAL_CALL_HEADER: token},
+            json={
+                "appName": AGENT_APP_NAME,
+                "userId": WARMUP_USER_ID,
+                "sessionId": "warmup-no-session",
+                "newMessage": {"role": "user", "parts": [{"text": "warm-up"}]},
+            },
+        )
+    if response.status_code != 404:
+        raise RuntimeError(f"Warm-up run answered {response.status_code}, expected 404")
+
+
+async def _warm_model_client(model) -> None:
+    client = await asyncio.to_thread(lambda: model.api_client)
+    await client.aio.models.get(model=model.model)
+
+
+def _unsigned_id_token(project_id: str) -> str:
+    """A well-formed Firebase ID token for ``project_id`` with a bogus signature."""
+    def encode(data) -> str:
+        raw = data if isinstance(data, bytes) else json.dumps(data).encode("utf-8")
+        return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+    now = int(time.time())
+    header = {"alg": "RS256", "kid": "warmup", "typ": "JWT"}
+    payload = {
+        "aud": project_id,
+        "iss": f"https://securetoken.google.com/{project_id}",
+        "sub": WARMUP_USER_ID,
+        "iat": now,
+        "exp": now + 300,
+    }
+    return ".".join((encode(header), encode(payload), encode(b"warmup")))
+
+
+def _warm_firebase() -> None:
+    import firebase_admin
+    from firebase_admin import auth
+
+    project_id = firebase_admin.get_app().project_id or os.getenv("GOOGLE_CLOUD_PROJECT")
+    # Its claims pass, so verify_id_token fetches (and caches) the signing
+    # certificates before it rejects the signature; fetch errors propagate
+    try:
+        auth.verify_id_token(_unsigned_id_token(project_id))
+    except auth.InvalidIdTokenError:
+        pass
+
+
+async def _run_step(state: WarmupState, name: str, step) -> Any:
+    started = time.perf_counter()
+    try:
+        result = await step()
+        state.steps[name] = {"ok": True, "duration_ms": (time.perf_counter() - started) * 1000}
+        return result
+    except Exception as e:
+        state.steps[name] = {
+            "ok": False,
+            "duration_ms": (time.perf_counter() - started) * 1000,
+            "error": f"{type(e).__name__}: {e}",
+        }
+        logger.warning(f"Warm-up step {name} failed: {e}")
+        return None
+
+
+async def _warm_up(state: WarmupState) -> None:
+    graph = await _run_step(state, "agent_graph", lambda: asyncio.to_thread(_warm_agent_graph))
+    await _run_step(state, "runner", _warm_runner)
+
+    if not env_flag("WARMUP_CONNECTIONS", default=True):
+        return
+
+    models = (graph or {}).get("models", [])
+
+    async def warm_models():
+        await asyncio.gather(*(_warm_model_client(model) for model in models))
+
+    steps = [_run_step(state, "firebase", lambda: asyncio.to_thread(_warm_firebase))]
+    if models:
+        steps.append(_run_step(state, "model_clients", warm_models))
+    await asyncio.gather(*steps)
+
+
+async def run_warmup() -> WarmupState:
+    """Warm the instance up and mark it ready; never raises."""
+    state = get_warmup_state()
+    state.started_at = time.time()
+    if env_flag("WARMUP", default=True):
+        try:
+            await asyncio.wait_for(_warm_up(state), timeout=env_float("WARMUP_TIMEOUT", 60.0))
+        except asyncio.TimeoutError:
+            state.timed_out = True
+            logger.warning("Warm-up timed out; reporting ready anyway")
+        except Exception as e:
+            logger.error(f"Warm-up failed: {e}")
+    state.finished_at = time.time()
+    state.ready = True
+    logger.info(f"🔥 Warm-up finished in {(state.finished_at - state.started_at) * 1000:.0f}ms: {state.steps}")
+    return state
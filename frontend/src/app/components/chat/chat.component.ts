@@ -912,6 +912,9 @@ export class ChatComponent implements OnInit, OnDestroy, AfterViewChecked {
     this.messages.push(progressMessage);
     this.shouldScrollToBottom = true;
 
+    // Text of the final prompt streamed so far
+    let streamedText = '';
+
     try {
       // Use SSE for real-time updates
       const response = await this.agentService.sendMessageWithSSE(
@@ -924,7 +927,10 @@ export class ChatComponent implements OnInit, OnDestroy, AfterViewChecked {
               this.messages[progressIndex].workflowSteps || [];
             if (update.content && update.content.parts) {
               const part = update.content.parts[0];
-              if (part.functionCall) {
+              if (update.partial && part.text) {
+                streamedText += part.text;
+                this.messages[progressIndex].content = streamedText;
+              } else if (part.functionCall) {
                 const step = `Calling: ${part.functionCall.name}`;
                 if (workflowSteps[workflowSteps.length - 1] !== step) {
                   workflowSteps.push(step);
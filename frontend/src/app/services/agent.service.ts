@@ -231,7 +231,8 @@ export class AgentService {
         if (line.startsWith('data: ')) {
           const json = JSON.parse(line.substring(6));
           onUpdate(json);
-          if (json.content && json.content.parts && json.content.parts[0] && json.content.parts[0].text) {
+          // Partial events carry streamed chunks; the final event has the full text
+          if (!json.partial && json.content && json.content.parts && json.content.parts[0] && json.content.parts[0].text) {
             lastMessage = json.content.parts[0].text;
           }
         }
@@ -3,15 +3,46 @@ import logging
 import firebase_admin
 from firebase_admin import credentials, auth
 from fastapi import Request, HTTPException, FastAPI
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 import uvicorn
 from google.adk.cli.fast_api import get_fast_api_app
 from datetime import datetime
+from contextlib import asynccontextmanager
 from starlette.middleware.base import BaseHTTPMiddleware
 import vertexai
 import google.generativeai as genai
 import asyncio
+import inspect
+import json
 import random
+import time
+from drop_agent.batch import (
+    AGENT_APP_NAME,
+    INTERNAL_CALL_HEADER,
+    extract_final_prompt,
+    get_internal_calls,
+    get_internal_client,
+    parse_batch_request,
+    run_batch,
+    set_internal_app,
+)
+from drop_agent.budget import get_budget_tracker
+from drop_agent.context_cache import get_context_cache
+from drop_agent.logging_config import analytics_tracker
+from drop_agent.metrics import MetricsMiddleware, get_metrics, is_quota_error, run_refresh_loop
+from drop_agent.request_analytics import RequestAnalyticsMiddleware, get_request_analytics
+from drop_agent.response_cache import get_response_cache
+from drop_agent.session_telemetry import get_session_telemetry
+from drop_agent.streaming import SSEChatterFilterMiddleware
+from drop_agent.tracing import get_tracing, start_auth_span, trace_request
+from drop_agent.usage_ledger import get_usage_ledger
+from drop_agent.warmup import get_warmup_state, run_warmup
+from drop_agent.circuit_breaker import (
+    VEO_BREAKER,
+    breaker_status,
+    get_breaker,
+    maybe_inject_failure,
+)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -52,23 +83,44 @@ vertexai.init(
 # Firebase authentication middleware
 class FirebaseAuthMiddleware(BaseHTTPMiddleware):
     async def dispatch(self, request: Request, call_next):
-        # Skip authentication for health check and OPTIONS requests
-        if request.url.path == "/health" or request.method == "OPTIONS":
+        # Root span of the request when tracing is enabled
+        return await trace_request(request, lambda request: self.authenticate(request, call_next))
+
+    async def authenticate(self, request: Request, call_next):
+        # Skip authentication for health/readiness checks, metrics scrapes and OPTIONS requests
+        if request.url.path in ("/health", "/ready", "/metrics") or request.method == "OPTIONS":
+            return await call_next(request)
+        # A batch's item requests act for the caller /run_batch already authenticated
+        internal_claims = get_internal_calls().claims(request.scope)
+        if internal_claims is not None:
+            request.state.user = internal_claims
             return await call_next(request)
         auth_header = request.headers.get("Authorization")
         if not auth_header or not auth_header.startswith("Bearer "):
+            count_auth_failure("missing_header")
             return JSONResponse(status_code=401, content={"detail": "Missing or invalid Authorization header"})
+        auth_span = start_auth_span()
         try:
             token = auth_header.split("Bearer ")[1]
             decoded_token = auth.verify_id_token(token)
             if not decoded_token.get('agent_access'):
+                count_auth_failure("no_agent_access")
                 return JSONResponse(status_code=403, content={"detail": "User does not have agent access"})
             request.state.user = decoded_token
         except Exception as e:
             print(f"Firebase token verification failed: {e}")
+            count_auth_failure("invalid_token")
             return JSONResponse(status_code=401, content={"detail": "Invalid authentication token"})
+        finally:
+            if auth_span:
+                auth_span.end()
         return await call_next(request)
 
+def count_auth_failure(reason: str):
+    metrics = get_metrics()
+    if metrics:
+        metrics.count_auth_failure(reason)
+
 # Set web=False for API-only usage
 SERVE_WEB_INTERFACE = False
 
@@ -81,21 +133,111 @@ ALLOWED_ORIGINS = [
     "http://localhost"
 ]
 
-# Call the function to get the FastAPI app instance
-app: FastAPI = get_fast_api_app(
-    agents_dir="drop_agent",
-    allow_origins=ALLOWED_ORIGINS,
-    web=SERVE_WEB_INTERFACE,
-)
+_warmup_task = None
+_metrics_task = None
+
+async def start_background_services():
+    """Create and keep warm the cached static instructions, start the instance warm-up and metrics sampling."""
+    global _warmup_task, _metrics_task
+    context_cache = get_context_cache()
+    if context_cache:
+        context_cache.start()
+    _warmup_task = asyncio.create_task(run_warmup())
+    _metrics_task = asyncio.create_task(run_refresh_loop())
+
+async def stop_background_services():
+    """Release cached content handles and flush request analytics, cached responses, the usage export and traces on shutdown."""
+    for task in (_warmup_task, _metrics_task):
+        if task and not task.done():
+            task.cancel()
+    context_cache = get_context_cache()
+    if context_cache:
+        context_cache.stop()
+    request_analytics = get_request_analytics()
+    if request_analytics:
+        await request_analytics.stop()
+    response_cache = get_response_cache()
+    if response_cache:
+        await asyncio.to_thread(response_cache.close)
+    ledger = get_usage_ledger()
+    if ledger:
+        ledger.close()
+    tracing = get_tracing()
+    if tracing:
+        tracing.shutdown()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await start_background_services()
+    try:
+        yield
+    finally:
+        await stop_background_services()
+
+# Call the function to get the FastAPI app instance. ADK installs its own
+# lifespan, which disables on_event handlers, so ours is passed in; ADK
+# releases without the parameter still run the event handlers.
+if "lifespan" in inspect.signature(get_fast_api_app).parameters:
+    app: FastAPI = get_fast_api_app(
+        agents_dir="drop_agent",
+        allow_origins=ALLOWED_ORIGINS,
+        web=SERVE_WEB_INTERFACE,
+        lifespan=lifespan,
+    )
+else:
+    app: FastAPI = get_fast_api_app(
+        agents_dir="drop_agent",
+        allow_origins=ALLOWED_ORIGINS,
+        web=SERVE_WEB_INTERFACE,
+    )
+    app.add_event_handler("startup", start_background_services)
+    app.add_event_handler("shutdown", stop_background_services)
+
+# Background work (batches, semantic cache refreshes, warm-up) calls the served routes in-process
+set_internal_app(app)
 
 # Add Firebase authentication middleware
 app.add_middleware(FirebaseAuthMiddleware)
 
+# Stream only the final agent's tokens (and workflow steps) over /run_sse
+app.add_middleware(SSEChatterFilterMiddleware)
+
+# Per-request analytics, outside authentication so rejected requests count too
+app.add_middleware(RequestAnalyticsMiddleware)
+
+# Outermost, so request latency includes authentication
+app.add_middleware(MetricsMiddleware)
+
 # Health check endpoint (no auth required)
 @app.get("/health")
 async def health_check():
     return {"status": "healthy", "timestamp": datetime.now().isoformat()}
 
+# Readiness endpoint (no auth required): ready once the warm-up has finished
+@app.get("/ready")
+async def readiness_check():
+    warmup = get_warmup_state().snapshot()
+    return JSONResponse(
+        status_code=200 if warmup["ready"] else 503,
+        content={
+            "status": "ready" if warmup["ready"] else "warming_up",
+            "warmup": warmup,
+            "timestamp": datetime.now().isoformat(),
+        },
+    )
+
+# Prometheus scrape endpoint (no Firebase auth; METRICS_TOKEN protects it when set)
+@app.get("/metrics")
+async def metrics_endpoint(request: Request):
+    metrics = get_metrics()
+    if metrics is None:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    token = os.getenv("METRICS_TOKEN")
+    if token and request.headers.get("Authorization") != f"Bearer {token}":
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    body, content_type = metrics.render()
+    return Response(content=body, media_type=content_type)
+
 # Mock mode configuration
 MOCK_MODE = True  # Set to False to use real video generation
 
@@ -110,6 +252,22 @@ MOCK_VIDEOS = [
 # Dictionary to store mock operations
 mock_operations = {}
 
+def create_mock_operation(user_id: str, session_id: str):
+    """Start a mock video generation operation."""
+    # Generate a random operation name
+    operation_name = f"projects/taajirah/locations/global/publishers/google/models/veo-3.0-generate-preview/operations/{random.randbytes(16).hex()}"
+
+    # Store operation data
+    mock_operations[operation_name] = {
+        "status": "in_progress",
+        "operation_name": operation_name,
+        "user_id": user_id,
+        "session_id": session_id,
+        "created_at": datetime.now().isoformat()
+    }
+
+    return mock_operations[operation_name]
+
 @app.post("/toggle-mock")
 async def toggle_mock(request: Request):
     """Toggle mock mode on/off."""
@@ -129,6 +287,162 @@ async def get_mock_status():
     }
 
 
+@app.get("/circuit-status")
+async def get_circuit_status():
+    """Get the state of every circuit breaker."""
+    return {
+        "breakers": breaker_status(),
+        "timestamp": datetime.now().isoformat()
+    }
+
+
+def is_admin(user: dict) -> bool:
+    """Whether the caller's Firebase claims grant admin access."""
+    return (user or {}).get("access_level") == "admin"
+
+
+@app.get("/usage")
+async def get_usage(request: Request, invocation_id: str = None, recent: int = 0):
+    """
+    Model token and latency totals (or one invocation's), with the
+    invocation budget usage and, for admins, the context cache savings.
+
+    Admins get the totals per agent, user and day; other callers only their
+    own totals, invocations and recent calls.
+    """
+    ledger = get_usage_ledger()
+    if ledger is None:
+        raise HTTPException(status_code=404, detail="Usage ledger is disabled")
+    budget = get_budget_tracker()
+    context_cache = get_context_cache()
+    user = getattr(request.state, "user", None) or {}
+    owner = None if is_admin(user) else user.get("uid") or "anonymous"
+    if invocation_id:
+        usage = ledger.get_invocation(invocation_id, user_id=owner)
+        if usage is None:
+            raise HTTPException(status_code=404, detail="Unknown invocation")
+        return {
+            "invocation_id": invocation_id,
+            "usage": usage,
+            "budget": budget.get_invocation_usage(invocation_id) if budget else None,
+        }
+    if owner is not None:
+        return {
+            **ledger.user_summary(owner),
+            "budget": budget.get_user_usage(owner) if budget else None,
+            "recent": ledger.recent(recent, user_id=owner) if recent else [],
+            "timestamp": datetime.now().isoformat()
+        }
+    return {
+        **ledger.summary(),
+        "budget": budget.usage_summary() if budget else None,
+        "context_cache": context_cache.savings_summary() if context_cache else None,
+        "export": ledger.export_stats(),
+        "recent": ledger.recent(recent) if recent else [],
+        "timestamp": datetime.now().isoformat()
+    }
+
+
+@app.get("/telemetry")
+async def get_telemetry(request: Request, session_id: str = None):
+    """Recent tool usage and tool metrics of one of the caller's sessions (kept outside session state)."""
+    telemetry = get_session_telemetry()
+    if session_id:
+        user = getattr(request.state, "user", None) or {}
+        owner = None if is_admin(user) else user.get("uid") or "anonymous"
+        session = telemetry.get_session(session_id, user_id=owner)
+        if session is None:
+            raise HTTPException(status_code=404, detail="Unknown session")
+        return {"session_id": session_id, **session}
+    return {**telemetry.summary(), "timestamp": datetime.now().isoformat()}
+
+
+@app.get("/analytics/overview")
+async def get_analytics_overview(request: Request):
+    """The caller's request analytics and today's totals."""
+    user = getattr(request.state, "user", None) or {}
+    request_analytics = get_request_analytics()
+    return {
+        "user_stats": analytics_tracker.get_user_summary(user.get("uid")),
+        "daily_stats": analytics_tracker.get_daily_summary(),
+        "pipeline": request_analytics.snapshot() if request_analytics else None,
+    }
+
+
+# Batch items run through this app's own session and /run routes, so each
+# idea gets a normal session and shares the in-process caches. They carry
+# the batch's internal call token instead of the caller's ID token.
+@app.post("/run_batch")
+async def run_batch_endpoint(request: Request):
+    """Run the prompt pipeline for many ideas, streaming NDJSON results as they complete."""
+    try:
+        ideas, concurrency = parse_batch_request(await request.json())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    user = getattr(request.state, "user", None) or {}
+    user_id = user.get("uid") or user.get("user_id")
+    if not user_id:
+        raise HTTPException(status_code=401, detail="User not authenticated")
+    headers = {}
+    client = get_internal_client()
+
+    async def run_item(idea: str):
+        response = await client.post(
+            f"/apps/{AGENT_APP_NAME}/users/{user_id}/sessions", headers=headers, json={}
+        )
+        if response.status_code != 200:
+            return {"error": f"Session creation failed with status {response.status_code}"}
+        session_id = response.json()["id"]
+
+        response = await client.post(
+            "/run",
+            headers=headers,
+            json={
+                "appName": AGENT_APP_NAME,
+                "userId": user_id,
+                "sessionId": session_id,
+                "newMessage": {"role": "user", "parts": [{"text": idea}]},
+            },
+        )
+        if response.status_code != 200:
+            return {"session_id": session_id, "error": f"Run failed with status {response.status_code}"}
+        events = response.json()
+        errors = [event for event in events if event.get("errorCode") or event.get("error")]
+        if errors:
+            error = errors[-1]
+            return {
+                "session_id": session_id,
+                "error": error.get("errorMessage") or error.get("errorCode") or str(error.get("error")),
+            }
+        prompt = extract_final_prompt(events)
+        if not prompt:
+            return {"session_id": session_id, "error": "Pipeline finished without a prompt"}
+        return {"session_id": session_id, "prompt": prompt}
+
+    async def stream():
+        started = time.perf_counter()
+        succeeded = failed = 0
+        with get_internal_calls().register(user) as token:
+            headers[INTERNAL_CALL_HEADER] = token
+            async for result in run_batch(ideas, run_item, concurrency):
+                if result["status"] == "ok":
+                    succeeded += 1
+                else:
+                    failed += 1
+                yield json.dumps(result) + "\n"
+        yield json.dumps({
+            "done": True,
+            "total": len(ideas),
+            "succeeded": succeeded,
+            "failed": failed,
+            "duration_ms": (time.perf_counter() - started) * 1000,
+        }) + "\n"
+
+    logger.info(f"Running batch of {len(ideas)} ideas for {user_id} (concurrency {concurrency})")
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
 @app.post("/generate-video")
 async def generate_video(request: Request):
     """Video generation endpoint."""
@@ -141,19 +455,7 @@ async def generate_video(request: Request):
             raise HTTPException(status_code=400, detail="Missing user_id or session_id")
         
         if MOCK_MODE:
-            # Generate a random operation name
-            operation_name = f"projects/taajirah/locations/global/publishers/google/models/veo-3.0-generate-preview/operations/{random.randbytes(16).hex()}"
-            
-            # Store operation data
-            mock_operations[operation_name] = {
-                "status": "in_progress",
-                "operation_name": operation_name,
-                "user_id": user_id,
-                "session_id": session_id,
-                "created_at": datetime.now().isoformat()
-            }
-            
-            return mock_operations[operation_name]
+            return create_mock_operation(user_id, session_id)
         else:
             # Original video generation code
             # Get user from request state
@@ -183,7 +485,16 @@ async def generate_video(request: Request):
             logger.info(f"Starting video generation for user {user_id}, session {session_id}")
             logger.info(f"Output GCS URI: {output_gcs_uri}")
 
+            # Degrade while Veo is failing: mock backend outside production, fail fast in production
+            veo_breaker = get_breaker(VEO_BREAKER)
+            if veo_breaker and not veo_breaker.allow():
+                if os.getenv('ENV', 'staging') != 'production':
+                    logger.warning("Veo circuit open, routing video generation to the mock backend")
+                    return {**create_mock_operation(user_id, session_id), "degraded": True}
+                raise HTTPException(status_code=503, detail="Video generation is temporarily unavailable")
+
             try:
+                maybe_inject_failure(VEO_BREAKER)
                 # Generate video
                 operation = client.models.generate_videos(
                     model="veo-3.0-generate-preview",
@@ -194,6 +505,9 @@ async def generate_video(request: Request):
                     ),
                 )
 
+                if veo_breaker:
+                    veo_breaker.record_success()
+
                 # Store operation in memory for status checks
                 operation_id = operation.name
                 operations[operation_id] = {
@@ -216,6 +530,12 @@ async def generate_video(request: Request):
                 }
 
             except Exception as e:
+                if veo_breaker:
+                    veo_breaker.record_failure()
+                if is_quota_error(e):
+                    metrics = get_metrics()
+                    if metrics:
+                        metrics.count_quota_error("veo")
                 logger.error(f"Error in GenAI client operation: {str(e)}")
                 raise HTTPException(status_code=500, detail=f"Video generation failed: {str(e)}")
 
@@ -228,6 +548,17 @@ async def generate_video(request: Request):
 # Dictionary to store operations with additional metadata
 operations = {}
 
+def observe_video_job(operation_data: dict, outcome: str):
+    """Record how long a video job took to reach its final status."""
+    metrics = get_metrics()
+    if metrics:
+        metrics.observe_video_job(operation_data.get("created_at"), outcome)
+
+_metrics = get_metrics()
+if _metrics:
+    _metrics.register_size("tracked_operations", "veo", lambda: len(operations))
+    _metrics.register_size("tracked_operations", "mock", lambda: len(mock_operations))
+
 def get_video_bucket():
     """Get the appropriate GCS bucket based on environment."""
     env = os.getenv('ENV', 'staging')  # Default to staging for safety
@@ -244,7 +575,8 @@ async def check_video_status(operation_name: str, request: Request):
         if not user:
             raise HTTPException(status_code=401, detail="User not authenticated")
 
-        if MOCK_MODE:
+        # Degraded requests (open Veo circuit) run on the mock backend too
+        if MOCK_MODE or operation_name in mock_operations:
             if operation_name not in mock_operations:
                 raise HTTPException(status_code=404, detail="Operation not found")
             
@@ -260,6 +592,7 @@ async def check_video_status(operation_name: str, request: Request):
                     operation_data["status"] = "completed"
                     operation_data["video_uri"] = random.choice(MOCK_VIDEOS)
                     mock_operations[operation_name] = operation_data
+                    observe_video_job(operation_data, "completed")
             
             return operation_data
         else:
@@ -290,6 +623,7 @@ async def check_video_status(operation_name: str, request: Request):
                             # Operation failed
                             error_msg = str(operation.error)
                             operations.pop(operation_name, None)  # Clean up
+                            observe_video_job(operation_data, "failed")
                             return {
                                 "status": "failed",
                                 "error": error_msg,
@@ -303,6 +637,7 @@ async def check_video_status(operation_name: str, request: Request):
                         if operation.response and operation.result.generated_videos:
                             video_uri = operation.result.generated_videos[0].video.uri
                             operations.pop(operation_name, None)  # Clean up
+                            observe_video_job(operation_data, "completed")
                             return {
                                 "status": "completed",
                                 "video_uri": video_uri,
@@ -316,6 +651,7 @@ async def check_video_status(operation_name: str, request: Request):
                     except Exception as e:
                         logger.error(f"Error processing completed operation: {str(e)}")
                         operations.pop(operation_name, None)  # Clean up
+                        observe_video_job(operation_data, "error")
                         return {
                             "status": "error",
                             "error": f"Failed to process completed operation: {str(e)}",
@@ -359,12 +695,14 @@ async def cancel_video_generation(operation_name: str, request: Request):
         if not user:
             raise HTTPException(status_code=401, detail="User not authenticated")
 
-        if MOCK_MODE:
+        # Degraded requests (open Veo circuit) run on the mock backend too
+        if MOCK_MODE or operation_name in mock_operations:
             if operation_name not in mock_operations:
                 raise HTTPException(status_code=404, detail="Operation not found")
             
             operation_data = mock_operations[operation_name]
             mock_operations.pop(operation_name)
+            observe_video_job(operation_data, "cancelled")
             
             return {
                 "status": "cancelled",
@@ -393,6 +731,7 @@ async def cancel_video_generation(operation_name: str, request: Request):
                 
                 # Clean up operation from memory
                 operations.pop(operation_name, None)
+                observe_video_job(operation_data, "cancelled")
                 
                 return {
                     "status": "cancelled",